@@ -0,0 +1,230 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# benchmarks/daemon_footprint.py
+# =============
+# Memory and CPU footprint of the headless daemon (daemon.py) against the
+# player window (main.py).
+#
+# Starts each entry point as a child process in a sandboxed config directory
+# with a generated library (the window on the offscreen platform plugin),
+# waits until it answers on its control socket, then samples /proc while it
+# sits idle with the library loaded and while it plays. Reports resident
+# memory, CPU time to get ready and CPU use in each phase, and exits non-zero
+# when the daemon's memory is not below --max-rss-ratio of the window's or it
+# uses more CPU than the window. Linux only.
+#
+# Usage:
+#   python -m benchmarks.daemon_footprint --size 2000 --output footprint.json
+# =============
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run_benchmarks import prepare_library  # noqa: E402
+from core.controlProtocol import ControlClient  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINTS = {"daemon": "daemon.py", "window": "main.py"}
+STARTUP_TIMEOUT_SECONDS = 60
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def read_proc(pid):
+    """(resident MiB, peak resident MiB, CPU seconds, threads) of a process from /proc."""
+    fields = {}
+    with open(f"/proc/{pid}/status", "r", encoding="utf-8") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            fields[key] = value.split()
+    with open(f"/proc/{pid}/stat", "r", encoding="utf-8") as f:
+        # Fields after the parenthesized command name; utime and stime are the 14th and 15th
+        stat = f.read().rsplit(")", 1)[1].split()
+    cpu_seconds = (int(stat[11]) + int(stat[12])) / CLOCK_TICKS
+    return (int(fields["VmRSS"][0]) / 1024, int(fields["VmHWM"][0]) / 1024, cpu_seconds,
+            int(fields["Threads"][0]))
+
+
+def make_sandbox(library_dir):
+    """Config directory and temp directory of a fresh profile that loads the generated library."""
+    sandbox = tempfile.mkdtemp(prefix="iota_footprint_")
+    config_dir = os.path.join(sandbox, ".config", "IotaPlayer")
+    os.makedirs(config_dir)
+    os.makedirs(os.path.join(sandbox, "tmp"))
+    config = {
+        "root_playlist_folder": os.path.join(library_dir, "playlists"),
+        "default_playlist": "bench_all",
+        "connect_to_discord": False,
+        # Skips the Qt version dialog, which would block the window's startup
+        "use_qdarktheme": True,
+    }
+    with open(os.path.join(config_dir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=4)
+    return sandbox
+
+
+def wait_until_ready(process):
+    """Seconds until the child answers "status"."""
+    start = time.perf_counter()
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"exited with code {process.returncode} before it was ready")
+        client = ControlClient.connect()
+        if client is not None:
+            try:
+                ok, _ = client.call("status")
+            except (OSError, ConnectionError):
+                ok = False
+            finally:
+                client.close()
+            if ok:
+                return time.perf_counter() - start
+        time.sleep(0.05)
+    raise RuntimeError(f"not ready after {STARTUP_TIMEOUT_SECONDS}s")
+
+
+def sample_phase(pid, seconds):
+    """CPU percent and resident MiB over a phase of `seconds`."""
+    _, _, cpu_start, _ = read_proc(pid)
+    wall_start = time.perf_counter()
+    time.sleep(seconds)
+    rss, _, cpu_end, threads = read_proc(pid)
+    elapsed = time.perf_counter() - wall_start
+    return {"cpu_percent": round((cpu_end - cpu_start) / elapsed * 100.0, 2), "rss_mb": round(rss, 1),
+            "threads": threads}
+
+
+def command(name):
+    client = ControlClient.connect()
+    if client is None:
+        return False
+    try:
+        ok, _ = client.call(name)
+        return ok
+    except (OSError, ConnectionError):
+        return False
+    finally:
+        client.close()
+
+
+def measure(kind, library_dir, settle, phase_seconds):
+    """Start one entry point in its own sandbox and measure it."""
+    sandbox = make_sandbox(library_dir)
+    env = dict(os.environ, HOME=sandbox, USERPROFILE=sandbox, APPDATA=sandbox,
+               TMPDIR=os.path.join(sandbox, "tmp"))
+    if kind == "window":
+        env["QT_QPA_PLATFORM"] = "offscreen"
+    # The control socket lives in the child's temp directory
+    previous_tmpdir = os.environ.get("TMPDIR")
+    os.environ["TMPDIR"] = env["TMPDIR"]
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, ENTRY_POINTS[kind])], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        ready_seconds = wait_until_ready(process)
+        _, _, startup_cpu, _ = read_proc(process.pid)
+        time.sleep(settle)
+        idle = sample_phase(process.pid, phase_seconds)
+        command("play")
+        playing = sample_phase(process.pid, phase_seconds)
+        _, peak_rss, _, _ = read_proc(process.pid)
+        command("quit")
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        if previous_tmpdir is None:
+            os.environ.pop("TMPDIR", None)
+        else:
+            os.environ["TMPDIR"] = previous_tmpdir
+        shutil.rmtree(sandbox, ignore_errors=True)
+    return {
+        "ready_s": round(ready_seconds, 2),
+        "startup_cpu_s": round(startup_cpu, 2),
+        "idle": idle,
+        "playing": playing,
+        "peak_rss_mb": round(peak_rss, 1),
+    }
+
+
+def check_budget(results, max_rss_ratio):
+    """Return a list of human-readable budget violations."""
+    daemon, window = results["daemon"], results["window"]
+    failures = []
+    for phase in ("idle", "playing"):
+        ratio = daemon[phase]["rss_mb"] / window[phase]["rss_mb"]
+        if ratio > max_rss_ratio:
+            failures.append(f"{phase}: daemon uses {ratio:.0%} of the window's memory (budget {max_rss_ratio:.0%})")
+        if daemon[phase]["cpu_percent"] > max(window[phase]["cpu_percent"], 0.5):
+            failures.append(f"{phase}: daemon uses {daemon[phase]['cpu_percent']}% CPU, "
+                            f"the window {window[phase]['cpu_percent']}%")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the footprint of daemon.py and main.py.")
+    parser.add_argument("--size", type=int, default=2000, help="Number of tracks in the loaded playlist")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "iota_bench"),
+                        help="Where generated libraries are cached between runs")
+    parser.add_argument("--settle", type=float, default=3.0, help="Seconds to wait after startup before sampling")
+    parser.add_argument("--phase", type=float, default=10.0, help="Seconds to sample while idle and while playing")
+    parser.add_argument("--max-rss-ratio", type=float, default=0.5,
+                        help="Largest allowed daemon / window resident memory ratio")
+    parser.add_argument("--output", help="JSON file to write results to")
+    args = parser.parse_args(argv)
+
+    if not sys.platform.startswith("linux"):
+        print("The footprint benchmark reads /proc and only runs on Linux.")
+        return 2
+    os.makedirs(args.workdir, exist_ok=True)
+    library_dir = prepare_library(args.workdir, args.size)
+
+    results = {}
+    for kind in ("daemon", "window"):
+        print(f"Measuring {kind} with {args.size} tracks...")
+        results[kind] = measure(kind, library_dir, args.settle, args.phase)
+    for kind, entry in results.items():
+        print(f"  {kind:<7} ready {entry['ready_s']:6.2f} s  startup CPU {entry['startup_cpu_s']:6.2f} s  "
+              f"idle {entry['idle']['rss_mb']:7.1f} MiB {entry['idle']['cpu_percent']:5.2f}% CPU  "
+              f"playing {entry['playing']['rss_mb']:7.1f} MiB {entry['playing']['cpu_percent']:5.2f}% CPU  "
+              f"peak {entry['peak_rss_mb']:7.1f} MiB")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"size": args.size, "results": results}, f, indent=4)
+        print(f"Results written to {args.output}")
+
+    failures = check_budget(results, args.max_rss_ratio)
+    for failure in failures:
+        print(f"BUDGET EXCEEDED: {failure}")
+    if not failures:
+        print("Daemon footprint within budget.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
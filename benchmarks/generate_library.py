@@ -0,0 +1,258 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# benchmarks/generate_library.py
+# =============
+# Synthetic music library generator for the benchmark suite.
+#
+# Writes N tagged audio files (MP3, FLAC and Ogg Vorbis in rotation) into a
+# single flat folder, each built from a tiny near-silent template whose audio
+# payload is unique per track, and tagged with artist/title/album/genre plus
+# embedded cover art shared per album.
+# Matching playlist JSON files are written next to it.
+#
+# Usage:
+#   python -m benchmarks.generate_library /tmp/iota_bench 10000
+# =============
+import os
+import io
+import sys
+import base64
+import json
+import random
+import struct
+import argparse
+
+from PIL import Image
+from mutagen.id3 import ID3, TPE1, TIT2, TALB, TCON, APIC
+from mutagen.flac import FLAC, Picture
+from mutagen.oggvorbis import OggVorbis
+from mutagen.ogg import OggPage
+
+FORMATS = ("mp3", "flac", "ogg")
+GENRES = ["Dubstep", "Drum & Bass", "House", "Techno", "Ambient", "Rock", "Jazz", "Hip-Hop", "Pop", "Classical"]
+TRACKS_PER_ALBUM = 12
+# Number of smaller playlists the full library is split into
+PLAYLIST_PARTS = 20
+
+
+# ----------------------------------------------------------------------
+# Silent templates
+# ----------------------------------------------------------------------
+def silent_mp3(variant=0, frames=10):
+    """
+    MPEG-1 Layer III, 128 kbps, 44.1 kHz joint stereo frames with zeroed side info (silence).
+
+    The variant is written into the first frame's ancillary data, which decoders ignore.
+    """
+    header = b"\xff\xfb\x90\x64"
+    frame_length = 144 * 128000 // 44100  # 417 bytes, no padding
+    frame = header + b"\x00" * (frame_length - len(header))
+    first = frame[:-4] + variant.to_bytes(4, "big")
+    return first + frame * (frames - 1)
+
+
+def _crc8(data):
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+
+def _crc16(data):
+    crc = 0
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x8005) & 0xFFFF if crc & 0x8000 else (crc << 1) & 0xFFFF
+    return crc
+
+
+def silent_flac(variant=0, frames=4, block_size=4096, sample_rate=44100):
+    """FLAC stream with STREAMINFO and CONSTANT-subframe frames holding a tiny DC offset set by variant."""
+    total_samples = frames * block_size
+    packed = (sample_rate << 44) | (1 << 41) | (15 << 36) | total_samples  # 2 ch, 16 bit
+    streaminfo = struct.pack(">HH", block_size, block_size) + b"\x00" * 6 + packed.to_bytes(8, "big") + b"\x00" * 16
+    data = b"fLaC" + bytes([0x80]) + len(streaminfo).to_bytes(3, "big") + streaminfo
+    for number in range(frames):
+        # Block size code 12 (4096), sample rate code 9 (44.1 kHz), 2 independent channels, 16 bit
+        header = bytes([0xFF, 0xF8, 0xC9, 0x18, number])
+        header += bytes([_crc8(header)])
+        frame = header + (b"\x00" + (variant & 0x7FFF).to_bytes(2, "big")) * 2  # two CONSTANT subframes
+        data += frame + _crc16(frame).to_bytes(2, "big")
+    return data
+
+
+def silent_ogg(variant=0, sample_rate=44100):
+    """Ogg Vorbis stream with valid header packets and an end page covering one second, holding variant."""
+    identification = b"\x01vorbis" + struct.pack("<IBIiiiBB", 0, 2, sample_rate, 0, 128000, 0, 0xB8, 1)
+    vendor = b"IotaPlayer benchmark"
+    comment = b"\x03vorbis" + struct.pack("<I", len(vendor)) + vendor + struct.pack("<I", 0) + b"\x01"
+    setup = b"\x05vorbis" + b"\x00" * 32
+    pages = []
+    first = OggPage()
+    first.packets = [identification]
+    first.first = True
+    first.sequence = 0
+    pages.append(first)
+    headers = OggPage()
+    headers.packets = [comment, setup]
+    headers.sequence = 1
+    pages.append(headers)
+    last = OggPage()
+    last.packets = [variant.to_bytes(4, "big")]
+    last.sequence = 2
+    last.position = sample_rate
+    last.last = True
+    pages.append(last)
+    for page in pages:
+        page.serial = 0x10747A
+    return b"".join(page.write() for page in pages)
+
+
+TEMPLATES = {"mp3": silent_mp3, "flac": silent_flac, "ogg": silent_ogg}
+
+
+def cover_art_bytes(seed, size=300):
+    """JPEG with a seeded gradient and grain, so every album gets distinct, realistically sized art."""
+    rng = random.Random(seed)
+    start = tuple(rng.randrange(256) for _ in range(3))
+    end = tuple(rng.randrange(256) for _ in range(3))
+    gradient = Image.linear_gradient("L").resize((size, size))
+    grain = Image.effect_noise((size, size), 24)
+    channels = [
+        Image.blend(gradient.point(lambda v, a=a, b=b: a + (b - a) * v // 255), grain, 0.2)
+        for a, b in zip(start, end)
+    ]
+    buffer = io.BytesIO()
+    Image.merge("RGB", channels).save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+# ----------------------------------------------------------------------
+# Tagging
+# ----------------------------------------------------------------------
+def tag_file(path, fmt, song, art):
+    if fmt == "mp3":
+        tags = ID3()
+        tags.add(TPE1(encoding=3, text=song["artist"]))
+        tags.add(TIT2(encoding=3, text=song["title"]))
+        tags.add(TALB(encoding=3, text=song["album"]))
+        tags.add(TCON(encoding=3, text=song["genre"]))
+        tags.add(APIC(encoding=3, mime="image/jpeg", type=3, desc="Cover", data=art))
+        tags.save(path)
+    elif fmt == "flac":
+        audio = FLAC(path)
+        audio["artist"] = song["artist"]
+        audio["title"] = song["title"]
+        audio["album"] = song["album"]
+        audio["genre"] = song["genre"]
+        audio.add_picture(cover_picture(art))
+        audio.save()
+    elif fmt == "ogg":
+        audio = OggVorbis(path)
+        audio["artist"] = song["artist"]
+        audio["title"] = song["title"]
+        audio["album"] = song["album"]
+        audio["genre"] = song["genre"]
+        audio["metadata_block_picture"] = [base64.b64encode(cover_picture(art).write()).decode("ascii")]
+        audio.save()
+
+
+def cover_picture(art):
+    picture = Picture()
+    picture.type = 3
+    picture.mime = "image/jpeg"
+    picture.data = art
+    return picture
+
+
+def generate_library(out_dir, count, seed=1234, art_size=300):
+    """
+    Generate a synthetic library of `count` tracks under out_dir.
+
+    Layout:
+        out_dir/music/       flat folder of tagged audio files
+        out_dir/playlists/   bench_all.json plus PLAYLIST_PARTS smaller playlists
+
+    Returns:
+        list: The song dicts written to bench_all.json
+    """
+    rng = random.Random(seed)
+    music_dir = os.path.join(out_dir, "music")
+    playlist_dir = os.path.join(out_dir, "playlists")
+    os.makedirs(music_dir, exist_ok=True)
+    os.makedirs(playlist_dir, exist_ok=True)
+
+    album_art = {}
+    songs = []
+    for index in range(count):
+        fmt = FORMATS[index % len(FORMATS)]
+        album_number = index // TRACKS_PER_ALBUM
+        artist = f"Artist {album_number % max(1, count // 40):04d}"
+        song = {
+            "artist": artist,
+            "title": f"Track {index:06d} {rng.choice(['Intro', 'Dawn', 'Echo', 'Drift', 'Pulse', 'Outro'])}",
+            "album": f"Album {album_number:05d}",
+            "genre": rng.choice(GENRES),
+            "picture_path": "",
+            "picture_link": "",
+            "youtube_id": "",
+        }
+        path = os.path.join(music_dir, f"{artist} - {song['title']}.{fmt}")
+        with open(path, "wb") as f:
+            f.write(TEMPLATES[fmt](index))
+        if album_number not in album_art:
+            album_art.clear()  # Only the current album's art is needed
+            album_art[album_number] = cover_art_bytes(seed + album_number, art_size)
+        tag_file(path, fmt, song, album_art[album_number])
+        song["path"] = path.replace("\\", "/")
+        songs.append(song)
+
+    write_playlist(playlist_dir, "bench_all", songs)
+    part_size = max(1, len(songs) // PLAYLIST_PARTS)
+    for part in range(PLAYLIST_PARTS):
+        write_playlist(playlist_dir, f"bench_part_{part:02d}", songs[part * part_size:(part + 1) * part_size])
+    return songs
+
+
+def write_playlist(playlist_dir, name, songs):
+    data = {
+        "playlist_name": name,
+        "playlist_large_image_key": "",
+        "song_count": len(songs),
+        "songs": songs,
+    }
+    with open(os.path.join(playlist_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic IotaPlayer music library.")
+    parser.add_argument("out_dir", help="Directory to create the library in")
+    parser.add_argument("count", type=int, help="Number of tracks to generate")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--art-size", type=int, default=300, help="Edge length of embedded cover art in pixels")
+    args = parser.parse_args(argv)
+    songs = generate_library(args.out_dir, args.count, seed=args.seed, art_size=args.art_size)
+    print(f"Generated {len(songs)} tracks in {args.out_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,361 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# benchmarks/qt_benchmarks.py
+# =============
+# Headless benchmark harness for IotaPlayer's Qt views.
+#
+# Starts MusicPlayer and PlaylistMaker under the offscreen platform plugin,
+# with the global keyboard hook, Discord Rich Presence, MPRIS, the update
+# check, the loudness analysis pool and (if not installed) the Google client
+# libraries stubbed out.
+# Measures widget population, search-as-you-type and track-switch latency,
+# including the event processing each action triggers, and exits non-zero
+# when a metric exceeds its budget in qt_thresholds.json.
+#
+# Usage:
+#   python -m benchmarks.qt_benchmarks --size 2000 --output qt_bench.json
+# =============
+import os
+import sys
+import json
+import time
+import types
+import logging
+import argparse
+import tempfile
+import importlib.util
+from types import SimpleNamespace
+
+os.environ["QT_QPA_PLATFORM"] = "offscreen"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run_benchmarks import prepare_library  # noqa: E402
+
+DEFAULT_THRESHOLDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "qt_thresholds.json")
+SEARCH_QUERY = "Artist 0001 - Track"
+
+
+# ----------------------------------------------------------------------
+# Stubs
+# ----------------------------------------------------------------------
+def _stub_module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+class _StubKeyboardListener:
+    """Stands in for pynput's global keyboard hook."""
+
+    def __init__(self, on_press=None, on_release=None):
+        self.on_press = on_press
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class _StubPresence:
+    def __init__(self, *args, **kwargs):
+        raise ConnectionRefusedError("Discord is stubbed in the benchmark harness")
+
+
+def _is_installed(name):
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ModuleNotFoundError:
+        return False
+
+
+def install_stubs():
+    """Replace modules with external side effects before core.musicPlayer is imported."""
+    _stub_module("pynput")
+    _stub_module(
+        "pynput.keyboard",
+        Listener=_StubKeyboardListener,
+        Key=SimpleNamespace(media_play_pause="play_pause", media_next="next", media_previous="previous"),
+    )
+    _stub_module("pypresence", Presence=_StubPresence, ActivityType=SimpleNamespace(LISTENING=2))
+
+    # The YouTube client is only used on demand; stub it only where it is not installed.
+    if not _is_installed("googleapiclient"):
+        _stub_module("googleapiclient")
+        _stub_module("googleapiclient.discovery", build=None)
+        _stub_module("googleapiclient.errors", HttpError=type("HttpError", (Exception,), {}))
+    if not _is_installed("httplib2"):
+        _stub_module("httplib2", Http=None, HttpLib2Error=type("HttpLib2Error", (Exception,), {}))
+    if not _is_installed("google_auth_httplib2"):
+        _stub_module("google_auth_httplib2", AuthorizedHttp=None)
+    if not _is_installed("google_auth_oauthlib"):
+        _stub_module("google_auth_oauthlib")
+        _stub_module("google_auth_oauthlib.flow", InstalledAppFlow=None)
+    if not _is_installed("google.auth"):
+        for name in ("google", "google.auth", "google.auth.transport"):
+            if name not in sys.modules:
+                _stub_module(name)
+        _stub_module("google.auth.transport.requests", Request=None)
+
+
+def patch_player_module(music_player_module):
+    """Swap Discord, the update check and the loudness analyzer for inert stand-ins."""
+    from core import discordIntegration, playbackEngine
+    from PyQt6.QtCore import QObject, pyqtSignal
+
+    class StubDiscordIntegration(QObject):
+        connection_status_changed = pyqtSignal(bool)
+
+        def __init__(self):
+            super().__init__()
+            self.presence_updates = 0
+
+        def is_connected(self):
+            return False
+
+        def update_presence(self, update_data):
+            self.presence_updates += 1
+
+    class StubUpdateCheckThread(QObject):
+        update_found = pyqtSignal(str, str)
+
+        def __init__(self, current_version, parent=None):
+            super().__init__(parent)
+
+        def start(self):
+            pass
+
+    class StubLoudnessAnalyzer(QObject):
+        analyzed = pyqtSignal(str, float, float)
+
+        def __init__(self, workers=None, parent=None):
+            super().__init__(parent)
+
+        def start(self):
+            pass
+
+        def enqueue(self, paths):
+            pass
+
+        def prioritize(self, path):
+            pass
+
+        def stop(self):
+            pass
+
+    # The playback engine creates these; it imports Discord only when presence is on
+    discordIntegration.DiscordIntegration = StubDiscordIntegration
+    music_player_module.UpdateCheckThread = StubUpdateCheckThread
+    # Track switches still look up cached gains; only the worker pool is replaced
+    playbackEngine.LoudnessAnalyzer = StubLoudnessAnalyzer
+
+
+class StubMPRISPlayer:
+    """Counts metadata pushes instead of talking to D-Bus."""
+
+    def __init__(self):
+        self.metadata_updates = 0
+
+    def update_metadata(self):
+        self.metadata_updates += 1
+
+
+# ----------------------------------------------------------------------
+# Measurement
+# ----------------------------------------------------------------------
+def timed_ms(app, action):
+    """Run action and drain the event queue it produced. Returns elapsed milliseconds."""
+    start = time.perf_counter()
+    action()
+    app.processEvents()
+    return (time.perf_counter() - start) * 1000.0
+
+
+def summarize(samples_ms, items):
+    ordered = sorted(samples_ms)
+    last = len(ordered) - 1
+    p50 = ordered[last // 2]
+    p95 = ordered[min(last, int(round(0.95 * last)))]
+    return {
+        "items": items,
+        "samples": len(ordered),
+        "p50_ms": round(p50, 3),
+        "p95_ms": round(p95, 3),
+        "max_ms": round(ordered[-1], 3),
+        "per_item_us": round(p50 / items * 1000.0, 3) if items else None,
+    }
+
+
+def run_benchmarks(app, library_dir, repeat, switches):
+    from core import musicPlayer
+    from core.configManager import ConfigManager
+    from core.playlistMaker import PlaylistMaker
+    from config import default_settings
+    from PyQt6.QtCore import Qt
+
+    patch_player_module(musicPlayer)
+
+    music_dir = os.path.join(library_dir, "music")
+    playlist_dir = os.path.join(library_dir, "playlists")
+    config = dict(default_settings)
+    config.update({
+        "root_playlist_folder": playlist_dir,
+        "unsorted_music_folder": music_dir,
+        "default_playlist": "bench_all",
+        # Keep presence updates on so track switches include building them; the stub swallows them
+        "connect_to_discord": True,
+    })
+    config_manager = ConfigManager.get_instance()
+    config_manager.save_config(config)
+
+    player = musicPlayer.MusicPlayer(
+        config, "", config_manager.get_config_path(), "#2f2f2f", "light", config=config
+    )
+    mpris = StubMPRISPlayer()
+    player.engine.mpris_player_iface = mpris
+    player.show()
+    app.processEvents()
+
+    results = {}
+    songs = len(player.engine.songs)
+
+    samples = [timed_ms(app, lambda: player.engine.load_playlist("bench_all")) for _ in range(repeat)]
+    results["player.fill_song_list"] = summarize(samples, songs)
+
+    playlists = len(player.get_playlist_names())
+    samples = [timed_ms(app, player.reload_playlists) for _ in range(repeat)]
+    results["player.fill_playlist_list"] = summarize(samples, playlists)
+
+    samples = []
+    for _ in range(repeat):
+        player.search_bar.clear()
+        app.processEvents()
+        for length in range(1, len(SEARCH_QUERY) + 1):
+            samples.append(timed_ms(app, lambda: player.search_bar.setText(SEARCH_QUERY[:length])))
+    results["player.search_keystroke"] = summarize(samples, songs)
+    player.search_bar.clear()
+    app.processEvents()
+
+    samples = [timed_ms(app, player.engine.next_song) for _ in range(switches)]
+    results["player.track_switch"] = summarize(samples, 1)
+    results["player.track_switch"]["mpris_updates"] = mpris.metadata_updates
+    player.engine.stop_music()
+
+    # Seek bar repaint with a full waveform, as on every position update
+    from core.waveform import WAVEFORM_BUCKETS
+    ramp = bytes(range(256)) * (2 * WAVEFORM_BUCKETS // 256)
+    player.progress_bar.set_peaks(ramp)
+    samples = []
+    for step in range(max(10, switches)):
+        player.progress_bar.setValue(step % 100)
+        samples.append(timed_ms(app, player.progress_bar.repaint))
+    results["player.waveform_paint"] = summarize(samples, 1)
+    player.progress_bar.set_peaks(None)
+
+    maker = PlaylistMaker("")
+    maker.show()
+    maker_songs = [dict(song) for song in player.engine.songs]
+
+    def fill_table():
+        maker.songs = maker_songs
+
+    samples = [timed_ms(app, fill_table) for _ in range(repeat)]
+    results["maker.fill_table"] = summarize(samples, len(maker_songs))
+
+    edit_rows = list(range(0, len(maker_songs), 2))[:500]
+    samples = [
+        timed_ms(app, lambda: maker.song_model.set_field(edit_rows, "album", f"Bulk Album {run}"))
+        for run in range(repeat)
+    ]
+    results["maker.bulk_edit"] = summarize(samples, len(edit_rows))
+
+    samples = [timed_ms(app, lambda: maker.song_table.sortByColumn(column, Qt.SortOrder.AscendingOrder))
+               for column in (1, 3, 0)[:max(1, repeat)]]
+    results["maker.sort"] = summarize(samples, len(maker_songs))
+
+    maker.close()
+    player.close()
+    app.processEvents()
+    return results
+
+
+def check_thresholds(results, thresholds):
+    """Return a list of human-readable threshold violations."""
+    failures = []
+    for name, limits in thresholds.items():
+        entry = results.get(name)
+        if entry is None:
+            continue
+        for stat, limit in limits.items():
+            value = entry.get(stat)
+            if value is not None and value > limit:
+                failures.append(f"{name}: {stat} {value} exceeds {limit}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run IotaPlayer's headless Qt view benchmarks.")
+    parser.add_argument("--size", type=int, default=2000, help="Number of tracks in the benchmark library")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "iota_bench"),
+                        help="Where generated libraries are cached between runs")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per fill/search benchmark")
+    parser.add_argument("--switches", type=int, default=20, help="Number of track switches to time")
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS, help="JSON file with per-metric budgets")
+    parser.add_argument("--output", help="JSON file to write results to")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    library_dir = prepare_library(args.workdir, args.size)
+
+    # Keep the player's config, logs and cover cache out of the user's profile
+    sandbox = tempfile.mkdtemp(prefix="iota_qt_bench_")
+    for variable in ("HOME", "USERPROFILE", "APPDATA"):
+        os.environ[variable] = sandbox
+
+    install_stubs()
+    logging.disable(logging.INFO)
+
+    from PyQt6.QtWidgets import QApplication
+    app = QApplication(sys.argv[:1])
+
+    print(f"Benchmarking Qt views with {args.size} tracks (platform: {app.platformName()})...")
+    results = run_benchmarks(app, library_dir, args.repeat, args.switches)
+    for name, entry in results.items():
+        print(f"  {name:<28} p50 {entry['p50_ms']:9.2f} ms  p95 {entry['p95_ms']:9.2f} ms  "
+              f"({entry['per_item_us']} us/item)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"size": args.size, "results": results}, f, indent=4)
+        print(f"Results written to {args.output}")
+
+    with open(args.thresholds, "r", encoding="utf-8") as f:
+        thresholds = json.load(f)
+    failures = check_thresholds(results, thresholds)
+    for failure in failures:
+        print(f"THRESHOLD EXCEEDED: {failure}")
+    if not failures:
+        print("All metrics within thresholds.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,409 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# benchmarks/run_benchmarks.py
+# =============
+# Benchmark suite for IotaPlayer's library and playlist code paths.
+#
+# Generates (or reuses) synthetic libraries of the requested sizes and times
+# folder scans, playlist loading and listing, search, combine, shuffle,
+# duplicate detection (by content hash, and by fingerprint over synthetic
+# fingerprints), analysis cache reads, play statistics queries and cover
+# extraction. Results are written to a JSON file so runs can be compared.
+#
+# Usage:
+#   python -m benchmarks.run_benchmarks --sizes 1000 10000 --output bench.json
+#   python -m benchmarks.run_benchmarks --sizes 1000 --compare bench.json
+# =============
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generate_library import generate_library  # noqa: E402
+from core.playlistLibrary import (  # noqa: E402
+    PlaylistManager, ACCEPTED_AUDIO_EXTENSIONS, read_song_metadata, scan_music_folder, list_playlists,
+)
+from core.songSearch import match_songs  # noqa: E402
+from core.libraryIndex import LibraryIndex, file_signature  # noqa: E402
+from core.folderScanner import FolderScanThread  # noqa: E402
+from core.playlistStore import PlaylistStore  # noqa: E402
+from core.trackIdentity import (  # noqa: E402
+    FINGERPRINT_FRAME, FINGERPRINT_HOP, FINGERPRINT_KIND, FINGERPRINT_RATE, FINGERPRINT_SECONDS,
+    find_duplicates, track_identities,
+)
+from core.imageCache import CoverArtCache  # noqa: E402
+from core.coverArtExtractor import CoverArtExtractor  # noqa: E402
+from core.blobStore import BlobStore  # noqa: E402
+from core.waveform import WAVEFORM_BUCKETS, WAVEFORM_KIND  # noqa: E402
+from core.playHistory import PlayHistory  # noqa: E402
+from core.smartPlaylists import SmartPlaylists, parse_query  # noqa: E402
+from core.sessionState import SessionState  # noqa: E402
+
+# Bump when the generated library layout changes so cached libraries are rebuilt
+LIBRARY_VERSION = 2
+# Simulated listening history: plays per track, spread over this many weeks
+HISTORY_PLAYS_PER_TRACK = 10
+HISTORY_WEEKS = 3 * 52
+SMART_QUERY = "genre contains Dubstep and not played in 30 days order by random limit 200"
+SEARCH_QUERIES = [("Artist 0001 - Track", "Artist & Title"), ("Dubstep", "Genre"), ("Album 00010", "Album")]
+# Every n-th track gets a synthetic re-encode of the track before it
+FINGERPRINT_DUPLICATE_EVERY = 50
+# Ratio of median times above which --compare reports a regression
+REGRESSION_RATIO = 1.2
+
+
+def measure(func, repeat):
+    """Run func `repeat` times and return (runs in seconds, result of the last run)."""
+    runs = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        runs.append(time.perf_counter() - start)
+    return runs, result
+
+
+def summarize(runs, items):
+    median = statistics.median(runs)
+    return {
+        "items": items,
+        "runs_s": [round(r, 6) for r in runs],
+        "min_s": round(min(runs), 6),
+        "median_s": round(median, 6),
+        "per_item_us": round(median / items * 1e6, 3) if items else None,
+    }
+
+
+def prepare_library(workdir, size):
+    """Return the path of a generated library of `size` tracks, generating it if needed."""
+    library_dir = os.path.join(workdir, f"lib_{size}")
+    marker = os.path.join(library_dir, ".complete")
+    if os.path.exists(marker):
+        with open(marker, "r", encoding="utf-8") as f:
+            if f.read().strip() == str(LIBRARY_VERSION):
+                return library_dir
+    shutil.rmtree(library_dir, ignore_errors=True)
+    print(f"Generating {size} tracks in {library_dir}...")
+    start = time.perf_counter()
+    generate_library(library_dir, size)
+    print(f"  done in {time.perf_counter() - start:.1f}s")
+    with open(marker, "w", encoding="utf-8") as f:
+        f.write(str(LIBRARY_VERSION))
+    return library_dir
+
+
+def seed_fingerprints(paths, index, blobs, seed=1234):
+    """
+    Cache a synthetic fingerprint and length for every track, as if ffmpeg had analyzed it.
+
+    Lengths are spread over 2-6 minutes, so every fingerprint is full length. Every
+    FINGERPRINT_DUPLICATE_EVERY-th track is a re-encode of the track before it: the same
+    length within 50 ms and 10% of its fingerprint bits flipped.
+
+    Returns:
+        int: Number of planted re-encodes
+    """
+    rng = np.random.default_rng(seed)
+    frames = (FINGERPRINT_SECONDS * FINGERPRINT_RATE - FINGERPRINT_FRAME) // FINGERPRINT_HOP
+    bit_values = 1 << np.arange(32, dtype=np.uint64)
+    identities = track_identities(paths, library_index=index)
+    entries, fingerprints = [], []
+    previous, planted = None, 0
+    for number, (path, (content_hash, _, _)) in enumerate(identities.items()):
+        if previous is not None and number % FINGERPRINT_DUPLICATE_EVERY == 0:
+            flips = ((rng.random((frames, 32)) < 0.1) * bit_values).sum(axis=1).astype("<u4")
+            fingerprint = previous[0] ^ flips
+            duration = previous[1] + rng.uniform(-0.05, 0.05)
+            planted += 1
+        else:
+            fingerprint = rng.integers(0, 1 << 32, frames, dtype=np.uint64).astype("<u4")
+            duration = rng.uniform(120, 360)
+        signature = file_signature(path)
+        entries.append((path, *signature, content_hash, duration))
+        fingerprints.append((path, signature, fingerprint))
+        previous = fingerprint, duration
+    index.store_identities(entries)
+    blobs.put_many(FINGERPRINT_KIND, fingerprints)
+    return planted
+
+
+def bench_size(library_dir, size, repeat, cover_sample):
+    music_dir = os.path.join(library_dir, "music")
+    playlist_dir = os.path.join(library_dir, "playlists")
+    results = {}
+
+    index_dir = tempfile.mkdtemp(prefix="iota_bench_index_")
+
+    def scan_process_folder(db_name):
+        # The worker PlaylistMaker.process_folder starts, run inline and minus the table fill
+        index = LibraryIndex(db_path=os.path.join(index_dir, db_name))
+        songs = []
+        scanner = FolderScanThread(music_dir, read_song_metadata, ACCEPTED_AUDIO_EXTENSIONS, library_index=index)
+        scanner.batch_ready.connect(songs.extend)
+        scanner.run()
+        index.close()
+        return songs
+
+    try:
+        # Cold: every run starts from an empty index. Warm: the index already holds every file.
+        runs, songs = measure(lambda: scan_process_folder(f"cold_{time.perf_counter_ns()}.db"), repeat)
+        results["scan.process_folder"] = summarize(runs, len(songs))
+        scan_process_folder("warm.db")
+        runs, songs = measure(lambda: scan_process_folder("warm.db"), repeat)
+        results["scan.process_folder_indexed"] = summarize(runs, len(songs))
+    finally:
+        shutil.rmtree(index_dir, ignore_errors=True)
+
+    runs, songs = measure(lambda: scan_music_folder(music_dir), repeat)
+    results["scan.load_unsorted_music"] = summarize(runs, len(songs))
+
+    manager = PlaylistManager(playlists_dir=playlist_dir)
+    runs, (_, songs, _) = measure(lambda: manager.load_playlist("bench_all"), repeat)
+    results["playlist.load"] = summarize(runs, len(songs))
+
+    # The same playlist from the session's warm cache, as on start
+    session_dir = tempfile.mkdtemp(prefix="iota_bench_session_")
+    try:
+        session = SessionState(directory=session_dir)
+        manager.load_playlist("bench_all", session)
+        runs, (_, cached_songs, _) = measure(lambda: manager.load_playlist("bench_all", session), repeat)
+        results["playlist.load_session_cache"] = summarize(runs, len(cached_songs))
+    finally:
+        shutil.rmtree(session_dir, ignore_errors=True)
+
+    runs, playlists = measure(lambda: list_playlists(playlist_dir, music_dir, "bench_all"), repeat)
+    results["playlist.get_playlist_names"] = summarize(runs, len(playlists))
+
+    for query, search_type in SEARCH_QUERIES:
+        runs, matches = measure(lambda: match_songs(songs, query, search_type), repeat)
+        entry = summarize(runs, len(songs))
+        entry["matches"] = len(matches)
+        results[f"search.{search_type.replace(' & ', '_').lower()}"] = entry
+
+    runs, _ = measure(lambda: manager.shuffle_songs("bench_all"), repeat)
+    results["playlist.shuffle"] = summarize(runs, len(songs))
+
+    combined_path = os.path.join(playlist_dir, "Combined Playlist.json")
+
+    def combine():
+        if os.path.exists(combined_path):
+            os.remove(combined_path)
+        return manager.combine_playlists()
+
+    runs, (_, combined) = measure(combine, repeat)
+    os.remove(combined_path)
+    results["playlist.combine"] = summarize(runs, len(combined))
+
+    runs, groups = measure(lambda: find_duplicates(playlist_dir, music_dir), repeat)
+    results["library.find_duplicates"] = summarize(runs, len(songs))
+    results["library.find_duplicates"]["groups"] = len(groups)
+
+    # Acoustic matching over cached fingerprints; synthetic ones stand in for ffmpeg
+    fingerprint_dir = tempfile.mkdtemp(prefix="iota_bench_fingerprints_")
+    try:
+        index = LibraryIndex(db_path=os.path.join(fingerprint_dir, "library_index.db"))
+        blobs = BlobStore(path=os.path.join(fingerprint_dir, "analysis_cache.blob"))
+        planted = seed_fingerprints([song["path"] for song in songs], index, blobs)
+        runs, groups = measure(lambda: find_duplicates(playlist_dir, music_dir, use_fingerprint=True,
+                                                       library_index=index, blob_store=blobs), repeat)
+        entry = summarize(runs, len(songs))
+        entry["groups"] = len(groups)
+        entry["planted"] = planted
+        results["library.find_duplicates_fingerprint"] = entry
+        blobs.close()
+        index.close()
+    finally:
+        shutil.rmtree(fingerprint_dir, ignore_errors=True)
+
+    # Saving a whole playlist vs. journaling a one-song append to it
+    store = PlaylistStore.get_instance()
+    save_path = os.path.join(playlist_dir, "bench_save.json")
+    save_data = {"playlist_name": "bench_save", "playlist_large_image_key": "", "songs": songs}
+    runs, _ = measure(lambda: store.save(save_path, save_data), repeat)
+    results["playlist.save_snapshot"] = summarize(runs, len(songs))
+    append_op = [{"op": "insert", "row": len(songs), "songs": [songs[0]]}]
+    runs, _ = measure(lambda: store.append_ops(save_path, append_op), repeat)
+    results["playlist.save_append_one"] = summarize(runs, 1)
+    store.wait_for_compaction()
+    store.delete(save_path)
+
+    # Waveform lookups from the blob store, as on every track switch
+    blob_dir = tempfile.mkdtemp(prefix="iota_bench_blobs_")
+    try:
+        blobs = BlobStore(path=os.path.join(blob_dir, "analysis_cache.blob"))
+        peaks = bytes(2 * WAVEFORM_BUCKETS)
+        blobs.put_many(WAVEFORM_KIND, ((song["path"], (0.0, index), peaks) for index, song in enumerate(songs)))
+        runs, _ = measure(lambda: [blobs.get(WAVEFORM_KIND, song["path"], (0.0, index))
+                                   for index, song in enumerate(songs)], repeat)
+        results["analysis_cache.read"] = summarize(runs, len(songs))
+        blobs.close()
+    finally:
+        shutil.rmtree(blob_dir, ignore_errors=True)
+
+    # Statistics queries over years of play history
+    history_dir = tempfile.mkdtemp(prefix="iota_bench_history_")
+    try:
+        index = LibraryIndex(db_path=os.path.join(history_dir, "history.db"))
+        start = time.time() - HISTORY_WEEKS * 7 * 86400
+        events = []
+        for number in range(len(songs) * HISTORY_PLAYS_PER_TRACK):
+            song = songs[(number * 7919) % len(songs)]
+            played_at = start + number * HISTORY_WEEKS * 7 * 86400 / (len(songs) * HISTORY_PLAYS_PER_TRACK)
+            events.append({"path": song["path"], "artist": song["artist"], "title": song["title"],
+                           "start": played_at, "end": played_at + 180, "position": 180, "duration": 180,
+                           "skipped": number % 5 == 0})
+        index.apply_play_events(events, 0)
+        history = PlayHistory(log_path=os.path.join(history_dir, "play_history.log"), library_index=index)
+        runs, _ = measure(lambda: history.top_tracks(50), repeat)
+        results["history.top_tracks"] = summarize(runs, len(events))
+        runs, _ = measure(lambda: history.top_tracks(50, days=28), repeat)
+        results["history.top_tracks_recent"] = summarize(runs, len(events))
+        runs, _ = measure(lambda: history.artists_per_week(12), repeat)
+        results["history.artists_per_week"] = summarize(runs, len(events))
+
+        # Smart playlist over the same statistics: full evaluation, cached count, one recorded play
+        index.store_tracks((song, 0.0, number) for number, song in enumerate(songs))
+        smart = SmartPlaylists(library_index=index)
+        definition = parse_query(SMART_QUERY)
+        runs, members = measure(lambda: smart.songs(f"bench_{time.perf_counter_ns()}", definition), repeat)
+        results["smart.evaluate"] = summarize(runs, len(songs))
+        results["smart.evaluate"]["matches"] = len(members)
+        smart.songs("bench", definition)
+        smart.forget_except(["bench"])
+        runs, _ = measure(lambda: smart.count("bench", definition), repeat)
+        results["smart.count"] = summarize(runs, len(songs))
+        play = dict(events[-1], start=time.time(), end=time.time() + 180)
+        runs, _ = measure(lambda: index.apply_play_events([play], 0), repeat)
+        results["smart.incremental_update"] = summarize(runs, 1)
+        history.close()
+        index.close()
+    finally:
+        shutil.rmtree(history_dir, ignore_errors=True)
+
+    cover_files = sorted(os.listdir(music_dir))[:cover_sample]
+    cache_dir = tempfile.mkdtemp(prefix="iota_bench_covers_")
+    try:
+        cache = CoverArtCache(cache_dir=cache_dir)
+        extractor = CoverArtExtractor([], cache)
+
+        def extract_covers():
+            found = 0
+            for f in cover_files:
+                path = os.path.join(music_dir, f)
+                cover = extractor.extract_cover(path)
+                if cover:
+                    cache.save_cover_from_bytes(path, cover, extractor.size)
+                    found += 1
+            return found
+
+        runs, found = measure(extract_covers, 1)
+        entry = summarize(runs, len(cover_files))
+        entry["covers_found"] = found
+        results["cover.extract_and_cache"] = entry
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Print median ratios against a previous results file. Returns the number of regressions."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = 0
+    print(f"\nComparison against {baseline_path} (rev {baseline['meta'].get('revision')}):")
+    for size, benches in results["sizes"].items():
+        old_benches = baseline.get("sizes", {}).get(size, {})
+        for name, entry in benches.items():
+            old = old_benches.get(name)
+            if not old:
+                continue
+            ratio = entry["median_s"] / old["median_s"] if old["median_s"] else float("inf")
+            flag = "  REGRESSION" if ratio > REGRESSION_RATIO else ""
+            regressions += bool(flag)
+            print(f"  {size:>7} {name:<32} {old['median_s'] * 1000:10.2f} ms -> {entry['median_s'] * 1000:10.2f} ms  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the IotaPlayer benchmark suite.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000],
+                        help="Library sizes to benchmark (e.g. 1000 10000 100000)")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "iota_bench"),
+                        help="Where generated libraries are cached between runs")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark")
+    parser.add_argument("--cover-sample", type=int, default=200,
+                        help="Number of files used for the cover extraction benchmark")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file to write results to")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)  # Playlist code logs every file it touches
+    os.makedirs(args.workdir, exist_ok=True)
+    # Combine and duplicate detection cache identities in the index singleton; keep them out of the user's
+    LibraryIndex._instance = LibraryIndex(db_path=os.path.join(args.workdir, "identity_index.db"))
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "sizes": {},
+    }
+    for size in args.sizes:
+        library_dir = prepare_library(args.workdir, size)
+        print(f"Benchmarking {size} tracks...")
+        results["sizes"][str(size)] = benches = bench_size(library_dir, size, args.repeat, args.cover_sample)
+        for name, entry in benches.items():
+            print(f"  {name:<32} median {entry['median_s'] * 1000:10.2f} ms  ({entry['per_item_us']} us/item)")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=4)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        return 1 if compare(results, args.compare) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
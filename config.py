@@ -16,7 +16,6 @@
 
 import os
 import platform
-import urllib.request
 import subprocess
 import logging
 
@@ -37,6 +36,15 @@ default_settings = {
     "colorization_color": "automatic",
     "volume_percentage": 100,
     "font_name": "Noto Sans",
+    "performance_metrics": False,
+    "stall_threshold_ms": 250,
+    "dedupe_by_content": True,
+    "volume_normalization": True,
+    "normalization_target_lufs": -18.0,
+    "waveform_seek_bar": True,
+    "play_history": True,
+    "restore_session": True,
+    "cover_cache_max_mb": 256,
 }
 logging.info(f"Using Discord Client ID: {default_settings['discord_client_id']}")
 
@@ -80,6 +88,7 @@ def get_changelog_entry(version_to_find):
     """
     Fetches the CHANGELOG.md from the repository and returns the entry for the specified version.
     """
+    import urllib.request  # Only the update check needs it; kept out of the daemon's imports
     changelog_url = "https://raw.githubusercontent.com/vorlie/IotaPlayer/main/CHANGELOG.md"
     try:
         with urllib.request.urlopen(changelog_url, timeout=5) as response:
@@ -102,6 +111,7 @@ def get_changelog_entry(version_to_find):
     return "Changelog entry not found for this version."
 
 def get_latest_version():
+    import urllib.request
     url = "https://raw.githubusercontent.com/vorlie/IotaPlayer/main/latest_version.txt"
     try:
         with urllib.request.urlopen(url, timeout=5) as response:
@@ -0,0 +1,125 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/audioDecode.py
+# =============
+# Decodes audio files to PCM sample arrays for analysis (fingerprints,
+# loudness, waveforms). Decoding is done by an external ffmpeg binary, which
+# is optional: when it is not on PATH every function here returns None and
+# callers skip the analysis that needed it.
+#
+# NumPy is imported by the functions that decode, so processes that only ask
+# for ffmpeg_path() (the headless daemon) do not load it.
+# =============
+import shutil
+import logging
+import subprocess
+from typing import TYPE_CHECKING, Iterator, Optional
+
+if TYPE_CHECKING:
+    import numpy as np
+
+_ffmpeg_path: Optional[str] = None
+_ffmpeg_checked = False
+
+
+def ffmpeg_path() -> Optional[str]:
+    """Return the ffmpeg executable, or None if it is not installed. The lookup is cached."""
+    global _ffmpeg_path, _ffmpeg_checked
+    if not _ffmpeg_checked:
+        _ffmpeg_path = shutil.which("ffmpeg")
+        _ffmpeg_checked = True
+        if _ffmpeg_path is None:
+            logging.info("ffmpeg not found; audio analysis features are disabled")
+    return _ffmpeg_path
+
+
+def decode_pcm(path: str, sample_rate: int = 11025, channels: int = 1,
+               max_seconds: Optional[float] = None, timeout: float = 120.0) -> Optional['np.ndarray']:
+    """
+    Decode an audio file to float32 PCM.
+
+    Args:
+        path: Audio file to decode
+        sample_rate: Output sample rate in Hz
+        channels: Output channel count; 1 downmixes to mono
+        max_seconds: Only decode this much audio from the start, if set
+        timeout: Seconds to wait for ffmpeg before giving up
+
+    Returns:
+        np.ndarray | None: Samples in [-1, 1], shape (frames,) for mono or
+        (frames, channels) otherwise; None if ffmpeg is missing or decoding failed
+    """
+    import numpy as np
+    ffmpeg = ffmpeg_path()
+    if ffmpeg is None:
+        return None
+    command = [ffmpeg, "-nostdin", "-v", "error", "-i", path]
+    if max_seconds is not None:
+        command += ["-t", str(max_seconds)]
+    command += ["-vn", "-ac", str(channels), "-ar", str(sample_rate), "-f", "f32le", "-"]
+    try:
+        result = subprocess.run(command, capture_output=True, timeout=timeout, check=True)
+    except (OSError, subprocess.SubprocessError) as e:
+        logging.warning(f"Could not decode {path}: {e}")
+        return None
+    samples = np.frombuffer(result.stdout, dtype="<f4")
+    if channels > 1:
+        samples = samples[: len(samples) - len(samples) % channels].reshape(-1, channels)
+    return samples
+
+
+def iter_pcm(path: str, sample_rate: int = 48000, channels: int = 2,
+             block_frames: int = 65536) -> Optional[Iterator['np.ndarray']]:
+    """
+    Stream an audio file as float32 PCM blocks, so long tracks never sit in memory whole.
+
+    Args:
+        path: Audio file to decode
+        sample_rate: Output sample rate in Hz
+        channels: Output channel count
+        block_frames: Frames per yielded block; the last block may be shorter
+
+    Returns:
+        Iterator[np.ndarray] | None: Blocks of shape (frames, channels), or None if ffmpeg is missing.
+        The iterator raises OSError if ffmpeg fails part way.
+    """
+    ffmpeg = ffmpeg_path()
+    if ffmpeg is None:
+        return None
+    command = [ffmpeg, "-nostdin", "-v", "error", "-i", path,
+               "-vn", "-ac", str(channels), "-ar", str(sample_rate), "-f", "f32le", "-"]
+
+    def blocks():
+        import numpy as np
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        block_bytes = block_frames * channels * 4
+        try:
+            while True:
+                data = process.stdout.read(block_bytes)
+                if not data:
+                    break
+                usable = len(data) - len(data) % (channels * 4)
+                yield np.frombuffer(data[:usable], dtype="<f4").reshape(-1, channels)
+            _, stderr = process.communicate()
+            if process.returncode != 0:
+                raise OSError(f"ffmpeg failed on {path}: {stderr.decode(errors='replace').strip()}")
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+    return blocks()
@@ -0,0 +1,302 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/blobStore.py
+# =============
+# Single-file store for per-track analysis arrays (waveform peaks, acoustic
+# fingerprints).
+#
+# Records are only ever appended to one file, which is memory-mapped for
+# reading: get() returns a read-only NumPy view of the mapped bytes, so
+# nothing is copied. An in-memory offset index is rebuilt from the record
+# headers on open; a newer record for the same key supersedes the older one.
+# A torn record at the end of the file (crash mid-write) is cut off.
+# Superseded records are reclaimed by compact(), which rewrites the live
+# records to a new file; it runs on open, before the file is mapped, once
+# enough of the file is dead.
+#
+# Record layout (little-endian, every record 8-byte aligned):
+#   header (32 bytes) | key (UTF-8, padded to 8) | payload (padded to 8)
+# =============
+
+import os
+import mmap
+import struct
+import zlib
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from core.configManager import ConfigManager
+from core import perfMetrics
+
+_MAGIC = b"IOTB"
+# magic, key length, dtype code, payload length, mtime, size, payload crc32
+_HEADER = struct.Struct("<4sHBxIdqI")
+_ALIGN = 8
+# dtype code 0 marks a deleted key
+_DTYPES = {1: np.dtype("u1"), 2: np.dtype("<u4"), 3: np.dtype("<f4"), 4: np.dtype("<f8"), 5: np.dtype("<i2")}
+_DTYPE_CODES = {dtype: code for code, dtype in _DTYPES.items()}
+_DELETED = 0
+
+# Compact on open once dead records exceed this share of the file (and COMPACT_MIN_BYTES)
+COMPACT_RATIO = 0.5
+COMPACT_MIN_BYTES = 4 * 1024 * 1024
+
+Signature = Tuple[float, int]
+
+
+def _padded(length: int) -> int:
+    return (length + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _record_key(kind: str, key: str) -> str:
+    return f"{kind}\0{key}"
+
+
+class BlobStore:
+    """
+    Singleton append-only store of NumPy arrays keyed by (kind, path).
+
+    Each entry carries the (mtime, size) signature of the file it was
+    computed from, so a lookup with the file's current signature misses
+    once the file changes.
+
+    Usage:
+        store = BlobStore.get_instance()
+        store.put("waveform", path, (mtime, size), peaks)
+        view = store.get("waveform", path, (mtime, size))  # read-only array or None
+    """
+
+    _instance: Optional['BlobStore'] = None
+    _lock = threading.Lock()
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize BlobStore. Use get_instance() instead of direct instantiation.
+
+        Args:
+            path: Open a separate store at this path instead of the one in the config directory
+        """
+        if path is None and BlobStore._instance is not None:
+            raise RuntimeError("Use BlobStore.get_instance() to get the singleton instance")
+
+        if path is None:
+            config_dir = ConfigManager.get_instance().get_config_dir()
+            os.makedirs(config_dir, exist_ok=True)
+            path = os.path.join(config_dir, "analysis_cache.blob")
+        self.path = path
+        self._store_lock = threading.Lock()
+        # record key -> (payload offset, element count, dtype code, mtime, size, record length)
+        self._index: Dict[str, Tuple[int, int, int, float, int, int]] = {}
+        self._dead_bytes = 0
+        self._map: Optional[mmap.mmap] = None
+
+        if not os.path.exists(path):
+            open(path, "wb").close()
+        end = self._load_index()
+        if os.path.getsize(path) != end:
+            logging.warning(f"Blob store {path}: discarding {os.path.getsize(path) - end} bytes of incomplete records")
+            with open(path, "r+b") as f:
+                f.truncate(end)
+        if self._dead_bytes > max(COMPACT_MIN_BYTES, end * COMPACT_RATIO):
+            self.compact()
+        self._file = open(path, "ab")
+        # Mapped through its own read handle (Windows cannot map a write-only handle)
+        self._reader = open(path, "rb")
+        self._end = os.path.getsize(path)
+        self._remap()
+        self._publish_size()
+
+    @classmethod
+    def get_instance(cls) -> 'BlobStore':
+        """
+        Get the singleton instance of BlobStore.
+
+        Returns:
+            BlobStore: The singleton instance
+        """
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def _load_index(self) -> int:
+        """Rebuild the offset index from the record headers; returns the end of the last intact record."""
+        self._index.clear()
+        self._dead_bytes = 0
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if not size:
+                return 0
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                offset = 0
+                while offset + _HEADER.size <= size:
+                    magic, key_length, code, length, mtime, file_size, crc = _HEADER.unpack_from(data, offset)
+                    payload = offset + _HEADER.size + _padded(key_length)
+                    itemsize = _DTYPES[code].itemsize if code in _DTYPES else 1
+                    record_length = payload - offset + _padded(length * itemsize)
+                    if magic != _MAGIC or (code != _DELETED and code not in _DTYPES) or offset + record_length > size:
+                        break
+                    with memoryview(data) as view:
+                        if zlib.crc32(view[payload:payload + length * itemsize]) != crc:
+                            break
+                        key = bytes(view[offset + _HEADER.size:offset + _HEADER.size + key_length]).decode("utf-8")
+                    previous = self._index.pop(key, None)
+                    if previous is not None:
+                        self._dead_bytes += previous[5]
+                    if code == _DELETED:
+                        self._dead_bytes += record_length
+                    else:
+                        self._index[key] = (payload, length, code, mtime, file_size, record_length)
+                    offset += record_length
+        return offset
+
+    def _remap(self) -> None:
+        # Arrays handed out by get() keep the previous map alive until they are released
+        self._map = mmap.mmap(self._reader.fileno(), 0, access=mmap.ACCESS_READ) if self._end else None
+
+    def get(self, kind: str, key: str, signature: Optional[Signature] = None) -> Optional[np.ndarray]:
+        """
+        Look up an array without copying it.
+
+        Args:
+            kind: Kind of data, e.g. "waveform"
+            key: Normalized file path
+            signature: The file's current (mtime, size); a stored entry with another signature is a miss
+
+        Returns:
+            np.ndarray | None: Read-only view of the stored array
+        """
+        with self._store_lock:
+            entry = self._index.get(_record_key(kind, key))
+            if entry is None:
+                return None
+            offset, count, code, mtime, size, _ = entry
+            if signature is not None and (mtime, size) != tuple(signature):
+                return None
+            if self._map is None or offset + count * _DTYPES[code].itemsize > len(self._map):
+                self._remap()
+            data = self._map
+        return np.frombuffer(data, dtype=_DTYPES[code], count=count, offset=offset)
+
+    def put(self, kind: str, key: str, signature: Signature, array) -> None:
+        """Store one array; see put_many()."""
+        self.put_many(kind, [(key, signature, array)])
+
+    def put_many(self, kind: str, entries: Iterable[Tuple[str, Signature, object]]) -> None:
+        """
+        Append arrays, replacing any stored under the same keys.
+
+        Args:
+            kind: Kind of data, e.g. "waveform"
+            entries: (key, (mtime, size), array) tuples; arrays may also be bytes (stored as uint8)
+        """
+        chunks = []
+        written = []
+        for key, (mtime, size), array in entries:
+            array = np.frombuffer(array, dtype=np.uint8) if isinstance(array, bytes) else np.asarray(array)
+            array = np.ascontiguousarray(array.astype(array.dtype.newbyteorder("<"), copy=False))
+            code = _DTYPE_CODES.get(array.dtype)
+            if code is None:
+                raise ValueError(f"Unsupported blob dtype: {array.dtype}")
+            chunks.append(self._encode(_record_key(kind, key), code, array.tobytes(), len(array), mtime, size))
+            written.append((_record_key(kind, key), code, len(array), mtime, size, len(chunks[-1])))
+        self._append(chunks, written)
+
+    def delete(self, kind: str, keys: Iterable[str]) -> None:
+        """Forget the arrays stored under keys."""
+        chunks, written = [], []
+        with self._store_lock:
+            present = [_record_key(kind, key) for key in keys if _record_key(kind, key) in self._index]
+        for record_key in present:
+            chunks.append(self._encode(record_key, _DELETED, b"", 0, 0.0, 0))
+            written.append((record_key, _DELETED, 0, 0.0, 0, len(chunks[-1])))
+        self._append(chunks, written)
+
+    @staticmethod
+    def _encode(record_key: str, code: int, payload: bytes, count: int, mtime: float, size: int) -> bytes:
+        key = record_key.encode("utf-8")
+        header = _HEADER.pack(_MAGIC, len(key), code, count, mtime, size, zlib.crc32(payload))
+        return b"".join([
+            header, key, b"\0" * (_padded(len(key)) - len(key)),
+            payload, b"\0" * (_padded(len(payload)) - len(payload)),
+        ])
+
+    def _append(self, chunks, written) -> None:
+        if not chunks:
+            return
+        with self._store_lock:
+            self._file.write(b"".join(chunks))
+            self._file.flush()
+            offset = self._end
+            for (record_key, code, count, mtime, size, record_length) in written:
+                previous = self._index.pop(record_key, None)
+                if previous is not None:
+                    self._dead_bytes += previous[5]
+                if code == _DELETED:
+                    self._dead_bytes += record_length
+                else:
+                    payload = offset + _HEADER.size + _padded(len(record_key.encode("utf-8")))
+                    self._index[record_key] = (payload, count, code, mtime, size, record_length)
+                offset += record_length
+            self._end = offset
+        self._publish_size()
+
+    def compact(self) -> None:
+        """
+        Rewrite the file with only its live records. Must run while no other
+        handle (or array from get()) refers to the store, which is why it runs on open.
+        """
+        temp_path = self.path + ".compact"
+        with open(self.path, "rb") as source, open(temp_path, "wb") as target:
+            for record_key, (payload, count, code, mtime, size, record_length) in list(self._index.items()):
+                key_length = _padded(len(record_key.encode("utf-8")))
+                source.seek(payload - _HEADER.size - key_length)
+                target.write(source.read(record_length))
+            target.flush()
+            os.fsync(target.fileno())
+        reclaimed = self._dead_bytes
+        os.replace(temp_path, self.path)
+        self._load_index()
+        logging.info(f"Blob store {self.path} compacted, {reclaimed} bytes reclaimed")
+        perfMetrics.increment("blob_store.compactions")
+
+    def flush(self) -> None:
+        """Make appended records durable."""
+        with self._store_lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    @property
+    def dead_bytes(self) -> int:
+        return self._dead_bytes
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def close(self) -> None:
+        with self._store_lock:
+            self._file.close()
+            self._reader.close()
+            self._map = None
+
+    def _publish_size(self) -> None:
+        perfMetrics.set_gauge("blob_store.bytes", self._end)
+        perfMetrics.set_gauge("blob_store.dead_bytes", self._dead_bytes)
@@ -0,0 +1,222 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/controlProtocol.py
+# =============
+# Wire format for controlling a running IotaPlayer over its local socket
+# (QLocalServer "IotaPlayerInstance", see core/controlServer.py).
+#
+# Every message is a frame: a 4-byte big-endian length followed by that many
+# bytes of UTF-8 JSON. A request is {"id": ..., "cmd": "next", "args": {...}}
+# and gets exactly one response {"id": ..., "ok": true, "result": ...} or
+# {"id": ..., "ok": false, "error": "..."}. Clients may send several requests
+# without waiting; responses come back in request order.
+#
+# Frames are at most MAX_FRAME bytes, so the first byte of a frame is always
+# 0. Older launchers send the bare text "focus" instead; a connection whose
+# first byte is not 0 is read as that legacy message.
+#
+# Standard library only, so command-line clients (iota.py) can use it
+# without Qt; ControlClient is the client side.
+# =============
+import os
+import json
+import socket
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+SERVER_NAME = "IotaPlayerInstance"
+MAX_FRAME = 1024 * 1024
+LEGACY_FOCUS = b"focus"
+
+_HEADER = struct.Struct(">I")
+
+
+class ProtocolError(Exception):
+    """A peer sent something that is not a valid frame."""
+
+
+def encode_frame(message: Dict[str, Any]) -> bytes:
+    """Serialize a message into a length-prefixed frame."""
+    payload = json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(payload) > MAX_FRAME:
+        raise ProtocolError(f"Message of {len(payload)} bytes exceeds {MAX_FRAME}")
+    return _HEADER.pack(len(payload)) + payload
+
+
+def request(command: str, args: Optional[Dict[str, Any]] = None, request_id: Any = None) -> bytes:
+    """Frame for a command request."""
+    message = {"id": request_id, "cmd": command}
+    if args:
+        message["args"] = args
+    return encode_frame(message)
+
+
+def response(request_id: Any, result: Any = None, error: Optional[str] = None) -> bytes:
+    """Frame for the response to a request; an error makes it a failure response."""
+    if error is not None:
+        return encode_frame({"id": request_id, "ok": False, "error": error})
+    return encode_frame({"id": request_id, "ok": True, "result": result})
+
+
+class FrameDecoder:
+    """
+    Incremental decoder for one connection's byte stream.
+
+    Usage:
+        decoder = FrameDecoder()
+        for message in decoder.feed(chunk):   # complete messages, in order
+            ...
+
+    A legacy "focus" connection yields {"cmd": "focus", "legacy": True} once.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._legacy: Optional[bool] = None
+
+    def feed(self, data: bytes) -> List[Dict[str, Any]]:
+        """
+        Add received bytes.
+
+        Returns:
+            List[Dict[str, Any]]: Messages completed by this chunk
+
+        Raises:
+            ProtocolError: Oversized frame, invalid JSON or a non-object message
+        """
+        self._buffer += data
+        if self._legacy is None and self._buffer:
+            self._legacy = self._buffer[0] != 0
+        if self._legacy:
+            return self._feed_legacy()
+        messages = []
+        while len(self._buffer) >= _HEADER.size:
+            (length,) = _HEADER.unpack_from(self._buffer)
+            if length > MAX_FRAME:
+                raise ProtocolError(f"Frame of {length} bytes exceeds {MAX_FRAME}")
+            end = _HEADER.size + length
+            if len(self._buffer) < end:
+                break
+            payload = bytes(self._buffer[_HEADER.size:end])
+            del self._buffer[:end]
+            try:
+                message = json.loads(payload.decode("utf-8"))
+            except (UnicodeDecodeError, ValueError) as e:
+                raise ProtocolError(f"Invalid frame: {e}") from e
+            if not isinstance(message, dict):
+                raise ProtocolError("A message must be a JSON object")
+            messages.append(message)
+        return messages
+
+    def _feed_legacy(self) -> List[Dict[str, Any]]:
+        if len(self._buffer) < len(LEGACY_FOCUS):
+            if not LEGACY_FOCUS.startswith(bytes(self._buffer)):
+                raise ProtocolError("Unknown legacy message")
+            return []
+        if bytes(self._buffer[:len(LEGACY_FOCUS)]) != LEGACY_FOCUS:
+            raise ProtocolError("Unknown legacy message")
+        del self._buffer[:len(LEGACY_FOCUS)]
+        return [{"cmd": "focus", "legacy": True}]
+
+
+def split_response(message: Dict[str, Any]) -> Tuple[bool, Any]:
+    """(ok, result or error message) of a response message."""
+    if message.get("ok"):
+        return True, message.get("result")
+    return False, message.get("error", "Unknown error")
+
+
+def server_address(server_name: str = SERVER_NAME) -> str:
+    """Where QLocalServer listens for a plain server name: a socket in Qt's temp dir, or a named pipe."""
+    if os.name == "nt":
+        return "\\\\.\\pipe\\" + server_name
+    # QDir::tempPath(): $TMPDIR, else /tmp
+    return os.path.join(os.environ.get("TMPDIR") or "/tmp", server_name)
+
+
+class ControlClient:
+    """
+    Blocking client for the control protocol.
+
+    Usage:
+        client = ControlClient.connect()      # None if no instance is listening
+        ok, result = client.call("status")
+        client.close()
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._decoder = FrameDecoder()
+        self._pending: List[Dict[str, Any]] = []
+        self._next_id = 0
+
+    @classmethod
+    def connect(cls, server_name: str = SERVER_NAME, timeout: float = 5.0) -> Optional['ControlClient']:
+        """Connect to a running instance, or return None if none is listening."""
+        address = server_address(server_name)
+        if os.name == "nt":
+            try:
+                return cls(_PipeStream(open(address, "r+b", buffering=0)))
+            except OSError:
+                return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(address)
+        except OSError:
+            sock.close()
+            return None
+        return cls(sock)
+
+    def send(self, command: str, args: Optional[Dict[str, Any]] = None) -> int:
+        """Send a request without waiting for its response; returns its id."""
+        self._next_id += 1
+        self._stream.sendall(request(command, args, self._next_id))
+        return self._next_id
+
+    def receive(self) -> Dict[str, Any]:
+        """Next response, in request order."""
+        while not self._pending:
+            data = self._stream.recv(65536)
+            if not data:
+                raise ConnectionError("The player closed the connection")
+            self._pending.extend(self._decoder.feed(data))
+        return self._pending.pop(0)
+
+    def call(self, command: str, args: Optional[Dict[str, Any]] = None) -> Tuple[bool, Any]:
+        """Send a request and wait for its response; returns (ok, result or error message)."""
+        self.send(command, args)
+        return split_response(self.receive())
+
+    def close(self) -> None:
+        self._stream.close()
+
+
+class _PipeStream:
+    """socket-like send/recv over a Windows named pipe file."""
+
+    def __init__(self, pipe):
+        self._pipe = pipe
+
+    def sendall(self, data: bytes) -> None:
+        self._pipe.write(data)
+
+    def recv(self, size: int) -> bytes:
+        return self._pipe.read(size)
+
+    def close(self) -> None:
+        self._pipe.close()
@@ -0,0 +1,182 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/controlServer.py
+# =============
+# Local control server of the running instance.
+#
+# Serves the protocol of core/controlProtocol.py on a QLocalServer. Every
+# connection has its own decoder and is read from readyRead as data
+# arrives, so the GUI thread never waits on a client and any number of
+# clients can be connected at once. Requests run on the GUI thread through
+# a table of command handlers; each returns a JSON-serializable result or
+# raises to report an error. player_commands() builds the standard table for
+# the player window and the headless daemon alike.
+# =============
+import logging
+from typing import Any, Callable, Dict
+
+from PyQt6.QtCore import QObject
+from PyQt6.QtNetwork import QLocalServer, QLocalSocket
+
+from core.controlProtocol import SERVER_NAME, FrameDecoder, ProtocolError, response
+from core.songSearch import match_songs
+from core import perfMetrics
+
+CommandHandler = Callable[[Dict[str, Any]], Any]
+
+
+class ControlServer(QObject):
+    """
+    QLocalServer that dispatches protocol requests to command handlers.
+
+    Args:
+        handlers: Command name -> handler(args) returning the result
+        server_name: Local socket / pipe name
+    """
+
+    def __init__(self, handlers: Dict[str, CommandHandler], server_name: str = SERVER_NAME, parent=None):
+        super().__init__(parent)
+        self.handlers = handlers
+        self.server_name = server_name
+        self.server = QLocalServer(self)
+        self.server.newConnection.connect(self._accept)
+        self._decoders: Dict[QLocalSocket, FrameDecoder] = {}
+
+    def listen(self) -> bool:
+        if not self.server.listen(self.server_name):
+            # A stale socket file left by a crash; the instance lock says nobody owns it
+            QLocalServer.removeServer(self.server_name)
+            if not self.server.listen(self.server_name):
+                logging.error(f"Control server failed to start: {self.server.errorString()}")
+                return False
+        logging.info(f"Control server listening on {self.server.fullServerName()}")
+        return True
+
+    def close(self) -> None:
+        self.server.close()
+        for socket in list(self._decoders):
+            socket.disconnectFromServer()
+
+    def _accept(self) -> None:
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            self._decoders[socket] = FrameDecoder()
+            socket.readyRead.connect(lambda socket=socket: self._read(socket))
+            socket.disconnected.connect(lambda socket=socket: self._drop(socket))
+            perfMetrics.set_gauge("control.clients", len(self._decoders))
+            # Data may have arrived before the signals were connected
+            if socket.bytesAvailable():
+                self._read(socket)
+
+    def _drop(self, socket: QLocalSocket) -> None:
+        # A client that writes and hangs up at once (the legacy "focus") may still have unread data
+        if socket.bytesAvailable():
+            self._read(socket)
+        if self._decoders.pop(socket, None) is not None:
+            perfMetrics.set_gauge("control.clients", len(self._decoders))
+            socket.deleteLater()
+
+    def _read(self, socket: QLocalSocket) -> None:
+        decoder = self._decoders.get(socket)
+        if decoder is None:
+            return
+        try:
+            messages = decoder.feed(socket.readAll().data())
+        except ProtocolError as e:
+            logging.warning(f"Control server: dropping client: {e}")
+            socket.write(response(None, error=str(e)))
+            socket.disconnectFromServer()
+            return
+        if not messages:
+            return
+        replies = bytearray()
+        for message in messages:
+            reply = self.dispatch(message)
+            if not message.get("legacy"):
+                replies += reply
+        if replies:
+            socket.write(bytes(replies))
+
+    def dispatch(self, message: Dict[str, Any]) -> bytes:
+        """Run one request and return its response frame."""
+        request_id = message.get("id")
+        command = message.get("cmd")
+        handler = self.handlers.get(command)
+        if handler is None:
+            return response(request_id, error=f"Unknown command: {command}")
+        args = message.get("args") or {}
+        if not isinstance(args, dict):
+            return response(request_id, error="args must be an object")
+        perfMetrics.increment("control.requests")
+        try:
+            with perfMetrics.span("control.command", cmd=command):
+                result = handler(args)
+            return response(request_id, result)
+        except Exception as e:
+            logging.warning(f"Control command {command} failed: {e}")
+            return response(request_id, error=str(e) or type(e).__name__)
+
+
+def player_commands(player, focus: Callable[[], Any], quit: Callable[[], Any]) -> Dict[str, CommandHandler]:
+    """
+    Control protocol commands of a player, run on its thread.
+
+    Args:
+        player: PlaybackEngine of the window or the daemon
+        focus: Brings the player to the front
+        quit: Shuts the instance down
+
+    Returns:
+        Dict[str, CommandHandler]: Command name -> handler
+    """
+    def play(args):
+        if "index" in args:
+            player.play_song(player.songs[int(args["index"])])
+        else:
+            player.handle_mpris_command("Play", None)
+        return player.control_status()
+
+    def command(name):
+        def run(args):
+            player.handle_mpris_command(name, None)
+            return player.control_status()
+        return run
+
+    def search(args):
+        query = str(args.get("query", ""))
+        limit = int(args.get("limit", 50))
+        positions = {id(song): index for index, song in enumerate(player.songs)}
+        results = match_songs(player.songs, query, args.get("type", "Artist & Title")) if query else []
+        return [
+            dict({key: song.get(key, "") for key in ("title", "artist", "album", "path")},
+                 index=positions[id(song)])
+            for song in results[:limit]
+        ]
+
+    return {
+        "focus": lambda args: focus(),
+        "status": lambda args: player.control_status(),
+        "play": play,
+        "pause": command("Pause"),
+        "toggle": command("PlayPause"),
+        "stop": command("Stop"),
+        "next": command("Next"),
+        "previous": command("Previous"),
+        "enqueue": lambda args: {"queued": player.enqueue_paths(args.get("paths", []))},
+        "search": search,
+        "quit": lambda args: quit(),
+    }
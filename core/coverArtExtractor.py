@@ -22,12 +22,40 @@
 # to the cover art cache. Skips files that already have cached images.
 # =============
 from PyQt6.QtCore import QThread, pyqtSignal, Qt
-from PyQt6.QtGui import QPixmap
 from mutagen import File
 from mutagen.id3 import APIC
 from mutagen.flac import Picture
 import os
 
+
+def extract_cover(filepath):
+    """Return the raw bytes of a file's embedded cover picture, or None."""
+    try:
+        audio = File(filepath)
+        if audio is None:
+            return None
+        # MP3
+        if filepath.lower().endswith('.mp3') and audio.tags:
+            for tag in audio.tags.values():
+                if isinstance(tag, APIC):
+                    return tag.data
+        # FLAC
+        if filepath.lower().endswith('.flac') and hasattr(audio, 'pictures'):
+            for pic in audio.pictures:
+                if isinstance(pic, Picture):
+                    return pic.data
+        # M4A/MP4
+        if filepath.lower().endswith('.m4a') and 'covr' in audio:
+            return audio['covr'][0]
+        # OGG
+        if filepath.lower().endswith('.ogg') and hasattr(audio, 'pictures'):
+            for pic in audio.pictures:
+                return pic.data
+    except Exception as e:
+        print(f"Error extracting cover from {filepath}: {e}")
+    return None
+
+
 class CoverArtExtractor(QThread):
     progress = pyqtSignal(int, int)  # current, total
     finished = pyqtSignal()
@@ -60,31 +88,9 @@ class CoverArtExtractor(QThread):
         self.finished.emit()
 
     def extract_cover(self, filepath):
-        try:
-            audio = File(filepath)
-            if audio is None:
-                return None
-            # MP3
-            if filepath.lower().endswith('.mp3') and audio.tags:
-                for tag in audio.tags.values():
-                    if isinstance(tag, APIC):
-                        return tag.data
-            # FLAC
-            if filepath.lower().endswith('.flac') and hasattr(audio, 'pictures'):
-                for pic in audio.pictures:
-                    if isinstance(pic, Picture):
-                        return pic.data
-            # M4A/MP4
-            if filepath.lower().endswith('.m4a') and 'covr' in audio:
-                return audio['covr'][0]
-            # OGG
-            if filepath.lower().endswith('.ogg') and hasattr(audio, 'pictures'):
-                for pic in audio.pictures:
-                    return pic.data
-        except Exception as e:
-            print(f"Error extracting cover from {filepath}: {e}")
-        return None
+        return extract_cover(filepath)
 
     def set_cover_art(self, image_path):
+        from PyQt6.QtGui import QPixmap  # Not at module level: MPRIS art in the daemon uses extract_cover() only
         self.coverLabel.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.coverLabel.setPixmap(QPixmap(image_path))
\ No newline at end of file
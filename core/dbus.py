@@ -24,21 +24,121 @@
 # for IotaPlayer using dbus-next. It exposes player metadata (title, artist, album, cover art, etc.)
 # and playback status to Linux desktop environments and compatible widgets.
 #
-# The implementation is read-only: playback controls (play, pause, next, etc.) are disabled,
-# and only metadata and status are provided. This ensures maximum compatibility and stability
-# with desktop integrations such as playerctl, KDE Plasma, GNOME Shell, and Waybar.
+# The service runs on an asyncio thread (core/mprisThread.py) and never touches Qt objects:
+# properties are read from the MPRISSnapshot the player publishes (core/mprisState.py), and
+# methods and property writes (play, pause, seek, volume, GoTo, ...) are sent to the player
+# as commands through its queued mpris_command signal, so they run on the GUI thread.
+#
+# The TrackList interface serves the loaded playlist in play order from an
+# MPRISTrackList (core/mprisTrackList.py).
+#
+# Change notifications go through an MPRISPublisher: the GUI thread only marks the state as
+# changed; on the bus loop, changes within COALESCE_SECONDS are folded into one pass that
+# compares each interface's properties with what was last announced and emits a single
+# PropertiesChanged carrying just the changed keys.
 #
 # The MPRIS service is started asynchronously and updates metadata in real time as songs change.
 # =============
 
+import os
 import logging
 import asyncio
+import threading
 from dbus_next.aio import MessageBus
-from dbus_next.service import (ServiceInterface, method, dbus_property, PropertyAccess)
+from dbus_next.service import (ServiceInterface, method, dbus_property, signal, PropertyAccess)
 from dbus_next import Variant
 
+from core.imageCache import CoverArtCache
+from core.mprisTrackList import MPRISTrackList, NO_TRACK
+
 MPRIS_BUS_NAME = 'org.mpris.MediaPlayer2.IotaPlayer'
 MPRIS_OBJECT_PATH = '/org/mpris/MediaPlayer2'
+# Changes closer together than this are announced together
+COALESCE_SECONDS = 0.05
+
+
+def art_url_for(song, art_path=None):
+    """
+    mpris:artUrl for a song: picture_link if it is a URL, else a file:// URL of the local picture.
+
+    Args:
+        song: Song dict
+        art_path: Cover cache file (CoverArtCache.art_file) used when the song has no picture of its own
+    """
+    # Prefer picture_link if it's a valid URL, else use picture_path as file://
+    art_url = song.get('picture_link', '')
+    if not art_url:
+        picture_path = song.get('picture_path', '')
+        if picture_path:
+            art_url = 'file://' + os.path.abspath(picture_path)
+    elif not (art_url.startswith('http://') or art_url.startswith('https://') or art_url.startswith('file://')):
+        # If picture_link is a local path, convert to file://
+        art_url = 'file://' + os.path.abspath(art_url)
+    if not art_url and art_path:
+        art_url = 'file://' + art_path
+    return art_url
+
+
+def song_metadata(song, trackid, length_us=None, art_path=None):
+    """MPRIS metadata dict for a song; mpris:length is left out when the length is not known."""
+    metadata = {
+        'mpris:trackid': Variant('o', trackid),
+        'xesam:title': Variant('s', song.get('title', 'Nothing is playing')),
+        'xesam:artist': Variant('as', [song.get('artist', 'Unknown Artist')]),
+        'xesam:album': Variant('s', song.get('album', 'Unknown Album')),
+        'xesam:url': Variant('s', 'file://' + os.path.abspath(song['path']) if song.get('path') else ''),
+        'mpris:artUrl': Variant('s', art_url_for(song, art_path)),
+    }
+    if length_us is not None:
+        metadata['mpris:length'] = Variant('x', length_us)
+    if song.get('genre'):
+        metadata['xesam:genre'] = Variant('as', [song['genre']])
+    return metadata
+
+class MPRISPublisher:
+    """
+    Coalesces state changes into one PropertiesChanged per interface, emitted on the bus loop.
+
+    Interfaces provide property_keys() (property name -> cheap comparable key) and
+    emit_changes(names); only properties whose key changed since the last emission are sent.
+    """
+
+    def __init__(self, loop, delay=COALESCE_SECONDS):
+        self.loop = loop
+        self.delay = delay
+        self._interfaces = []
+        self._last = {}
+        self._lock = threading.Lock()
+        self._scheduled = False
+        self._seeked = False
+
+    def add(self, interface):
+        self._interfaces.append(interface)
+        self._last[interface] = interface.property_keys()
+
+    def schedule(self, seeked=False):
+        """Note a change; safe to call from any thread."""
+        with self._lock:
+            self._seeked = self._seeked or seeked
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.loop.call_soon_threadsafe(self.loop.call_later, self.delay, self.flush)
+
+    def flush(self):
+        with self._lock:
+            self._scheduled = False
+            seeked, self._seeked = self._seeked, False
+        for interface in self._interfaces:
+            keys = interface.property_keys()
+            last = self._last[interface]
+            changed = [name for name, key in keys.items() if last.get(name) != key]
+            self._last[interface] = keys
+            if changed:
+                interface.emit_changes(changed)
+            if seeked and hasattr(interface, 'Seeked'):
+                interface.Seeked(interface.snapshot.position_us())
+
 
 class MPRISRootInterface(ServiceInterface):
     def __init__(self, player):
@@ -47,7 +147,7 @@ class MPRISRootInterface(ServiceInterface):
 
     @method()
     def Raise(self):
-        logging.info('MPRIS: Raise called')
+        self.player.mpris_command.emit('Raise', None)
 
     @method()
     def Quit(self):
@@ -59,11 +159,11 @@ class MPRISRootInterface(ServiceInterface):
 
     @dbus_property(PropertyAccess.READ)
     def CanRaise(self) -> 'b':
-        return False
+        return True
 
     @dbus_property(PropertyAccess.READ)
     def HasTrackList(self) -> 'b':
-        return False
+        return True
 
     @dbus_property(PropertyAccess.READ)
     def Identity(self) -> 's':
@@ -82,38 +182,120 @@ class MPRISRootInterface(ServiceInterface):
         return ['audio/mpeg', 'audio/mp3', 'audio/x-wav', 'audio/flac']
 
 class MPRISPlayerInterface(ServiceInterface):
-    def __init__(self, player):
+    def __init__(self, player, snapshot, tracklist, publisher, art_cache=None):
         super().__init__('org.mpris.MediaPlayer2.Player')
         self.player = player
+        self.snapshot = snapshot
+        self.tracklist = tracklist
+        self.publisher = publisher
+        self.art_cache = art_cache
+        # (song, cover cache file) of the current song; the file is made off the bus loop
+        self._art = (None, None)
+        snapshot.add_listener(self._state_changed)
+
+    def _state_changed(self, state, seeked):
+        song = state['song']
+        if self.art_cache is not None and song and song is not self._art[0]:
+            self._art = (song, None)
+            self.publisher.loop.call_soon_threadsafe(self._prepare_art, song)
+        self.publisher.schedule(seeked)
+
+    def _prepare_art(self, song):
+        """Materialize the song's cover file in a worker thread, then announce the new artUrl."""
+        future = self.publisher.loop.run_in_executor(None, self.art_cache.art_file, song)
+        future.add_done_callback(lambda done: self._art_prepared(song, done))
+
+    def _art_prepared(self, song, done):
+        if done.cancelled() or done.exception() is not None:
+            return
+        path = done.result()
+        if path and self._art[0] is song:
+            self._art = (song, path)
+            self.publisher.schedule()
+
+    def command(self, name, argument=None):
+        # Queued into the GUI thread; the result shows up in a later snapshot
+        self.player.mpris_command.emit(name, argument)
+
+    @method()
+    def Next(self):
+        self.command('Next')
+
+    @method()
+    def Previous(self):
+        self.command('Previous')
+
+    @method()
+    def Pause(self):
+        self.command('Pause')
+
+    @method()
+    def PlayPause(self):
+        self.command('PlayPause')
+
+    @method()
+    def Stop(self):
+        self.command('Stop')
+
+    @method()
+    def Play(self):
+        self.command('Play')
+
+    @method()
+    def Seek(self, offset: 'x'):
+        self.command('Seek', offset)
+
+    @method()
+    def SetPosition(self, track_id: 'o', position: 'x'):
+        self.command('SetPosition', (track_id, position))
+
+    @method()
+    def OpenUri(self, uri: 's'):
+        logging.info(f'MPRIS: OpenUri not supported: {uri}')
+
+    @signal()
+    def Seeked(self, position) -> 'x':
+        return position
 
     @dbus_property(PropertyAccess.READ)
     def PlaybackStatus(self) -> 's':
-        if getattr(self.player, 'is_playing', False):
-            return 'Playing'
-        elif getattr(self.player, 'is_paused', False):
-            return 'Paused'
-        else:
-            return 'Stopped'
+        return self.snapshot.get()['status']
 
-    @dbus_property(PropertyAccess.READ)
+    @dbus_property()
     def LoopStatus(self) -> 's':
-        return 'None'
+        return self.snapshot.get()['loop']
 
-    @dbus_property(PropertyAccess.READ)
+    @LoopStatus.setter
+    def LoopStatus(self, value: 's'):
+        self.command('LoopStatus', value)
+
+    @dbus_property()
     def Rate(self) -> 'd':
         return 1.0
 
-    @dbus_property(PropertyAccess.READ)
+    @Rate.setter
+    def Rate(self, value: 'd'):
+        pass  # Only 1.0 is supported (MinimumRate == MaximumRate)
+
+    @dbus_property()
     def Shuffle(self) -> 'b':
-        return False
+        return self.snapshot.get()['shuffle']
 
-    @dbus_property(PropertyAccess.READ)
+    @Shuffle.setter
+    def Shuffle(self, value: 'b'):
+        self.command('Shuffle', value)
+
+    @dbus_property()
     def Volume(self) -> 'd':
-        return 1.0
+        return self.snapshot.get()['volume']
+
+    @Volume.setter
+    def Volume(self, value: 'd'):
+        self.command('Volume', value)
 
     @dbus_property(PropertyAccess.READ)
     def Position(self) -> 'x':
-        return int(getattr(self.player, 'current_position', 0) * 1_000_000)
+        return self.snapshot.position_us()
 
     @dbus_property(PropertyAccess.READ)
     def MinimumRate(self) -> 'd':
@@ -125,55 +307,38 @@ class MPRISPlayerInterface(ServiceInterface):
 
     @dbus_property(PropertyAccess.READ)
     def CanGoNext(self) -> 'b':
-        return False
+        return self.snapshot.get()['can_go_next']
 
     @dbus_property(PropertyAccess.READ)
     def CanGoPrevious(self) -> 'b':
-        return False
+        return self.snapshot.get()['can_go_previous']
 
     @dbus_property(PropertyAccess.READ)
     def CanPlay(self) -> 'b':
-        return False
+        return self.snapshot.get()['can_play']
 
     @dbus_property(PropertyAccess.READ)
     def CanPause(self) -> 'b':
-        return False
+        return self.snapshot.get()['can_pause']
 
     @dbus_property(PropertyAccess.READ)
     def CanSeek(self) -> 'b':
-        return False
+        return self.snapshot.get()['can_seek']
 
     @dbus_property(PropertyAccess.READ)
     def CanControl(self) -> 'b':
-        return False
+        return True
 
     @dbus_property(PropertyAccess.READ)
     def Metadata(self) -> 'a{sv}':
         try:
-            import os
-            song = getattr(self.player, 'current_song', None) or {}
-            title = song.get('title', 'Nothing is playing')
-            artist = [song.get('artist', 'Unknown Artist')]
-            album = song.get('album', 'Unknown Album')
-            length = int(getattr(self.player, 'song_duration', 0) * 1_000_000)
-            # Prefer picture_link if it's a valid URL, else use picture_path as file://
-            art_url = song.get('picture_link', '')
-            if not art_url:
-                picture_path = song.get('picture_path', '')
-                if picture_path:
-                    art_url = 'file://' + os.path.abspath(picture_path)
-            elif not (art_url.startswith('http://') or art_url.startswith('https://') or art_url.startswith('file://')):
-                # If picture_link is a local path, convert to file://
-                art_url = 'file://' + os.path.abspath(art_url)
-            trackid = '/org/mpris/MediaPlayer2/track/1'
-            return {
-                'mpris:trackid': Variant('o', trackid),
-                'xesam:title': Variant('s', title),
-                'xesam:artist': Variant('as', artist),
-                'xesam:album': Variant('s', album),
-                'mpris:length': Variant('x', length),
-                'mpris:artUrl': Variant('s', art_url),
-            }
+            state = self.snapshot.get()
+            song = state['song'] or {}
+            trackid = self.tracklist.current_id()
+            if trackid == NO_TRACK and song:
+                trackid = '/org/mpris/MediaPlayer2/track/1'
+            art_song, art_path = self._art
+            return song_metadata(song, trackid, state['length_us'], art_path if art_song is state['song'] else None)
         except Exception as e:
             logging.error(f'MPRIS: Metadata error: {e}')
             return {
@@ -183,17 +348,107 @@ class MPRISPlayerInterface(ServiceInterface):
                 'xesam:album': Variant('s', 'Unknown Album'),
                 'mpris:length': Variant('x', 0),
             }
-    def update_metadata(self):
-        self.emit_properties_changed({'Metadata': self.Metadata})
+
+    def property_keys(self):
+        state = self.snapshot.get()
+        return {
+            'PlaybackStatus': state['status'],
+            'LoopStatus': state['loop'],
+            'Shuffle': state['shuffle'],
+            'Volume': state['volume'],
+            'CanGoNext': state['can_go_next'],
+            'CanGoPrevious': state['can_go_previous'],
+            'CanPlay': state['can_play'],
+            'CanPause': state['can_pause'],
+            'CanSeek': state['can_seek'],
+            # Metadata is only rebuilt when the song, its track id, its length or its art changed
+            'Metadata': (id(state['song']), self.tracklist.current_id(), state['length_us'], self._art[1]),
+        }
+
+    def emit_changes(self, names):
+        self.emit_properties_changed({name: getattr(self, name) for name in names})
+
+class MPRISTrackListInterface(ServiceInterface):
+    """org.mpris.MediaPlayer2.TrackList over the player's play order (read-only)."""
+
+    def __init__(self, player, tracklist, publisher):
+        super().__init__('org.mpris.MediaPlayer2.TrackList')
+        self.player = player
+        self.tracklist = tracklist
+        self.publisher = publisher
+        self._generation = tracklist.version()[0]
+
+    @method()
+    def GetTracksMetadata(self, track_ids: 'ao') -> 'aa{sv}':
+        return self.tracklist.metadata(track_ids)
+
+    @method()
+    def AddTrack(self, uri: 's', after_track: 'o', set_as_current: 'b'):
+        logging.info('MPRIS: AddTrack ignored, the track list is not editable')
+
+    @method()
+    def RemoveTrack(self, track_id: 'o'):
+        logging.info('MPRIS: RemoveTrack ignored, the track list is not editable')
+
+    @method()
+    def GoTo(self, track_id: 'o'):
+        # Handled on the GUI thread, which resolves the id against its current list
+        self.player.mpris_command.emit('GoTo', track_id)
+
+    @dbus_property(PropertyAccess.READ)
+    def Tracks(self) -> 'ao':
+        return self.tracklist.tracks()
+
+    @dbus_property(PropertyAccess.READ)
+    def CanEditTracks(self) -> 'b':
+        return False
+
+    @signal()
+    def TrackListReplaced(self, tracks, current) -> 'aoo':
+        return [tracks, current]
+
+    def replace_tracks(self, songs, current_song):
+        """Called from the GUI thread when the playlist or its play order changes."""
+        self.tracklist.replace(songs, current_song)
+        self.publisher.schedule()
+
+    def set_current_track(self, song):
+        """Called from the GUI thread when another track starts; the Tracks window moves with it."""
+        if self.tracklist.set_current(song):
+            self.publisher.schedule()
+
+    def property_keys(self):
+        return {'Tracks': self.tracklist.version()}
+
+    def emit_changes(self, names):
+        generation = self.tracklist.version()[0]
+        if generation != self._generation:
+            # A new list is announced with TrackListReplaced rather than a Tracks change
+            self._generation = generation
+            self.TrackListReplaced(self.tracklist.tracks(), self.tracklist.current_id())
+        else:
+            self.emit_properties_changed({}, invalidated_properties=['Tracks'])
+
 
 async def run_mpris(player):
     bus = await MessageBus().connect()
+    art_cache = getattr(player, 'cover_cache', None) or CoverArtCache()
+    # Track list entries only use cover files that already exist; the current song makes its own
+    tracklist = MPRISTrackList(
+        lambda song, trackid: song_metadata(song, trackid, art_path=art_cache.art_file(song, create=False)))
+    tracklist.replace(player.mpris_play_order(), getattr(player, 'current_song', None))
+    publisher = MPRISPublisher(asyncio.get_running_loop())
     root_iface = MPRISRootInterface(player)
-    player_iface = MPRISPlayerInterface(player)
+    player_iface = MPRISPlayerInterface(player, player.mpris_state, tracklist, publisher, art_cache)
+    tracklist_iface = MPRISTrackListInterface(player, tracklist, publisher)
+    publisher.add(player_iface)
+    publisher.add(tracklist_iface)
     bus.export(MPRIS_OBJECT_PATH, root_iface)
     bus.export(MPRIS_OBJECT_PATH, player_iface)
+    bus.export(MPRIS_OBJECT_PATH, tracklist_iface)
     await bus.request_name(MPRIS_BUS_NAME)
-    # Attach the player_iface to the player for metadata updates
+    # Attach the interfaces to the player for metadata and track list updates
     player.mpris_player_iface = player_iface
+    player.mpris_tracklist_iface = tracklist_iface
     logging.info(f"MPRIS: Service published on D-Bus (dbus-next) as {MPRIS_BUS_NAME}")
     await asyncio.get_event_loop().create_future()  # Run forever
@@ -34,6 +34,7 @@ from typing import Optional
 from config import discord_cdn_images
 from tenacity import retry, stop_after_attempt, wait_fixed
 from core.configManager import ConfigManager
+from core import perfMetrics
 
 discord_logger = logging.getLogger('discord')
 
@@ -94,8 +95,9 @@ class DiscordIntegration(QObject):
                     # Process pending update if any
                     if self._pending_update:
                         discord_logger.info("Processing queued presence update")
-                        self.update_presence(self._pending_update)
-                        self._pending_update = None
+                        pending, self._pending_update = self._pending_update, None
+                        perfMetrics.set_gauge("discord.queue_depth", 0)
+                        self.update_presence(pending)
                         
                     return
                 except Exception as e:
@@ -121,13 +123,15 @@ class DiscordIntegration(QObject):
             if not self._ensure_connection():
                 # Queue update if connection failed
                 self._pending_update = update_data
+                perfMetrics.set_gauge("discord.queue_depth", 1)
                 discord_logger.info("Discord not connected. Update queued.")
                 return
 
             try:
                 activity = self._create_base_activity(update_data)
                 activity = self._handle_timestamps(activity, update_data)
-                self._execute_presence_update(activity, update_data)
+                with perfMetrics.span("discord.update_presence"):
+                    self._execute_presence_update(activity, update_data)
             except Exception as e:
                 self._handle_update_error(e, update_data)
 
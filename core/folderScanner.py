@@ -0,0 +1,173 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/folderScanner.py
+# =============
+# Background folder import for the Playlist Maker.
+#
+# Walks a folder recursively on a worker thread, reads tags for new or
+# changed files and takes everything else from the library index, and
+# streams the resulting song dicts to the GUI in batches. Progress is
+# reported per batch and the scan can be cancelled at any point. Files whose
+# audio is identical to one already imported can optionally be skipped.
+# =============
+import os
+import time
+import logging
+from PyQt6.QtCore import QThread, pyqtSignal
+from core.libraryIndex import LibraryIndex, file_signature
+from core.trackIdentity import track_identities
+from core import perfMetrics
+
+# A batch is sent when it reaches this many songs or has been open this long
+BATCH_SIZE = 250
+BATCH_INTERVAL = 0.1
+
+
+def iter_audio_files(folder, extensions, should_stop=None):
+    """
+    Yield audio file paths below a folder, depth first, sorted by name within each directory.
+
+    Args:
+        folder: Root folder to walk
+        extensions: Lower-case file extensions to accept
+        should_stop: Optional callable; the walk ends early when it returns True
+    """
+    pending = [folder]
+    while pending:
+        if should_stop and should_stop():
+            return
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name.lower())
+        except OSError as e:
+            logging.warning(f"Cannot read folder {directory}: {e}")
+            continue
+        subdirectories = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(entry.path)
+                elif entry.name.lower().endswith(extensions):
+                    yield entry.path
+            except OSError:
+                continue
+        pending.extend(reversed(subdirectories))
+
+
+class FolderScanThread(QThread):
+    """
+    Imports a folder of audio files on a worker thread.
+
+    Signals:
+        progress(done, total): with every batch and once the file list is known
+        batch_ready(songs): a list of song dicts, in folder order
+        scan_finished(count, cancelled): once, when the scan ends
+    """
+    progress = pyqtSignal(int, int)
+    batch_ready = pyqtSignal(list)
+    scan_finished = pyqtSignal(int, bool)
+
+    def __init__(self, folder, read_metadata, extensions, library_index=None, dedupe=False, parent=None):
+        super().__init__(parent)
+        self.folder = folder
+        self.read_metadata = read_metadata  # Callable(path) -> song dict
+        self.extensions = extensions
+        self.library_index = library_index
+        self.dedupe = dedupe  # Skip files with the same audio content as an earlier one
+        self.duplicates_skipped = 0
+
+    def cancel(self):
+        self.requestInterruption()
+
+    def run(self):
+        start = time.perf_counter()
+        index = self.library_index or LibraryIndex.get_instance()
+        try:
+            cached = index.cached_tracks(self.folder)
+        except Exception as e:
+            logging.error(f"Library index unavailable, reading all tags: {e}")
+            index, cached = None, {}
+
+        paths = list(iter_audio_files(self.folder, self.extensions, self.isInterruptionRequested))
+        total = len(paths)
+        self.progress.emit(0, total)
+
+        batch, fresh = [], []
+        batch_started = time.monotonic()
+        done = hits = 0
+        seen_hashes = set()
+        for chunk_start in range(0, total, BATCH_SIZE):
+            if self.isInterruptionRequested():
+                break
+            chunk = [path.replace("\\", "/") for path in paths[chunk_start:chunk_start + BATCH_SIZE]]
+            identities = track_identities(chunk, library_index=index) if self.dedupe and index else {}
+            for path in chunk:
+                if self.isInterruptionRequested():
+                    break
+                done += 1
+                identity = identities.get(path)
+                if identity is not None:
+                    if identity[0] in seen_hashes:
+                        self.duplicates_skipped += 1
+                        continue
+                    seen_hashes.add(identity[0])
+                song, from_index = self._read(path, cached, fresh)
+                if song is not None:
+                    hits += from_index
+                    batch.append(song)
+                if len(batch) >= BATCH_SIZE or time.monotonic() - batch_started >= BATCH_INTERVAL:
+                    self._flush(batch, fresh, index)
+                    self.progress.emit(done, total)
+                    batch, fresh = [], []
+                    batch_started = time.monotonic()
+        self._flush(batch, fresh, index)
+        self.progress.emit(done, total)
+
+        cancelled = self.isInterruptionRequested()
+        perfMetrics.increment("library.cache_hit", hits)
+        perfMetrics.increment("library.cache_miss", done - hits - self.duplicates_skipped)
+        perfMetrics.increment("library.duplicates_skipped", self.duplicates_skipped)
+        perfMetrics.record_scan("playlist_maker.scan_folder", done, time.perf_counter() - start)
+        logging.info(
+            f"Scanned {done}/{total} files in {self.folder} ({hits} from library index, "
+            f"{self.duplicates_skipped} duplicates skipped)"
+            f"{', cancelled' if cancelled else ''}"
+        )
+        self.scan_finished.emit(done, cancelled)
+
+    def _read(self, path, cached, fresh):
+        """Return (song, from_index) for a path, using the index when its mtime and size still match."""
+        try:
+            mtime, size = file_signature(path)
+        except OSError:
+            return None, False
+        entry = cached.get(path)
+        if entry is not None and entry[0] == mtime and entry[1] == size:
+            return dict(entry[2]), True
+        song = self.read_metadata(path)
+        fresh.append((song, mtime, size))
+        return song, False
+
+    def _flush(self, batch, fresh, index):
+        if index is not None and fresh:
+            try:
+                index.store_tracks(fresh)
+            except Exception as e:
+                logging.error(f"Failed to update library index: {e}")
+        if batch:
+            self.batch_ready.emit(batch)
@@ -19,17 +19,31 @@
 # This module provides Google/YouTube Data API 
 # integration for IotaPlayer, including authentication, 
 # playlist creation, and adding videos to playlists
+# (batched and resumable, see core/youtubeUpload.py)
+# The service object is built once and kept, with its token
+# refreshed in the background (YouTubeService).
 # =============
 from googleapiclient.discovery import build
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
+import google_auth_httplib2
+import httplib2
 import os
+import time
 import pickle
+import datetime
+import threading
 from core.configManager import ConfigManager
+from core.youtubeUpload import HttpPool, PlaylistUploader, UploadJournal
 
 # Define the scopes required for playlist management
 SCOPES = ['https://www.googleapis.com/auth/youtube.force-ssl']
 CLIENT_SECRETS_FILE = "" # This will be set later, do not set manually
+# Refresh the access token this long before it expires
+REFRESH_MARGIN_SECONDS = 300
+# Stop refreshing in the background after this long without a get()
+IDLE_SECONDS = 1800
+HTTP_TIMEOUT_SECONDS = 60
 
 def get_token_pickle_file():
     """Get the path to the token pickle file."""
@@ -42,8 +56,8 @@ def load_client_secrets_path():
     config = config_manager.load_config()
     return config.get("google_client_secret_file", "")
 
-def get_authenticated_service():
-    """Gets an authenticated YouTube Data API service object. Handles OAuth flow."""
+def load_credentials():
+    """Loads saved OAuth credentials, refreshing them or running the OAuth flow when needed."""
     global CLIENT_SECRETS_FILE
     CLIENT_SECRETS_FILE = load_client_secrets_path()
     if not CLIENT_SECRETS_FILE or not os.path.exists(CLIENT_SECRETS_FILE):
@@ -78,18 +92,150 @@ def get_authenticated_service():
                 return None
 
         # Save the credentials for the next run
-        os.makedirs(os.path.dirname(TOKEN_PICKLE_FILE), exist_ok=True)
-        with open(TOKEN_PICKLE_FILE, 'wb') as token:
-            pickle.dump(creds, token) # Save pickled credentials
+        save_credentials(creds)
+    return creds
 
-    try:
-      service = build('youtube', 'v3', credentials=creds)
-      return service
-    except Exception as e:
-        print(f"Error building YouTube service: {e}")
-        # Potentially delete the token file if credentials are bad
-        # os.remove(TOKEN_PICKLE_FILE)
+def save_credentials(creds):
+    """Pickles credentials to the token file."""
+    TOKEN_PICKLE_FILE = get_token_pickle_file()
+    os.makedirs(os.path.dirname(TOKEN_PICKLE_FILE), exist_ok=True)
+    with open(TOKEN_PICKLE_FILE, 'wb') as token:
+        pickle.dump(creds, token) # Save pickled credentials
+
+def seconds_until_expiry(creds):
+    """Seconds until the access token expires, or None if it has no known expiry."""
+    if creds is None or creds.expiry is None:
         return None
+    # google-auth keeps expiry as a naive UTC datetime
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    return (creds.expiry - now).total_seconds()
+
+
+class YouTubeService:
+    """
+    Long-lived YouTube Data API client shared by all uploads.
+
+    The service object is built once from the discovery document bundled with
+    google-api-python-client (no discovery fetch) over a kept-alive connection;
+    http_pool holds further connections for batches in flight. While the
+    service is in use the access token is refreshed in the background shortly
+    before it expires, so operations never wait for a refresh.
+
+    Usage:
+        youtube = YouTubeService.get_instance()
+        service = youtube.get()          # None if authentication failed
+        PlaylistUploader(service, journal, http_pool=youtube.http_pool)
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        if YouTubeService._instance is not None:
+            raise RuntimeError("Use YouTubeService.get_instance() to get the singleton instance")
+        self._service_lock = threading.RLock()
+        self._service = None
+        self._credentials = None
+        self.http_pool = None
+        self._refresh_timer = None
+        self._last_used = 0.0
+
+    @classmethod
+    def get_instance(cls):
+        """
+        Get the singleton instance of YouTubeService.
+
+        Returns:
+            YouTubeService: The singleton instance
+        """
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def get(self):
+        """Returns the authenticated service object, building it on first use or after invalidate()."""
+        with self._service_lock:
+            self._last_used = time.monotonic()
+            if self._service is not None:
+                left = seconds_until_expiry(self._credentials)
+                if self._credentials.valid and (left is None or left > REFRESH_MARGIN_SECONDS):
+                    return self._service
+                # The background refresh did not run (the service sat idle); refresh now
+                if self._credentials.refresh_token and self._refresh():
+                    return self._service
+            creds = load_credentials()
+            if creds is None:
+                return None
+            try:
+                http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS))
+                self._service = build('youtube', 'v3', http=http, static_discovery=True, cache_discovery=False)
+            except Exception as e:
+                print(f"Error building YouTube service: {e}")
+                self._service = None
+                return None
+            self._close_pool()
+            self._credentials = creds
+            self.http_pool = HttpPool(creds, timeout=HTTP_TIMEOUT_SECONDS)
+            self._schedule_refresh()
+            return self._service
+
+    def invalidate(self):
+        """Drops the service, e.g. after the user revoked access; the next get() authenticates again."""
+        with self._service_lock:
+            self._service = None
+            self._credentials = None
+            self._close_pool()
+            self._cancel_refresh()
+
+    def _refresh(self):
+        """Refreshes the access token in place (every connection shares the credentials object)."""
+        try:
+            self._credentials.refresh(Request())
+        except Exception as e:
+            print(f"Error refreshing token: {e}")
+            return False
+        try:
+            save_credentials(self._credentials)
+        except OSError as e:
+            print(f"Error saving refreshed token: {e}")
+        self._schedule_refresh()
+        return True
+
+    def _background_refresh(self):
+        with self._service_lock:
+            self._refresh_timer = None
+            if self._service is None:
+                return
+            # Let an unused token lapse; get() refreshes it on demand
+            if time.monotonic() - self._last_used > IDLE_SECONDS:
+                return
+            self._refresh()
+
+    def _schedule_refresh(self):
+        self._cancel_refresh()
+        left = seconds_until_expiry(self._credentials)
+        if left is None or not self._credentials.refresh_token:
+            return
+        self._refresh_timer = threading.Timer(max(left - REFRESH_MARGIN_SECONDS, 0), self._background_refresh)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+    def _cancel_refresh(self):
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+
+    def _close_pool(self):
+        if self.http_pool is not None:
+            self.http_pool.close()
+            self.http_pool = None
+
+
+def get_authenticated_service():
+    """Gets an authenticated YouTube Data API service object. Handles OAuth flow."""
+    return YouTubeService.get_instance().get()
 
 
 def create_youtube_playlist(service, title, description="Created using IotaPlayer", privacy_status="public"):
@@ -117,33 +263,20 @@ def create_youtube_playlist(service, title, description="Created using IotaPlaye
         raise e # Let the caller handle it
 
 def add_videos_to_youtube_playlist(service, playlist_id, video_ids):
-    """Adds a list of video IDs to a YouTube playlist."""
+    """
+    Adds a list of video IDs to a YouTube playlist, in batches (see core/youtubeUpload.py).
+
+    Returns:
+        Tuple[int, List[str]]: (videos added, error messages)
+    """
     if not service:
         raise ValueError("YouTube service object is not valid.")
     if not playlist_id:
         raise ValueError("Playlist ID is required.")
 
-    added_count = 0
-    errors = []
-    for video_id in video_ids:
-        try:
-            request = service.playlistItems().insert(
-                part="snippet",
-                body={
-                  "snippet": {
-                    "playlistId": playlist_id,
-                    "resourceId": {
-                      "kind": "youtube#video",
-                      "videoId": video_id
-                    }
-                  }
-                }
-            )
-            request.execute()
-            added_count += 1
-            print(f"Added video {video_id} to playlist {playlist_id}")
-        except Exception as e:
-            print(f"Error adding video {video_id} to playlist {playlist_id}: {e}")
-            errors.append(f"{video_id}: {e}")
-
-    return added_count, errors
\ No newline at end of file
+    journal = UploadJournal(None, video_ids)
+    journal.playlist_id = playlist_id
+    youtube = YouTubeService.get_instance()
+    http_pool = youtube.http_pool if service is youtube._service else None
+    added_count, errors, _ = PlaylistUploader(service, journal, http_pool=http_pool).upload()
+    return added_count, errors
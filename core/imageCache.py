@@ -20,12 +20,52 @@
 # It handles image resizing, cropping, and caching to improve performance
 # and reduce redundant processing.
 # The cache is stored in a user-specific directory based on the platform.
+#
+# Covers for other applications (MPRIS artUrl) live in its art/ directory as
+# content-addressed PNGs (named by the SHA-1 of their bytes), made at most
+# once per album and shared by albums with the same cover; art/index.json
+# maps albums to their file. evict() keeps the directory under a size limit
+# by deleting the least recently used files.
+#
+# QtGui is imported where pixmaps are made, so serving MPRIS art from the
+# headless daemon does not load it.
 # =============
 import os
-from PIL import Image, ImageQt
-from PyQt6.QtGui import QPixmap
+import json
+import hashlib
+import logging
+import threading
+from PIL import Image
 import io
 from core.configManager import ConfigManager
+from core.coverArtExtractor import extract_cover
+from core.playlistStore import atomic_write_json
+from core import perfMetrics
+
+ART_DIR = "art"
+ART_SIZE = 250
+# Default limit for evict()
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def _square(img, size):
+    """Crop an image to its centre square and resize it to size x size."""
+    w, h = img.size
+    # Crop to center square
+    if w != h:
+        min_side = min(w, h)
+        left = (w - min_side) // 2
+        top = (h - min_side) // 2
+        img = img.crop((left, top, left + min_side, top + min_side))
+    return img.resize((size, size), Image.LANCZOS)
+
+
+def _album_key(song):
+    """Songs of one album share their art; songs without a known album get their own."""
+    album = (song.get("album") or "").strip()
+    if not album or album == "Unknown Album":
+        return "path:" + song.get("path", "")
+    return f"album:{(song.get('artist') or '').strip().lower()}\0{album.lower()}"
 
 class CoverArtCache:
     def __init__(self, cache_dir=None):
@@ -36,50 +76,179 @@ class CoverArtCache:
         if not os.path.exists(self.cache_dir):
             os.makedirs(self.cache_dir, exist_ok=True)
         self.cache = {}
+        self.memory_bytes = 0
+        self.art_dir = os.path.join(self.cache_dir, ART_DIR)
+        self._art_lock = threading.Lock()
+        self._art_index = None  # album key -> file name in art_dir, loaded on first use
+        self._art_missing = set()  # album keys without any cover, this session
+
+    def _remember(self, cache_key, pixmap):
+        """Keep a pixmap in memory and publish the cache footprint."""
+        if cache_key not in self.cache and pixmap is not None and not pixmap.isNull():
+            self.memory_bytes += pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+        self.cache[cache_key] = pixmap
+        perfMetrics.set_gauge("cover_cache.entries", len(self.cache))
+        perfMetrics.set_gauge("cover_cache.memory_bytes", self.memory_bytes)
 
     def get_cover(self, image_path, size=250):
         cache_key = f"{os.path.basename(image_path)}_{size}"
         cache_file = os.path.join(self.cache_dir, cache_key + ".png")
         if cache_key in self.cache:
+            perfMetrics.increment("cover_cache.hit_memory")
             return self.cache[cache_key]
         if os.path.exists(cache_file):
-            pixmap = QPixmap(cache_file)
-            self.cache[cache_key] = pixmap
+            perfMetrics.increment("cover_cache.hit_disk")
+            self._touch(cache_file)
+            from PyQt6.QtGui import QPixmap
+            with perfMetrics.span("cover_cache.load_disk"):
+                pixmap = QPixmap(cache_file)
+            self._remember(cache_key, pixmap)
             return pixmap
-        pixmap = self.process_and_cache(image_path, cache_file, size)
-        self.cache[cache_key] = pixmap
+        perfMetrics.increment("cover_cache.miss")
+        with perfMetrics.span("cover_cache.process", size=size):
+            pixmap = self.process_and_cache(image_path, cache_file, size)
+        self._remember(cache_key, pixmap)
         return pixmap
 
     def process_and_cache(self, image_path, cache_file, size):
+        from PIL import ImageQt
+        from PyQt6.QtGui import QPixmap
         try:
-            img = Image.open(image_path).convert("RGBA")
-            w, h = img.size
-            # Crop to center square
-            if w != h:
-                min_side = min(w, h)
-                left = (w - min_side) // 2
-                top = (h - min_side) // 2
-                img = img.crop((left, top, left + min_side, top + min_side))
-            img = img.resize((size, size), Image.LANCZOS)
+            img = _square(Image.open(image_path).convert("RGBA"), size)
             img.save(cache_file)
             return QPixmap.fromImage(ImageQt.ImageQt(img))
         except Exception as e:
             print(f"Error processing cover art: {e}")
             return QPixmap("default.png")
 
+    @perfMetrics.timed("cover_cache.save_from_bytes")
     def save_cover_from_bytes(self, song_path, img_bytes, size):
         cache_key = f"{os.path.basename(song_path)}_{size}"
         cache_file = os.path.join(self.cache_dir, cache_key + ".png")
         try:
-            img = Image.open(io.BytesIO(img_bytes)).convert("RGBA")
-            w, h = img.size
-            # Crop to center square
-            if w != h:
-                min_side = min(w, h)
-                left = (w - min_side) // 2
-                top = (h - min_side) // 2
-                img = img.crop((left, top, left + min_side, top + min_side))
-            img = img.resize((size, size), Image.LANCZOS)
+            img = _square(Image.open(io.BytesIO(img_bytes)).convert("RGBA"), size)
             img.save(cache_file)
         except Exception as e:
-            print(f"Error saving cover art: {e}")
\ No newline at end of file
+            print(f"Error saving cover art: {e}")
+
+    @staticmethod
+    def _touch(path):
+        """Mark a cache file as used, for evict()."""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _load_art_index(self):
+        if self._art_index is None:
+            try:
+                with open(os.path.join(self.art_dir, "index.json"), "r", encoding="utf-8") as f:
+                    self._art_index = json.load(f)
+            except (OSError, ValueError):
+                self._art_index = {}
+        return self._art_index
+
+    def _cover_png(self, song_path):
+        """PNG bytes of a song's cover: the processed cover if cached, else its embedded picture."""
+        processed = os.path.join(self.cache_dir, f"{os.path.basename(song_path)}_{ART_SIZE}.png")
+        try:
+            with open(processed, "rb") as f:
+                return f.read()
+        except OSError:
+            pass
+        data = extract_cover(song_path)
+        if not data:
+            return None
+        try:
+            img = _square(Image.open(io.BytesIO(data)).convert("RGBA"), ART_SIZE)
+        except Exception as e:
+            logging.warning(f"Unreadable cover art in {song_path}: {e}")
+            return None
+        out = io.BytesIO()
+        img.save(out, format="PNG")
+        return out.getvalue()
+
+    def art_file(self, song, create=True):
+        """
+        Path of a content-addressed PNG of a song's cover, for other applications.
+
+        Args:
+            song: Song dict (path, artist, album)
+            create: Make the file if the song's album has none yet; otherwise only look it up
+
+        Returns:
+            str | None: Absolute path, or None if the song has no cover (or none yet and not create)
+        """
+        key = _album_key(song)
+        with self._art_lock:
+            name = self._load_art_index().get(key)
+            if name and os.path.exists(os.path.join(self.art_dir, name)):
+                path = os.path.join(self.art_dir, name)
+                self._touch(path)
+                return os.path.abspath(path)
+            if not create or key in self._art_missing or not song.get("path"):
+                return None
+        with perfMetrics.span("cover_cache.art_materialize"):
+            data = self._cover_png(song["path"])
+        if data is None:
+            with self._art_lock:
+                self._art_missing.add(key)
+            return None
+        name = hashlib.sha1(data).hexdigest() + ".png"
+        path = os.path.join(self.art_dir, name)
+        try:
+            os.makedirs(self.art_dir, exist_ok=True)
+            if not os.path.exists(path):
+                temp_path = path + ".tmp"
+                with open(temp_path, "wb") as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+            with self._art_lock:
+                index = self._load_art_index()
+                index[key] = name
+                atomic_write_json(os.path.join(self.art_dir, "index.json"), index, indent=None)
+        except OSError as e:
+            logging.error(f"Failed to store cover art for {song['path']}: {e}")
+            return None
+        return os.path.abspath(path)
+
+    def evict(self, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Delete the least recently used cover files until the cache directory fits in max_bytes.
+
+        Returns:
+            int: Number of files deleted
+        """
+        files = []
+        for directory in (self.cache_dir, self.art_dir):
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(".png"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        if removed:
+            with self._art_lock:
+                index = self._load_art_index()
+                stale = [key for key, name in index.items() if not os.path.exists(os.path.join(self.art_dir, name))]
+                for key in stale:
+                    del index[key]
+                if stale:
+                    atomic_write_json(os.path.join(self.art_dir, "index.json"), index, indent=None)
+            logging.info(f"Cover cache: evicted {removed} files, {total} bytes left")
+            perfMetrics.increment("cover_cache.evicted", removed)
+        perfMetrics.set_gauge("cover_cache.disk_bytes", total)
+        return removed
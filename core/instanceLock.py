@@ -0,0 +1,88 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/instanceLock.py
+# =============
+# Single instance enforcement.
+#
+# The player window (main.py) and the headless daemon (daemon.py) take the
+# same lock file in the config directory, so only one of them owns playback
+# and the control socket at a time. The lock file holds the owner's PID,
+# which iota.py reads to tell a starting instance from a dead one.
+# =============
+import os
+import logging
+from PyQt6.QtNetwork import QLocalSocket
+from core.controlProtocol import SERVER_NAME
+from core.configManager import ConfigManager
+
+
+def is_instance_running(server_name=SERVER_NAME):
+    """Send focus message to running instance if it exists."""
+    socket = QLocalSocket()
+    socket.connectToServer(server_name)
+    is_running = socket.waitForConnected(1000)
+    if is_running:
+        logging.info("Sending focus message to the running instance")
+        socket.write(b"focus")
+        socket.flush()
+        socket.waitForBytesWritten(1000)
+        socket.disconnectFromServer()
+    return is_running
+
+def acquire_instance_lock():
+    """Acquire file-based lock to ensure single instance.
+
+    Returns:
+        tuple: (lock_file_path, lock_fd) if lock acquired, (None, None) if another instance running
+    """
+    import fcntl
+
+    lock_file = os.path.join(ConfigManager.get_instance().get_config_dir(), ".iota.lock")
+    os.makedirs(os.path.dirname(lock_file), exist_ok=True)
+    lock_fd = None
+
+    try:
+        # Opened without truncating: a launch that loses the race must not
+        # erase the owner's PID, which iota.py reads while the owner starts
+        lock_fd = open(lock_file, 'a+')
+        fcntl.flock(lock_fd.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        lock_fd.seek(0)
+        lock_fd.truncate()
+        lock_fd.write(str(os.getpid()))
+        lock_fd.flush()
+        logging.info(f"Acquired instance lock: {lock_file}")
+        return lock_file, lock_fd
+    except (IOError, OSError) as e:
+        logging.info(f"Could not acquire lock (another instance running): {e}")
+        if lock_fd is not None:
+            lock_fd.close()
+        # Another instance is running, try to send focus message
+        is_instance_running()
+        return None, None
+
+def release_instance_lock(lock_file, lock_fd):
+    """Release the instance lock."""
+    if lock_fd:
+        import fcntl
+        try:
+            fcntl.flock(lock_fd.fileno(), fcntl.LOCK_UN)
+            lock_fd.close()
+            if lock_file and os.path.exists(lock_file):
+                os.remove(lock_file)
+            logging.info("Released instance lock")
+        except Exception as e:
+            logging.error(f"Error releasing lock: {e}")
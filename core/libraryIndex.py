@@ -0,0 +1,620 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/libraryIndex.py
+# =============
+# Persistent library index for IotaPlayer.
+# Stores the tags read from every audio file the player has scanned in an
+# SQLite database in the config directory, keyed by path and validated by
+# mtime and size, so re-importing a folder only reads files that changed.
+# It also caches each file's content identity (see core/trackIdentity.py)
+# and loudness (see core/loudness.py), and aggregates the play history
+# (see core/playHistory.py) into per-track and per-week counts, and keeps
+# the membership of smart playlists (see core/smartPlaylists.py); per-track arrays such as waveform
+# peaks and fingerprints live in the blob store (see core/blobStore.py).
+# Schema changes are applied as numbered migrations tracked in user_version.
+# =============
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from core.configManager import ConfigManager
+from core import perfMetrics
+
+# Song dict keys stored per track, in column order
+TRACK_FIELDS = ("artist", "title", "album", "genre", "picture_path", "picture_link", "youtube_id")
+
+# Each entry upgrades the schema by one version; never edit a released entry, append a new one.
+_MIGRATIONS = [
+    """
+    CREATE TABLE tracks (
+        path TEXT PRIMARY KEY,
+        mtime REAL NOT NULL,
+        size INTEGER NOT NULL,
+        artist TEXT NOT NULL DEFAULT '',
+        title TEXT NOT NULL DEFAULT '',
+        album TEXT NOT NULL DEFAULT '',
+        genre TEXT NOT NULL DEFAULT '',
+        picture_path TEXT NOT NULL DEFAULT '',
+        picture_link TEXT NOT NULL DEFAULT '',
+        youtube_id TEXT NOT NULL DEFAULT '',
+        scanned_at REAL NOT NULL
+    );
+    """,
+    """
+    CREATE TABLE identities (
+        path TEXT PRIMARY KEY,
+        mtime REAL NOT NULL,
+        size INTEGER NOT NULL,
+        content_hash TEXT NOT NULL
+    );
+    CREATE INDEX identities_content_hash ON identities (content_hash);
+    """,
+    """
+    CREATE TABLE loudness (
+        path TEXT PRIMARY KEY,
+        mtime REAL NOT NULL,
+        size INTEGER NOT NULL,
+        integrated_lufs REAL,
+        peak REAL NOT NULL,
+        source TEXT NOT NULL,
+        analyzed_at REAL NOT NULL
+    );
+    """,
+    """
+    CREATE TABLE play_stats (
+        path TEXT PRIMARY KEY,
+        artist TEXT NOT NULL DEFAULT '',
+        title TEXT NOT NULL DEFAULT '',
+        play_count INTEGER NOT NULL DEFAULT 0,
+        skip_count INTEGER NOT NULL DEFAULT 0,
+        seconds_played REAL NOT NULL DEFAULT 0,
+        last_played REAL
+    );
+    CREATE INDEX play_stats_play_count ON play_stats (play_count);
+    CREATE INDEX play_stats_last_played ON play_stats (last_played);
+    CREATE TABLE track_weeks (
+        week INTEGER NOT NULL,
+        path TEXT NOT NULL,
+        plays INTEGER NOT NULL,
+        PRIMARY KEY (week, path)
+    );
+    CREATE TABLE artist_weeks (
+        week INTEGER NOT NULL,
+        artist TEXT NOT NULL,
+        plays INTEGER NOT NULL,
+        PRIMARY KEY (week, artist)
+    );
+    CREATE TABLE history_meta (
+        key TEXT PRIMARY KEY,
+        value
+    );
+    """,
+    """
+    CREATE TABLE smart_playlists (
+        name TEXT PRIMARY KEY,
+        definition TEXT NOT NULL,
+        refreshed_at REAL NOT NULL
+    );
+    CREATE TABLE smart_members (
+        playlist TEXT NOT NULL,
+        path TEXT NOT NULL,
+        PRIMARY KEY (playlist, path)
+    );
+    CREATE INDEX tracks_artist ON tracks (artist COLLATE NOCASE);
+    CREATE INDEX tracks_album ON tracks (album COLLATE NOCASE);
+    CREATE INDEX tracks_genre ON tracks (genre COLLATE NOCASE);
+    """,
+    """
+    ALTER TABLE identities ADD COLUMN duration REAL;
+    """,
+]
+
+# Smart playlist rules are compiled to WHERE clauses over this join (see core/smartPlaylists.py)
+_TRACKS_WITH_STATS = "tracks AS t LEFT JOIN play_stats AS s ON s.path = t.path"
+
+
+class LibraryIndex:
+    """
+    Singleton SQLite index of scanned tracks.
+
+    Usage:
+        index = LibraryIndex.get_instance()
+        cached = index.cached_tracks(folder)
+        index.store_tracks([(song, mtime, size), ...])
+    """
+
+    _instance: Optional['LibraryIndex'] = None
+    _lock = threading.Lock()
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Initialize LibraryIndex. Use get_instance() instead of direct instantiation.
+
+        Args:
+            db_path: Open a separate index at this path instead of the one in the config directory
+        """
+        if db_path is None and LibraryIndex._instance is not None:
+            raise RuntimeError("Use LibraryIndex.get_instance() to get the singleton instance")
+
+        if db_path is None:
+            config_dir = ConfigManager.get_instance().get_config_dir()
+            os.makedirs(config_dir, exist_ok=True)
+            db_path = os.path.join(config_dir, "library_index.db")
+        self.db_path = db_path
+        self._db_lock = threading.Lock()
+        self._change_listeners = []
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+        self._publish_size()
+
+    @classmethod
+    def get_instance(cls) -> 'LibraryIndex':
+        """
+        Get the singleton instance of LibraryIndex.
+
+        Returns:
+            LibraryIndex: The singleton instance
+        """
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def _migrate(self) -> None:
+        with self._db_lock:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            for number, script in enumerate(_MIGRATIONS[version:], start=version + 1):
+                with self._conn:
+                    self._conn.executescript(script)
+                    self._conn.execute(f"PRAGMA user_version = {number}")
+                logging.info(f"Library index migrated to schema version {number}")
+
+    # ------------------------------------------------------------------
+    # Tracks
+    # ------------------------------------------------------------------
+    def cached_tracks(self, folder: str) -> Dict[str, Tuple[float, int, Dict[str, Any]]]:
+        """
+        Return every indexed track below a folder.
+
+        Args:
+            folder: Folder whose tracks to return, recursively
+
+        Returns:
+            Dict[str, Tuple[float, int, Dict]]: path -> (mtime, size, song dict)
+        """
+        prefix = folder.replace("\\", "/").rstrip("/") + "/"
+        # Range scan on the primary key; "0" is the character right after "/"
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT * FROM tracks WHERE path >= ? AND path < ?", (prefix, prefix[:-1] + "0")
+            ).fetchall()
+        return {row["path"]: (row["mtime"], row["size"], self._row_to_song(row)) for row in rows}
+
+    def store_tracks(self, entries: Iterable[Tuple[Dict[str, Any], float, int]]) -> None:
+        """
+        Insert or update tracks in a single transaction.
+
+        Args:
+            entries: (song dict, mtime, size) tuples; the song's "path" is the key
+        """
+        now = time.time()
+        rows = [
+            (song["path"], mtime, size, *(song.get(field) or "" for field in TRACK_FIELDS), now)
+            for song, mtime, size in entries
+        ]
+        if not rows:
+            return
+        placeholders = ", ".join("?" * (len(TRACK_FIELDS) + 4))
+        with self._db_lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO tracks (path, mtime, size, {', '.join(TRACK_FIELDS)}, scanned_at) "
+                f"VALUES ({placeholders})",
+                rows,
+            )
+        self._publish_size()
+        self._notify_changed([row[0] for row in rows])
+
+    def remove_tracks(self, paths: Iterable[str]) -> None:
+        paths = [(p,) for p in paths]
+        with self._db_lock, self._conn:
+            self._conn.executemany("DELETE FROM tracks WHERE path = ?", paths)
+            self._conn.executemany("DELETE FROM identities WHERE path = ?", paths)
+            self._conn.executemany("DELETE FROM loudness WHERE path = ?", paths)
+        self._publish_size()
+        self._notify_changed([p for (p,) in paths])
+
+    def get_track(self, path: str) -> Optional[Dict[str, Any]]:
+        with self._db_lock:
+            row = self._conn.execute("SELECT * FROM tracks WHERE path = ?", (path,)).fetchone()
+        return self._row_to_song(row) if row else None
+
+    def count(self) -> int:
+        with self._db_lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Identities
+    # ------------------------------------------------------------------
+    def cached_identities(self, paths: Iterable[str]) -> Dict[str, Tuple[float, int, str, Optional[float]]]:
+        """
+        Look up the stored content hash and duration of a set of files.
+
+        Args:
+            paths: Normalized file paths
+
+        Returns:
+            Dict[str, Tuple[float, int, str, float | None]]: path -> (mtime, size, content hash, duration);
+            the duration is None until it has been measured
+        """
+        paths = list(paths)
+        found = {}
+        with self._db_lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(paths), 500):
+                chunk = paths[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT path, mtime, size, content_hash, duration FROM identities "
+                    f"WHERE path IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for row in rows:
+                    found[row["path"]] = (row["mtime"], row["size"], row["content_hash"], row["duration"])
+        return found
+
+    def store_identities(self, entries: Iterable[Tuple[str, float, int, str, Optional[float]]]) -> None:
+        """
+        Insert or update content hashes in a single transaction. Fingerprints
+        are kept in the blob store.
+
+        Args:
+            entries: (path, mtime, size, content hash, duration or None) tuples
+        """
+        rows = list(entries)
+        if not rows:
+            return
+        with self._db_lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO identities (path, mtime, size, content_hash, duration) "
+                "VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+    # ------------------------------------------------------------------
+    # Loudness
+    # ------------------------------------------------------------------
+    def cached_loudness(self, paths: Iterable[str]) -> Dict[str, Tuple[float, int, Optional[float], float]]:
+        """
+        Look up stored loudness measurements.
+
+        Args:
+            paths: Normalized file paths
+
+        Returns:
+            Dict[str, Tuple[float, int, float | None, float]]: path -> (mtime, size, integrated LUFS, peak);
+            the loudness is None for silent tracks
+        """
+        paths = list(paths)
+        found = {}
+        with self._db_lock:
+            for start in range(0, len(paths), 500):
+                chunk = paths[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT path, mtime, size, integrated_lufs, peak FROM loudness "
+                    f"WHERE path IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for row in rows:
+                    found[row["path"]] = (row["mtime"], row["size"], row["integrated_lufs"], row["peak"])
+        return found
+
+    def store_loudness(self, entries: Iterable[Tuple[str, float, int, Optional[float], float, str]]) -> None:
+        """
+        Insert or update loudness measurements in a single transaction.
+
+        Args:
+            entries: (path, mtime, size, integrated LUFS or None, peak, source) tuples, where source
+                is "analysis" or "tags"
+        """
+        now = time.time()
+        rows = [(*entry, now) for entry in entries]
+        if not rows:
+            return
+        with self._db_lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO loudness (path, mtime, size, integrated_lufs, peak, source, analyzed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    # ------------------------------------------------------------------
+    # Play statistics
+    # ------------------------------------------------------------------
+    def apply_play_events(self, events: Iterable[Dict[str, Any]], log_offset: int) -> None:
+        """
+        Add play events to the statistics in a single transaction.
+
+        Args:
+            events: Events as written by PlayHistory.record()
+            log_offset: Position in the history log up to which events have now been applied
+        """
+        plays, skips, tracks, weeks, artists = [], [], [], [], []
+        events = list(events)
+        for event in events:
+            week = week_start(event["start"])
+            tracks.append((event["path"], event.get("artist", ""), event.get("title", "")))
+            if event["skipped"]:
+                skips.append((event["position"], event["path"]))
+            else:
+                plays.append((event["position"], event["end"], event["path"]))
+                weeks.append((week, event["path"]))
+                artists.append((week, event.get("artist", "")))
+        with self._db_lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO play_stats (path, artist, title) VALUES (?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET artist = excluded.artist, title = excluded.title",
+                tracks,
+            )
+            self._conn.executemany(
+                "UPDATE play_stats SET play_count = play_count + 1, seconds_played = seconds_played + ?, "
+                "last_played = MAX(COALESCE(last_played, 0), ?) WHERE path = ?",
+                plays,
+            )
+            self._conn.executemany(
+                "UPDATE play_stats SET skip_count = skip_count + 1, seconds_played = seconds_played + ? "
+                "WHERE path = ?",
+                skips,
+            )
+            self._conn.executemany(
+                "INSERT INTO track_weeks (week, path, plays) VALUES (?, ?, 1) "
+                "ON CONFLICT(week, path) DO UPDATE SET plays = plays + 1",
+                weeks,
+            )
+            self._conn.executemany(
+                "INSERT INTO artist_weeks (week, artist, plays) VALUES (?, ?, 1) "
+                "ON CONFLICT(week, artist) DO UPDATE SET plays = plays + 1",
+                artists,
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO history_meta (key, value) VALUES ('log_offset', ?)", (log_offset,)
+            )
+        if events:
+            self._notify_changed(list({event["path"] for event in events}))
+
+    def history_log_offset(self) -> int:
+        """Position in the history log up to which events are included in the statistics."""
+        with self._db_lock:
+            row = self._conn.execute("SELECT value FROM history_meta WHERE key = 'log_offset'").fetchone()
+        return int(row["value"]) if row else 0
+
+    def reset_play_statistics(self) -> None:
+        """Forget all aggregated statistics, so they can be rebuilt from the history log."""
+        with self._db_lock, self._conn:
+            for table in ("play_stats", "track_weeks", "artist_weeks", "history_meta"):
+                self._conn.execute(f"DELETE FROM {table}")
+
+    def play_statistics(self, paths: Iterable[str]) -> Dict[str, Tuple[int, int, Optional[float]]]:
+        """
+        Look up play statistics of a set of files.
+
+        Returns:
+            Dict[str, Tuple[int, int, float | None]]: path -> (play count, skip count, last played);
+            tracks that were never played are left out
+        """
+        paths = list(paths)
+        found = {}
+        with self._db_lock:
+            for start in range(0, len(paths), 500):
+                chunk = paths[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT path, play_count, skip_count, last_played FROM play_stats "
+                    f"WHERE path IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for row in rows:
+                    found[row["path"]] = (row["play_count"], row["skip_count"], row["last_played"])
+        return found
+
+    def top_tracks(self, limit: int = 25, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Most played tracks.
+
+        Args:
+            limit: Number of tracks to return
+            since: Only count plays from the week containing this timestamp on; all time if None
+
+        Returns:
+            List[Dict[str, Any]]: {"path", "artist", "title", "plays", "skips", "last_played"}, most played first
+        """
+        with self._db_lock:
+            if since is None:
+                rows = self._conn.execute(
+                    "SELECT path, artist, title, play_count AS plays, skip_count AS skips, last_played "
+                    "FROM play_stats WHERE play_count > 0 ORDER BY play_count DESC LIMIT ?", (limit,)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT recent.path, artist, title, recent.plays, skip_count AS skips, last_played "
+                    "FROM (SELECT path, SUM(plays) AS plays FROM track_weeks WHERE week >= ? "
+                    "      GROUP BY path ORDER BY plays DESC LIMIT ?) AS recent "
+                    "JOIN play_stats ON play_stats.path = recent.path ORDER BY recent.plays DESC",
+                    (week_start(since), limit),
+                ).fetchall()
+        return [dict(row) for row in rows]
+
+    def artist_plays_by_week(self, since: float, limit_per_week: int = 10) -> List[Tuple[int, str, int]]:
+        """
+        Most played artists of each week.
+
+        Args:
+            since: First week to include (any timestamp within it)
+            limit_per_week: Artists returned per week
+
+        Returns:
+            List[Tuple[int, str, int]]: (week start timestamp, artist, plays), newest week first
+        """
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT week, artist, plays FROM ("
+                "  SELECT week, artist, plays, "
+                "         ROW_NUMBER() OVER (PARTITION BY week ORDER BY plays DESC, artist) AS rank "
+                "  FROM artist_weeks WHERE week >= ?"
+                ") WHERE rank <= ? ORDER BY week DESC, plays DESC, artist",
+                (week_start(since), limit_per_week),
+            ).fetchall()
+        return [(row["week"], row["artist"], row["plays"]) for row in rows]
+
+    # ------------------------------------------------------------------
+    # Smart playlists
+    # ------------------------------------------------------------------
+    def smart_playlist_state(self, name: str) -> Optional[Tuple[str, float]]:
+        """
+        Returns:
+            Tuple[str, float] | None: (definition JSON, time of the last full evaluation)
+        """
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT definition, refreshed_at FROM smart_playlists WHERE name = ?", (name,)
+            ).fetchone()
+        return (row["definition"], row["refreshed_at"]) if row else None
+
+    def refresh_smart_playlist(self, name: str, definition: str, where: str, params: Iterable[Any]) -> None:
+        """
+        Recompute a smart playlist's members from scratch.
+
+        Args:
+            name: Playlist name
+            definition: Definition JSON, stored to detect edits
+            where: SQL condition over the tracks (t) and play_stats (s) tables
+            params: Parameters of the condition
+        """
+        with self._db_lock, self._conn:
+            self._conn.execute("DELETE FROM smart_members WHERE playlist = ?", (name,))
+            self._conn.execute(
+                f"INSERT INTO smart_members (playlist, path) SELECT ?, t.path FROM {_TRACKS_WITH_STATS} "
+                f"WHERE {where}",
+                (name, *params),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO smart_playlists (name, definition, refreshed_at) VALUES (?, ?, ?)",
+                (name, definition, time.time()),
+            )
+
+    def update_smart_members(self, name: str, where: str, params: Iterable[Any], paths: Iterable[str]) -> None:
+        """Re-check only the given tracks against a smart playlist's condition."""
+        paths = list(paths)
+        params = list(params)
+        with self._db_lock, self._conn:
+            for start in range(0, len(paths), 500):
+                chunk = paths[start:start + 500]
+                marks = ", ".join("?" * len(chunk))
+                self._conn.execute(f"DELETE FROM smart_members WHERE playlist = ? AND path IN ({marks})", (name, *chunk))
+                self._conn.execute(
+                    f"INSERT INTO smart_members (playlist, path) SELECT ?, t.path FROM {_TRACKS_WITH_STATS} "
+                    f"WHERE t.path IN ({marks}) AND ({where})",
+                    (name, *chunk, *params),
+                )
+
+    def smart_playlist_count(self, name: str) -> int:
+        with self._db_lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM smart_members WHERE playlist = ?", (name,)
+            ).fetchone()[0]
+
+    def smart_playlist_songs(self, name: str, order: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Members of a smart playlist as song dicts.
+
+        Args:
+            name: Playlist name
+            order: SQL ORDER BY expression over t and s
+            limit: Maximum number of songs, or None for all
+        """
+        with self._db_lock:
+            rows = self._conn.execute(
+                f"SELECT t.* FROM smart_members AS m JOIN tracks AS t ON t.path = m.path "
+                f"LEFT JOIN play_stats AS s ON s.path = t.path "
+                f"WHERE m.playlist = ? ORDER BY {order} LIMIT ?",
+                (name, -1 if limit is None else limit),
+            ).fetchall()
+        return [self._row_to_song(row) for row in rows]
+
+    def count_matching(self, where: str, params: Iterable[Any]) -> int:
+        """Number of tracks matching a condition, without storing anything."""
+        with self._db_lock:
+            return self._conn.execute(
+                f"SELECT COUNT(*) FROM {_TRACKS_WITH_STATS} WHERE {where}", tuple(params)
+            ).fetchone()[0]
+
+    def drop_smart_playlists(self, keep: Iterable[str]) -> None:
+        """Forget the members of every smart playlist not named in keep."""
+        keep = set(keep)
+        with self._db_lock:
+            names = [row["name"] for row in self._conn.execute("SELECT name FROM smart_playlists")]
+        doomed = [(name,) for name in names if name not in keep]
+        if not doomed:
+            return
+        with self._db_lock, self._conn:
+            self._conn.executemany("DELETE FROM smart_members WHERE playlist = ?", doomed)
+            self._conn.executemany("DELETE FROM smart_playlists WHERE name = ?", doomed)
+
+    # ------------------------------------------------------------------
+    # Change notification
+    # ------------------------------------------------------------------
+    def add_change_listener(self, callback: Callable[[List[str]], None]) -> None:
+        """
+        Call back with the affected paths after tracks are stored or removed or plays are recorded.
+        The callback runs on the thread that made the change, after the index lock is released.
+        """
+        self._change_listeners.append(callback)
+
+    def _notify_changed(self, paths: List[str]) -> None:
+        for callback in list(self._change_listeners):
+            try:
+                callback(paths)
+            except Exception:
+                logging.exception("Library index change listener failed")
+
+    def close(self) -> None:
+        with self._db_lock:
+            self._conn.close()
+
+    @staticmethod
+    def _row_to_song(row: sqlite3.Row) -> Dict[str, Any]:
+        song = {field: row[field] for field in TRACK_FIELDS}
+        song["path"] = row["path"]
+        return song
+
+    def _publish_size(self) -> None:
+        perfMetrics.set_gauge("library.index_size", self.count())
+
+
+def week_start(timestamp: float) -> int:
+    """Start of the week (Monday 00:00 UTC) containing a timestamp, in seconds since the epoch."""
+    day = int(timestamp // 86400)
+    # 1970-01-01 was a Thursday
+    return (day - (day + 3) % 7) * 86400
+
+
+def file_signature(path: str) -> Tuple[float, int]:
+    """Return the (mtime, size) pair used to decide whether a cached entry is still valid."""
+    stat = os.stat(path)
+    return stat.st_mtime, stat.st_size
+
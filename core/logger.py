@@ -20,6 +20,7 @@
 # It also sets up a Discord logger for integration with Discord Rich Presence.
 # The log files are stored in a user-specific configuration directory,
 # which varies based on the operating system (Windows or Unix-like).
+# Performance events are written as JSON lines to a separate rotating file.
 # =============
 import logging
 from logging.handlers import RotatingFileHandler
@@ -55,4 +56,25 @@ def setup_logging():
     discord_logger = logging.getLogger('discord')
     if not discord_logger.hasHandlers():  # Check if handlers are already set up
         discord_logger.setLevel(logging.DEBUG)
-        discord_logger.addHandler(file_handler)
\ No newline at end of file
+        discord_logger.addHandler(file_handler)
+
+def setup_perf_logging():
+    """Attach a rotating JSON-lines handler to the 'perf' logger and return it."""
+    from core.configManager import ConfigManager
+
+    perf_logger = logging.getLogger('perf')
+    for handler in perf_logger.handlers:
+        if isinstance(handler, RotatingFileHandler):
+            return handler
+
+    config_manager = ConfigManager.get_instance()
+    log_dir = config_manager.get_config_dir()
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, 'perf_events.log')
+    perf_handler = RotatingFileHandler(log_path, maxBytes=5*1024*1024, backupCount=2, encoding='utf-8')
+    perf_handler.setLevel(logging.INFO)
+    perf_handler.setFormatter(logging.Formatter('%(message)s'))
+    perf_logger.setLevel(logging.INFO)
+    perf_logger.addHandler(perf_handler)
+    perf_logger.propagate = False  # Keep JSON events out of combined_app.log
+    return perf_handler
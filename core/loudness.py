@@ -0,0 +1,310 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/loudness.py
+# =============
+# Loudness analysis for per-track volume normalization.
+#
+# Measures integrated loudness (ITU-R BS.1770 / EBU R128: K-weighting,
+# 400 ms blocks with 75% overlap, absolute and relative gating) and sample
+# peak of each track. Audio is streamed from ffmpeg and filtered with FFT
+# overlap-add in NumPy. Without ffmpeg, existing ReplayGain tags are used.
+# Analysis runs in a process pool driven by LoudnessAnalyzer, and results
+# are cached in the library index.
+#
+# NumPy is only imported where audio is measured (in the workers), so
+# cached_gain() is cheap to import for the headless daemon.
+# =============
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Iterable, Optional, Tuple
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from core.audioDecode import iter_pcm, ffmpeg_path
+from core.libraryIndex import LibraryIndex, file_signature
+from core.workQueue import PathQueue
+from core import perfMetrics
+
+if TYPE_CHECKING:
+    import numpy as np
+
+ANALYSIS_RATE = 48000
+# ReplayGain 2.0 reference level
+DEFAULT_TARGET_LUFS = -18.0
+
+# BS.1770 K-weighting at 48 kHz: high-shelf pre-filter, then RLB high-pass
+_SHELF = ([1.53512485958697, -2.69169618940638, 1.19839281085285], [1.0, -1.69065929318241, 0.73248077421585])
+_HIGHPASS = ([1.0, -2.0, 1.0], [1.0, -1.99004745483398, 0.99007225036621])
+# The filters' impulse response has decayed below 1e-8 after this many taps
+_IMPULSE_TAPS = 4096
+_FFT_SIZE = 1 << 18
+_CHUNK_FRAMES = _FFT_SIZE - _IMPULSE_TAPS + 1
+
+_STEP_FRAMES = ANALYSIS_RATE // 10  # 100 ms; a gating block is four steps
+_ABSOLUTE_GATE = -70.0
+_RELATIVE_GATE = -10.0
+
+
+def _k_weighting_spectrum() -> 'np.ndarray':
+    """Frequency response of the K-weighting filter, sized for the overlap-add FFT."""
+    import numpy as np
+    grid = 1 << 16
+    z = np.exp(-1j * np.linspace(0, np.pi, grid // 2 + 1))
+    response = np.ones_like(z)
+    for b, a in (_SHELF, _HIGHPASS):
+        response *= (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+    impulse = np.fft.irfft(response, grid)[:_IMPULSE_TAPS]
+    return np.fft.rfft(impulse, _FFT_SIZE)
+
+
+_K_SPECTRUM = None
+
+
+def _power_to_lufs(power):
+    import numpy as np
+    return -0.691 + 10.0 * np.log10(power)
+
+
+def measure_blocks(blocks: Iterable['np.ndarray']) -> Tuple[Optional[float], float]:
+    """
+    Measure integrated loudness and sample peak of a PCM stream.
+
+    Args:
+        blocks: float32 arrays of shape (frames, channels) at ANALYSIS_RATE
+
+    Returns:
+        Tuple[float | None, float]: (integrated loudness in LUFS, or None if the
+        audio is silent or shorter than one gating block; peak amplitude)
+    """
+    import numpy as np
+    global _K_SPECTRUM
+    if _K_SPECTRUM is None:
+        _K_SPECTRUM = _k_weighting_spectrum()
+
+    peak = 0.0
+    tail = None          # Filter ringing carried into the next chunk
+    leftover = None      # Filtered frames not yet forming a whole 100 ms step
+    step_energy = []     # Per-step sum of squares per channel
+    pending = []
+    pending_frames = 0
+
+    def process(chunk):
+        nonlocal tail, leftover
+        filtered = np.fft.irfft(np.fft.rfft(chunk, _FFT_SIZE, axis=0) * _K_SPECTRUM[:, None], _FFT_SIZE, axis=0)
+        frames = len(chunk)
+        if tail is not None:
+            filtered[:_IMPULSE_TAPS - 1] += tail
+        tail = filtered[frames:frames + _IMPULSE_TAPS - 1]
+        output = filtered[:frames]
+        if leftover is not None:
+            output = np.concatenate([leftover, output])
+        steps = len(output) // _STEP_FRAMES
+        squared = output[:steps * _STEP_FRAMES] ** 2
+        step_energy.append(squared.reshape(steps, _STEP_FRAMES, -1).sum(axis=1))
+        leftover = output[steps * _STEP_FRAMES:]
+
+    # Re-slice the incoming blocks into fixed-size chunks for the overlap-add
+    for block in blocks:
+        if not len(block):
+            continue
+        peak = max(peak, float(np.abs(block).max()))
+        pending.append(block.astype(np.float64))
+        pending_frames += len(block)
+        while pending_frames >= _CHUNK_FRAMES:
+            joined = np.concatenate(pending)
+            process(joined[:_CHUNK_FRAMES])
+            pending = [joined[_CHUNK_FRAMES:]]
+            pending_frames -= _CHUNK_FRAMES
+    if pending_frames:
+        process(np.concatenate(pending))
+
+    if not step_energy:
+        return None, peak
+    steps = np.concatenate(step_energy)
+    if len(steps) < 4:
+        return None, peak
+    # 400 ms blocks starting every 100 ms: sum four consecutive steps per channel, then over channels
+    cumulative = np.concatenate([np.zeros((1, steps.shape[1])), np.cumsum(steps, axis=0)])
+    block_power = ((cumulative[4:] - cumulative[:-4]) / (4 * _STEP_FRAMES)).sum(axis=1)
+
+    with np.errstate(divide="ignore"):
+        block_loudness = _power_to_lufs(block_power)
+    gated = block_power[block_loudness > _ABSOLUTE_GATE]
+    if not len(gated):
+        return None, peak
+    relative_threshold = _power_to_lufs(gated.mean()) + _RELATIVE_GATE
+    gated = block_power[(block_loudness > _ABSOLUTE_GATE) & (block_loudness > relative_threshold)]
+    return float(_power_to_lufs(gated.mean())), peak
+
+
+def read_replaygain_tags(path: str) -> Optional[Tuple[float, float]]:
+    """
+    Read ReplayGain track gain and peak tags, converted to (integrated LUFS, peak).
+
+    Returns:
+        Tuple[float, float] | None: None if the file has no track gain tag
+    """
+    from mutagen import File as MutagenFile
+    try:
+        audio = MutagenFile(path, easy=True)
+    except Exception:
+        return None
+    if audio is None or audio.tags is None:
+        return None
+    try:
+        gain = audio.tags.get("replaygain_track_gain")
+        peak = audio.tags.get("replaygain_track_peak")
+        gain_db = float(gain[0].lower().replace("db", "").strip()) if gain else None
+        peak_value = float(peak[0]) if peak else 1.0
+    except (ValueError, KeyError, IndexError):
+        return None
+    if gain_db is None:
+        return None
+    return DEFAULT_TARGET_LUFS - gain_db, peak_value
+
+
+def analyze_file(path: str):
+    """
+    Measure one file. Runs in a worker process.
+
+    Returns:
+        tuple | None: (path, mtime, size, integrated LUFS or None, peak, source) ready for
+        LibraryIndex.store_loudness(), or None if the file could not be measured
+    """
+    try:
+        mtime, size = file_signature(path)
+        blocks = iter_pcm(path, ANALYSIS_RATE, 2)
+        if blocks is not None:
+            lufs, peak = measure_blocks(blocks)
+            return path, mtime, size, lufs, peak, "analysis"
+        tagged = read_replaygain_tags(path)
+        if tagged is not None:
+            return path, mtime, size, tagged[0], tagged[1], "tags"
+    except OSError as e:
+        logging.warning(f"Loudness analysis failed for {path}: {e}")
+    return None
+
+
+def track_gain(integrated_lufs: Optional[float], peak: float, target_lufs: float = DEFAULT_TARGET_LUFS) -> float:
+    """
+    Linear gain that brings a track to the target loudness without clipping its peak.
+
+    Args:
+        integrated_lufs: Measured loudness, or None for silence
+        peak: Sample peak amplitude
+        target_lufs: Loudness to normalize to
+
+    Returns:
+        float: Factor to multiply the output volume by
+    """
+    if integrated_lufs is None:
+        return 1.0
+    gain = 10.0 ** ((target_lufs - integrated_lufs) / 20.0)
+    if peak > 0:
+        gain = min(gain, 1.0 / peak)
+    return gain
+
+
+def cached_gain(path: str, target_lufs: float = DEFAULT_TARGET_LUFS,
+                library_index: Optional[LibraryIndex] = None) -> Optional[float]:
+    """Return the stored gain for a file, or None if it has not been measured since it last changed."""
+    path = path.replace("\\", "/")
+    index = library_index or LibraryIndex.get_instance()
+    try:
+        mtime, size = file_signature(path)
+        entry = index.cached_loudness([path]).get(path)
+    except Exception:
+        return None
+    if entry is None or entry[0] != mtime or entry[1] != size:
+        return None
+    return track_gain(entry[2], entry[3], target_lufs)
+
+
+class LoudnessAnalyzer(QThread):
+    """
+    Background loudness analysis.
+
+    Paths passed to enqueue() are measured in a process pool unless the
+    library index already has a current measurement; prioritize() moves a
+    path to the front. Each path is tried once per session. Runs until stop().
+
+    Signals:
+        analyzed(path, integrated_lufs, peak): after each new measurement; the loudness is NaN for silence
+    """
+    analyzed = pyqtSignal(str, float, float)
+
+    def __init__(self, workers: Optional[int] = None, library_index: Optional[LibraryIndex] = None, parent=None):
+        super().__init__(parent)
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.library_index = library_index
+        self.queue = PathQueue()
+
+    def enqueue(self, paths: Iterable[str]) -> None:
+        self.queue.enqueue(paths)
+
+    def prioritize(self, path: str) -> None:
+        self.queue.prioritize(path)
+
+    def stop(self) -> None:
+        self.queue.close()
+        self.wait()
+
+    def run(self):
+        index = self.library_index or LibraryIndex.get_instance()
+        if ffmpeg_path() is None:
+            logging.info("Loudness analysis will only use ReplayGain tags (ffmpeg not found)")
+        # Spawned workers do not inherit the GUI's Qt threads
+        pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            while True:
+                batch = self.queue.take(self.workers * 2)
+                if not batch:
+                    break
+                self._analyze(batch, pool, index)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _analyze(self, batch, pool, index):
+        cached = index.cached_loudness(batch)
+        stale = []
+        for path in batch:
+            try:
+                mtime, size = file_signature(path)
+            except OSError:
+                continue
+            entry = cached.get(path)
+            if entry is None or entry[0] != mtime or entry[1] != size:
+                stale.append(path)
+
+        futures = [pool.submit(analyze_file, path) for path in stale]
+        results = []
+        for future in as_completed(futures):
+            if self.queue.closed:
+                break
+            result = future.result()
+            if result is None:
+                continue
+            results.append(result)
+            path, _, _, lufs, peak, _ = result
+            self.analyzed.emit(path, float("nan") if lufs is None else lufs, peak)
+        perfMetrics.increment("loudness.analyzed", len(results))
+        try:
+            index.store_loudness(results)
+        except Exception as e:
+            logging.error(f"Failed to store loudness results: {e}")
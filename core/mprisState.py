@@ -0,0 +1,102 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/mprisState.py
+# =============
+# Player state as seen by MPRIS (core/dbus.py).
+#
+# The D-Bus service runs on its own asyncio thread and must not touch Qt
+# objects. The player (GUI thread) publishes a snapshot of everything MPRIS
+# reports whenever its state changes; D-Bus property reads only look at the
+# latest snapshot. Position is extrapolated from the position and time of
+# the last snapshot while playing, so it needs no update every tick.
+#
+# Commands go the other way as (name, argument) pairs through a queued Qt
+# signal on the player (see PlaybackEngine.handle_mpris_command).
+# =============
+import time
+import threading
+from typing import Any, Callable, Dict, List
+
+# Player loop modes and their MPRIS LoopStatus names
+LOOP_TO_MPRIS = {"Off": "None", "Song": "Track", "Playlist": "Playlist"}
+MPRIS_TO_LOOP = {status: mode for mode, status in LOOP_TO_MPRIS.items()}
+
+_EMPTY_STATE = {
+    "status": "Stopped",
+    "loop": "None",
+    "shuffle": False,
+    "volume": 1.0,
+    "position_us": 0,
+    "length_us": 0,
+    "song": None,
+    "can_go_next": False,
+    "can_go_previous": False,
+    "can_play": False,
+    "can_pause": False,
+    "can_seek": False,
+}
+
+StateListener = Callable[[Dict[str, Any], bool], None]
+
+
+class MPRISSnapshot:
+    """
+    Latest published player state.
+
+    Usage:
+        snapshot = MPRISSnapshot()
+        snapshot.publish({"status": "Playing", "position_us": 0, ...})  # GUI thread
+        snapshot.get()["status"], snapshot.position_us()                # any thread
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state: Dict[str, Any] = dict(_EMPTY_STATE, taken_at=time.monotonic())
+        self._listeners: List[StateListener] = []
+
+    def add_listener(self, callback: StateListener) -> None:
+        """Call callback(state, seeked) after every publish, on the publishing thread."""
+        self._listeners.append(callback)
+
+    def publish(self, state: Dict[str, Any], seeked: bool = False) -> None:
+        """
+        Replace the snapshot.
+
+        Args:
+            state: Keys of _EMPTY_STATE; missing keys keep their empty value
+            seeked: The position jumped (a seek, not normal playback)
+        """
+        state = dict(_EMPTY_STATE, **state, taken_at=time.monotonic())
+        with self._lock:
+            self._state = state
+        for callback in list(self._listeners):
+            callback(state, seeked)
+
+    def get(self) -> Dict[str, Any]:
+        """The current snapshot; treat it as read-only."""
+        with self._lock:
+            return self._state
+
+    def position_us(self) -> int:
+        """Playback position in microseconds, advanced by the time since the snapshot while playing."""
+        state = self.get()
+        position = state["position_us"]
+        if state["status"] == "Playing":
+            position += int((time.monotonic() - state["taken_at"]) * 1_000_000)
+            if state["length_us"] > 0:
+                position = min(position, state["length_us"])
+        return position
@@ -0,0 +1,149 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/mprisTrackList.py
+# =============
+# Track list model behind the MPRIS TrackList interface (core/dbus.py).
+#
+# The list is the loaded playlist in play order (shuffled order while
+# shuffling). Every entry has an object path made of the list's generation
+# and the entry's position, so it stays valid until the list is replaced and
+# resolves back to its entry without a search. D-Bus exposes a window of
+# tracks around the current one in Tracks, and metadata dicts are built only
+# for the ids a client asks for and then cached, so no call walks the whole
+# playlist.
+#
+# The player (Qt main thread) replaces the list; D-Bus handlers (asyncio
+# thread) read it. Both go through one lock that only guards reference swaps.
+# =============
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+TRACK_PATH_PREFIX = "/org/iotaplayer/IotaPlayer/Track"
+NO_TRACK = "/org/mpris/MediaPlayer2/TrackList/NoTrack"
+# Tracks exposed before and after the current one
+WINDOW_BEFORE = 5
+WINDOW_AFTER = 45
+
+
+class MPRISTrackList:
+    """
+    Play-order track list with stable per-track object paths.
+
+    Args:
+        metadata_factory: Builds the MPRIS metadata dict for (song, track id)
+    """
+
+    def __init__(self, metadata_factory: Callable[[Dict[str, Any], str], Dict[str, Any]]):
+        self._metadata_factory = metadata_factory
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._songs: List[Dict[str, Any]] = []
+        self._current = -1
+        self._metadata: Dict[int, Dict[str, Any]] = {}
+
+    def replace(self, songs: List[Dict[str, Any]], current_song: Optional[Dict[str, Any]] = None) -> None:
+        """Start a new list (new ids) from songs in play order; the list is kept by reference, not copied."""
+        current = self._find(songs, current_song, -1)
+        with self._lock:
+            self._generation += 1
+            self._songs = songs
+            self._current = current
+            self._metadata = {}
+
+    def set_current(self, song: Optional[Dict[str, Any]]) -> bool:
+        """
+        Move the current track.
+
+        Returns:
+            bool: True if the current track changed
+        """
+        with self._lock:
+            songs, previous = self._songs, self._current
+        current = self._find(songs, song, previous)
+        with self._lock:
+            if self._songs is not songs or self._current == current:
+                return False
+            self._current = current
+        return True
+
+    @staticmethod
+    def _find(songs: List[Dict[str, Any]], song: Optional[Dict[str, Any]], near: int) -> int:
+        """Position of song in songs, checking around `near` first since tracks mostly advance by one."""
+        if song is None:
+            return -1
+        for position in (near + 1, near, near - 1):
+            if 0 <= position < len(songs) and songs[position] is song:
+                return position
+        for position, candidate in enumerate(songs):
+            if candidate is song:
+                return position
+        return -1
+
+    def _track_id(self, generation: int, position: int) -> str:
+        return f"{TRACK_PATH_PREFIX}/{generation}_{position}"
+
+    def _position(self, track_id: str) -> Optional[int]:
+        """Position of a track id in the current list; caller holds the lock."""
+        prefix, _, name = track_id.rpartition("/")
+        generation, _, position = name.partition("_")
+        if prefix != TRACK_PATH_PREFIX or not position.isdigit() or generation != str(self._generation):
+            return None
+        position = int(position)
+        return position if position < len(self._songs) else None
+
+    def tracks(self) -> List[str]:
+        """Ids of the tracks around the current one, in play order."""
+        with self._lock:
+            centre = max(self._current, 0)
+            start = max(centre - WINDOW_BEFORE, 0)
+            end = min(centre + WINDOW_AFTER + 1, len(self._songs))
+            return [self._track_id(self._generation, position) for position in range(start, end)]
+
+    def version(self) -> Tuple[int, int]:
+        """(generation, current position); changes whenever Tracks would."""
+        with self._lock:
+            return self._generation, self._current
+
+    def current_id(self) -> str:
+        with self._lock:
+            if self._current < 0:
+                return NO_TRACK
+            return self._track_id(self._generation, self._current)
+
+    def song_for(self, track_id: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """(position in play order, song) for a track id, or None if it is not in the current list."""
+        with self._lock:
+            position = self._position(track_id)
+            return None if position is None else (position, self._songs[position])
+
+    def metadata(self, track_ids: List[str]) -> List[Dict[str, Any]]:
+        """Metadata for the given ids that are in the list, built on first request and then cached."""
+        results = []
+        for track_id in track_ids:
+            with self._lock:
+                position = self._position(track_id)
+                if position is None:
+                    continue
+                cached = self._metadata.get(position)
+                song, metadata = self._songs[position], self._metadata
+            if cached is None:
+                cached = self._metadata_factory(song, track_id)
+                with self._lock:
+                    if self._metadata is metadata:
+                        metadata[position] = cached
+            results.append(cached)
+        return results
@@ -17,9 +17,10 @@
 # =============
 # Music Player Core Logic
 #
-# This module implements the main player window, playback controls, UI updates,
-# and state management for IotaPlayer. It handles song loading, playlist navigation,
-# cover art display, Discord integration, and MPRIS metadata updates.
+# This module implements the main player window, playback controls and UI updates
+# for IotaPlayer. Playback itself (queue, shuffle, loop, session, Discord and MPRIS
+# state) lives in core/playbackEngine.py, shared with the headless daemon; the
+# window drives the engine and follows its signals.
 # =============
 import os
 import webbrowser
@@ -49,77 +50,247 @@ from PyQt6.QtWidgets import (
     QInputDialog,
     QFormLayout,
     QDialogButtonBox,
+    QTreeWidget,
+    QTreeWidgetItem,
+    QTabWidget,
 )
 from PyQt6.QtGui import QIcon, QPixmap
-from PyQt6.QtCore import QTimer, Qt, QThread, pyqtSignal, QUrl, QByteArray, PYQT_VERSION_STR, QT_VERSION_STR
-from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
+from PyQt6.QtCore import QTimer, Qt, QThread, pyqtSignal, QByteArray, PYQT_VERSION_STR, QT_VERSION_STR
+from PyQt6.QtMultimedia import QMediaPlayer
 from pynput import keyboard
 from mutagen.mp3 import MP3
 from mutagen.id3 import ID3, APIC
-from core.discordIntegration import DiscordIntegration, PresenceUpdateData
-from core.playlistMaker import PlaylistMaker, PlaylistManager
+from core.playlistMaker import PlaylistMaker
+from core.playlistLibrary import list_playlists, ACCEPTED_AUDIO_EXTENSIONS
+from core.playbackEngine import PlaybackEngine, UNSORTED_MUSIC
+from core.trackIdentity import find_duplicates
+from core.audioDecode import ffmpeg_path
+from core.waveform import WaveformGenerator, cached_peaks
+from core.waveformSeekBar import WaveformSeekBar
+from core.smartPlaylists import SmartPlaylists, parse_query, format_query, save_smart_playlist
+from core.songSearch import match_songs
+from core.playlistStore import PlaylistStore, read_playlist
 from core.settingManager import SettingsDialog
 from core.imageCache import CoverArtCache
-from core.playerState import PlayerState, PlayerStateMachine
-from core.google import (
-    get_authenticated_service,
-    create_youtube_playlist,
-    add_videos_to_youtube_playlist,
-)
-from config import discord_cdn_images, __version__, is_version_higher
-from fuzzywuzzy import process
+from core import perfMetrics
+from core.google import YouTubeService
+from core.youtubeSync import SyncRegistry, UploadFailed, publish_playlist
+from config import __version__, is_version_higher
 from PyQt6.QtGui import QFont
 
+LOOP_BUTTON_TEXT = {"Off": "Loop Off", "Song": "Loop Song", "Playlist": "Loop Playlist"}
+
 
 class YouTubeUploadThread(QThread):
     progress = pyqtSignal(str)  # Signal to report progress steps
     finished_signal = pyqtSignal(str)  # Signal when done (success message)
     error = pyqtSignal(str)  # Signal on error
 
-    def __init__(self, playlist_title, video_ids):
+    def __init__(self, playlist_title, video_ids, playlist_name=None, sync=False):
         super().__init__()
         self.playlist_title = playlist_title
         self.video_ids = video_ids
+        self.playlist_name = playlist_name  # Local playlist, to remember its YouTube playlist
+        self.sync = sync  # Update the YouTube playlist it was uploaded to instead of creating one
 
     def run(self):
         try:
             self.progress.emit("Authenticating with Google...")
-            service = get_authenticated_service()  # From core.google
+            youtube = YouTubeService.get_instance()
+            service = youtube.get()  # From core.google
             if not service:
                 self.error.emit(
                     "Failed to authenticate with Google. Check console/logs."
                 )
                 return
+            self.finished_signal.emit(publish_playlist(
+                service, self.playlist_title, self.video_ids, self.playlist_name, self.sync,
+                progress=self.progress.emit, http_pool=youtube.http_pool,
+            ))
+        except UploadFailed as e:
+            self.error.emit(str(e))
+        except Exception as e:
+            self.error.emit(f"An unexpected error occurred: {str(e)}")
 
-            self.progress.emit(f"Creating YouTube playlist '{self.playlist_title}'...")
-            new_playlist_id = create_youtube_playlist(
-                service, self.playlist_title, privacy_status="private"
-            )  # Or 'public'/'unlisted'
-            if not new_playlist_id:
-                self.error.emit("Failed to create YouTube playlist.")
-                return
 
-            self.progress.emit(f"Adding {len(self.video_ids)} videos to playlist...")
-            added_count, errors = add_videos_to_youtube_playlist(
-                service, new_playlist_id, self.video_ids
-            )
+class DuplicateScanThread(QThread):
+    finished_signal = pyqtSignal(list)  # Duplicate groups from find_duplicates()
+    error = pyqtSignal(str)
 
-            result_message = f"Successfully created playlist '{self.playlist_title}' (ID: {new_playlist_id}).\n"
-            result_message += (
-                f"Added {added_count} out of {len(self.video_ids)} videos."
-            )
-            if errors:
-                result_message += (
-                    f"\n\nErrors occurred for {len(errors)} videos:\n"
-                    + "\n".join(errors[:5])
-                )  # Show first 5 errors
-                if len(errors) > 5:
-                    result_message += "\n..."
+    def __init__(self, playlist_dir, unsorted_folder, use_fingerprint):
+        super().__init__()
+        self.playlist_dir = playlist_dir
+        self.unsorted_folder = unsorted_folder
+        self.use_fingerprint = use_fingerprint
+
+    def run(self):
+        try:
+            with perfMetrics.span("library.find_duplicates", fingerprint=self.use_fingerprint):
+                groups = find_duplicates(
+                    self.playlist_dir, self.unsorted_folder, self.use_fingerprint, ACCEPTED_AUDIO_EXTENSIONS
+                )
+            self.finished_signal.emit(groups)
+        except Exception as e:
+            logging.exception("Duplicate scan failed")
+            self.error.emit(str(e))
+
+
+class DuplicateReportDialog(QDialog):
+    """Lists groups of files with the same audio and the playlists each copy is in."""
+
+    def __init__(self, groups, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Iota Player • Duplicate Tracks")
+        self.resize(800, 450)
+
+        layout = QVBoxLayout(self)
+        copies = sum(len(group["paths"]) - 1 for group in groups)
+        summary = QLabel(
+            f"{len(groups)} tracks are stored more than once ({copies} extra copies)."
+            if groups else "No duplicate tracks found."
+        )
+        layout.addWidget(summary)
+
+        tree = QTreeWidget()
+        tree.setHeaderLabels(["File", "Found in"])
+        tree.setColumnWidth(0, 520)
+        for group in groups:
+            match = "same audio" if group["match"] == "content" else "same recording"
+            first = next(iter(group["paths"]))
+            parent_item = QTreeWidgetItem([f"{os.path.basename(first)} ({len(group['paths'])} copies, {match})", ""])
+            for path, sources in group["paths"].items():
+                child = QTreeWidgetItem([path, ", ".join(sources) or "-"])
+                child.setToolTip(0, path)
+                parent_item.addChild(child)
+            tree.addTopLevelItem(parent_item)
+        tree.expandAll()
+        layout.addWidget(tree)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+
+class PlayStatisticsDialog(QDialog):
+    """Shows the most played tracks and the most played artists of recent weeks."""
+
+    PERIODS = [("All time", None), ("Last 4 weeks", 28), ("Last 7 days", 7)]
 
-            self.finished_signal.emit(result_message)
+    def __init__(self, play_history, parent=None):
+        super().__init__(parent)
+        self.play_history = play_history
+        self.setWindowTitle("Iota Player • Statistics")
+        self.resize(800, 500)
+
+        layout = QVBoxLayout(self)
+        tabs = QTabWidget()
+        layout.addWidget(tabs)
+
+        tracks_tab = QWidget()
+        tracks_layout = QVBoxLayout(tracks_tab)
+        self.period_combo = QComboBox()
+        for label, _ in self.PERIODS:
+            self.period_combo.addItem(label)
+        self.period_combo.currentIndexChanged.connect(self.fill_top_tracks)
+        tracks_layout.addWidget(self.period_combo)
+        self.tracks_tree = QTreeWidget()
+        self.tracks_tree.setRootIsDecorated(False)
+        self.tracks_tree.setHeaderLabels(["Track", "Plays", "Skips", "Last played"])
+        self.tracks_tree.setColumnWidth(0, 450)
+        tracks_layout.addWidget(self.tracks_tree)
+        tabs.addTab(tracks_tab, "Top Tracks")
+
+        self.artists_tree = QTreeWidget()
+        self.artists_tree.setHeaderLabels(["Artist", "Plays"])
+        self.artists_tree.setColumnWidth(0, 450)
+        tabs.addTab(self.artists_tree, "Artists by Week")
+
+        button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+        self.fill_top_tracks()
+        self.fill_artists()
+
+    def fill_top_tracks(self):
+        self.tracks_tree.clear()
+        days = self.PERIODS[self.period_combo.currentIndex()][1]
+        for track in self.play_history.top_tracks(50, days):
+            name = f"{track['artist']} - {track['title']}" if track["artist"] else os.path.basename(track["path"])
+            last_played = time.strftime("%Y-%m-%d %H:%M", time.localtime(track["last_played"])) \
+                if track["last_played"] else "-"
+            item = QTreeWidgetItem([name, str(track["plays"]), str(track["skips"]), last_played])
+            item.setToolTip(0, track["path"])
+            self.tracks_tree.addTopLevelItem(item)
+
+    def fill_artists(self):
+        self.artists_tree.clear()
+        weeks = {}
+        for week, artist, plays in self.play_history.artists_per_week(12):
+            if week not in weeks:
+                weeks[week] = QTreeWidgetItem([f"Week of {time.strftime('%Y-%m-%d', time.gmtime(week))}", ""])
+                self.artists_tree.addTopLevelItem(weeks[week])
+            weeks[week].addChild(QTreeWidgetItem([artist or "Unknown artist", str(plays)]))
+        self.artists_tree.expandAll()
+
+
+class SmartPlaylistDialog(QDialog):
+    """Edits a smart playlist's name and rule query, showing how many tracks it selects."""
+
+    def __init__(self, name="", query="", parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Iota Player • Smart Playlist")
+        self.resize(600, 180)
+        self.definition = None
+
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+        self.name_edit = QLineEdit(name)
+        self.query_edit = QLineEdit(query)
+        self.query_edit.setPlaceholderText("genre contains Dubstep and not played in 30 days order by random limit 200")
+        form.addRow(QLabel("Name:"), self.name_edit)
+        form.addRow(QLabel("Rules:"), self.query_edit)
+        layout.addLayout(form)
+        help_label = QLabel(
+            "Fields: artist, title, album, genre, path (is, is not, contains, does not contain, starts with), "
+            "plays, skips (=, >, <). Also: played in N days, not played in N days, never played. "
+            "Join rules with and/or; add order by (random, artist, title, most played, recently played...) "
+            "and limit N. Only tracks imported through the Playlist Maker are searched."
+        )
+        help_label.setWordWrap(True)
+        layout.addWidget(help_label)
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        self.button_box = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Save | QDialogButtonBox.StandardButton.Cancel
+        )
+        self.button_box.accepted.connect(self.accept)
+        self.button_box.rejected.connect(self.reject)
+        layout.addWidget(self.button_box)
+
+        self.name_edit.textChanged.connect(self.validate)
+        self.query_edit.textChanged.connect(self.validate)
+        self.validate()
 
+    def validate(self):
+        self.definition = None
+        name = self.name_edit.text().strip()
+        try:
+            definition = parse_query(self.query_edit.text())
+            count = SmartPlaylists.get_instance().preview_count(definition)
+        except ValueError as e:
+            self.status_label.setText(str(e) if self.query_edit.text().strip() else "")
         except Exception as e:
-            self.error.emit(f"An unexpected error occurred: {str(e)}")
+            logging.error(f"Smart playlist preview failed: {e}")
+            self.status_label.setText(f"Could not evaluate the rules: {e}")
+        else:
+            self.definition = definition
+            self.status_label.setText(f"{count} songs match.")
+        valid_name = bool(name) and not any(c in name for c in '/\\:*?"<>|')
+        self.button_box.button(QDialogButtonBox.StandardButton.Save).setEnabled(
+            self.definition is not None and valid_name
+        )
 
 
 class UpdateCheckThread(QThread):
@@ -276,7 +447,7 @@ class MusicPlayer(QMainWindow):
     keyboard_play_pause = pyqtSignal()
     keyboard_next = pyqtSignal()
     keyboard_prev = pyqtSignal()
-    
+
     def __init__(self, settings, icon_path, config_path, theme, normal, config=None):
         super().__init__()
         self.icon_path = icon_path
@@ -320,62 +491,51 @@ class MusicPlayer(QMainWindow):
 
         self.initUI()
         self.cover_cache = CoverArtCache()
+        # Trim the cover cache once startup has settled
+        QTimer.singleShot(10000, self.evict_cover_cache)
         self.listener = keyboard.Listener(on_press=self.on_key_press)
         self.listener_thread = threading.Thread(target=self.listener.start)
         self.listener_thread.start()
-        self.playlist_manager = PlaylistManager()
-        self.discord_integration = DiscordIntegration()
         self.settings_manager = SettingsDialog(settings, icon_path, config_path)
-        self.discord_integration.connection_status_changed.connect(
-            self.update_discord_status
-        )
-        self.current_playlist_image = None
-        self.current_song = None
-        self.time_played = 0
-        self.start_time = 0
-        self.pause_start_time = 0
-        self.total_paused_time = 0
-        self.song_duration = 0
-        self.songs = []
-        self.song_index = 0
-        self.is_looping = "Off"
-        logging.info(f"Initialized Iota Player with is_looping = {self.is_looping}")
-        
-        # Initialize state machine (replaces is_playing, is_paused, has_started)
-        self.state_machine = PlayerStateMachine(initial_state=PlayerState.STOPPED)
-        
-        self.is_shuffling = False
-        self.shuffled_index = 0
-        logging.info(
-            f"Initialized Iota Player with is_shuffling = {self.is_shuffling}; shuffled_index = {self.shuffled_index}"
-        )
+        self.song_info_var = "Nothing is playing"
+        self._ignore_song_list_signal = False
+
+        # Playback runs in the engine the headless daemon uses; the window shows its state.
+        # The window measures the loudness of whole playlists, with the default worker count.
+        self.engine = PlaybackEngine(self.config, parent=self, loudness_workers=None)
+        self.engine.cover_cache = self.cover_cache
+        self.engine.playlist_changed.connect(self.on_playlist_changed)
+        self.engine.track_changed.connect(self.on_track_changed)
+        self.engine.state_changed.connect(self.on_state_changed)
+        self.engine.raise_requested.connect(self.raise_window)
+        self.engine.media_player.positionChanged.connect(self.update_progress)
+
+        self.toggle_play_button.clicked.connect(self.toggle_play)
+        self.toggle_pause_button.clicked.connect(self.toggle_pause)
+        self.next_button.clicked.connect(self.engine.next_song)
+        self.prev_button.clicked.connect(self.engine.prev_song)
+        self.loop_button.clicked.connect(self.engine.toggle_loop)
+        self.shuffle_button.clicked.connect(self.engine.toggle_shuffle)
+
+        if self.engine.discord_integration is not None:
+            self.engine.discord_integration.connection_status_changed.connect(self.update_discord_status)
+            # Timer for checking Discord connection status
+            self.connection_check_timer = QTimer()
+            self.connection_check_timer.timeout.connect(self.check_discord_connection)
+            self.connection_check_timer.start(10000)  # Check every 10 seconds
 
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_progress)
         self.timer.start(1000)
 
-        self.check_end_timer = QTimer()
-        self.check_end_timer.timeout.connect(self.check_song_end)
-        self.check_end_timer.start(100)
+        # Waveform thumbnails for the seek bar need ffmpeg to decode tracks
+        self.waveform_generator = None
+        if self.config.get("waveform_seek_bar", True) and ffmpeg_path() is not None:
+            self.waveform_generator = WaveformGenerator()
+            self.waveform_generator.ready.connect(self.on_waveform_ready)
+            self.waveform_generator.start()
 
-        # Timer for checking Discord connection status
-        self.connection_check_timer = QTimer()
-        self.connection_check_timer.timeout.connect(self.check_discord_connection)
-        self.connection_check_timer.start(10000)  # Check every 10 seconds
-
-        self.media_player = QMediaPlayer()
-        self.audio_output = QAudioOutput()
-        self.media_player.setAudioOutput(self.audio_output)
-        
-        self.on_start()
-        
-        self.media_player.positionChanged.connect(self.update_progress)
-        #self.media_player.durationChanged.connect(self.update_duration)
-        #self.media_player.stateChanged.connect(self.handle_state_change)
-        
-        self.volume_update_timer = QTimer()
-        self.volume_update_timer.timeout.connect(self.update_volume_slider)
-        self.volume_update_timer.start(1000)
+        self.engine.start()
 
         # Start update check in background
         self.update_thread = UpdateCheckThread(__version__)
@@ -383,9 +543,9 @@ class MusicPlayer(QMainWindow):
         self.update_thread.start()
         
         # Connect keyboard signals to handlers (thread-safe)
-        self.keyboard_play_pause.connect(self.handle_keyboard_playpause)
-        self.keyboard_next.connect(self.next_song)
-        self.keyboard_prev.connect(self.prev_song)
+        self.keyboard_play_pause.connect(self.engine.toggle_play_pause)
+        self.keyboard_next.connect(self.engine.next_song)
+        self.keyboard_prev.connect(self.engine.prev_song)
 
     def on_update_found(self, latest, changelog):
         reply = QMessageBox.question(
@@ -492,6 +652,8 @@ class MusicPlayer(QMainWindow):
         self.playlist_list_layout.addLayout(self.three_button_layout)
         self.playlist_list_layout.addLayout(self.two_button_layout)
         self.playlist_list_layout.addLayout(self.one_button_layout)
+        self.library_button_layout = QHBoxLayout()
+        self.playlist_list_layout.addLayout(self.library_button_layout)
 
         self.load_button = QPushButton("Load")
         self.reload_button = QPushButton("Reload")
@@ -500,6 +662,9 @@ class MusicPlayer(QMainWindow):
         self.loop_button = QPushButton("Loop Off")
         self.youtube_button = QPushButton("Open song on Youtube")
         self.upload_youtube_button = QPushButton("Upload to YouTube")
+        self.find_duplicates_button = QPushButton("Find Duplicates")
+        self.statistics_button = QPushButton("Statistics")
+        self.smart_playlist_button = QPushButton("Smart Playlist")
 
         self.three_button_layout.addWidget(self.load_button)
         self.three_button_layout.addWidget(self.reload_button)
@@ -508,6 +673,9 @@ class MusicPlayer(QMainWindow):
         self.two_button_layout.addWidget(self.loop_button)
         self.one_button_layout.addWidget(self.youtube_button)
         self.one_button_layout.addWidget(self.upload_youtube_button)
+        self.library_button_layout.addWidget(self.find_duplicates_button)
+        self.library_button_layout.addWidget(self.statistics_button)
+        self.library_button_layout.addWidget(self.smart_playlist_button)
 
         client_secret_path = self.config.get("google_client_secret_file", "")
         if not client_secret_path or not os.path.exists(client_secret_path):
@@ -524,7 +692,7 @@ class MusicPlayer(QMainWindow):
         self.time_label = QLabel("00:00 / 00:00")
         self.sliders_layout.addWidget(self.time_label)
 
-        self.progress_bar = QSlider(Qt.Orientation.Horizontal)
+        self.progress_bar = WaveformSeekBar()
         self.progress_bar.setRange(0, 100)
         self.sliders_layout.addWidget(self.progress_bar)
 
@@ -664,18 +832,15 @@ class MusicPlayer(QMainWindow):
         self.discord_status_label = QLabel("Discord Status: Disconnected")
         self.bottom_layout.addWidget(self.discord_status_label)
 
-        # Connect buttons
-        self.toggle_play_button.clicked.connect(self.toggle_play)
-        self.toggle_pause_button.clicked.connect(self.toggle_pause)
-        self.next_button.clicked.connect(self.next_song)
-        self.prev_button.clicked.connect(self.prev_song)
+        # Connect buttons (playback buttons are connected to the engine in __init__)
         self.load_button.clicked.connect(self.load_playlist_dialog)
-        self.loop_button.clicked.connect(self.toggle_loop)
-        self.shuffle_button.clicked.connect(self.toggle_shuffle)
         self.youtube_button.clicked.connect(self.open_youtube)
         self.reload_button.clicked.connect(self.reload_playlists)
         self.delete_button.clicked.connect(self.delete_playlist)
         self.playlist_combine_button.clicked.connect(self.combine_playlists_mp)
+        self.find_duplicates_button.clicked.connect(self.find_duplicates)
+        self.statistics_button.clicked.connect(self.open_statistics)
+        self.smart_playlist_button.clicked.connect(self.edit_smart_playlist)
         self.playlist_maker_button.clicked.connect(self.open_playlist_maker)
         self.settings_button.clicked.connect(self.open_settings)
         self.about_button.clicked.connect(self.open_about)
@@ -684,13 +849,13 @@ class MusicPlayer(QMainWindow):
 
     def seek_in_song(self):
         """Seek to the position in the song based on the slider value."""
-        if self.media_player.duration() > 0:
+        duration = self.engine.media_player.duration()
+        if duration > 0:
             # Get the slider value (0-100)
             slider_value = self.progress_bar.value()
             # Calculate the position in milliseconds
-            new_position = int((slider_value / 100) * self.media_player.duration())
-            self.media_player.setPosition(new_position)
-            self.update_song_info()
+            new_position = int((slider_value / 100) * duration)
+            self.engine.seek_to_us(new_position * 1000, beyond_end_skips=False)
 
     def update_youtube_button_state(self):
         client_secret_path = self.config.get("google_client_secret_file", "")
@@ -776,8 +941,7 @@ class MusicPlayer(QMainWindow):
         logging.info(f"Processing playlist for YouTube upload: {playlist_path}")
 
         try:
-            with open(playlist_path, "r", encoding="utf-8") as f:
-                playlist_data = json.load(f)
+            playlist_data = read_playlist(playlist_path)
         except Exception as e:
             QMessageBox.critical(
                 self, "Error", f"Failed to load playlist file '{playlist_path}': {e}"
@@ -824,8 +988,22 @@ class MusicPlayer(QMainWindow):
             if reply == QMessageBox.StandardButton.No:
                 return
 
-        # --- Get YouTube Playlist Name ---
+        # --- Update the YouTube playlist it was uploaded to before ---
         local_playlist_title = playlist_data.get("playlist_name", playlist_name)
+        if SyncRegistry.get_instance().remote_playlist(playlist_name):
+            reply = QMessageBox.question(
+                self,
+                "Update YouTube Playlist",
+                f"'{local_playlist_title}' was uploaded to YouTube before.\n"
+                "Update that YouTube playlist with the changes? Choose No to create a new one.",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.Yes,
+            )
+            if reply == QMessageBox.StandardButton.Yes:
+                self.start_youtube_upload(local_playlist_title, video_ids, playlist_name, sync=True)
+                return
+
+        # --- Get YouTube Playlist Name ---
         youtube_playlist_title, ok = QInputDialog.getText(
             self,
             "YouTube Playlist Name",
@@ -838,14 +1016,16 @@ class MusicPlayer(QMainWindow):
         youtube_playlist_title = (
             youtube_playlist_title.strip()
         )  # Ensure no leading/trailing whitespace
+        self.start_youtube_upload(youtube_playlist_title, video_ids, playlist_name)
 
+    def start_youtube_upload(self, youtube_playlist_title, video_ids, playlist_name, sync=False):
         # --- Start Background Thread ---
         # Disable the upload button to prevent multiple clicks
         self.upload_youtube_button.setEnabled(False)
         # Update status bar or label
         # self.statusBar().showMessage("Starting YouTube upload...")
 
-        self.youtube_thread = YouTubeUploadThread(youtube_playlist_title, video_ids)
+        self.youtube_thread = YouTubeUploadThread(youtube_playlist_title, video_ids, playlist_name, sync)
         # Connect signals from the thread to slots in MusicPlayer for feedback
         self.youtube_thread.progress.connect(self.update_youtube_progress)
         self.youtube_thread.finished_signal.connect(self.on_youtube_upload_finished)
@@ -889,37 +1069,137 @@ class MusicPlayer(QMainWindow):
         search_type = self.search_type_dropdown.currentText()
         if not query:
             self.song_list.clear()
-            for song in self.songs:
+            for song in self.engine.songs:
                 self.song_list.addItem(self.display_song_text(song))
             return
 
-        results = []
-        for song in self.songs:
-            if search_type == "Artist & Title":
-                song_info = f"{song['artist']} - {song['title']}"
-            elif search_type == "Genre":
-                song_info = song["genre"]
-            elif search_type == "Album":
-                song_info = song["album"]
-            else:
-                song_info = f"{song['artist']} - {song['title']} - {song['album']} - {song['genre']}"
-
-            match = process.extractOne(query, [song_info])
-            if match and match[1] > 70:
-                results.append(song)
+        songs = self.engine.songs
+        with perfMetrics.span("player.search_songs", search_type=search_type, songs=len(songs)) as span:
+            results = match_songs(songs, query, search_type)
 
-        self.song_list.clear()
-        for song in results:
-            self.song_list.addItem(self.display_song_text(song))
+            self.song_list.clear()
+            for song in results:
+                self.song_list.addItem(self.display_song_text(song))
+            span.set(results=len(results))
 
     def combine_playlists_mp(self):
-        self.playlist_manager.combine_playlists()
+        self.engine.playlist_manager.combine_playlists()
         time.sleep(1)
         self.reload_playlists()
 
-    def on_start(self):
-        time.sleep(0.2)
-        self.load_playlist(self.config["default_playlist"])
+    def find_duplicates(self):
+        """Scan all playlists and the unsorted folder for tracks stored more than once."""
+        use_fingerprint = False
+        if ffmpeg_path() is not None:
+            reply = QMessageBox.question(
+                self,
+                "Find Duplicates",
+                "Also match re-encoded copies of the same recording by listening to them? This is much slower.",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.No,
+            )
+            use_fingerprint = reply == QMessageBox.StandardButton.Yes
+
+        self.find_duplicates_button.setEnabled(False)
+        self.find_duplicates_button.setText("Searching...")
+        self.duplicate_thread = DuplicateScanThread(
+            self.config.get("root_playlist_folder", "playlists"),
+            self.config.get("unsorted_music_folder", ""),
+            use_fingerprint,
+        )
+        self.duplicate_thread.finished_signal.connect(self.on_duplicates_found)
+        self.duplicate_thread.error.connect(self.on_duplicate_scan_error)
+        self.duplicate_thread.start()
+
+    def on_duplicates_found(self, groups):
+        self.find_duplicates_button.setEnabled(True)
+        self.find_duplicates_button.setText("Find Duplicates")
+        logging.info(f"Duplicate scan found {len(groups)} groups")
+        DuplicateReportDialog(groups, self).exec()
+
+    def on_duplicate_scan_error(self, error_message):
+        self.find_duplicates_button.setEnabled(True)
+        self.find_duplicates_button.setText("Find Duplicates")
+        QMessageBox.critical(self, "Find Duplicates", f"The duplicate scan failed:\n{error_message}")
+
+    def open_statistics(self):
+        if self.engine.play_history is None:
+            QMessageBox.information(self, "Statistics", "Play history is turned off in the settings.")
+            return
+        PlayStatisticsDialog(self.engine.play_history, self).exec()
+
+    def edit_smart_playlist(self):
+        """Create a smart playlist, or edit the selected one if it is smart."""
+        playlist_folder = self.config.get("root_playlist_folder", "playlists")
+        name, query = "", ""
+        current = self.playlist_list.currentItem()
+        match = re.match(r"^(.*) \((\d+) Songs\)$", current.text()) if current else None
+        if match:
+            try:
+                data = read_playlist(os.path.join(playlist_folder, f"{match.group(1)}.json"))
+                if "smart" in data:
+                    name, query = match.group(1), format_query(data["smart"])
+            except (OSError, ValueError, KeyError):
+                pass
+
+        dialog = SmartPlaylistDialog(name, query, self)
+        if dialog.exec() != QDialog.DialogCode.Accepted or dialog.definition is None:
+            return
+        new_name = dialog.name_edit.text().strip()
+        if new_name != name and os.path.exists(os.path.join(playlist_folder, f"{new_name}.json")):
+            reply = QMessageBox.question(
+                self, "Smart Playlist", f"A playlist named '{new_name}' already exists. Replace it?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No,
+            )
+            if reply != QMessageBox.StandardButton.Yes:
+                return
+        try:
+            os.makedirs(playlist_folder, exist_ok=True)
+            save_smart_playlist(playlist_folder, new_name, dialog.definition)
+        except OSError as e:
+            QMessageBox.critical(self, "Smart Playlist", f"Failed to save smart playlist '{new_name}': {e}")
+            return
+        logging.info(f"Saved smart playlist {new_name}: {format_query(dialog.definition)}")
+        self.reload_playlists()
+
+    def on_playlist_changed(self):
+        """Show the playlist the engine loaded."""
+        self.song_list.clear()
+        for song in self.engine.songs:
+            self.song_list.addItem(self.display_song_text(song))
+        self.shuffle_button.setEnabled(self.engine.current_playlist_file != UNSORTED_MUSIC)
+        self.queue_track_analysis(self.engine.songs)
+        # A song from the previous playlist keeps playing and stays on show
+        if not self.engine.is_active():
+            self.update_song_info()
+
+    def on_track_changed(self):
+        if self.engine.current_song:
+            self.show_waveform(self.engine.current_song["path"])
+        self.update_song_info()
+
+    def on_state_changed(self):
+        """Follow the engine's playback, loop, shuffle and volume state."""
+        self.toggle_play_button.setText("Stop" if self.engine.state_machine.is_playing() else "Play")
+        self.toggle_pause_button.setText("Resume" if self.engine.state_machine.is_paused() else "Pause")
+        self.loop_button.setText(LOOP_BUTTON_TEXT[self.engine.is_looping])
+        self.shuffle_button.setText("Shuffle On" if self.engine.is_shuffling else "Shuffle Off")
+        volume = int(round(self.engine.user_volume * 100))
+        if self.volume_slider.value() != volume:
+            self.volume_slider.blockSignals(True)
+            self.volume_slider.setValue(volume)
+            self.volume_slider.blockSignals(False)
+        self.volume_label.setText(f"Volume: {volume}%")
+
+    def raise_window(self):
+        self.showNormal()
+        self.raise_()
+        self.activateWindow()
+
+    def evict_cover_cache(self):
+        """Keep the cover cache under cover_cache_max_mb, in a background thread."""
+        max_bytes = int(self.config.get("cover_cache_max_mb", 256)) * 1024 * 1024
+        threading.Thread(target=self.cover_cache.evict, args=(max_bytes,), daemon=True).start()
 
     def open_settings(self):
         """Open the settings dialog."""
@@ -932,52 +1212,21 @@ class MusicPlayer(QMainWindow):
         about_dialog = AboutDialog(self)
         about_dialog.exec()
 
+    @perfMetrics.timed("player.get_playlist_names")
     def get_playlist_names(self):
         """Retrieve available playlist names and song counts from the predefined directory, plus Unsorted Music if set."""
-        playlist_folder = self.config.get("root_playlist_folder", "playlists")
-        unsorted_folder = self.config.get("unsorted_music_folder", "")
-
-        playlists = []
-        default_playlist_name = self.config.get("default_playlist", "default")
-
-        # Add Unsorted Music as a virtual playlist if set and exists
-        if unsorted_folder and os.path.exists(unsorted_folder):
-            # Count audio files
-            count = 0
-            for root, _, files in os.walk(unsorted_folder):
-                count += len([f for f in files if f.lower().endswith((".mp3", ".flac", ".ogg", ".wav", ".m4a"))])
-            playlists.append(("Unsorted Music", None, count, None))
-
-        for f in os.listdir(playlist_folder):
-            if f.endswith(".json"):
-                playlist_path = os.path.join(playlist_folder, f)
-                try:
-                    with open(playlist_path, "r", encoding="utf-8") as file:
-                        data = json.load(file)
-                        name = data.get("playlist_name", os.path.splitext(f)[0])
-                        playlist_image = data.get("playlist_large_image_key", None)
-                        song_count = data.get("song_count", 0)
-                        playlists.append((name, playlist_path, song_count, playlist_image))
-                except json.JSONDecodeError:
-                    logging.error(f"Error decoding JSON in playlist file: {playlist_path}")
-                except IOError as e:
-                    logging.error(f"Error reading playlist file: {playlist_path}; {e}")
-
-        if not playlists:
-            logging.info("No playlists found in the folder.")
-
-        # Move the default playlist to the top (after Unsorted Music)
-        playlists = sorted(
-            playlists, key=lambda x: x[0] == default_playlist_name, reverse=True
+        playlists = list_playlists(
+            self.config.get("root_playlist_folder", "playlists"),
+            self.config.get("unsorted_music_folder", ""),
+            self.config.get("default_playlist", "default"),
         )
-
         logging.info(f"Available playlists: {playlists}")
         return playlists
 
     def load_playlist_from_list(self, current, previous):
         if current:
             selected_playlist = current.text()
-            if selected_playlist.startswith("Unsorted Music"):
+            if selected_playlist.startswith(UNSORTED_MUSIC):
                 self.load_unsorted_music()
                 return
             # ...existing code...
@@ -988,7 +1237,7 @@ class MusicPlayer(QMainWindow):
                 playlist_file = f"{playlist_name}.json"
                 playlist_path = os.path.join(playlist_folder, playlist_file)
                 if os.path.exists(playlist_path):
-                    self.load_playlist(playlist_name)
+                    self.engine.load_playlist(playlist_name)
                 else:
                     logging.error(f"Error loading playlist: Playlist file not found: {playlist_path}")
             else:
@@ -1000,101 +1249,7 @@ class MusicPlayer(QMainWindow):
         if not unsorted_folder or not os.path.exists(unsorted_folder):
             QMessageBox.warning(self, "Unsorted Music", "Unsorted music folder is not set or does not exist.")
             return
-        songs = []
-        for root, _, files in os.walk(unsorted_folder):
-            for f in files:
-                if f.lower().endswith((".mp3", ".flac", ".ogg", ".wav", ".m4a")):
-                    path = os.path.join(root, f)
-                    # Try to extract metadata
-                    try:
-                        audio = MP3(path)
-                        title = audio.get("TIT2", os.path.splitext(f)[0])
-                        artist = audio.get("TPE1", "Unknown Artist")
-                        album = audio.get("TALB", "Unknown Album")
-                        genre = audio.get("TCON", "Unknown Genre")
-                        song = {
-                            "title": str(title),
-                            "artist": str(artist),
-                            "album": str(album),
-                            "genre": str(genre),
-                            "path": path,
-                            "picture_path": "",
-                            "picture_link": "",
-                        }
-                    except Exception:
-                        song = {
-                            "title": os.path.splitext(f)[0],
-                            "artist": "Unknown Artist",
-                            "album": "Unknown Album",
-                            "genre": "Unknown Genre",
-                            "path": path,
-                            "picture_path": "",
-                            "picture_link": "",
-                        }
-                    songs.append(song)
-        self.current_playlist = "Unsorted Music"
-        self.current_playlist_image = None
-        self.playlist_name_var = "Unsorted Music"
-        self.songs = songs
-        self.song_list.clear()
-        for song in self.songs:
-            self.song_list.addItem(self.display_song_text(song))
-        if self.songs:
-            self.song_index = 0
-            self.current_song = self.songs[self.song_index]
-            self.update_song_info()
-        else:
-            self.current_song = None
-            self.update_song_info()
-        self.shuffled_songs = []
-        self.shuffled_index = 0
-        self.is_shuffling = False
-        self.shuffle_button.setEnabled(False)
-        self.shuffle_button.setText("Shuffle Off")
-        logging.info(f"Loaded Unsorted Music with {len(self.songs)} songs.")
-
-    def load_playlist(self, playlist_name):
-        logging.info(f"Loading playlist: {playlist_name}")
-
-        try:
-            playlist_name, self.songs, playlist_image = (
-                self.playlist_manager.load_playlist(playlist_name)
-            )
-        except FileNotFoundError as e:
-            logging.error(f"Error loading playlist: {e}")
-            return
-        except Exception as e:
-            logging.error(f"Unexpected error: {e}")
-            return
-
-        self.current_playlist = playlist_name
-        self.current_playlist_image = playlist_image
-        self.playlist_name_var = playlist_name
-
-        self.song_list.clear()
-        if self.songs:
-            for song in self.songs:
-                self.song_list.addItem(self.display_song_text(song))
-            if self.media_player.playbackState() == QMediaPlayer.PlaybackState.PlayingState:
-                logging.info(
-                    "Current song is playing, not updating title and song info."
-                )
-            else:
-                self.setWindowTitle(f"{self.window_title} • {playlist_name}")
-                self.song_index = 0
-                self.current_song = self.songs[self.song_index]
-                self.update_song_info()
-                logging.info(f"Playlist loaded with {len(self.songs)} songs.")
-        else:
-            self.current_song = None
-            self.update_song_info()
-            logging.info("Playlist is empty.")
-
-        # Reset shuffle state
-        self.shuffled_songs = []
-        self.shuffled_index = 0
-        self.shuffle_button.setEnabled(True)
-        self.toggle_shuffle()  # If shuffle was enabled, reapply shuffle
+        self.engine.load_unsorted_music()
 
     def load_playlist_dialog(self):
         playlist_path, _ = QFileDialog.getOpenFileName(
@@ -1106,7 +1261,7 @@ class MusicPlayer(QMainWindow):
         if playlist_path:
             playlist_name = os.path.splitext(os.path.basename(playlist_path))[0]
             logging.info(f"Loading playlist from dialog: {playlist_name}")
-            self.load_playlist(playlist_name)
+            self.engine.load_playlist(playlist_name)
         else:
             logging.warning("No playlist file selected.")
             pass
@@ -1149,7 +1304,7 @@ class MusicPlayer(QMainWindow):
         if reply == QMessageBox.StandardButton.Yes:
             if os.path.exists(playlist_path):
                 try:
-                    os.remove(playlist_path)
+                    PlaylistStore.get_instance().delete(playlist_path)
                     logging.info(f"Deleted playlist: {playlist_name}")
 
                     # Remove the playlist from the UI
@@ -1163,7 +1318,7 @@ class MusicPlayer(QMainWindow):
                 logging.error(f"Playlist file not found: {playlist_path}")
 
     def check_discord_connection(self):
-        is_connected = self.discord_integration.is_connected()
+        is_connected = self.engine.discord_integration.is_connected()
         self.update_discord_status(is_connected)
 
     def update_discord_status(self, is_connected):
@@ -1173,18 +1328,37 @@ class MusicPlayer(QMainWindow):
 
     def adjust_volume(self, value):
         """Adjusts the volume of the music player."""
-        volume = value / 100.0
-        self.audio_output.setVolume(volume)  # QAudioOutput expects 0.0 - 1.0
+        self.engine.set_volume(value)
         self.volume_label.setText(f"Volume: {value}%")
-        # logging.info(f"Volume set to: {value}%")
 
-    def update_volume_slider(self):
-        """Updates the volume slider based on the current system volume."""
-        current_volume = self.audio_output.volume() * 100
-        self.volume_slider.blockSignals(True)
-        self.volume_slider.setValue(int(current_volume))
-        self.volume_slider.blockSignals(False)
-        self.volume_label.setText(f"Volume: {int(current_volume)}%")
+    def show_waveform(self, path):
+        """Draw the track's waveform on the seek bar, or queue it and show a plain bar until it is ready."""
+        peaks = None
+        if self.waveform_generator is not None:
+            peaks = cached_peaks(path)
+            if peaks is None:
+                self.waveform_generator.prioritize(path)
+        self.progress_bar.set_peaks(peaks)
+
+    def on_waveform_ready(self, path, peaks):
+        song = self.engine.current_song
+        if song and song["path"].replace("\\", "/") == path:
+            self.progress_bar.set_peaks(peaks)
+
+    def queue_track_analysis(self, songs):
+        """Let the background workers measure loudness and waveforms of the loaded songs."""
+        paths = [song["path"] for song in songs]
+        if self.engine.loudness_analyzer is not None:
+            self.engine.loudness_analyzer.enqueue(paths)
+        if self.waveform_generator is not None:
+            self.waveform_generator.enqueue(paths)
+
+    def closeEvent(self, event):
+        self.engine.close()
+        if self.waveform_generator is not None:
+            self.waveform_generator.stop()
+            self.waveform_generator = None
+        super().closeEvent(event)
 
     def keyPressEvent(self, event):
         """Handle key press events within the PyQt6 application."""
@@ -1207,193 +1381,40 @@ class MusicPlayer(QMainWindow):
         except AttributeError:
             logging.warning(f"Unhandled key press: {key}")
 
-    def handle_keyboard_playpause(self):
-        """Handle play/pause keyboard shortcut - runs on main thread."""
-        logging.info("Handling play/pause keyboard shortcut")
-
-        if self.state_machine.is_paused():
-            logging.info("Music is paused, resuming...")
-            self.resume_music()
-        elif self.state_machine.is_playing():
-            logging.info("Music is playing, pausing...")
-            self.pause_music()
-        else:
-            logging.info("No music is playing, attempting to start...")
-            self.toggle_play()
-
     def play_selected_song(self, item):
         """Play the song selected from the song list."""
-        if item:
+        if item and not self._ignore_song_list_signal:
             song_text = item.text()
             song_info = song_text.split(" - ")
             if len(song_info) == 2:
                 artist, title = song_info
                 # Find the full song info based on artist and title
-                for song in self.songs:
+                for song in self.engine.songs:
                     if song["artist"] == artist and song["title"] == title:
-                        if self.current_song != song:
-                            self.current_song = song
-                            logging.info(
-                                f"Selected song: {self.current_song['artist']} - {self.current_song['title']}"
-                            )
-                            self.play_music()
+                        if self.engine.current_song != song:
+                            logging.info(f"Selected song: {song['artist']} - {song['title']}")
+                            self.engine.play_song(song)
                         return
                 logging.warning(f"Song not found in playlist: {artist} - {title}")
             else:
                 logging.warning(f"Invalid song format selected: {song_text}")
 
-    def set_mpris_player_iface(self, mpris_iface):
-        """Inject the MPRIS player interface for D-Bus updates."""
-        self.mpris_player_iface = mpris_iface
-
-    def play_music(self):
-        logging.info(f"Playing music: {self.current_song}")
-        if self.current_song:
-            url = QUrl.fromLocalFile(self.current_song["path"])
-            self.media_player.setSource(url)
-            self.media_player.play()
-
-            # Track the start time and reset time played
-            self.start_time = time.time()  # Set the current time as the start time
-            self.time_played = 0  # Reset time played when starting a new song
-            self.song_duration = self.get_song_length(self.current_song["path"])
-            self.total_paused_time = 0
-            
-            # Update state machine - transition through required states
-            if self.state_machine.is_stopped():
-                self.state_machine.transition_to(PlayerState.LOADING)
-                self.state_machine.transition_to(PlayerState.READY)
-            elif self.state_machine.is_paused():
-                # If paused, we are effectively ready to restart/play new
-                self.state_machine.transition_to(PlayerState.READY, force=True)
-                
-            self.state_machine.transition_to(PlayerState.PLAYING)
-            
-            self.update_song_info()  # Handle Discord presence
-
-            # Toggle Play button to Stop
-            self.toggle_play_button.setText("Stop")
-
-            # --- MPRIS: Update metadata ---
-            if hasattr(self, "mpris_player_iface") and self.mpris_player_iface:
-                self.mpris_player_iface.update_metadata()
-
-            logging.info(f"Music started: {self.current_song['title']}")
-        else:
-            # logging.warning("No song selected for playback.")
-            pass
-
-    def stop_music(self):
-        try:
-            self.media_player.stop()
-            
-            # Update state machine
-            self.state_machine.transition_to(PlayerState.STOPPED)
-            
-            self.update_song_info()
-            self.toggle_play_button.setText("Play")
-            logging.info("Music stopped.")
-        except Exception as e:
-            logging.error(f"Error in stop_music: {e}")
-
     def toggle_play(self):
-        if self.state_machine.is_playing():
-            self.stop_music()
-        else:
-            self.play_music()
-
-    def pause_music(self):
-        logging.info("Pausing music.")
-        if self.state_machine.can_pause():
-            self.media_player.pause()
-            
-            # Update state machine
-            self.state_machine.transition_to(PlayerState.PAUSED)
-
-            self.time_played += time.time() - self.start_time
-
-            self.update_song_info()  # Handle Discord presence
-
-            # Toggle Pause button to Resume
-            self.toggle_pause_button.setText("Resume")
-
-            logging.info("Music paused.")
+        if self.engine.state_machine.is_playing():
+            self.engine.stop_music()
         else:
-            # logging.warning("Music is either not playing or already paused.")
-            pass
-
-    def resume_music(self):
-        logging.info("Resuming music.")
-        if self.state_machine.is_paused():
-            self.media_player.play()
-            
-            # Update state machine
-            self.state_machine.transition_to(PlayerState.PLAYING)
-
-            # Add the paused duration to total_paused_time
-            self.start_time = time.time()  # Restart the timer
-
-            self.update_song_info()  # Handle Discord presence
-
-            # Toggle Resume button to Pause
-            self.toggle_pause_button.setText("Pause")
-
-            logging.info(f"Music resumed: {self.current_song['title']}")
-        else:
-            # logging.warning("Music is already playing or not paused.")
-            pass
+            self.engine.play_music()
 
     def toggle_pause(self):
-        if self.state_machine.is_paused():
-            self.resume_music()
+        if self.engine.state_machine.is_paused():
+            self.engine.resume_music()
         else:
-            self.pause_music()
-
-    def next_song(self):
-        # logging.info("Skipping to next song.")
-        if not self.songs:
-            # logging.warning("No songs available in the current playlist.")
-            return
-
-        if self.is_shuffling and self.current_playlist:
-            shuffled_songs = self.playlist_manager.shuffled_songs[self.current_playlist]
-            if self.shuffled_index >= len(shuffled_songs):
-                self.shuffled_index = 0
-            self.current_song = shuffled_songs[self.shuffled_index]
-            self.shuffled_index += 1
-        else:
-            self.song_index = (self.song_index + 1) % len(self.songs)
-            self.current_song = self.songs[self.song_index]
-        self.play_music()
-        # --- MPRIS: Update metadata ---
-        if hasattr(self, "mpris_player_iface") and self.mpris_player_iface:
-            self.mpris_player_iface.update_metadata()
-
-    def prev_song(self):
-        # logging.info("Skipping to previous song.")
-        if not self.songs:
-            # logging.warning("No songs available in the current playlist.")
-            return
-
-        if self.is_shuffling and self.current_playlist:
-            shuffled_songs = self.playlist_manager.shuffled_songs[self.current_playlist]
-            if self.shuffled_index <= 0:
-                self.shuffled_index = len(shuffled_songs) - 1
-            else:
-                self.shuffled_index -= 1
-            self.current_song = shuffled_songs[self.shuffled_index]
-        else:
-            self.song_index = (self.song_index - 1) % len(self.songs)
-            self.current_song = self.songs[self.song_index]
-        self.play_music()
-        # --- MPRIS: Update metadata ---
-        if hasattr(self, "mpris_player_iface") and self.mpris_player_iface:
-            self.mpris_player_iface.update_metadata()
+            self.engine.pause_music()
 
     def highlight_current_song(self):
         """Highlight the currently playing song in the song list."""
-        if self.is_shuffling:
-            current_song_title = self.display_song_text(self.current_song)
+        if self.engine.is_shuffling:
+            current_song_title = self.display_song_text(self.engine.current_song)
             items = [
                 self.song_list.item(i).text() for i in range(self.song_list.count())
             ]
@@ -1405,12 +1426,12 @@ class MusicPlayer(QMainWindow):
                     f"Current song {current_song_title} not found in song list."
                 )
         else:
-            if self.song_index is not None:
-                self.song_list.setCurrentRow(self.song_index)
+            if self.engine.song_index is not None:
+                self.song_list.setCurrentRow(self.engine.song_index)
 
     def update_song_info(self):
-        if self.current_song:
-            self.song_info_var = self.display_song_text(self.current_song)
+        if self.engine.current_song:
+            self.song_info_var = self.display_song_text(self.engine.current_song)
             self.update_right_frame_info()  # Update the right frame with the song info
         else:
             self.song_info_var = "Nothing is playing"
@@ -1422,77 +1443,9 @@ class MusicPlayer(QMainWindow):
         self._ignore_song_list_signal = False
 
         self.setWindowTitle(
-            f"{self.window_title} • {self.current_playlist} • {self.song_info_var}"
+            f"{self.window_title} • {self.engine.current_playlist} • {self.song_info_var}"
         )
 
-        # Determine loop status for Discord presence
-        small_image_key = discord_cdn_images["play"]  # Default to play icon
-        small_image_text = "Playing"  # Default to playing text
-
-        if self.is_looping == "Song":
-            small_image_key = discord_cdn_images[
-                "repeat-one"
-            ]  # Small image key for song repeat
-            small_image_text = "Looping Song"  # Text for song repeat
-        elif self.is_looping == "Playlist":
-            small_image_key = discord_cdn_images[
-                "repeat"
-            ]  # Small image key for playlist repeat
-            small_image_text = "Looping Playlist"  # Text for playlist repeat
-
-        # Update Discord presence
-        if self.config["connect_to_discord"]:  # Check if Discord connection is enabled
-            # Compose system info string
-            #sys_info = f"{platform.system()} {platform.release()} | Python {platform.python_version()}"
-            if self.current_playlist == "Unsorted Music":
-                image_text = "Unsorted Music"
-                big_image = discord_cdn_images.get("default_image")
-            else:
-                image_text = self.current_song.get("album") or self.current_playlist
-                if self.current_song.get("picture_link"):
-                    big_image = self.current_song["picture_link"]
-                else:
-                    big_image = (
-                        self.current_playlist_image if self.current_playlist else None
-                    )
-
-        if self.state_machine.is_playing() or self.state_machine.is_paused():
-            current_position = self.media_player.position() // 1000
-            if self.state_machine.is_paused():
-                update_data = PresenceUpdateData(
-                    song_title=self.current_song['title'],
-                    artist_name=self.current_song['artist'],
-                    large_image_text=image_text,
-                    small_image_key=discord_cdn_images["pause"],
-                    small_image_text="Paused",
-                    image_key=big_image,
-                    song_duration=self.song_duration,
-                    time_played=current_position
-                )
-            else:
-                update_data = PresenceUpdateData(
-                    song_title=self.current_song['title'],
-                    artist_name=self.current_song['artist'],
-                    large_image_text=image_text,
-                    small_image_key=small_image_key,
-                    small_image_text=small_image_text,
-                    youtube_id=self.current_song.get("youtube_id"),
-                    image_key=big_image,
-                    song_duration=self.song_duration,
-                    time_played=current_position
-                )
-            self.discord_integration.update_presence(update_data)
-        else:
-            update_data = PresenceUpdateData(
-                song_title="Nothing is playing",
-                artist_name="Literally nothing.",
-                large_image_text="No playlist",
-                small_image_key=discord_cdn_images["stop"],
-                small_image_text="Stopped",
-                image_key=None
-            )
-            self.discord_integration.update_presence(update_data)
-
     def get_embedded_cover(self, song_path):
         """Return QPixmap of embedded cover art if present, else None."""
         try:
@@ -1512,14 +1465,15 @@ class MusicPlayer(QMainWindow):
 
     def update_right_frame_info(self):
         """Update the right frame with the current song's information."""
-        if self.current_song:
+        song = self.engine.current_song
+        if song:
             # Try cached/processed cover first
-            cover_pixmap = self.cover_cache.get_cover(self.current_song["path"], size=250)
+            cover_pixmap = self.cover_cache.get_cover(song["path"], size=250)
             if cover_pixmap and not cover_pixmap.isNull():
                 self.song_picture.setPixmap(cover_pixmap)
             else:
                 # Fallback to picture_path
-                picture_path = self.current_song.get("picture_path", "default.png")
+                picture_path = song.get("picture_path", "default.png")
                 if os.path.exists(picture_path):
                     self.song_picture.setPixmap(
                         QPixmap(picture_path).scaled(250, 250, Qt.AspectRatioMode.KeepAspectRatio)
@@ -1531,16 +1485,16 @@ class MusicPlayer(QMainWindow):
 
             # Update the labels with song information
             self.song_title_label.setText(
-                "Title: " + self.truncate_text(self.current_song.get("title", "Unknown Title"))
+                "Title: " + self.truncate_text(song.get("title", "Unknown Title"))
             )
             self.song_author_label.setText(
-                "Author: " + self.truncate_text(self.current_song.get("artist", "Unknown Artist"))
+                "Author: " + self.truncate_text(song.get("artist", "Unknown Artist"))
             )
             self.song_album_label.setText(
-                "Album: " + self.truncate_text(self.current_song.get("album", "Unknown Album"))
+                "Album: " + self.truncate_text(song.get("album", "Unknown Album"))
             )
             self.song_genre_label.setText(
-                "Genre: " + self.truncate_text(self.current_song.get("genre", "Unknown Genre"))
+                "Genre: " + self.truncate_text(song.get("genre", "Unknown Genre"))
             )
         else:
             self.clear_right_frame_info()
@@ -1556,77 +1510,30 @@ class MusicPlayer(QMainWindow):
         self.song_genre_label.setText("Genre:")
 
     def update_progress(self):
-        if self.media_player.playbackState() == QMediaPlayer.PlaybackState.PlayingState:
-            elapsed_time = self.media_player.position() // 1000  # milliseconds to seconds
-            total_time = self.media_player.duration() // 1000
+        media_player = self.engine.media_player
+        if media_player.playbackState() == QMediaPlayer.PlaybackState.PlayingState:
+            elapsed_time = media_player.position() // 1000  # milliseconds to seconds
+            total_time = media_player.duration() // 1000
             elapsed_str = self.format_time(elapsed_time)
             total_str = self.format_time(total_time)
             self.time_label.setText(f"{elapsed_str} / {total_str}")
             if total_time > 0:
                 self.progress_bar.setValue(int((elapsed_time / total_time) * 100))
             self.setWindowTitle(
-                f"{self.window_title} • {self.current_playlist} ({len(self.songs)} songs) • {self.song_info_var} • {elapsed_str} / {total_str}"
+                f"{self.window_title} • {self.engine.current_playlist} ({len(self.engine.songs)} songs) • {self.song_info_var} • {elapsed_str} / {total_str}"
             )
 
-    def check_song_end(self):
-        # Check if we think we are playing but the media player has stopped
-        if self.state_machine.is_playing() and self.media_player.playbackState() != QMediaPlayer.PlaybackState.PlayingState and self.current_song:
-            self.handle_song_end()
-
-    def toggle_loop(self):
-        if self.is_looping == "Off":
-            self.is_looping = "Song"
-            self.loop_button.setText("Loop Song")
-        elif self.is_looping == "Song":
-            self.is_looping = "Playlist"
-            self.loop_button.setText("Loop Playlist")
-        elif self.is_looping == "Playlist":
-            self.is_looping = "Off"
-            self.loop_button.setText("Loop Off")
-        # logging.info(f"Loop mode set to: {self.is_looping}")
-
-    def shuffle_songs(self):
-        if self.current_playlist:
-            self.playlist_manager.shuffle_songs(self.current_playlist)
-            self.is_shuffling = True
-            self.shuffled_index = 0
-            logging.info("Songs shuffled.")
-
-    def toggle_shuffle(self):
-        self.is_shuffling = not self.is_shuffling
-        self.shuffle_button.setText(
-            "Shuffle On" if self.is_shuffling else "Shuffle Off"
-        )
-        if self.is_shuffling:
-            self.shuffle_songs()
-        logging.info(f"Shuffle mode set to: {'ON' if self.is_shuffling else 'OFF'}")
-
-    def get_song_length(self, song_path):
-        audio = MP3(song_path)
-        return int(audio.info.length)
-
     def format_time(self, seconds):
         minutes = seconds // 60
         seconds = seconds % 60
         return f"{int(minutes):02}:{int(seconds):02}"
 
-    def handle_song_end(self):
-        try:
-            logging.info(f"Song ended. Looping: {self.is_looping}")
-            if self.is_looping == "Song":
-                self.play_music()
-            elif self.is_looping == "Playlist":
-                self.next_song()
-            else:
-                self.stop_music()
-        except Exception as e:
-            logging.error(f"Error in handle_song_end: {e}")
-
     def open_youtube(self):
         """Open the YouTube video for the current song."""
-        if self.current_song and "youtube_id" in self.current_song:
+        song = self.engine.current_song
+        if song and "youtube_id" in song:
             youtube_url = (
-                f"https://www.youtube.com/watch?v={self.current_song['youtube_id']}"
+                f"https://www.youtube.com/watch?v={song['youtube_id']}"
             )
             webbrowser.open(youtube_url)
             logging.info(f"Opened YouTube video: {youtube_url}")
@@ -0,0 +1,295 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/perfMetrics.py
+# =============
+# Lightweight performance instrumentation for IotaPlayer.
+# Provides timing spans (context manager and decorator), counters and gauges,
+# and writes structured JSON events to a dedicated rotating log file.
+# When metrics are disabled, spans and counters are shared no-op objects,
+# so instrumented hot paths pay only an attribute check.
+# =============
+
+import json
+import time
+import logging
+import threading
+import functools
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Optional
+
+perf_logger = logging.getLogger('perf')
+
+
+class _NullSpan:
+    """Span used while metrics are disabled. Does nothing."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """
+    Times a block of code and reports it to PerfMetrics on exit.
+
+    Extra fields can be attached while the span is open with set(),
+    e.g. the number of songs a playlist turned out to contain.
+    """
+    __slots__ = ('_metrics', 'name', 'fields', '_start', 'duration_ms')
+
+    def __init__(self, metrics: 'PerfMetrics', name: str, fields: Dict[str, Any]):
+        self._metrics = metrics
+        self.name = name
+        self.fields = fields
+        self._start = 0.0
+        self.duration_ms = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration_ms = (time.perf_counter() - self._start) * 1000.0
+        if exc_type is not None:
+            self.fields['error'] = exc_type.__name__
+        self._metrics.record_span(self.name, self.duration_ms, self.fields)
+        return False
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+
+class PerfMetrics:
+    """
+    Singleton collector for spans, counters and gauges.
+
+    Usage:
+        metrics = PerfMetrics.get_instance()
+        with metrics.span("playlist.load", playlist=name) as span:
+            ...
+            span.set(songs=len(songs))
+        metrics.increment("cover_cache.hit")
+    """
+
+    _instance: Optional['PerfMetrics'] = None
+    _lock = threading.Lock()
+
+    # Number of recent durations kept per span name for percentile queries
+    SAMPLE_WINDOW = 512
+
+    def __init__(self):
+        """Initialize PerfMetrics. Use get_instance() instead of direct instantiation."""
+        if PerfMetrics._instance is not None:
+            raise RuntimeError("Use PerfMetrics.get_instance() to get the singleton instance")
+
+        self.enabled = False
+        self._data_lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, Any] = {}
+        self._samples: Dict[str, deque] = {}
+        self._handler = None
+
+    @classmethod
+    def get_instance(cls) -> 'PerfMetrics':
+        """
+        Get the singleton instance of PerfMetrics.
+
+        Returns:
+            PerfMetrics: The singleton instance
+        """
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def configure(self, enabled: bool) -> None:
+        """
+        Enable or disable metric collection.
+
+        The JSON event log is only attached the first time metrics are enabled.
+
+        Args:
+            enabled: True to start recording spans, counters and events
+        """
+        if enabled and self._handler is None:
+            from core.logger import setup_perf_logging
+            self._handler = setup_perf_logging()
+        self.enabled = bool(enabled)
+        logging.info(f"Performance metrics {'enabled' if self.enabled else 'disabled'}")
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+    def span(self, name: str, **fields):
+        """Return a context manager timing the enclosed block."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, fields)
+
+    def timed(self, name: Optional[str] = None) -> Callable:
+        """Decorator form of span(). Defaults to the function's qualified name."""
+        def decorator(func):
+            span_name = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with Span(self, span_name, {}):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """Add value to a named counter."""
+        if not self.enabled:
+            return
+        with self._data_lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: Any) -> None:
+        """Set a named gauge to its latest value."""
+        if not self.enabled:
+            return
+        with self._data_lock:
+            self._gauges[name] = value
+
+    def record_span(self, name: str, duration_ms: float, fields: Dict[str, Any]) -> None:
+        """Store a finished span duration and write it to the event log."""
+        with self._data_lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.SAMPLE_WINDOW)
+            samples.append(duration_ms)
+        self.emit("span", name=name, duration_ms=round(duration_ms, 3), **fields)
+
+    def emit(self, event: str, **fields) -> None:
+        """Write a structured JSON event to the perf log."""
+        if not self.enabled:
+            return
+        record = {
+            "ts": round(time.time(), 3),
+            "event": event,
+            "thread": threading.current_thread().name,
+        }
+        record.update(fields)
+        perf_logger.info(json.dumps(record, default=str, ensure_ascii=False))
+
+    def record_scan(self, name: str, files: int, seconds: float) -> None:
+        """Record a finished library scan as a span plus a files/s throughput gauge."""
+        if not self.enabled:
+            return
+        files_per_sec = files / seconds if seconds > 0 else 0.0
+        self.set_gauge("scan.files_per_sec", round(files_per_sec, 1))
+        self.set_gauge("scan.last_files", files)
+        self.record_span(name, seconds * 1000.0, {"files": files, "files_per_sec": round(files_per_sec, 1)})
+
+    def flush_counters(self) -> None:
+        """Write the current counters and gauges as a single summary event."""
+        if not self.enabled:
+            return
+        with self._data_lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        self.emit("summary", counters=counters, gauges=gauges)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def counter(self, name: str) -> float:
+        with self._data_lock:
+            return self._counters.get(name, 0)
+
+    def gauge(self, name: str, default: Any = None) -> Any:
+        with self._data_lock:
+            return self._gauges.get(name, default)
+
+    def percentiles(self, name: str, points: Iterable[float] = (50, 95, 99)) -> Dict[float, float]:
+        """
+        Return percentiles (in ms) of the most recent samples for a span name.
+
+        Returns:
+            Dict[float, float]: Percentile -> duration, empty if no samples exist
+        """
+        with self._data_lock:
+            samples = sorted(self._samples.get(name, ()))
+        if not samples:
+            return {}
+        result = {}
+        last = len(samples) - 1
+        for point in points:
+            result[point] = samples[min(last, int(round(point / 100.0 * last)))]
+        return result
+
+    def sample_count(self, name: str) -> int:
+        with self._data_lock:
+            samples = self._samples.get(name)
+            return len(samples) if samples else 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a copy of all counters, gauges and span sample counts."""
+        with self._data_lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "spans": {name: len(s) for name, s in self._samples.items()},
+            }
+
+    def reset(self) -> None:
+        """Drop all collected data."""
+        with self._data_lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._samples.clear()
+
+
+_metrics = PerfMetrics.get_instance()
+
+
+def span(name: str, **fields):
+    """Shortcut for PerfMetrics.get_instance().span()."""
+    return _metrics.span(name, **fields)
+
+
+def timed(name: Optional[str] = None) -> Callable:
+    """Shortcut for PerfMetrics.get_instance().timed()."""
+    return _metrics.timed(name)
+
+
+def increment(name: str, value: float = 1) -> None:
+    """Shortcut for PerfMetrics.get_instance().increment()."""
+    _metrics.increment(name, value)
+
+
+def set_gauge(name: str, value: Any) -> None:
+    """Shortcut for PerfMetrics.get_instance().set_gauge()."""
+    _metrics.set_gauge(name, value)
+
+
+def record_scan(name: str, files: int, seconds: float) -> None:
+    """Shortcut for PerfMetrics.get_instance().record_scan()."""
+    _metrics.record_scan(name, files, seconds)
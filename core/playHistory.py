@@ -0,0 +1,238 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/playHistory.py
+# =============
+# Play history and listening statistics.
+#
+# Every time a track stops playing (it ended, was skipped or the player
+# closed) one event is appended to play_history.log in the config directory,
+# a JSON-lines file that is the permanent record. Events reach the OS
+# immediately but are fsynced in batches, and each batch is then folded into
+# the statistics tables of the library index (per-track play and skip counts,
+# last played time, and per-week track and artist counts). Queries only read
+# those aggregates, so they stay fast however long the log grows.
+#
+# The index remembers how far into the log it has applied events. On start,
+# anything past that point is applied, and if the index was lost or reset the
+# statistics are rebuilt from the whole log.
+# =============
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from core.configManager import ConfigManager
+from core.libraryIndex import LibraryIndex
+from core import perfMetrics
+
+# Sync the log and update the statistics after this many events, or when the oldest unsynced one is this old
+FLUSH_EVENTS = 8
+FLUSH_SECONDS = 300
+# A track counts as played once half of it, or this many seconds, was heard (as on Last.fm)
+PLAYED_SECONDS = 240
+PLAYED_FRACTION = 0.5
+# Events applied per transaction when catching up with the log
+_CATCH_UP_BATCH = 5000
+
+
+def counts_as_played(position: float, duration: float, completed: bool) -> bool:
+    """
+    Decide whether a play event is a play or a skip.
+
+    Args:
+        position: Seconds into the track when it stopped
+        duration: Track length in seconds, 0 if unknown
+        completed: The track played to its end
+    """
+    if completed:
+        return True
+    threshold = min(duration * PLAYED_FRACTION, PLAYED_SECONDS) if duration > 0 else PLAYED_SECONDS
+    return position >= threshold
+
+
+class PlayHistory:
+    """
+    Singleton append-only log of play events with aggregated statistics.
+
+    Usage:
+        history = PlayHistory.get_instance()
+        history.record(song, started_at, time.time(), position, duration, completed)
+        history.top_tracks(10)
+    """
+
+    _instance: Optional['PlayHistory'] = None
+    _lock = threading.Lock()
+
+    def __init__(self, log_path: Optional[str] = None, library_index: Optional[LibraryIndex] = None):
+        """
+        Initialize PlayHistory. Use get_instance() instead of direct instantiation.
+
+        Args:
+            log_path: Use a separate log at this path instead of the one in the config directory
+            library_index: Index that holds the statistics; the singleton by default
+        """
+        if log_path is None and PlayHistory._instance is not None:
+            raise RuntimeError("Use PlayHistory.get_instance() to get the singleton instance")
+
+        if log_path is None:
+            config_dir = ConfigManager.get_instance().get_config_dir()
+            os.makedirs(config_dir, exist_ok=True)
+            log_path = os.path.join(config_dir, "play_history.log")
+        self.log_path = log_path
+        self.library_index = library_index or LibraryIndex.get_instance()
+        self._history_lock = threading.Lock()
+        self._pending: List[Dict[str, Any]] = []
+        self._pending_since = 0.0
+
+        self._catch_up()
+        self._file = open(log_path, "ab")
+
+    @classmethod
+    def get_instance(cls) -> 'PlayHistory':
+        """
+        Get the singleton instance of PlayHistory.
+
+        Returns:
+            PlayHistory: The singleton instance
+        """
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def _catch_up(self) -> None:
+        """Apply log events the statistics do not include yet and cut off a torn last line."""
+        try:
+            size = os.path.getsize(self.log_path)
+        except FileNotFoundError:
+            size = 0
+        offset = self.library_index.history_log_offset()
+        if offset > size:
+            logging.warning("Play statistics are ahead of the history log; rebuilding them")
+            self.library_index.reset_play_statistics()
+            offset = 0
+        if offset == size:
+            return
+
+        with perfMetrics.span("history.catch_up"):
+            events = []
+            end = offset
+            with open(self.log_path, "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    end += len(line)
+                    try:
+                        events.append(json.loads(line))
+                    except ValueError:
+                        logging.warning(f"Skipping unreadable play history entry at byte {end - len(line)}")
+                        continue
+                    if len(events) >= _CATCH_UP_BATCH:
+                        self.library_index.apply_play_events(events, end)
+                        events = []
+            self.library_index.apply_play_events(events, end)
+        if end != size:
+            logging.warning(f"Discarding {size - end} bytes of incomplete play history")
+            with open(self.log_path, "r+b") as f:
+                f.truncate(end)
+
+    def record(self, song: Dict[str, Any], started_at: float, ended_at: float,
+               position: float, duration: float, completed: bool) -> Dict[str, Any]:
+        """
+        Log that a track stopped playing.
+
+        Args:
+            song: Song dict of the track
+            started_at: When playback of the track started
+            ended_at: When it stopped
+            position: Seconds into the track when it stopped
+            duration: Track length in seconds, 0 if unknown
+            completed: The track played to its end
+
+        Returns:
+            Dict[str, Any]: The event as written to the log
+        """
+        event = {
+            "path": song["path"].replace("\\", "/"),
+            "artist": song.get("artist", ""),
+            "title": song.get("title", ""),
+            "start": round(started_at, 3),
+            "end": round(ended_at, 3),
+            "position": round(position, 3),
+            "duration": round(duration, 3),
+            "skipped": not counts_as_played(position, duration, completed),
+        }
+        with self._history_lock:
+            self._file.write(json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n")
+            self._file.flush()
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            self._pending.append(event)
+            due = len(self._pending) >= FLUSH_EVENTS or time.monotonic() - self._pending_since >= FLUSH_SECONDS
+        perfMetrics.increment("history.skips" if event["skipped"] else "history.plays")
+        if due:
+            self.flush()
+        return event
+
+    def flush(self) -> None:
+        """Sync the log and fold unsynced events into the statistics."""
+        with self._history_lock:
+            if not self._pending:
+                return
+            with perfMetrics.span("history.flush", events=len(self._pending)):
+                os.fsync(self._file.fileno())
+                self.library_index.apply_play_events(self._pending, self._file.tell())
+            self._pending = []
+
+    def close(self) -> None:
+        self.flush()
+        with self._history_lock:
+            self._file.close()
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def statistics(self, paths: Iterable[str]) -> Dict[str, Tuple[int, int, Optional[float]]]:
+        """path -> (play count, skip count, last played) for the tracks that have been played."""
+        self.flush()
+        return self.library_index.play_statistics(path.replace("\\", "/") for path in paths)
+
+    def top_tracks(self, limit: int = 25, days: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Most played tracks, all time or over roughly the last `days` days (whole weeks).
+
+        Returns:
+            List[Dict[str, Any]]: {"path", "artist", "title", "plays", "skips", "last_played"}
+        """
+        self.flush()
+        since = time.time() - days * 86400 if days is not None else None
+        return self.library_index.top_tracks(limit, since)
+
+    def artists_per_week(self, weeks: int = 8, limit_per_week: int = 10) -> List[Tuple[int, str, int]]:
+        """
+        Most played artists of each of the last `weeks` weeks.
+
+        Returns:
+            List[Tuple[int, str, int]]: (week start timestamp, artist, plays), newest week first
+        """
+        self.flush()
+        return self.library_index.artist_plays_by_week(time.time() - (weeks - 1) * 7 * 86400, limit_per_week)
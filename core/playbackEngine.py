@@ -0,0 +1,714 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/playbackEngine.py
+# =============
+# Playback, shared by the player window and the headless daemon (daemon.py).
+#
+# PlaybackEngine owns the media player, the playlist and play queue, loop
+# and shuffle, loudness gain, play history, the session file and the state
+# published to MPRIS and Discord. It only needs QtCore, QtMultimedia and
+# QtNetwork, so the daemon runs it under a QCoreApplication. The control
+# commands (core/controlServer.py) and the MPRIS service (core/dbus.py)
+# drive it directly; the window (core/musicPlayer.py) is a view on it that
+# follows its signals.
+#
+# It polls nothing: the end of a track comes from the media status, and
+# timers only run while a track is playing.
+# =============
+import os
+import math
+import time
+import logging
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from PyQt6.QtCore import QObject, QTimer, QUrl, pyqtSignal
+from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
+from mutagen import File as MutagenFile
+
+from core.playlistLibrary import PlaylistManager, read_song_metadata, scan_music_folder
+from core.libraryIndex import LibraryIndex
+from core.loudness import LoudnessAnalyzer, cached_gain, track_gain, DEFAULT_TARGET_LUFS
+from core.playHistory import PlayHistory
+from core.mprisState import MPRISSnapshot, LOOP_TO_MPRIS, MPRIS_TO_LOOP
+from core.sessionState import (
+    SessionState, SAVE_DELAY_SECONDS, POSITION_SAVE_SECONDS, shuffle_order, apply_shuffle_order,
+)
+from core.playerState import PlayerState, PlayerStateMachine
+from core import perfMetrics
+from config import discord_cdn_images
+
+UNSORTED_MUSIC = "Unsorted Music"
+LOOP_MODES = ("Off", "Song", "Playlist")
+
+
+class PlaybackEngine(QObject):
+    """
+    Music player without a window.
+
+    Args:
+        config: Loaded configuration (config.json)
+        loudness_workers: Loudness analysis processes; None for one per two cores.
+            The daemon measures only tracks about to play, the window whole playlists.
+
+    Signals:
+        mpris_command(command, argument): MPRIS calls from the D-Bus thread, run on this object's thread
+        state_changed(): After any change of track, playback state, loop, shuffle or volume
+        track_changed(): The current song changed
+        playlist_changed(): A playlist was loaded
+        raise_requested(): An MPRIS client asked to show the player
+    """
+    mpris_command = pyqtSignal(str, object)
+    state_changed = pyqtSignal()
+    track_changed = pyqtSignal()
+    playlist_changed = pyqtSignal()
+    raise_requested = pyqtSignal()
+
+    def __init__(self, config: Dict[str, Any], parent=None, loudness_workers: Optional[int] = 1):
+        super().__init__(parent)
+        self.config = config
+        self.playlist_manager = PlaylistManager(config.get("root_playlist_folder", "playlists"))
+        self.songs: List[Dict[str, Any]] = []
+        self.song_index = 0
+        self.current_song: Optional[Dict[str, Any]] = None
+        self.announced_song = None  # Last song track_changed was emitted for
+        self.current_playlist = None
+        self.current_playlist_file = None  # Playlist file name (without .json) or "Unsorted Music"
+        self.current_playlist_image = None
+        self.play_queue = deque()
+        self.is_looping = "Off"
+        self.is_shuffling = False
+        self.shuffled_index = 0
+        self.song_duration = 0
+        self.state_machine = PlayerStateMachine(initial_state=PlayerState.STOPPED)
+        self.cover_cache = None  # Set by whoever serves MPRIS cover art
+
+        self.media_player = QMediaPlayer(self)
+        self.audio_output = QAudioOutput(self)
+        self.media_player.setAudioOutput(self.audio_output)
+        self.media_player.mediaStatusChanged.connect(self.on_media_status)
+
+        # Output volume is the user volume times the track's loudness gain
+        self.user_volume = min(max(config.get("volume_percentage", 100), 0), 100) / 100.0
+        self.track_gain = 1.0
+        self.loudness_target = config.get("normalization_target_lufs", DEFAULT_TARGET_LUFS)
+        self.loudness_analyzer = None
+        if config.get("volume_normalization", True):
+            self.loudness_analyzer = LoudnessAnalyzer(workers=loudness_workers)
+            self.loudness_analyzer.analyzed.connect(self.on_loudness_analyzed)
+            self.loudness_analyzer.start()
+        self.apply_volume()
+
+        self.play_history = None
+        self.play_event = None  # (song, started_at) of the track playing now
+        if config.get("play_history", True):
+            try:
+                self.play_history = PlayHistory.get_instance()
+            except Exception as e:
+                logging.error(f"Play history unavailable: {e}")
+
+        self.discord_integration = None
+        if config.get("connect_to_discord", False):
+            # Imported here so a daemon without Discord never loads pypresence
+            from core.discordIntegration import DiscordIntegration
+            self.discord_integration = DiscordIntegration()
+
+        self.mpris_state = MPRISSnapshot()
+        self.mpris_command.connect(self.handle_mpris_command)
+
+        # The session file is the one the window uses, so either resumes where the other stopped
+        self.session_state = None
+        self.pending_seek_ms = 0
+        if config.get("restore_session", True):
+            try:
+                self.session_state = SessionState.get_instance()
+            except OSError as e:
+                logging.error(f"Session state unavailable: {e}")
+        self.session_save_timer = QTimer(self)
+        self.session_save_timer.setSingleShot(True)
+        self.session_save_timer.setInterval(SAVE_DELAY_SECONDS * 1000)
+        self.session_save_timer.timeout.connect(self.save_session)
+        self.session_position_timer = QTimer(self)
+        self.session_position_timer.setInterval(POSITION_SAVE_SECONDS * 1000)
+        self.session_position_timer.timeout.connect(self.save_session)
+
+    def start(self, playlist_name: Optional[str] = None) -> None:
+        """Load the given playlist, or restore the last session, or load the default playlist."""
+        if playlist_name:
+            self.load_named_playlist(playlist_name)
+        elif not (self.session_state is not None and self.restore_session()):
+            self.load_named_playlist(self.config.get("default_playlist", "default"))
+        self.playback_state_changed()
+
+    def close(self) -> None:
+        """Save the session and stop the background workers."""
+        self.save_session()
+        self.finish_play_event()
+        self.media_player.stop()
+        if self.play_history is not None:
+            self.play_history.close()
+            self.play_history = None
+        if self.loudness_analyzer is not None:
+            self.loudness_analyzer.stop()
+            self.loudness_analyzer = None
+
+    # ------------------------------------------------------------------
+    # Playlists
+    # ------------------------------------------------------------------
+    def load_named_playlist(self, playlist_name: str) -> None:
+        if playlist_name == UNSORTED_MUSIC:
+            self.load_unsorted_music()
+        else:
+            self.load_playlist(playlist_name)
+
+    @perfMetrics.timed("player.load_playlist")
+    def load_playlist(self, playlist_name: str) -> None:
+        logging.info(f"Loading playlist: {playlist_name}")
+        try:
+            name, songs, playlist_image = self.playlist_manager.load_playlist(playlist_name, self.session_state)
+        except Exception as e:
+            logging.error(f"Error loading playlist {playlist_name}: {e}")
+            return
+        self.set_songs(playlist_name, name, songs, playlist_image)
+
+    def load_unsorted_music(self) -> None:
+        """Scan the unsorted music folder and build a song list on the fly."""
+        unsorted_folder = self.config.get("unsorted_music_folder", "")
+        if not unsorted_folder or not os.path.exists(unsorted_folder):
+            logging.warning("Unsorted music folder is not set or does not exist.")
+            return
+        scan_start = time.perf_counter()
+        songs = scan_music_folder(unsorted_folder)
+        perfMetrics.record_scan("player.scan_unsorted", len(songs), time.perf_counter() - scan_start)
+        self.set_songs(UNSORTED_MUSIC, UNSORTED_MUSIC, songs, None)
+
+    def set_songs(self, playlist_file: str, playlist_name: str, songs: List[Dict[str, Any]], playlist_image) -> None:
+        self.current_playlist_file = playlist_file
+        self.current_playlist = playlist_name
+        self.current_playlist_image = playlist_image
+        self.songs = songs
+        self.song_index = 0
+        if not (self.state_machine.is_playing() or self.state_machine.is_paused()):
+            self.current_song = songs[0] if songs else None
+        # Shuffling stays on across playlists, with a new order for the new one
+        if self.is_shuffling and playlist_file != UNSORTED_MUSIC:
+            self.shuffle_songs()
+        else:
+            self.is_shuffling = False
+            self.shuffled_index = 0
+        self.update_mpris_tracklist(replaced=True)
+        self.playlist_changed.emit()
+        self.playback_state_changed()
+        logging.info(f"Loaded {playlist_name} with {len(songs)} songs.")
+
+    def enqueue_paths(self, paths: List[str]) -> int:
+        """
+        Queue audio files to play next, ahead of the playlist; starts playback if nothing is playing.
+
+        Returns:
+            int: Number of files queued
+        """
+        library_index = LibraryIndex.get_instance()
+        queued = 0
+        for path in paths:
+            path = os.path.abspath(path)
+            if not os.path.isfile(path):
+                raise FileNotFoundError(path)
+            self.play_queue.append(library_index.get_track(path) or read_song_metadata(path))
+            queued += 1
+        if queued and not (self.state_machine.is_playing() or self.state_machine.is_paused()):
+            self.next_song()
+        return queued
+
+    # ------------------------------------------------------------------
+    # Playback
+    # ------------------------------------------------------------------
+    @perfMetrics.timed("player.play_music")
+    def play_music(self) -> None:
+        if not self.current_song:
+            return
+        logging.info(f"Playing music: {self.current_song['path']}")
+        self.finish_play_event()
+        self.pending_seek_ms = 0
+        self.media_player.setSource(QUrl.fromLocalFile(self.current_song["path"]))
+        self.update_track_gain(self.current_song["path"])
+        self.media_player.play()
+        self.play_event = (self.current_song, time.time())
+        self.song_duration = self.get_song_length(self.current_song["path"])
+        if self.state_machine.is_stopped():
+            self.state_machine.transition_to(PlayerState.LOADING)
+            self.state_machine.transition_to(PlayerState.READY)
+        elif self.state_machine.is_paused():
+            self.state_machine.transition_to(PlayerState.READY, force=True)
+        self.state_machine.transition_to(PlayerState.PLAYING)
+        self.session_position_timer.start()
+        self.update_mpris_tracklist()
+        self.playback_state_changed()
+
+    def play_song(self, song: Dict[str, Any]) -> None:
+        """Play a song of the loaded playlist."""
+        self.current_song = song
+        if song in self.songs:
+            self.song_index = self.songs.index(song)
+        self.play_music()
+
+    def stop_music(self) -> None:
+        self.finish_play_event()
+        self.media_player.stop()
+        self.state_machine.transition_to(PlayerState.STOPPED)
+        self.session_position_timer.stop()
+        self.playback_state_changed()
+
+    def pause_music(self) -> None:
+        if not self.state_machine.can_pause():
+            return
+        self.media_player.pause()
+        self.state_machine.transition_to(PlayerState.PAUSED)
+        self.session_position_timer.stop()
+        self.playback_state_changed()
+
+    def resume_music(self) -> None:
+        if not self.state_machine.is_paused():
+            return
+        self.media_player.play()
+        self.state_machine.transition_to(PlayerState.PLAYING)
+        self.session_position_timer.start()
+        self.playback_state_changed()
+
+    def toggle_play_pause(self) -> None:
+        if self.state_machine.is_paused():
+            self.resume_music()
+        elif self.state_machine.is_playing():
+            self.pause_music()
+        else:
+            self.play_music()
+
+    def next_song(self) -> None:
+        if self.play_queue:
+            self.current_song = self.play_queue.popleft()
+            self.play_music()
+            return
+        if not self.songs:
+            return
+        shuffled = self.shuffled_songs()
+        if shuffled:
+            if self.shuffled_index >= len(shuffled):
+                self.shuffled_index = 0
+            self.current_song = shuffled[self.shuffled_index]
+            self.shuffled_index += 1
+        else:
+            self.song_index = (self.song_index + 1) % len(self.songs)
+            self.current_song = self.songs[self.song_index]
+        self.play_music()
+
+    def prev_song(self) -> None:
+        if not self.songs:
+            return
+        shuffled = self.shuffled_songs()
+        if shuffled:
+            self.shuffled_index = self.shuffled_index - 1 if self.shuffled_index > 0 else len(shuffled) - 1
+            self.current_song = shuffled[self.shuffled_index]
+        else:
+            self.song_index = (self.song_index - 1) % len(self.songs)
+            self.current_song = self.songs[self.song_index]
+        self.play_music()
+
+    def on_media_status(self, status) -> None:
+        if status in (QMediaPlayer.MediaStatus.LoadedMedia, QMediaPlayer.MediaStatus.BufferedMedia):
+            self.apply_pending_seek()
+        elif status == QMediaPlayer.MediaStatus.EndOfMedia and self.state_machine.is_playing():
+            self.handle_song_end(completed=True)
+        elif status == QMediaPlayer.MediaStatus.InvalidMedia and self.state_machine.is_playing():
+            logging.warning(f"Cannot play {self.current_song['path'] if self.current_song else None}")
+            self.handle_song_end(completed=False)
+
+    def handle_song_end(self, completed: bool) -> None:
+        logging.info(f"Song ended. Looping: {self.is_looping}")
+        self.finish_play_event(completed=completed)
+        if self.is_looping == "Song" and completed:
+            self.play_music()
+        elif self.play_queue or self.is_looping == "Playlist":
+            self.next_song()
+        else:
+            self.stop_music()
+
+    def seek_to_us(self, position_us: int, beyond_end_skips: bool = True) -> None:
+        """Seek the current track; past its end either skips to the next track or is ignored (MPRIS rules)."""
+        if not (self.state_machine.is_playing() or self.state_machine.is_paused()):
+            return
+        length_us = (self.media_player.duration() * 1000) or int(self.song_duration * 1_000_000)
+        if position_us < 0:
+            if not beyond_end_skips:
+                return
+            position_us = 0
+        if length_us and position_us > length_us:
+            if beyond_end_skips:
+                self.next_song()
+            return
+        self.media_player.setPosition(int(position_us // 1000))
+        self.playback_state_changed(seeked=True)
+
+    def apply_pending_seek(self) -> None:
+        """Seek to a restored position once the media can seek."""
+        if self.pending_seek_ms:
+            position, self.pending_seek_ms = self.pending_seek_ms, 0
+            self.media_player.setPosition(position)
+            self.publish_mpris_state(seeked=True)
+
+    def get_song_length(self, song_path: str) -> int:
+        try:
+            audio = MutagenFile(song_path)
+        except Exception:
+            return 0
+        if audio is None or audio.info is None:
+            return 0
+        return int(audio.info.length)
+
+    # ------------------------------------------------------------------
+    # Loop, shuffle and volume
+    # ------------------------------------------------------------------
+    def toggle_loop(self) -> None:
+        self.set_loop(LOOP_MODES[(LOOP_MODES.index(self.is_looping) + 1) % len(LOOP_MODES)])
+
+    def set_loop(self, mode: str) -> None:
+        if mode in LOOP_MODES and mode != self.is_looping:
+            self.is_looping = mode
+            self.playback_state_changed()
+
+    def shuffled_songs(self) -> Optional[List[Dict[str, Any]]]:
+        """The shuffled play order while shuffling, else None."""
+        if self.is_shuffling and self.current_playlist:
+            return self.playlist_manager.shuffled_songs.get(self.current_playlist) or None
+        return None
+
+    def shuffle_songs(self) -> None:
+        self.playlist_manager.playlists[self.current_playlist] = self.songs
+        self.playlist_manager.shuffle_songs(self.current_playlist)
+        self.is_shuffling = True
+        self.shuffled_index = 0
+
+    def toggle_shuffle(self) -> None:
+        self.set_shuffle(not self.is_shuffling)
+
+    def can_shuffle(self) -> bool:
+        """Unsorted Music is scanned anew on every load and has no shuffle order to keep."""
+        return bool(self.songs) and self.current_playlist_file != UNSORTED_MUSIC
+
+    def set_shuffle(self, enabled: bool) -> None:
+        if enabled == self.is_shuffling or (enabled and not self.can_shuffle()):
+            return
+        if enabled:
+            self.shuffle_songs()
+        else:
+            self.is_shuffling = False
+            if self.current_song in self.songs:
+                self.song_index = self.songs.index(self.current_song)
+        self.update_mpris_tracklist(replaced=True)
+        self.playback_state_changed()
+        logging.info(f"Shuffle mode set to: {'ON' if self.is_shuffling else 'OFF'}")
+
+    def set_volume(self, percent: int) -> None:
+        self.user_volume = min(max(int(percent), 0), 100) / 100.0
+        self.apply_volume()
+        self.publish_mpris_state()
+        self.state_changed.emit()
+
+    def apply_volume(self) -> None:
+        self.audio_output.setVolume(min(1.0, self.user_volume * self.track_gain))
+
+    def update_track_gain(self, path: str) -> None:
+        """Apply the cached loudness gain for a track, or have it measured first."""
+        gain = None
+        if self.loudness_analyzer is not None:
+            gain = cached_gain(path, self.loudness_target)
+            if gain is None:
+                self.loudness_analyzer.prioritize(path)
+        self.track_gain = 1.0 if gain is None else gain
+        self.apply_volume()
+
+    def on_loudness_analyzed(self, path: str, integrated_lufs: float, peak: float) -> None:
+        # Only adjust the playing track if it has barely started, to avoid an audible jump
+        if not self.current_song or self.current_song["path"].replace("\\", "/") != path:
+            return
+        if self.media_player.position() > 5000:
+            return
+        self.track_gain = track_gain(None if math.isnan(integrated_lufs) else integrated_lufs, peak,
+                                     self.loudness_target)
+        self.apply_volume()
+
+    # ------------------------------------------------------------------
+    # State for control clients, MPRIS, Discord and the session file
+    # ------------------------------------------------------------------
+    def is_active(self) -> bool:
+        return bool(self.current_song) and (self.state_machine.is_playing() or self.state_machine.is_paused())
+
+    def position_ms(self) -> int:
+        return self.pending_seek_ms or self.media_player.position()
+
+    def control_status(self) -> Dict[str, Any]:
+        """Playback state for control clients (core/controlServer.py)."""
+        status = {
+            "state": "stopped",
+            "song": None,
+            "position_ms": 0,
+            "duration_ms": int(self.song_duration * 1000),
+            "volume": int(round(self.user_volume * 100)),
+            "loop": self.is_looping,
+            "shuffle": self.is_shuffling,
+            "playlist": self.current_playlist_file,
+            "queued": len(self.play_queue),
+        }
+        if self.is_active():
+            status["state"] = "playing" if self.state_machine.is_playing() else "paused"
+            status["position_ms"] = self.position_ms()
+            status["song"] = {key: self.current_song.get(key, "") for key in ("title", "artist", "album", "path")}
+        return status
+
+    def playback_state_changed(self, seeked: bool = False) -> None:
+        """Save the session soon and publish the new state to MPRIS, Discord and listeners."""
+        if self.session_state is not None:
+            self.session_save_timer.start()
+        self.publish_mpris_state(seeked)
+        self.update_presence()
+        if self.current_song is not self.announced_song:
+            self.announced_song = self.current_song
+            self.track_changed.emit()
+        self.state_changed.emit()
+
+    def mpris_play_order(self) -> List[Dict[str, Any]]:
+        """Songs in the order they will play: the shuffled list while shuffling."""
+        return self.shuffled_songs() or self.songs
+
+    def update_mpris_tracklist(self, replaced: bool = False) -> None:
+        """Tell the MPRIS track list that the play order (replaced=True) or the current track changed."""
+        iface = getattr(self, "mpris_tracklist_iface", None)
+        if not iface:
+            return
+        if replaced:
+            iface.replace_tracks(self.mpris_play_order(), self.current_song)
+        else:
+            iface.set_current_track(self.current_song)
+
+    def publish_mpris_state(self, seeked: bool = False) -> None:
+        """Publish the state MPRIS reports; D-Bus reads only this snapshot."""
+        playing = self.state_machine.is_playing()
+        paused = self.state_machine.is_paused()
+        duration_ms = self.media_player.duration() if (playing or paused) else 0
+        self.mpris_state.publish({
+            "status": "Playing" if playing else "Paused" if paused else "Stopped",
+            "loop": LOOP_TO_MPRIS.get(self.is_looping, "None"),
+            "shuffle": self.is_shuffling,
+            "volume": self.user_volume,
+            "position_us": self.position_ms() * 1000 if (playing or paused) else 0,
+            "length_us": int(self.song_duration * 1_000_000) if self.current_song else 0,
+            "song": self.current_song,
+            "can_go_next": bool(self.songs) or bool(self.play_queue),
+            "can_go_previous": bool(self.songs),
+            "can_play": self.current_song is not None or bool(self.songs),
+            "can_pause": self.current_song is not None,
+            "can_seek": (playing or paused) and (duration_ms > 0 or self.song_duration > 0),
+        }, seeked)
+
+    def handle_mpris_command(self, command: str, argument: Any) -> None:
+        """Run an MPRIS method, property write or control command on this object's thread."""
+        logging.info(f"MPRIS: {command} {argument if argument is not None else ''}")
+        if command == "Play":
+            if self.state_machine.is_paused():
+                self.resume_music()
+            elif not self.state_machine.is_playing():
+                if self.current_song is None and self.songs:
+                    self.current_song = self.songs[self.song_index % len(self.songs)]
+                self.play_music()
+        elif command == "Pause":
+            self.pause_music()
+        elif command == "PlayPause":
+            self.toggle_play_pause()
+        elif command == "Stop":
+            self.stop_music()
+        elif command == "Next":
+            self.next_song()
+        elif command == "Previous":
+            self.prev_song()
+        elif command == "Seek":
+            self.seek_to_us(self.media_player.position() * 1000 + argument)
+        elif command == "SetPosition":
+            track_id, position = argument
+            iface = getattr(self, "mpris_tracklist_iface", None)
+            if iface and track_id == iface.tracklist.current_id():
+                self.seek_to_us(position, beyond_end_skips=False)
+        elif command == "GoTo":
+            self.go_to_mpris_track(argument)
+        elif command == "Volume":
+            self.set_volume(int(round(min(max(argument, 0.0), 1.0) * 100)))
+        elif command == "LoopStatus":
+            mode = MPRIS_TO_LOOP.get(argument)
+            if mode is not None:
+                self.set_loop(mode)
+        elif command == "Shuffle":
+            self.set_shuffle(bool(argument))
+        elif command == "Raise":
+            self.raise_requested.emit()
+        else:
+            logging.warning(f"MPRIS: Unknown command {command}")
+
+    def go_to_mpris_track(self, track_id: str) -> None:
+        """Play the track an MPRIS client picked from the track list."""
+        iface = getattr(self, "mpris_tracklist_iface", None)
+        found = iface.tracklist.song_for(track_id) if iface else None
+        if found is None:
+            logging.warning(f"MPRIS: GoTo for unknown track {track_id}")
+            return
+        position, song = found
+        if self.is_shuffling:
+            self.shuffled_index = position + 1
+        else:
+            self.song_index = position
+        self.current_song = song
+        self.play_music()
+
+    def update_presence(self) -> None:
+        """Show the current track on Discord, as the window does."""
+        if self.discord_integration is None:
+            return
+        from core.discordIntegration import PresenceUpdateData
+        if not self.is_active():
+            self.discord_integration.update_presence(PresenceUpdateData(
+                song_title="Nothing is playing",
+                artist_name="Literally nothing.",
+                large_image_text="No playlist",
+                small_image_key=discord_cdn_images["stop"],
+                small_image_text="Stopped",
+                image_key=None,
+            ))
+            return
+        song = self.current_song
+        if self.current_playlist == UNSORTED_MUSIC:
+            image_text, big_image = UNSORTED_MUSIC, discord_cdn_images.get("default_image")
+        else:
+            image_text = song.get("album") or self.current_playlist
+            big_image = song.get("picture_link") or self.current_playlist_image
+        if self.state_machine.is_paused():
+            small_image_key, small_image_text = discord_cdn_images["pause"], "Paused"
+        elif self.is_looping == "Song":
+            small_image_key, small_image_text = discord_cdn_images["repeat-one"], "Looping Song"
+        elif self.is_looping == "Playlist":
+            small_image_key, small_image_text = discord_cdn_images["repeat"], "Looping Playlist"
+        else:
+            small_image_key, small_image_text = discord_cdn_images["play"], "Playing"
+        self.discord_integration.update_presence(PresenceUpdateData(
+            song_title=song["title"],
+            artist_name=song["artist"],
+            large_image_text=image_text,
+            small_image_key=small_image_key,
+            small_image_text=small_image_text,
+            youtube_id=None if self.state_machine.is_paused() else song.get("youtube_id"),
+            image_key=big_image,
+            song_duration=self.song_duration,
+            time_played=self.position_ms() // 1000,
+        ))
+
+    def finish_play_event(self, completed: bool = False) -> None:
+        """Record the current track in the play history once it stops playing."""
+        if self.play_event is None:
+            return
+        song, started_at = self.play_event
+        self.play_event = None
+        if self.play_history is None:
+            return
+        duration = self.song_duration or self.media_player.duration() / 1000
+        position = duration if completed else self.media_player.position() / 1000
+        try:
+            self.play_history.record(song, started_at, time.time(), position, duration, completed)
+        except Exception as e:
+            logging.error(f"Failed to record play history: {e}")
+
+    def session_snapshot(self) -> Dict[str, Any]:
+        """Current playback state as stored in the session file."""
+        snapshot = {
+            "playlist": self.current_playlist_file,
+            "loop": self.is_looping,
+            "shuffle": self.is_shuffling,
+            "shuffled_index": self.shuffled_index,
+            "shuffle_order": [],
+            "song_index": self.song_index,
+            "song_path": self.current_song["path"] if self.current_song else None,
+            "position_ms": 0,
+            "state": "stopped",
+        }
+        shuffled = self.shuffled_songs()
+        if shuffled:
+            snapshot["shuffle_order"] = shuffle_order(self.songs, shuffled)
+        if self.is_active():
+            snapshot["state"] = "playing" if self.state_machine.is_playing() else "paused"
+            snapshot["position_ms"] = self.position_ms()
+        return snapshot
+
+    def save_session(self) -> None:
+        self.session_save_timer.stop()
+        if self.session_state is None or self.current_playlist_file is None:
+            return
+        try:
+            self.session_state.save(self.session_snapshot())
+        except OSError as e:
+            logging.error(f"Failed to save session: {e}")
+
+    def restore_session(self) -> bool:
+        """
+        Restore the playlist, track, position, loop and shuffle state of the last session.
+
+        Returns:
+            bool: True if a playlist was restored
+        """
+        snapshot = self.session_state.load()
+        playlist_file = snapshot.get("playlist")
+        if not playlist_file:
+            return False
+        logging.info(f"Restoring session: {playlist_file}")
+        self.load_named_playlist(playlist_file)
+        if self.current_playlist_file != playlist_file:
+            return False
+        self.set_loop(snapshot.get("loop", "Off"))
+
+        shuffled = None
+        if snapshot.get("shuffle") and playlist_file != UNSORTED_MUSIC:
+            shuffled = apply_shuffle_order(self.songs, snapshot.get("shuffle_order", []))
+        if shuffled is not None:
+            self.playlist_manager.shuffled_songs[self.current_playlist] = shuffled
+            self.playlist_manager.shuffle_states[self.current_playlist] = True
+            self.shuffled_index = min(max(int(snapshot.get("shuffled_index", 0)), 0), len(shuffled))
+        self.is_shuffling = shuffled is not None
+        self.update_mpris_tracklist(replaced=True)
+
+        song_path = snapshot.get("song_path")
+        index = snapshot.get("song_index", 0)
+        if not song_path or not self.songs:
+            return True
+        if not (isinstance(index, int) and 0 <= index < len(self.songs) and self.songs[index]["path"] == song_path):
+            index = next((i for i, song in enumerate(self.songs) if song["path"] == song_path), None)
+            if index is None:
+                return True
+        self.song_index = index
+        self.current_song = self.songs[index]
+        if snapshot.get("state") in ("playing", "paused") and os.path.exists(song_path):
+            self.play_music()
+            self.pending_seek_ms = max(int(snapshot.get("position_ms", 0)), 0)
+            if self.media_player.mediaStatus() in (QMediaPlayer.MediaStatus.LoadedMedia,
+                                                   QMediaPlayer.MediaStatus.BufferedMedia):
+                self.apply_pending_seek()
+            if snapshot["state"] == "paused":
+                self.pause_music()
+        return True
@@ -0,0 +1,333 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/playlistLibrary.py
+# =============
+# Playlists and music folders without any widgets.
+#
+# Reading song tags, scanning folders, listing playlists and the
+# PlaylistManager that loads, shuffles and combines them. Shared by the
+# Playlist Maker dialog (core/playlistMaker.py), the player window and the
+# headless daemon (daemon.py), which must not load QtWidgets.
+# =============
+import re
+import logging
+import json
+import os
+import random
+from core.configManager import ConfigManager
+from core.playlistStore import PlaylistStore, read_playlist
+from core.smartPlaylists import SmartPlaylists
+from core.sessionState import playlist_identity
+from core import perfMetrics
+
+from mutagen.mp3 import MP3
+from mutagen import File
+
+
+ACCEPTED_AUDIO_EXTENSIONS = (".mp3", ".wav", ".flac", ".ogg", ".m4a")
+
+
+def read_song_metadata(song_path):
+    """Read tags for a single file into a playlist song dict, falling back to the file name."""
+    filename = os.path.basename(song_path)
+    artist = title = album = genre = picture_path = picture_link = youtube_id = ""
+    try:
+        audio = File(song_path)
+        if audio:
+            artist = audio.get('artist', [None])[0] if audio.get('artist') else ""
+            title = audio.get('title', [None])[0] if audio.get('title') else ""
+            album = audio.get('album', [None])[0] if audio.get('album') else ""
+            genre = audio.get('genre', [None])[0] if audio.get('genre') else ""
+
+            if isinstance(audio, MP3) and audio.tags:
+                tags = audio.tags
+                artist = tags.get('TPE1', [None])[0] if tags.get('TPE1') else artist
+                title = tags.get('TIT2', [None])[0] if tags.get('TIT2') else title
+                album = tags.get('TALB', [None])[0] if tags.get('TALB') else album
+                genre = tags.get('TCON', [None])[0] if tags.get('TCON') else genre
+        
+        artist = str(artist) if artist else ""
+        title = str(title) if title else ""
+        album = str(album) if album else ""
+        genre = str(genre) if genre else ""
+
+    except Exception as e:
+        logging.error(f"Error reading metadata for {filename}: {e}")
+        artist = title = album = genre = ""
+        picture_path = ""
+    
+    if not artist or not title:
+        match = re.match(r'(.+) - (.+) \[([^\]]*)\]\.(mp3|wav|flac|ogg|m4a)$', filename, re.IGNORECASE)
+        if match:
+            artist, title, youtube_id, _ = match.groups()
+        else:
+            artist = "Unknown Artist"
+            title = os.path.splitext(filename)[0]
+            youtube_id = ""
+
+    return {
+        "artist": artist,
+        "title": title,
+        "album": album,
+        "genre": genre,
+        "picture_path": picture_path,  # "" if no embedded cover
+        "picture_link": picture_link,
+        "youtube_id": youtube_id,
+        "path": song_path.replace("\\", "/")
+    }
+
+
+def scan_music_folder(folder):
+    """Recursively scan a folder (e.g. Unsorted Music) and build a song list from MP3 tags."""
+    songs = []
+    for root, _, files in os.walk(folder):
+        for f in files:
+            if f.lower().endswith((".mp3", ".flac", ".ogg", ".wav", ".m4a")):
+                path = os.path.join(root, f)
+                # Try to extract metadata
+                try:
+                    audio = MP3(path)
+                    title = audio.get("TIT2", os.path.splitext(f)[0])
+                    artist = audio.get("TPE1", "Unknown Artist")
+                    album = audio.get("TALB", "Unknown Album")
+                    genre = audio.get("TCON", "Unknown Genre")
+                    song = {
+                        "title": str(title),
+                        "artist": str(artist),
+                        "album": str(album),
+                        "genre": str(genre),
+                        "path": path,
+                        "picture_path": "",
+                        "picture_link": "",
+                    }
+                except Exception:
+                    song = {
+                        "title": os.path.splitext(f)[0],
+                        "artist": "Unknown Artist",
+                        "album": "Unknown Album",
+                        "genre": "Unknown Genre",
+                        "path": path,
+                        "picture_path": "",
+                        "picture_link": "",
+                    }
+                songs.append(song)
+    return songs
+
+
+def list_playlists(playlist_folder, unsorted_folder="", default_playlist_name="default"):
+    """Retrieve available playlist names and song counts from a folder, plus Unsorted Music if set.
+
+    Smart playlists report how many songs their rules currently select.
+
+    Returns:
+        list: (name, playlist_path, song_count, playlist_image) tuples, default playlist first
+    """
+    playlists = []
+
+    # Add Unsorted Music as a virtual playlist if set and exists
+    if unsorted_folder and os.path.exists(unsorted_folder):
+        # Count audio files
+        count = 0
+        for root, _, files in os.walk(unsorted_folder):
+            count += len([f for f in files if f.lower().endswith((".mp3", ".flac", ".ogg", ".wav", ".m4a"))])
+        playlists.append(("Unsorted Music", None, count, None))
+
+    smart_names = []
+    for f in os.listdir(playlist_folder):
+        if f.endswith(".json"):
+            playlist_path = os.path.join(playlist_folder, f)
+            try:
+                data = read_playlist(playlist_path)
+                name = data.get("playlist_name", os.path.splitext(f)[0])
+                playlist_image = data.get("playlist_large_image_key", None)
+                song_count = data.get("song_count", 0)
+                if "smart" in data:
+                    smart_names.append(name)
+                    song_count = SmartPlaylists.get_instance().count(name, data["smart"])
+                playlists.append((name, playlist_path, song_count, playlist_image))
+            except json.JSONDecodeError:
+                logging.error(f"Error decoding JSON in playlist file: {playlist_path}")
+            except IOError as e:
+                logging.error(f"Error reading playlist file: {playlist_path}; {e}")
+            except Exception as e:
+                logging.error(f"Error evaluating smart playlist: {playlist_path}; {e}")
+    try:
+        SmartPlaylists.get_instance().forget_except(smart_names)
+    except Exception as e:
+        logging.error(f"Could not clean up smart playlists: {e}")
+
+    if not playlists:
+        logging.info("No playlists found in the folder.")
+
+    # Move the default playlist to the top (after Unsorted Music)
+    playlists = sorted(
+        playlists, key=lambda x: x[0] == default_playlist_name, reverse=True
+    )
+    return playlists
+
+
+class PlaylistManager:
+    def __init__(self, playlists_dir=None):
+        self.playlists = {}
+        self.shuffle_states = {}
+        self.shuffled_songs = {}
+
+        if playlists_dir is not None:
+            self.playlists_dir = playlists_dir
+        else:
+            config_manager = ConfigManager.get_instance()
+            try:
+                config = config_manager.load_config()
+                self.playlists_dir = config.get("root_playlist_folder", "playlists")
+            except (FileNotFoundError, json.JSONDecodeError):
+                logging.warning("Could not load config, using default playlists directory")
+                self.playlists_dir = "playlists"
+
+        if not os.path.exists(self.playlists_dir):
+            os.makedirs(self.playlists_dir)
+            print(f"Created playlists directory: {self.playlists_dir}")
+
+    def load_playlist(self, playlist_name, session_state=None):
+        """Load a playlist by name from the playlists directory.
+
+        With a SessionState, an unchanged playlist is taken from its warm
+        cache, and a freshly read one (other than a smart playlist) is cached.
+        """
+        playlist_file = playlist_name
+        playlist_path = os.path.join(self.playlists_dir, f"{playlist_file}.json")
+        
+        if not os.path.isfile(playlist_path):
+            raise FileNotFoundError(f"Playlist file not found: {playlist_path}")
+
+        cached = session_state.cached_playlist(playlist_file, playlist_path) if session_state else None
+        if cached is not None:
+            name, songs, playlist_image = cached
+            self.playlists[name] = songs
+            self.shuffle_states[name] = False
+            self.shuffled_songs[name] = []
+            return name, songs, playlist_image
+
+        identity = playlist_identity(playlist_path)
+        with perfMetrics.span("playlist.load", playlist=playlist_name) as span:
+            try:
+                data = read_playlist(playlist_path)
+            except json.JSONDecodeError:
+                raise ValueError(f"Error decoding JSON in playlist file: {playlist_path}")
+            except IOError as e:
+                raise IOError(f"Error reading playlist file: {playlist_path}") from e
+            span.set(songs=len(data.get("songs", [])))
+
+        playlist_name = data.get("playlist_name", playlist_name)
+        playlist_image = data.get("playlist_large_image_key", None)
+        if "smart" in data:
+            try:
+                songs = SmartPlaylists.get_instance().songs(playlist_name, data["smart"])
+            except ValueError as e:
+                raise ValueError(f"Invalid smart playlist {playlist_path}: {e}")
+        else:
+            songs = data.get("songs", [])
+
+        self.playlists[playlist_name] = songs
+        self.shuffle_states[playlist_name] = False
+        self.shuffled_songs[playlist_name] = []
+
+        if session_state is not None and "smart" not in data:
+            session_state.store_playlist(playlist_file, identity, (playlist_name, songs, playlist_image))
+        return playlist_name, songs, playlist_image
+
+    def shuffle_songs(self, playlist_name):
+        """Shuffle the songs for a specific playlist."""
+        if playlist_name in self.playlists:
+            songs = self.playlists[playlist_name][:]
+            with perfMetrics.span("playlist.shuffle", songs=len(songs)):
+                random.shuffle(songs)
+            self.shuffled_songs[playlist_name] = songs
+            self.shuffle_states[playlist_name] = True
+
+    @perfMetrics.timed("playlist.combine")
+    def combine_playlists(self, combined_playlist_name="Combined Playlist"):
+        """Combine all songs from playlist files, update the existing combined playlist if needed, and shuffle.
+
+        Songs are deduplicated by audio content, so the same track stored under
+        two paths (or retagged) is only added once.
+        """
+        # Fingerprinting needs NumPy, which the daemon otherwise never loads
+        from core.trackIdentity import track_identities, identity_key
+        combined_songs = []
+
+        combined_playlist_path = os.path.join(self.playlists_dir, f"{combined_playlist_name}.json")
+
+        # Check if combined playlist exists and load its contents
+        if os.path.exists(combined_playlist_path):
+            logging.info(f"Combined playlist '{combined_playlist_name}' exists. Loading existing songs...")
+            try:
+                combined_playlist_data = read_playlist(combined_playlist_path)
+                combined_songs = combined_playlist_data.get("songs", [])
+                logging.info(f"Loaded {len(combined_songs)} songs from existing combined playlist.")
+            except Exception as e:
+                logging.info(f"Error loading combined playlist: {e}")
+
+        # Read every other playlist file in the playlists directory
+        candidate_songs = []
+        for filename in os.listdir(self.playlists_dir):
+            if filename.endswith(".json") and filename != f"{combined_playlist_name}.json":
+                playlist_path = os.path.join(self.playlists_dir, filename)
+                logging.info(f"Processing file: {filename}")
+
+                try:
+                    playlist_data = read_playlist(playlist_path)
+                    songs = playlist_data.get("songs", [])
+                    logging.info(f"Found {len(songs)} songs in {filename}")
+                    candidate_songs.extend(songs)
+                except Exception as e:
+                    logging.info(f"Error reading file {filename}: {e}")
+
+        # Add songs to the combined playlist, avoiding duplicates by content identity
+        identities = track_identities(
+            song.get("path", "").strip() for song in combined_songs + candidate_songs
+        )
+        unique_keys = {identity_key(song.get("path", "").strip(), identities) for song in combined_songs}
+        for song in candidate_songs:
+            song_path = song.get("path", "").strip()
+            key = identity_key(song_path, identities) if song_path else None
+            if key and key not in unique_keys:
+                combined_songs.append(song)
+                unique_keys.add(key)
+            else:
+                logging.info(f"Duplicate or invalid song skipped: {song_path}")
+
+        # Shuffle the combined songs
+        random.shuffle(combined_songs)
+        logging.info(f"Playlist shuffled with {len(combined_songs)} songs.")
+
+        # Save the updated combined playlist with shuffled songs
+        combined_playlist_data = {
+            "playlist_name": combined_playlist_name,
+            "song_count": len(combined_songs),
+            "songs": combined_songs
+        }
+
+        PlaylistStore.get_instance().save(combined_playlist_path, combined_playlist_data)
+
+        logging.info(f"Updated combined playlist saved at: {combined_playlist_path}, Total songs: {len(combined_songs)}")
+
+        # Optionally, update the manager's memory
+        self.playlists[combined_playlist_name] = combined_songs
+        self.shuffle_states[combined_playlist_name] = True
+        self.shuffled_songs[combined_playlist_name] = combined_songs.copy()
+
+        return combined_playlist_name, combined_songs
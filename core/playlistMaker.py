@@ -21,138 +21,17 @@
 # It provides functionality to select folders, add songs manually,
 # edit and delete songs, and save playlists.
 # =============
-import platform
-import re
 import logging
-import json
 import os
-import random
-from PyQt6.QtWidgets import QDialog, QFileDialog, QPushButton, QVBoxLayout, QHBoxLayout, QWidget, QLineEdit, QLabel, QTableWidget, QTableWidgetItem, QMessageBox, QListWidget
+from PyQt6.QtWidgets import QDialog, QFileDialog, QPushButton, QVBoxLayout, QHBoxLayout, QWidget, QLineEdit, QLabel, QTableView, QMessageBox, QListWidget, QProgressBar, QMenu, QInputDialog
 from PyQt6.QtGui import QIcon
 from PyQt6.QtCore import Qt
 from core.configManager import ConfigManager
+from core.folderScanner import FolderScanThread
+from core.songTableModel import SongTableModel, COLUMNS
+from core.playlistStore import PlaylistStore, is_smart_playlist
+from core.playlistLibrary import ACCEPTED_AUDIO_EXTENSIONS, PlaylistManager, read_song_metadata
 
-from mutagen.mp3 import MP3
-from mutagen import File
-
-class PlaylistManager:
-    def __init__(self):
-        self.playlists = {}
-        self.shuffle_states = {}
-        self.shuffled_songs = {}
-
-        config_manager = ConfigManager.get_instance()
-        try:
-            config = config_manager.load_config()
-            self.playlists_dir = config.get("root_playlist_folder", "playlists")
-        except (FileNotFoundError, json.JSONDecodeError):
-            logging.warning("Could not load config, using default playlists directory")
-            self.playlists_dir = "playlists"
-
-        if not os.path.exists(self.playlists_dir):
-            os.makedirs(self.playlists_dir)
-            print(f"Created playlists directory: {self.playlists_dir}")
-
-    def load_playlist(self, playlist_name):
-        """Load a playlist by name from the playlists directory."""
-        playlist_path = os.path.join(self.playlists_dir, f"{playlist_name}.json")
-        
-        if not os.path.isfile(playlist_path):
-            raise FileNotFoundError(f"Playlist file not found: {playlist_path}")
-
-        try:
-            with open(playlist_path, 'r', encoding='utf-8') as file:
-                data = json.load(file)
-        except json.JSONDecodeError:
-            raise ValueError(f"Error decoding JSON in playlist file: {playlist_path}")
-        except IOError as e:
-            raise IOError(f"Error reading playlist file: {playlist_path}") from e
-
-        playlist_name = data.get("playlist_name", playlist_name)
-        playlist_image = data.get("playlist_large_image_key", None)
-        songs = data.get("songs", [])
-
-        self.playlists[playlist_name] = songs
-        self.shuffle_states[playlist_name] = False
-        self.shuffled_songs[playlist_name] = []
-
-        return playlist_name, songs, playlist_image
-
-    def shuffle_songs(self, playlist_name):
-        """Shuffle the songs for a specific playlist."""
-        if playlist_name in self.playlists:
-            songs = self.playlists[playlist_name][:]
-            random.shuffle(songs)
-            self.shuffled_songs[playlist_name] = songs
-            self.shuffle_states[playlist_name] = True
-
-    def combine_playlists(self, combined_playlist_name="Combined Playlist"):
-        """Combine all songs from playlist files, update the existing combined playlist if needed, and shuffle."""
-        combined_songs = []
-        unique_song_paths = set()
-
-        combined_playlist_path = os.path.join(self.playlists_dir, f"{combined_playlist_name}.json")
-
-        # Check if combined playlist exists and load its contents
-        if os.path.exists(combined_playlist_path):
-            logging.info(f"Combined playlist '{combined_playlist_name}' exists. Loading existing songs...")
-            try:
-                with open(combined_playlist_path, 'r', encoding='utf-8') as f:
-                    combined_playlist_data = json.load(f)
-                combined_songs = combined_playlist_data.get("songs", [])
-                unique_song_paths = {song.get("path", "") for song in combined_songs}
-                logging.info(f"Loaded {len(combined_songs)} songs from existing combined playlist.")
-            except Exception as e:
-                logging.info(f"Error loading combined playlist: {e}")
-
-        # Iterate over all files in the playlists directory
-        for filename in os.listdir(self.playlists_dir):
-            if filename.endswith(".json") and filename != f"{combined_playlist_name}.json":
-                playlist_path = os.path.join(self.playlists_dir, filename)
-                logging.info(f"Processing file: {filename}")
-
-                # Load the playlist file
-                try:
-                    with open(playlist_path, 'r', encoding='utf-8') as f:
-                        playlist_data = json.load(f)
-
-                    songs = playlist_data.get("songs", [])
-                    logging.info(f"Found {len(songs)} songs in {filename}")
-
-                    # Add songs to the combined playlist, avoiding duplicates
-                    for song in songs:
-                        song_path = song.get("path", "").strip()
-                        if song_path and song_path not in unique_song_paths:
-                            combined_songs.append(song)
-                            unique_song_paths.add(song_path)
-                        else:
-                            logging.info(f"Duplicate or invalid song skipped: {song_path}")
-
-                except Exception as e:
-                    logging.info(f"Error reading file {filename}: {e}")
-
-        # Shuffle the combined songs
-        random.shuffle(combined_songs)
-        logging.info(f"Playlist shuffled with {len(combined_songs)} songs.")
-
-        # Save the updated combined playlist with shuffled songs
-        combined_playlist_data = {
-            "playlist_name": combined_playlist_name,
-            "song_count": len(combined_songs),
-            "songs": combined_songs
-        }
-
-        with open(combined_playlist_path, 'w', encoding='utf-8') as f:
-            json.dump(combined_playlist_data, f, indent=4, ensure_ascii=False)
-
-        logging.info(f"Updated combined playlist saved at: {combined_playlist_path}, Total songs: {len(combined_songs)}")
-
-        # Optionally, update the manager's memory
-        self.playlists[combined_playlist_name] = combined_songs
-        self.shuffle_states[combined_playlist_name] = True
-        self.shuffled_songs[combined_playlist_name] = combined_songs.copy()
-
-        return combined_playlist_name, combined_songs
 
 class PlaylistMaker(QDialog):
     def __init__(self, icon_path):
@@ -195,6 +74,19 @@ class PlaylistMaker(QDialog):
         self.select_folder_button.clicked.connect(self.select_folder)
         self.left_layout.addWidget(self.select_folder_button)
 
+        # Folder import progress, shown while a scan is running
+        self.scan_layout = QHBoxLayout()
+        self.scan_progress_bar = QProgressBar()
+        self.scan_progress_bar.setFormat("%v / %m")
+        self.scan_layout.addWidget(self.scan_progress_bar)
+        self.cancel_scan_button = QPushButton("Cancel")
+        self.cancel_scan_button.clicked.connect(self.cancel_scan)
+        self.scan_layout.addWidget(self.cancel_scan_button)
+        self.left_layout.addLayout(self.scan_layout)
+        self.scan_progress_bar.hide()
+        self.cancel_scan_button.hide()
+        self.scan_thread = None
+
         self.playlist_name_label = QLabel("Enter playlist name:")
         self.left_layout.addWidget(self.playlist_name_label)
 
@@ -263,7 +155,7 @@ class PlaylistMaker(QDialog):
             """
             <b>Notes:</b><br><br>
             <ul>
-                <li><b>Select a folder</b> with songs to automatically populate the playlist or add songs manually.</li>
+                <li><b>Select a folder</b> with songs (subfolders included) to automatically populate the playlist or add songs manually.</li>
                 <li><b>Add songs manually</b> by entering the artist, title, genre, picture path, YouTube ID (optional), and song path.</li>
                 <li><b>Use the full path</b> to the song file when adding manually.</li>
                 <li><b>Follow the file naming format</b> for automatic recognition:<br>
@@ -273,6 +165,8 @@ class PlaylistMaker(QDialog):
                 <li><b>To delete a song</b>, select the row in the table and press the <b>Delete</b> key on your keyboard.</li>
                 <li><b>Click on a row</b> in the table to select a song before performing any actions.</li>
                 <li><b>Double-click</b> on a cell in the table to <b>edit</b> its content.</li>
+                <li><b>Right-click</b> a selection to set a field (e.g. Album) on all selected rows at once.</li>
+                <li><b>Click a column header</b> to sort the table by it.</li>
             </ul>
             """
         )
@@ -287,9 +181,9 @@ class PlaylistMaker(QDialog):
         self.layout.addWidget(self.right_frame)
 
         # Table view for song list
-        self.song_table = QTableWidget()
-        self.song_table.setColumnCount(8)
-        self.song_table.setHorizontalHeaderLabels(["Artist", "Title", "Album", "Genre", "Picture Path", "Picture Link", "YouTube ID", "Song Path"])
+        self.song_model = SongTableModel(parent=self)
+        self.song_table = QTableView()
+        self.song_table.setModel(self.song_model)
         self.right_layout.addWidget(self.song_table)
         self.song_table.setColumnWidth(0, 150)
         self.song_table.setColumnWidth(1, 150)
@@ -299,18 +193,27 @@ class PlaylistMaker(QDialog):
         self.song_table.setColumnWidth(5, 150)
         self.song_table.setColumnWidth(6, 150)
         self.song_table.setColumnWidth(7, 450)
-        self.song_table.itemChanged.connect(self.update_song_data)
+        # No initial sort, so songs stay in folder/playlist order until a header is clicked
+        self.song_table.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        self.song_table.setSortingEnabled(True)
+        self.song_table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.song_table.customContextMenuRequested.connect(self.show_table_menu)
         self.songs = []
+        self.loaded_playlist_path = None  # Playlist the table was opened from, for incremental saves
+        self.loaded_image_key = ""
+
+    @property
+    def songs(self):
+        return self.song_model.songs
+
+    @songs.setter
+    def songs(self, songs):
+        self.song_model.set_songs(songs)
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key.Key_Delete:
-            selected_indexes = self.song_table.selectionModel().selectedRows()
-            if selected_indexes:
-                for index in sorted(selected_indexes, reverse=True):
-                    row = index.row()
-                    self.song_table.removeRow(row)
-                    if row < len(self.songs):
-                        del self.songs[row]
+            selected_rows = self.song_table.selectionModel().selectedRows()
+            self.song_model.remove_rows([index.row() for index in selected_rows])
         super().keyPressEvent(event)
 
     def select_folder(self):
@@ -320,108 +223,77 @@ class PlaylistMaker(QDialog):
             self.process_folder(folder)
     
     def process_folder(self, folder):
+        """Import a folder recursively on a worker thread, streaming rows into the table."""
+        self.stop_scan()
         self.songs = []
-        if self.song_table:
-            self.song_table.setRowCount(0)
-
-        ACCEPTED_AUDIO_EXTENSIONS = (".mp3", ".wav", ".flac", ".ogg", ".m4a") 
-
-        song_files = [f for f in os.listdir(folder) if f.lower().endswith(ACCEPTED_AUDIO_EXTENSIONS)]
-
-        for filename in song_files:
-            song_path = os.path.join(folder, filename)
-            artist = title = album = genre = picture_path = picture_link = youtube_id = ""
-            try:
-                audio = File(song_path)
-                if audio:
-                    artist = audio.get('artist', [None])[0] if audio.get('artist') else ""
-                    title = audio.get('title', [None])[0] if audio.get('title') else ""
-                    album = audio.get('album', [None])[0] if audio.get('album') else ""
-                    genre = audio.get('genre', [None])[0] if audio.get('genre') else ""
-
-                    if isinstance(audio, MP3) and audio.tags:
-                        tags = audio.tags
-                        artist = tags.get('TPE1', [None])[0] if tags.get('TPE1') else artist
-                        title = tags.get('TIT2', [None])[0] if tags.get('TIT2') else title
-                        album = tags.get('TALB', [None])[0] if tags.get('TALB') else album
-                        genre = tags.get('TCON', [None])[0] if tags.get('TCON') else genre
-                
-                artist = str(artist) if artist else ""
-                title = str(title) if title else ""
-                album = str(album) if album else ""
-                genre = str(genre) if genre else ""
-
-            except Exception as e:
-                logging.error(f"Error reading metadata for {filename}: {e}")
-                artist = title = album = genre = ""
-                picture_path = ""
-            
-            if not artist or not title:
-                match = re.match(r'(.+) - (.+) \[([^\]]*)\]\.(mp3|wav|flac|ogg|m4a)$', filename, re.IGNORECASE)
-                if match:
-                    artist, title, youtube_id, _ = match.groups()
-                else:
-                    artist = "Unknown Artist"
-                    title = os.path.splitext(filename)[0]
-                    youtube_id = ""
-
-            self.songs.append({
-                "artist": artist,
-                "title": title,
-                "album": album,
-                "genre": genre,
-                "picture_path": picture_path,  # "" if no embedded cover
-                "picture_link": picture_link,
-                "youtube_id": youtube_id,
-                "path": song_path.replace("\\", "/")
-            })
-
-        if hasattr(self, 'add_song_to_table') and callable(self.add_song_to_table):
-            self.add_song_to_table()
-
-    def add_song_to_table(self):
-        self.song_table.setRowCount(len(self.songs))
-        for row, song in enumerate(self.songs):
-            artist = song.get('artist', 'Unknown Artist')
-            title = song.get('title', 'Unknown Title')
-            album = song.get('album', 'Unknown Album')
-            genre = song.get('genre', 'Unknown Genre')
-            picture_path = song.get('picture_path', '')
-            picture_link = song.get('picture_link', '')
-            youtube_id = song.get('youtube_id', '')
-            path = song.get('path', '')
-
-            self.song_table.setItem(row, 0, QTableWidgetItem(artist))
-            self.song_table.setItem(row, 1, QTableWidgetItem(title))
-            self.song_table.setItem(row, 2, QTableWidgetItem(album))
-            self.song_table.setItem(row, 3, QTableWidgetItem(genre))
-            self.song_table.setItem(row, 4, QTableWidgetItem(picture_path))
-            self.song_table.setItem(row, 5, QTableWidgetItem(picture_link))
-            self.song_table.setItem(row, 6, QTableWidgetItem(youtube_id))
-            self.song_table.setItem(row, 7, QTableWidgetItem(path))
-
-    def update_song_data(self, item):
-        row = item.row()
-        column = item.column()
-        value = item.text()
-
-        if row < len(self.songs):
-            if column == 0:
-                self.songs[row]['artist'] = value
-            elif column == 1:
-                self.songs[row]['title'] = value
-            elif column == 2:
-                self.songs[row]['album'] = value
-            elif column == 3:
-                self.songs[row]['genre'] = value
-            elif column == 4:
-                self.songs[row]['picture_path'] = value
-            elif column == 5:
-                self.songs[row]['picture_link'] = value
-            elif column == 6:
-                self.songs[row]['youtube_id'] = value
-            elif column == 7:
-                self.songs[row]['path'] = value
+
+        self.scan_thread = FolderScanThread(
+            folder, read_song_metadata, ACCEPTED_AUDIO_EXTENSIONS,
+            dedupe=self.config.get("dedupe_by_content", True),
+        )
+        self.scan_thread.batch_ready.connect(self.on_scan_batch)
+        self.scan_thread.progress.connect(self.on_scan_progress)
+        self.scan_thread.scan_finished.connect(self.on_scan_finished)
+        self.scan_progress_bar.setRange(0, 0)  # Busy until the file list is known
+        self.scan_progress_bar.show()
+        self.cancel_scan_button.show()
+        self.scan_thread.start()
+
+    def cancel_scan(self):
+        if self.scan_thread is not None:
+            self.scan_thread.cancel()
+
+    def stop_scan(self):
+        """Cancel a running import and wait for the worker to exit."""
+        if self.scan_thread is not None:
+            self.scan_thread.cancel()
+            self.scan_thread.wait()
+            self.scan_thread = None
+
+    def on_scan_batch(self, songs):
+        # Ignore batches still queued from a scan that was replaced
+        if self.sender() is not self.scan_thread:
+            return
+        self.song_model.append_songs(songs)
+
+    def on_scan_progress(self, done, total):
+        if self.sender() is not self.scan_thread:
+            return
+        self.scan_progress_bar.setRange(0, total)
+        self.scan_progress_bar.setValue(done)
+
+    def on_scan_finished(self, count, cancelled):
+        if self.sender() is not self.scan_thread:
+            return
+        self.scan_progress_bar.hide()
+        self.cancel_scan_button.hide()
+        skipped = self.scan_thread.duplicates_skipped
+        self.folder_path_label.setText(
+            f"{self.scan_thread.folder} ({len(self.songs)} songs"
+            f"{f', {skipped} duplicates skipped' if skipped else ''}{', cancelled' if cancelled else ''})"
+        )
+        self.scan_thread = None
+
+    def done(self, result):
+        self.stop_scan()
+        super().done(result)
+
+    def show_table_menu(self, pos):
+        """Context menu offering to set one field on every selected row at once."""
+        rows = sorted({index.row() for index in self.song_table.selectionModel().selectedIndexes()})
+        if not rows:
+            return
+        menu = QMenu(self)
+        for header, key in COLUMNS:
+            action = menu.addAction(f"Set {header} for {len(rows)} selected row(s)...")
+            action.triggered.connect(lambda _, h=header, k=key: self.bulk_edit(rows, h, k))
+        menu.exec(self.song_table.viewport().mapToGlobal(pos))
+
+    def bulk_edit(self, rows, header, key):
+        current = self.songs[rows[0]].get(key, "")
+        value, ok = QInputDialog.getText(self, "Bulk Edit", f"{header} for {len(rows)} row(s):", text=current)
+        if ok:
+            self.song_model.set_field(rows, key, value.strip())
 
     def add_song(self):
         artist = self.artist_input.text().strip()
@@ -444,8 +316,7 @@ class PlaylistMaker(QDialog):
                 "youtube_id": youtube_id,
                 "path": path.replace("\\", "/")
             }
-            self.songs.append(song_data)
-            self.add_song_to_table()
+            self.song_model.append_songs([song_data])
 
     def save_playlist(self):
         playlist_name = self.playlist_name_input.text().strip() or "Untitled Playlist"
@@ -468,8 +339,36 @@ class PlaylistMaker(QDialog):
             os.makedirs(playlist_folder)
 
         playlist_path = os.path.join(playlist_folder, f"{playlist_name}.json")
-        with open(playlist_path, 'w') as f:
-            json.dump(playlist_data, f, indent=4)
+        if is_smart_playlist(playlist_path):
+            QMessageBox.warning(
+                self, "Smart Playlist",
+                f"'{playlist_name}' is a smart playlist. Save these songs under another name, "
+                "or edit its rules with Smart Playlist in the player."
+            )
+            return
+        store = PlaylistStore.get_instance()
+        # Re-saving the playlist that was opened only appends the edits made since
+        incremental = (
+            not self.song_model.needs_snapshot
+            and self.loaded_playlist_path is not None
+            and os.path.abspath(self.loaded_playlist_path) == os.path.abspath(playlist_path)
+            and os.path.exists(playlist_path)
+        )
+        try:
+            if incremental:
+                ops = list(self.song_model.pending_ops)
+                if discord_large_image_key != self.loaded_image_key:
+                    ops.append({"op": "meta", "fields": {"playlist_large_image_key": discord_large_image_key}})
+                store.append_ops(playlist_path, ops)
+            else:
+                store.save(playlist_path, playlist_data)
+        except (OSError, ValueError) as e:
+            logging.error(f"Failed to save playlist {playlist_path}: {e}")
+            QMessageBox.critical(self, "Error", f"Failed to save playlist '{playlist_name}': {e}")
+            return
+        self.song_model.mark_saved()
+        self.loaded_playlist_path = playlist_path
+        self.loaded_image_key = discord_large_image_key
 
         QMessageBox.information(self, "Playlist Saved", f"Playlist '{playlist_name}' has been saved successfully!")
   
@@ -519,6 +418,14 @@ class PlaylistMaker(QDialog):
     def load_playlist(self, playlist_name):
         """Load a playlist into the UI."""
         playlist_manager = PlaylistManager()
+        playlist_path = os.path.join(playlist_manager.playlists_dir, f"{playlist_name}.json")
+        # Its songs come from rules, which the table cannot edit or save
+        if is_smart_playlist(playlist_path):
+            QMessageBox.information(
+                self, "Smart Playlist",
+                f"'{playlist_name}' is a smart playlist. Edit its rules with Smart Playlist in the player."
+            )
+            return
         try:
             playlist_name, songs, playlist_image = playlist_manager.load_playlist(playlist_name)
         except (FileNotFoundError, ValueError, IOError) as e:
@@ -529,7 +436,8 @@ class PlaylistMaker(QDialog):
         self.discord_large_image_key_input.setText(playlist_image if playlist_image else "")
 
         self.songs = songs
-        self.song_table.setRowCount(0)
-        self.add_song_to_table()
+        self.song_model.mark_saved()
+        self.loaded_playlist_path = playlist_path
+        self.loaded_image_key = playlist_image if playlist_image else ""
             
         QMessageBox.information(self, "Playlist Loaded", f"Playlist '{playlist_name}' loaded successfully.")
\ No newline at end of file
@@ -0,0 +1,389 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/playlistStore.py
+# =============
+# Crash-safe playlist persistence.
+#
+# A playlist is a JSON snapshot (<name>.json, the existing format) plus an
+# optional append-only journal (<name>.journal) of JSON-lines edit operations.
+# Snapshots are always written to a temp file, fsynced and renamed over the
+# old file, so a crash leaves either the old or the new playlist intact.
+# Small edits append a few journal lines instead of rewriting the snapshot;
+# a background thread folds the journal back into the snapshot once it grows.
+#
+# Every journal operation carries a sequence number and the snapshot records
+# the last one it contains ("journal_seq"), so replaying a journal that
+# survived a crash during compaction never applies an operation twice.
+#
+# Smart playlists (core/smartPlaylists.py) keep rules instead of songs, so
+# journal operations, which address song rows, are refused for them.
+# =============
+
+import os
+import re
+import json
+import queue
+import logging
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional
+
+from core import perfMetrics
+
+JOURNAL_SUFFIX = ".journal"
+# Compact once the journal is bigger than this share of the snapshot (and at least COMPACT_MIN_BYTES)
+COMPACT_RATIO = 0.25
+COMPACT_MIN_BYTES = 64 * 1024
+
+
+def journal_path_for(playlist_path: str) -> str:
+    return os.path.splitext(playlist_path)[0] + JOURNAL_SUFFIX
+
+
+def atomic_write_json(path: str, data: Dict[str, Any], indent: Optional[int] = 4) -> None:
+    """
+    Write JSON to path so that readers only ever see the old or the new content.
+
+    Args:
+        path: Destination file
+        data: JSON-serializable data
+        indent: Indentation, or None for compact output
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=indent, ensure_ascii=False, separators=None if indent else (",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    _fsync_directory(directory)
+
+
+def _fsync_directory(directory: str) -> None:
+    """Persist a rename on POSIX; directories cannot be opened this way on Windows."""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    try:
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def read_journal(journal_path: str) -> List[Dict[str, Any]]:
+    """Return the journal's operations, stopping at a torn or corrupt line."""
+    ops = []
+    try:
+        with open(journal_path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    ops.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logging.warning(f"Ignoring journal {journal_path} from line {line_number} on (incomplete write)")
+                    break
+    except FileNotFoundError:
+        pass
+    return ops
+
+
+def apply_op(data: Dict[str, Any], op: Dict[str, Any]) -> None:
+    """Apply one journal operation to playlist data in place."""
+    songs = data.setdefault("songs", [])
+    kind = op["op"]
+    if kind == "insert":
+        row = op["row"]
+        songs[row:row] = op["songs"]
+    elif kind == "remove":
+        doomed = set(op["rows"])
+        songs[:] = [song for row, song in enumerate(songs) if row not in doomed]
+    elif kind == "update":
+        for row in op["rows"]:
+            songs[row].update(op["fields"])
+    elif kind == "reorder":
+        songs[:] = [songs[row] for row in op["order"]]
+    elif kind == "meta":
+        data.update(op["fields"])
+    else:
+        raise ValueError(f"Unknown playlist journal operation: {kind}")
+
+
+def read_playlist(playlist_path: str) -> Dict[str, Any]:
+    """
+    Load a playlist snapshot and replay its journal.
+
+    Args:
+        playlist_path: Path to the playlist's .json file
+
+    Returns:
+        Dict[str, Any]: Playlist data with an up-to-date song_count
+
+    Raises:
+        FileNotFoundError: If the snapshot does not exist
+        json.JSONDecodeError: If the snapshot is not valid JSON
+    """
+    journal_path = journal_path_for(playlist_path)
+    while True:
+        before = _file_identity(playlist_path)
+        with open(playlist_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        ops = read_journal(journal_path)
+        # A compaction that replaced the snapshot and dropped the journal while
+        # we were reading would leave us with the old snapshot and no journal.
+        if _file_identity(playlist_path) == before:
+            break
+    if ops:
+        applied = data.get("journal_seq", 0)
+        for op in ops:
+            if op.get("seq", 0) > applied:
+                apply_op(data, op)
+                applied = op["seq"]
+        data["journal_seq"] = applied
+        data["song_count"] = len(data.get("songs", []))
+    return data
+
+
+def _file_identity(path: str):
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class PlaylistStore:
+    """
+    Singleton that serializes writes per playlist and runs background compaction.
+
+    Usage:
+        store = PlaylistStore.get_instance()
+        store.save(path, playlist_data)           # full atomic snapshot
+        store.append_ops(path, [{"op": "insert", "row": 10, "songs": [...]}])
+        data = read_playlist(path)                # snapshot + journal
+    """
+
+    _instance: Optional['PlaylistStore'] = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        """Initialize PlaylistStore. Use get_instance() instead of direct instantiation."""
+        if PlaylistStore._instance is not None:
+            raise RuntimeError("Use PlaylistStore.get_instance() to get the singleton instance")
+
+        self._path_locks: Dict[str, threading.Lock] = {}
+        self._path_locks_guard = threading.Lock()
+        self._last_seq: Dict[str, int] = {}
+        self._compaction_queue: "queue.Queue[str]" = queue.Queue()
+        self._queued: set = set()
+        self._compactor = threading.Thread(target=self._compaction_loop, name="IotaPlaylistCompactor", daemon=True)
+        self._compactor.start()
+
+    @classmethod
+    def get_instance(cls) -> 'PlaylistStore':
+        """
+        Get the singleton instance of PlaylistStore.
+
+        Returns:
+            PlaylistStore: The singleton instance
+        """
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def _lock_for(self, playlist_path: str) -> threading.Lock:
+        key = os.path.abspath(playlist_path)
+        with self._path_locks_guard:
+            lock = self._path_locks.get(key)
+            if lock is None:
+                lock = self._path_locks[key] = threading.Lock()
+            return lock
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def save(self, playlist_path: str, data: Dict[str, Any]) -> None:
+        """Write a full snapshot atomically and drop the now redundant journal."""
+        with self._lock_for(playlist_path), perfMetrics.span("playlist.save_snapshot", songs=len(data.get("songs", []))):
+            self._write_snapshot(playlist_path, dict(data))
+
+    def append_ops(self, playlist_path: str, ops: List[Dict[str, Any]]) -> None:
+        """
+        Durably append edit operations to a playlist's journal.
+
+        Args:
+            playlist_path: Path to an existing playlist snapshot
+            ops: Operations understood by apply_op(); a "seq" is added to each
+
+        Raises:
+            ValueError: If the playlist is a smart playlist
+        """
+        if not ops:
+            return
+        if is_smart_playlist(playlist_path):
+            raise ValueError(f"{playlist_path} is a smart playlist; its songs come from its rules")
+        journal_path = journal_path_for(playlist_path)
+        with self._lock_for(playlist_path), perfMetrics.span("playlist.append_journal", ops=len(ops)):
+            seq = self._current_seq(playlist_path)
+            lines = []
+            for op in ops:
+                seq += 1
+                lines.append(json.dumps(dict(op, seq=seq), ensure_ascii=False))
+            _truncate_torn_tail(journal_path)
+            with open(journal_path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._last_seq[os.path.abspath(playlist_path)] = seq
+            journal_size = os.path.getsize(journal_path)
+            snapshot_size = os.path.getsize(playlist_path)
+        if journal_size > max(COMPACT_MIN_BYTES, snapshot_size * COMPACT_RATIO):
+            self.schedule_compaction(playlist_path)
+
+    def delete(self, playlist_path: str) -> None:
+        """Remove a playlist's snapshot and journal."""
+        with self._lock_for(playlist_path):
+            for path in (playlist_path, journal_path_for(playlist_path)):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._last_seq.pop(os.path.abspath(playlist_path), None)
+
+    # ------------------------------------------------------------------
+    # Compaction
+    # ------------------------------------------------------------------
+    def compact(self, playlist_path: str) -> None:
+        """Fold the journal into a new snapshot, if there is one."""
+        if not os.path.exists(journal_path_for(playlist_path)):
+            return
+        with self._lock_for(playlist_path), perfMetrics.span("playlist.compact") as span:
+            data = read_playlist(playlist_path)
+            span.set(songs=len(data.get("songs", [])))
+            self._write_snapshot(playlist_path, data)
+        logging.info(f"Compacted playlist journal for {playlist_path}")
+
+    def schedule_compaction(self, playlist_path: str) -> None:
+        key = os.path.abspath(playlist_path)
+        with self._path_locks_guard:
+            if key in self._queued:
+                return
+            self._queued.add(key)
+        self._compaction_queue.put(key)
+
+    def wait_for_compaction(self) -> None:
+        """Block until all scheduled compactions have finished."""
+        self._compaction_queue.join()
+
+    def _compaction_loop(self) -> None:
+        while True:
+            playlist_path = self._compaction_queue.get()
+            with self._path_locks_guard:
+                self._queued.discard(playlist_path)
+            try:
+                self.compact(playlist_path)
+            except Exception as e:
+                logging.error(f"Playlist compaction failed for {playlist_path}: {e}")
+            finally:
+                self._compaction_queue.task_done()
+
+    # ------------------------------------------------------------------
+    # Helpers (callers hold the playlist's lock)
+    # ------------------------------------------------------------------
+    def _write_snapshot(self, playlist_path: str, data: Dict[str, Any]) -> None:
+        songs = data.pop("songs", [])
+        data["song_count"] = len(songs)
+        data["journal_seq"] = self._current_seq(playlist_path)
+        data["songs"] = songs  # Last, so _snapshot_seq() finds journal_seq in the file's first bytes
+        atomic_write_json(playlist_path, data)
+        # Everything in the journal is now in the snapshot; a crash before this
+        # removal is harmless because replay skips seq <= journal_seq.
+        journal_path = journal_path_for(playlist_path)
+        if os.path.exists(journal_path):
+            os.remove(journal_path)
+
+    def _current_seq(self, playlist_path: str) -> int:
+        key = os.path.abspath(playlist_path)
+        seq = self._last_seq.get(key)
+        if seq is None:
+            seq = _snapshot_seq(playlist_path)
+            journal = read_journal(journal_path_for(playlist_path))
+            if journal:
+                seq = max(seq, journal[-1].get("seq", 0))
+            self._last_seq[key] = seq
+        return seq
+
+
+def _truncate_torn_tail(journal_path: str) -> None:
+    """Cut a partially written last line, so new operations are not appended after it."""
+    try:
+        with open(journal_path, "rb+") as f:
+            end = f.seek(0, os.SEEK_END)
+            if end == 0:
+                return
+            f.seek(end - 1)
+            if f.read(1) == b"\n":
+                return
+            position = end
+            while position > 0:
+                chunk_start = max(0, position - 4096)
+                f.seek(chunk_start)
+                chunk = f.read(position - chunk_start)
+                newline = chunk.rfind(b"\n")
+                if newline != -1:
+                    f.truncate(chunk_start + newline + 1)
+                    return
+                position = chunk_start
+            f.truncate(0)
+    except FileNotFoundError:
+        pass
+
+
+def is_smart_playlist(playlist_path: str) -> bool:
+    """Whether a snapshot holds smart playlist rules, from its head where possible (songs are written last)."""
+    try:
+        with open(playlist_path, "rb") as f:
+            head = f.read(4096).decode("utf-8", "ignore")
+    except OSError:
+        return False
+    if '"songs"' in head:
+        return re.search(r'"smart":', head.split('"songs"', 1)[0]) is not None
+    try:
+        with open(playlist_path, "r", encoding="utf-8") as f:
+            return "smart" in json.load(f)
+    except (OSError, ValueError):
+        return False
+
+
+def _snapshot_seq(playlist_path: str) -> int:
+    """Read journal_seq from the head of a snapshot, parsing the whole file only if it is not there."""
+    try:
+        with open(playlist_path, "rb") as f:
+            head = f.read(4096).decode("utf-8", "ignore")
+    except OSError:
+        return 0
+    if '"songs"' in head:
+        match = re.search(r'"journal_seq":\s*(\d+)', head.split('"songs"', 1)[0])
+        return int(match.group(1)) if match else 0
+    try:
+        with open(playlist_path, "r", encoding="utf-8") as f:
+            return json.load(f).get("journal_seq", 0)
+    except (OSError, ValueError):
+        return 0
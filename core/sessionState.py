@@ -0,0 +1,206 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/sessionState.py
+# =============
+# Session snapshot for resuming playback on the next start.
+#
+# session.json in the config directory holds the playback state: playlist,
+# current track, position, play/pause state, loop mode and the shuffle order
+# (as indices into the playlist). It is small and rewritten atomically, a
+# couple of seconds after each change and at exit.
+#
+# The songs of the current playlist are also kept in session_playlist.cache,
+# a pickle tagged with the identity (mtime, size) of the playlist file and
+# its journal. On start the playlist comes from there instead of parsing its
+# JSON and replaying its journal; any change to the playlist files makes the
+# cache miss. The cache is only rewritten when the playlist changes.
+# =============
+
+import os
+import json
+import pickle
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.configManager import ConfigManager
+from core.playlistStore import atomic_write_json, journal_path_for
+from core import perfMetrics
+
+SESSION_VERSION = 1
+# Write the snapshot this long after the last change, and at least this often while playing
+SAVE_DELAY_SECONDS = 2
+POSITION_SAVE_SECONDS = 15
+
+PlaylistIdentity = Tuple[int, int, int, int]
+
+
+def playlist_identity(playlist_path: str) -> Optional[PlaylistIdentity]:
+    """(mtime_ns, size) of a playlist snapshot and of its journal (0, 0 if none); None if the playlist is missing."""
+    try:
+        stat = os.stat(playlist_path)
+    except OSError:
+        return None
+    try:
+        journal = os.stat(journal_path_for(playlist_path))
+        journal_identity = (journal.st_mtime_ns, journal.st_size)
+    except OSError:
+        journal_identity = (0, 0)
+    return (stat.st_mtime_ns, stat.st_size, *journal_identity)
+
+
+def shuffle_order(songs: List[Dict[str, Any]], shuffled: List[Dict[str, Any]]) -> List[int]:
+    """Express a shuffled copy of songs as indices into songs."""
+    positions = {id(song): index for index, song in enumerate(songs)}
+    return [positions[id(song)] for song in shuffled if id(song) in positions]
+
+
+def apply_shuffle_order(songs: List[Dict[str, Any]], order: List[int]) -> Optional[List[Dict[str, Any]]]:
+    """Rebuild a shuffled song list from indices, or None if they are not a permutation of songs."""
+    if len(order) != len(songs) or sorted(order) != list(range(len(songs))):
+        return None
+    return [songs[index] for index in order]
+
+
+class SessionState:
+    """
+    Singleton that persists the playback session and a warm copy of its playlist.
+
+    Usage:
+        session = SessionState.get_instance()
+        snapshot = session.load()
+        session.save(snapshot)
+        playlist = session.cached_playlist(file_name, playlist_path)  # None on a miss
+        session.store_playlist(file_name, identity, (name, songs, image))
+    """
+
+    _instance: Optional['SessionState'] = None
+    _lock = threading.Lock()
+
+    def __init__(self, directory: Optional[str] = None):
+        """
+        Initialize SessionState. Use get_instance() instead of direct instantiation.
+
+        Args:
+            directory: Keep the session files in this directory instead of the config directory
+        """
+        if directory is None and SessionState._instance is not None:
+            raise RuntimeError("Use SessionState.get_instance() to get the singleton instance")
+
+        if directory is None:
+            directory = ConfigManager.get_instance().get_config_dir()
+        os.makedirs(directory, exist_ok=True)
+        self.session_path = os.path.join(directory, "session.json")
+        self.cache_path = os.path.join(directory, "session_playlist.cache")
+        self._session_lock = threading.Lock()
+        # (playlist name, identity) of the songs in the cache file
+        self._cached_key: Optional[Tuple[str, PlaylistIdentity]] = None
+
+    @classmethod
+    def get_instance(cls) -> 'SessionState':
+        """
+        Get the singleton instance of SessionState.
+
+        Returns:
+            SessionState: The singleton instance
+        """
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def load(self) -> Dict[str, Any]:
+        """
+        Read the last saved snapshot.
+
+        Returns:
+            Dict[str, Any]: The snapshot, or an empty dict if there is none or it is unreadable
+        """
+        try:
+            with open(self.session_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable session snapshot: {e}")
+            return {}
+        if not isinstance(snapshot, dict) or snapshot.get("version") != SESSION_VERSION:
+            return {}
+        return snapshot
+
+    def save(self, snapshot: Dict[str, Any]) -> None:
+        """Atomically replace the snapshot."""
+        with self._session_lock, perfMetrics.span("session.save"):
+            atomic_write_json(self.session_path, dict(snapshot, version=SESSION_VERSION), indent=None)
+
+    def cached_playlist(self, playlist_file: str,
+                        playlist_path: str) -> Optional[Tuple[str, List[Dict[str, Any]], Any]]:
+        """
+        A playlist from the warm cache.
+
+        Args:
+            playlist_file: Name of the playlist file, without .json
+            playlist_path: Its path; the file and journal must be unchanged since they were cached
+
+        Returns:
+            Tuple[str, List[Dict[str, Any]], Any] | None: (playlist name, songs, image key) as
+            PlaylistManager.load_playlist returns them, or None on a miss
+        """
+        identity = playlist_identity(playlist_path)
+        if identity is None:
+            return None
+        with self._session_lock, perfMetrics.span("session.cache_read"):
+            try:
+                with open(self.cache_path, "rb") as f:
+                    cached = pickle.load(f)
+            except FileNotFoundError:
+                return None
+            except Exception as e:
+                logging.warning(f"Ignoring unreadable playlist cache: {e}")
+                return None
+            if not isinstance(cached, dict):
+                return None
+            if (cached.get("file"), cached.get("identity")) != (playlist_file, identity):
+                return None
+            self._cached_key = (playlist_file, identity)
+        return cached["name"], cached["songs"], cached["image"]
+
+    def store_playlist(self, playlist_file: str, identity: Optional[PlaylistIdentity],
+                       playlist: Tuple[str, List[Dict[str, Any]], Any]) -> None:
+        """
+        Cache a loaded playlist unless the cache already holds this version of it.
+
+        Args:
+            playlist_file: Name of the playlist file, without .json
+            identity: playlist_identity() of the file, taken before it was read
+            playlist: (playlist name, songs, image key)
+        """
+        if identity is None or self._cached_key == (playlist_file, identity):
+            return
+        name, songs, image = playlist
+        data = {"file": playlist_file, "identity": identity, "name": name, "songs": songs, "image": image}
+        temp_path = self.cache_path + ".tmp"
+        with self._session_lock, perfMetrics.span("session.cache_write", songs=len(songs)):
+            try:
+                with open(temp_path, "wb") as f:
+                    pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temp_path, self.cache_path)
+            except OSError as e:
+                logging.warning(f"Failed to cache playlist {playlist_file}: {e}")
+                return
+            self._cached_key = (playlist_file, identity)
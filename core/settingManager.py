@@ -30,8 +30,10 @@ from PyQt6.QtWidgets import (
     QMessageBox, QApplication, QColorDialog, QSpinBox, QProgressBar 
 )
 from PyQt6.QtGui import QIcon
+from PyQt6.QtCore import QTimer
 from core.coverArtExtractor import CoverArtExtractor
 from core.imageCache import CoverArtCache
+from core.perfMetrics import PerfMetrics
 
 class SettingsDialog(QDialog):
     def __init__(self, settings, icon_path, config_path):
@@ -91,6 +93,15 @@ class SettingsDialog(QDialog):
         self.volume_percentage_edit.setValue(self.settings.get("volume_percentage", 100))
         self.general_layout.addRow(QLabel("Default Playlist:"), self.default_playlist_edit)
         self.general_layout.addRow(QLabel("Volume Percentage:"), self.volume_percentage_edit)
+        self.volume_normalization_checkbox = QCheckBox("Normalize loudness between tracks (restart to apply)")
+        self.volume_normalization_checkbox.setChecked(self.settings.get("volume_normalization", True))
+        self.general_layout.addRow(self.volume_normalization_checkbox)
+        self.play_history_checkbox = QCheckBox("Keep a history of played tracks for statistics (restart to apply)")
+        self.play_history_checkbox.setChecked(self.settings.get("play_history", True))
+        self.general_layout.addRow(self.play_history_checkbox)
+        self.restore_session_checkbox = QCheckBox("Resume the last playlist, track and position on start")
+        self.restore_session_checkbox.setChecked(self.settings.get("restore_session", True))
+        self.general_layout.addRow(self.restore_session_checkbox)
 
         self.unsorted_music_folder_edit = QLineEdit()
         self.unsorted_music_folder_edit.setPlaceholderText("Path to your unsorted music folder")
@@ -107,6 +118,10 @@ class SettingsDialog(QDialog):
         unsorted_layout.addWidget(self.unsorted_music_browse_button)
         self.general_layout.addRow(QLabel("Unsorted Music Folder:"), unsorted_layout)
 
+        self.dedupe_by_content_checkbox = QCheckBox("Skip files with identical audio when importing folders")
+        self.dedupe_by_content_checkbox.setChecked(self.settings.get("dedupe_by_content", True))
+        self.general_layout.addRow(self.dedupe_by_content_checkbox)
+
         # --- Appearance Tab ---
         self.appearance_tab = QWidget()
         self.appearance_layout = QFormLayout()
@@ -203,6 +218,42 @@ class SettingsDialog(QDialog):
         self.extract_button.clicked.connect(self.start_cover_extraction)
         self.cover_layout.addStretch(1)  # Add stretch to push controls to the top
 
+        # --- Performance Tab ---
+        self.performance_tab = QWidget()
+        self.performance_layout = QFormLayout()
+        self.performance_tab.setLayout(self.performance_layout)
+        self.tabs.addTab(self.performance_tab, "Performance")
+
+        self.performance_metrics_checkbox = QCheckBox("Record performance metrics")
+        self.performance_metrics_checkbox.setChecked(PerfMetrics.get_instance().enabled)
+        self.performance_metrics_checkbox.stateChanged.connect(self.toggle_performance_metrics)
+        self.performance_layout.addRow(self.performance_metrics_checkbox)
+
+        self.perf_cover_hit_rate_label = QLabel()
+        self.perf_cover_memory_label = QLabel()
+        self.perf_library_size_label = QLabel()
+        self.perf_scan_throughput_label = QLabel()
+        self.perf_search_latency_label = QLabel()
+        self.perf_discord_queue_label = QLabel()
+        self.perf_gui_stalls_label = QLabel()
+        self.performance_layout.addRow(QLabel("Cover Cache Hit Rate:"), self.perf_cover_hit_rate_label)
+        self.performance_layout.addRow(QLabel("Cover Cache Memory:"), self.perf_cover_memory_label)
+        self.performance_layout.addRow(QLabel("Library Index Size:"), self.perf_library_size_label)
+        self.performance_layout.addRow(QLabel("Last Scan Throughput:"), self.perf_scan_throughput_label)
+        self.performance_layout.addRow(QLabel("Search Latency:"), self.perf_search_latency_label)
+        self.performance_layout.addRow(QLabel("Discord Queue Depth:"), self.perf_discord_queue_label)
+        self.performance_layout.addRow(QLabel("GUI Event-Loop Stalls:"), self.perf_gui_stalls_label)
+
+        self.perf_reset_button = QPushButton("Reset Counters")
+        self.perf_reset_button.clicked.connect(self.reset_performance_metrics)
+        self.performance_layout.addRow(self.perf_reset_button)
+
+        # Refresh live counters only while the dialog is visible
+        self.perf_refresh_timer = QTimer(self)
+        self.perf_refresh_timer.setInterval(1000)
+        self.perf_refresh_timer.timeout.connect(self.refresh_performance_tab)
+        self.refresh_performance_tab()
+
         # --- Save/Cancel Buttons ---
         button_layout = QHBoxLayout()
         layout.addLayout(button_layout)
@@ -245,6 +296,75 @@ class SettingsDialog(QDialog):
         self.extract_button.setEnabled(True)
         QMessageBox.information(self, "Done", "Cover extraction and caching finished.")
 
+    def showEvent(self, event):
+        self.refresh_performance_tab()
+        self.perf_refresh_timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.perf_refresh_timer.stop()
+        super().hideEvent(event)
+
+    def toggle_performance_metrics(self):
+        """Apply the metrics toggle immediately; it is persisted on Save."""
+        PerfMetrics.get_instance().configure(self.performance_metrics_checkbox.isChecked())
+        self.refresh_performance_tab()
+
+    def reset_performance_metrics(self):
+        PerfMetrics.get_instance().reset()
+        self.refresh_performance_tab()
+
+    def refresh_performance_tab(self):
+        """Update the Performance tab labels from the live PerfMetrics counters."""
+        metrics = PerfMetrics.get_instance()
+        not_available = "—" if metrics.enabled else "— (metrics disabled)"
+
+        hits = metrics.counter("cover_cache.hit_memory") + metrics.counter("cover_cache.hit_disk")
+        lookups = hits + metrics.counter("cover_cache.miss")
+        if lookups:
+            self.perf_cover_hit_rate_label.setText(
+                f"{hits / lookups * 100:.1f}% ({int(hits)}/{int(lookups)} lookups)"
+            )
+        else:
+            self.perf_cover_hit_rate_label.setText(not_available)
+
+        memory_bytes = metrics.gauge("cover_cache.memory_bytes")
+        if memory_bytes is not None:
+            entries = metrics.gauge("cover_cache.entries", 0)
+            self.perf_cover_memory_label.setText(f"{memory_bytes / (1024 * 1024):.1f} MB ({entries} covers)")
+        else:
+            self.perf_cover_memory_label.setText(not_available)
+
+        index_size = metrics.gauge("library.index_size")
+        self.perf_library_size_label.setText(f"{index_size} tracks" if index_size is not None else not_available)
+
+        files_per_sec = metrics.gauge("scan.files_per_sec")
+        if files_per_sec is not None:
+            self.perf_scan_throughput_label.setText(
+                f"{files_per_sec:.1f} files/s ({metrics.gauge('scan.last_files', 0)} files)"
+            )
+        else:
+            self.perf_scan_throughput_label.setText(not_available)
+
+        search = metrics.percentiles("player.search_songs")
+        if search:
+            self.perf_search_latency_label.setText(
+                f"p50 {search[50]:.1f} ms • p95 {search[95]:.1f} ms • p99 {search[99]:.1f} ms"
+            )
+        else:
+            self.perf_search_latency_label.setText(not_available)
+
+        queue_depth = metrics.gauge("discord.queue_depth")
+        self.perf_discord_queue_label.setText(str(queue_depth) if queue_depth is not None else not_available)
+
+        stalls = metrics.percentiles("gui.stall", (50, 100))
+        if stalls:
+            self.perf_gui_stalls_label.setText(
+                f"{int(metrics.counter('gui.stalls'))} stalls • median {stalls[50]:.0f} ms • worst {stalls[100]:.0f} ms"
+            )
+        else:
+            self.perf_gui_stalls_label.setText("None recorded" if metrics.enabled else not_available)
+
     def toggle_colorization_color(self):
         is_checked = self.use_system_accent_checkbox.isChecked()
         self.colorization_color_edit.setEnabled(not is_checked)
@@ -278,6 +398,11 @@ class SettingsDialog(QDialog):
         self.settings["font_name"] = self.font_name_edit.text()
         self.settings["unsorted_music_folder"] = self.unsorted_music_folder_edit.text()
         self.settings["use_qdarktheme"] = self.use_qdarktheme_checkbox.isChecked()
+        self.settings["performance_metrics"] = self.performance_metrics_checkbox.isChecked()
+        self.settings["dedupe_by_content"] = self.dedupe_by_content_checkbox.isChecked()
+        self.settings["volume_normalization"] = self.volume_normalization_checkbox.isChecked()
+        self.settings["play_history"] = self.play_history_checkbox.isChecked()
+        self.settings["restore_session"] = self.restore_session_checkbox.isChecked()
         
         if sys.platform.startswith("linux"):
             self.settings["dark_mode"] = self.dark_mode_checkbox.isChecked()
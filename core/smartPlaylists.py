@@ -0,0 +1,341 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/smartPlaylists.py
+# =============
+# Rule-based playlists over the tracks in the library index.
+#
+# A smart playlist is a playlist JSON file with a "smart" definition instead
+# of a song list, for example the query
+#   genre contains Dubstep and not played in 30 days order by random limit 200
+# Rules compile to an SQL condition over the library index's tracks and
+# play statistics. Each playlist's matching tracks are kept in the index:
+# computed in full once, then updated only for the tracks a folder scan or a
+# recorded play touched. Rules relative to the current time are recomputed
+# in full at most every REFRESH_SECONDS.
+# =============
+
+import os
+import json
+import shlex
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.libraryIndex import LibraryIndex
+from core.playlistStore import PlaylistStore
+
+REFRESH_SECONDS = 3600
+
+TEXT_FIELDS = ("artist", "title", "album", "genre", "path")
+NUMBER_FIELDS = {"plays": "COALESCE(s.play_count, 0)", "skips": "COALESCE(s.skip_count, 0)"}
+TEXT_OPERATORS = ("is", "is not", "contains", "does not contain", "starts with")
+NUMBER_OPERATORS = ("=", "!=", ">", ">=", "<", "<=")
+ORDERS = {
+    "artist": "t.artist COLLATE NOCASE, t.album COLLATE NOCASE, t.title COLLATE NOCASE",
+    "title": "t.title COLLATE NOCASE",
+    "album": "t.album COLLATE NOCASE, t.title COLLATE NOCASE",
+    "random": "RANDOM()",
+    "most played": "COALESCE(s.play_count, 0) DESC, t.path",
+    "least played": "COALESCE(s.play_count, 0), t.path",
+    "recently played": "COALESCE(s.last_played, 0) DESC, t.path",
+    "least recently played": "COALESCE(s.last_played, 0), t.path",
+}
+_KEYWORDS = ("and", "or", "order", "limit")
+
+
+def _like_pattern(value: str, prefix: bool) -> str:
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%" if prefix else "%" + escaped + "%"
+
+
+def parse_query(text: str) -> Dict[str, Any]:
+    """
+    Parse a smart playlist query into a definition.
+
+    Grammar (case-insensitive; quote values that contain keywords):
+        rule [and|or rule ...] [order by ORDER] [limit N]
+        rule: FIELD is|is not|contains|does not contain|starts with VALUE
+              plays|skips =|!=|>|>=|<|<= N
+              [not] played in [the last] N days
+              never played
+
+    Returns:
+        Dict[str, Any]: {"match": "all" | "any", "rules": [...], "order": str, "limit": int | None}
+
+    Raises:
+        ValueError: If the query cannot be parsed
+    """
+    try:
+        tokens = shlex.split(text)
+    except ValueError as e:
+        raise ValueError(f"Unbalanced quotes in query: {e}")
+    lowered = [token.lower() for token in tokens]
+    rules, joiners = [], set()
+    order, limit = "artist", None
+    position = 0
+
+    def expect_number(index):
+        if index >= len(tokens) or not tokens[index].isdigit():
+            raise ValueError(f"Expected a number after '{' '.join(tokens[:index])}'")
+        return int(tokens[index])
+
+    def take(*words):
+        nonlocal position
+        if tuple(lowered[position:position + len(words)]) == words:
+            position += len(words)
+            return True
+        return False
+
+    while position < len(tokens):
+        if take("order", "by"):
+            order = " ".join(lowered[position:]).split(" limit ")[0].strip()
+            if order not in ORDERS:
+                raise ValueError(f"Unknown order '{order}'; use one of: {', '.join(ORDERS)}")
+            position += len(order.split())
+            continue
+        if take("limit"):
+            limit = expect_number(position)
+            position += 1
+            continue
+        if rules:
+            if take("and"):
+                joiners.add("all")
+            elif take("or"):
+                joiners.add("any")
+            else:
+                raise ValueError(f"Expected 'and', 'or', 'order by' or 'limit' at '{tokens[position]}'")
+
+        negate = take("not")
+        if take("never", "played"):
+            rules.append({"field": "plays", "op": "=", "value": 0})
+            continue
+        if take("played", "in"):
+            take("the", "last") or take("last")
+            days = expect_number(position)
+            position += 1
+            take("days") or take("day")
+            rules.append({"field": "last_played", "op": "not within days" if negate else "within days",
+                          "value": days})
+            continue
+        if negate:
+            raise ValueError("'not' can only be used as 'not played in N days'")
+
+        field = lowered[position] if position < len(tokens) else ""
+        position += 1
+        if field in NUMBER_FIELDS:
+            op = lowered[position] if position < len(tokens) else ""
+            if op not in NUMBER_OPERATORS:
+                raise ValueError(f"Expected one of {' '.join(NUMBER_OPERATORS)} after '{field}'")
+            rules.append({"field": field, "op": op, "value": expect_number(position + 1)})
+            position += 2
+            continue
+        if field not in TEXT_FIELDS:
+            raise ValueError(f"Unknown field '{field}'; use one of: {', '.join(TEXT_FIELDS + tuple(NUMBER_FIELDS))}")
+        for op in sorted(TEXT_OPERATORS, key=len, reverse=True):
+            if take(*op.split()):
+                break
+        else:
+            raise ValueError(f"Expected one of: {', '.join(TEXT_OPERATORS)} after '{field}'")
+        value = []
+        while position < len(tokens) and lowered[position] not in _KEYWORDS:
+            value.append(tokens[position])
+            position += 1
+        if not value:
+            raise ValueError(f"Missing value after '{field} {op}'")
+        rules.append({"field": field, "op": op, "value": " ".join(value)})
+
+    if not rules:
+        raise ValueError("A smart playlist needs at least one rule")
+    if len(joiners) > 1:
+        raise ValueError("Use either 'and' or 'or' between rules, not both")
+    return {"match": joiners.pop() if joiners else "all", "rules": rules, "order": order, "limit": limit}
+
+
+def format_query(definition: Dict[str, Any]) -> str:
+    """Turn a definition back into query text that parse_query() accepts."""
+    parts = []
+    for rule in definition["rules"]:
+        if rule["field"] == "last_played":
+            prefix = "not " if rule["op"] == "not within days" else ""
+            parts.append(f"{prefix}played in {rule['value']} days")
+        elif rule["field"] == "plays" and rule["op"] == "=" and rule["value"] == 0:
+            parts.append("never played")
+        elif rule["field"] in NUMBER_FIELDS:
+            parts.append(f"{rule['field']} {rule['op']} {rule['value']}")
+        else:
+            parts.append(f"{rule['field']} {rule['op']} {shlex.quote(str(rule['value']))}")
+    text = f" {'and' if definition.get('match', 'all') == 'all' else 'or'} ".join(parts)
+    if definition.get("order", "artist") != "artist":
+        text += f" order by {definition['order']}"
+    if definition.get("limit"):
+        text += f" limit {definition['limit']}"
+    return text
+
+
+def compile_rules(definition: Dict[str, Any], now: Optional[float] = None) -> Tuple[str, List[Any]]:
+    """
+    Compile a definition's rules to an SQL condition over tracks (t) and play_stats (s).
+
+    Returns:
+        Tuple[str, List]: (condition, parameters)
+    """
+    now = time.time() if now is None else now
+    clauses, params = [], []
+    for rule in definition["rules"]:
+        field, op, value = rule["field"], rule["op"], rule["value"]
+        if field == "last_played":
+            params.append(now - int(value) * 86400)
+            clauses.append("s.last_played >= ?" if op == "within days"
+                           else "(s.last_played IS NULL OR s.last_played < ?)")
+        elif field in NUMBER_FIELDS:
+            if op not in NUMBER_OPERATORS:
+                raise ValueError(f"Unknown operator '{op}'")
+            clauses.append(f"{NUMBER_FIELDS[field]} {op} ?")
+            params.append(int(value))
+        elif field in TEXT_FIELDS:
+            column = f"t.{field}"
+            if op == "is":
+                clauses.append(f"{column} = ? COLLATE NOCASE")
+                params.append(value)
+            elif op == "is not":
+                clauses.append(f"{column} <> ? COLLATE NOCASE")
+                params.append(value)
+            elif op in ("contains", "does not contain", "starts with"):
+                negation = "NOT " if op == "does not contain" else ""
+                clauses.append(f"{column} {negation}LIKE ? ESCAPE '\\'")
+                params.append(_like_pattern(value, prefix=op == "starts with"))
+            else:
+                raise ValueError(f"Unknown operator '{op}'")
+        else:
+            raise ValueError(f"Unknown field '{field}'")
+    joiner = " AND " if definition.get("match", "all") == "all" else " OR "
+    return "(" + joiner.join(clauses) + ")", params
+
+
+def save_smart_playlist(playlist_dir: str, name: str, definition: Dict[str, Any], image_key: str = "") -> str:
+    """
+    Write a smart playlist file next to the normal playlists.
+
+    Returns:
+        str: Path of the playlist file
+    """
+    playlist_path = os.path.join(playlist_dir, f"{name}.json")
+    PlaylistStore.get_instance().save(playlist_path, {
+        "playlist_name": name,
+        "playlist_large_image_key": image_key,
+        "smart": definition,
+        "songs": [],
+    })
+    return playlist_path
+
+
+def is_time_relative(definition: Dict[str, Any]) -> bool:
+    return any(rule["field"] == "last_played" for rule in definition["rules"])
+
+
+class SmartPlaylists:
+    """
+    Singleton that evaluates smart playlists and keeps their members current.
+
+    Usage:
+        smart = SmartPlaylists.get_instance()
+        songs = smart.songs(name, definition)
+        count = smart.count(name, definition)
+    """
+
+    _instance: Optional['SmartPlaylists'] = None
+    _lock = threading.Lock()
+
+    def __init__(self, library_index: Optional[LibraryIndex] = None):
+        """
+        Initialize SmartPlaylists. Use get_instance() instead of direct instantiation.
+
+        Args:
+            library_index: Evaluate against this index instead of the singleton
+        """
+        if library_index is None and SmartPlaylists._instance is not None:
+            raise RuntimeError("Use SmartPlaylists.get_instance() to get the singleton instance")
+        self.library_index = library_index or LibraryIndex.get_instance()
+        self._smart_lock = threading.Lock()
+        # Playlists seen this session, kept current as the index changes: name -> definition
+        self._active: Dict[str, Dict[str, Any]] = {}
+        self.library_index.add_change_listener(self._on_index_changed)
+
+    @classmethod
+    def get_instance(cls) -> 'SmartPlaylists':
+        """
+        Get the singleton instance of SmartPlaylists.
+
+        Returns:
+            SmartPlaylists: The singleton instance
+        """
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def _ensure(self, name: str, definition: Dict[str, Any]) -> None:
+        """Evaluate a playlist in full if it is new, was edited or its time-relative rules are stale."""
+        encoded = json.dumps(definition, sort_keys=True)
+        with self._smart_lock:
+            state = self.library_index.smart_playlist_state(name)
+            stale = (
+                state is None
+                or state[0] != encoded
+                or (is_time_relative(definition) and time.time() - state[1] > REFRESH_SECONDS)
+            )
+            if stale:
+                where, params = compile_rules(definition)
+                self.library_index.refresh_smart_playlist(name, encoded, where, params)
+                logging.info(f"Smart playlist '{name}' evaluated")
+            self._active[name] = definition
+
+    def count(self, name: str, definition: Dict[str, Any]) -> int:
+        """Number of songs the playlist currently holds."""
+        self._ensure(name, definition)
+        count = self.library_index.smart_playlist_count(name)
+        return min(count, definition["limit"]) if definition.get("limit") else count
+
+    def songs(self, name: str, definition: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """The playlist's songs, ordered and limited as the definition says."""
+        self._ensure(name, definition)
+        order = ORDERS.get(definition.get("order", "artist"), ORDERS["artist"])
+        return self.library_index.smart_playlist_songs(name, order, definition.get("limit"))
+
+    def preview_count(self, definition: Dict[str, Any]) -> int:
+        """Number of songs a definition would select, without saving it."""
+        where, params = compile_rules(definition)
+        count = self.library_index.count_matching(where, params)
+        return min(count, definition["limit"]) if definition.get("limit") else count
+
+    def forget_except(self, names) -> None:
+        """Drop stored members of smart playlists that no longer exist."""
+        names = set(names)
+        with self._smart_lock:
+            for name in list(self._active):
+                if name not in names:
+                    del self._active[name]
+            self.library_index.drop_smart_playlists(names)
+
+    def _on_index_changed(self, paths: List[str]) -> None:
+        with self._smart_lock:
+            active = list(self._active.items())
+        for name, definition in active:
+            where, params = compile_rules(definition)
+            self.library_index.update_smart_members(name, where, params, paths)
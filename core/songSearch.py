@@ -0,0 +1,46 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/songSearch.py
+# =============
+# Fuzzy song matching used by the main window's search bar.
+# Kept free of Qt so it can be reused and benchmarked on its own.
+# =============
+from fuzzywuzzy import process
+
+# Minimum fuzzywuzzy score for a song to count as a match
+MATCH_THRESHOLD = 70
+
+
+def song_search_text(song, search_type):
+    """Return the text of a song that a search of the given type is matched against."""
+    if search_type == "Artist & Title":
+        return f"{song['artist']} - {song['title']}"
+    elif search_type == "Genre":
+        return song["genre"]
+    elif search_type == "Album":
+        return song["album"]
+    return f"{song['artist']} - {song['title']} - {song['album']} - {song['genre']}"
+
+
+def match_songs(songs, query, search_type="Artist & Title"):
+    """Return the songs whose search text fuzzily matches the query, in playlist order."""
+    results = []
+    for song in songs:
+        match = process.extractOne(query, [song_search_text(song, search_type)])
+        if match and match[1] > MATCH_THRESHOLD:
+            results.append(song)
+    return results
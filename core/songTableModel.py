@@ -0,0 +1,191 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/songTableModel.py
+# =============
+# Table model over a playlist's list of song dicts, used by the Playlist Maker.
+# The view reads the dicts directly instead of copying them into per-cell
+# items, and every bulk operation (range insert, removal, multi-row edit,
+# sort) emits a single change notification.
+# Edits made after mark_saved() are also recorded as playlist journal
+# operations (see core/playlistStore.py), so saving them costs O(change).
+# =============
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+# (header, song dict key) per column
+COLUMNS = [
+    ("Artist", "artist"),
+    ("Title", "title"),
+    ("Album", "album"),
+    ("Genre", "genre"),
+    ("Picture Path", "picture_path"),
+    ("Picture Link", "picture_link"),
+    ("YouTube ID", "youtube_id"),
+    ("Song Path", "path"),
+]
+
+
+class SongTableModel(QAbstractTableModel):
+    """
+    Editable model over a list of song dicts.
+
+    The list passed to set_songs() is used as-is, so the model and its owner
+    always see the same songs.
+    """
+
+    def __init__(self, songs=None, parent=None):
+        super().__init__(parent)
+        self._songs = songs if songs is not None else []
+        # Journal operations since the last save; only meaningful once a saved
+        # playlist has been loaded, until then a full snapshot is needed anyway.
+        self.pending_ops = []
+        self.needs_snapshot = True
+
+    @property
+    def songs(self):
+        return self._songs
+
+    # ------------------------------------------------------------------
+    # Qt model interface
+    # ------------------------------------------------------------------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._songs)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return None
+        value = self._songs[index.row()].get(COLUMNS[index.column()][1])
+        return "" if value is None else str(value)
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if not index.isValid() or role != Qt.ItemDataRole.EditRole:
+            return False
+        key = COLUMNS[index.column()][1]
+        self._songs[index.row()][key] = value
+        self._record({"op": "update", "rows": [index.row()], "fields": {key: value}})
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return COLUMNS[section][0]
+        return str(section + 1)
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsEditable
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        """Sort case-insensitively by a column, keeping selections attached to their songs."""
+        if not 0 <= column < len(COLUMNS):
+            return
+        key = COLUMNS[column][1]
+        self.layoutAboutToBeChanged.emit()
+        order_by = sorted(
+            range(len(self._songs)),
+            key=lambda row: str(self._songs[row].get(key) or "").casefold(),
+            reverse=order == Qt.SortOrder.DescendingOrder,
+        )
+        new_row = {old: new for new, old in enumerate(order_by)}
+        self._songs[:] = [self._songs[row] for row in order_by]
+        self._record({"op": "reorder", "order": order_by})
+        persistent = self.persistentIndexList()
+        self.changePersistentIndexList(
+            persistent, [self.index(new_row[index.row()], index.column()) for index in persistent]
+        )
+        self.layoutChanged.emit()
+
+    # ------------------------------------------------------------------
+    # Bulk operations
+    # ------------------------------------------------------------------
+    def set_songs(self, songs):
+        """Replace the whole list."""
+        self.beginResetModel()
+        self._songs = songs
+        self.pending_ops = []
+        self.needs_snapshot = True
+        self.endResetModel()
+
+    def insert_songs(self, row, songs):
+        """Insert songs before `row` as one range."""
+        if not songs:
+            return
+        row = max(0, min(row, len(self._songs)))
+        self.beginInsertRows(QModelIndex(), row, row + len(songs) - 1)
+        self._songs[row:row] = songs
+        self._record({"op": "insert", "row": row, "songs": [dict(song) for song in songs]})
+        self.endInsertRows()
+
+    def append_songs(self, songs):
+        self.insert_songs(len(self._songs), songs)
+
+    def remove_rows(self, rows):
+        """
+        Remove a set of rows.
+
+        A contiguous selection is removed as one range; scattered rows are
+        dropped in a single pass followed by one model reset.
+        """
+        rows = sorted(set(r for r in rows if 0 <= r < len(self._songs)))
+        if not rows:
+            return
+        self._record({"op": "remove", "rows": rows})
+        first, last = rows[0], rows[-1]
+        if last - first + 1 == len(rows):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._songs[first:last + 1]
+            self.endRemoveRows()
+            return
+        doomed = set(rows)
+        self.beginResetModel()
+        self._songs[:] = [song for row, song in enumerate(self._songs) if row not in doomed]
+        self.endResetModel()
+
+    def set_field(self, rows, key, value):
+        """Set one field on many rows, with a single dataChanged over the affected span."""
+        rows = [r for r in rows if 0 <= r < len(self._songs)]
+        if not rows:
+            return
+        for row in rows:
+            self._songs[row][key] = value
+        self._record({"op": "update", "rows": rows, "fields": {key: value}})
+        column = self.column_for_key(key)
+        self.dataChanged.emit(self.index(min(rows), column), self.index(max(rows), column))
+
+    # ------------------------------------------------------------------
+    # Change tracking
+    # ------------------------------------------------------------------
+    def mark_saved(self):
+        """The songs now match what is on disk; start recording edits from here."""
+        self.pending_ops = []
+        self.needs_snapshot = False
+
+    def _record(self, op):
+        if not self.needs_snapshot:
+            self.pending_ops.append(op)
+
+    @staticmethod
+    def column_for_key(key):
+        for column, (_, column_key) in enumerate(COLUMNS):
+            if column_key == key:
+                return column
+        raise KeyError(key)
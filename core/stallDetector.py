@@ -0,0 +1,116 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/stallDetector.py
+# =============
+# GUI event-loop stall detector.
+# A QTimer on the main thread records a heartbeat; a watchdog thread checks
+# how long ago the last heartbeat happened. When the main loop has not
+# responded for longer than the threshold, the watchdog captures the main
+# thread's Python stack with sys._current_frames() and logs it, so every
+# freeze can be attributed to the code path that caused it.
+# =============
+import sys
+import time
+import logging
+import threading
+import traceback
+from PyQt6.QtCore import QObject, QTimer
+from core import perfMetrics
+
+stall_logger = logging.getLogger('stall')
+
+
+class StallDetector(QObject):
+    """
+    Watches the Qt event loop and logs the main thread's stack during stalls.
+
+    Usage:
+        detector = StallDetector(threshold_ms=250)
+        detector.start()
+        ...
+        detector.stop()
+    """
+
+    def __init__(self, threshold_ms=250, heartbeat_ms=100, parent=None):
+        super().__init__(parent)
+        self.threshold = threshold_ms / 1000.0
+        self.heartbeat_interval = heartbeat_ms / 1000.0
+        self._main_thread_id = threading.main_thread().ident
+        self._last_beat = time.monotonic()
+        self._stall_reported = False
+        self._stall_stack = ""
+        self._stop_event = threading.Event()
+        self._watchdog = None
+
+        self._heartbeat_timer = QTimer(self)
+        self._heartbeat_timer.setInterval(heartbeat_ms)
+        self._heartbeat_timer.timeout.connect(self._beat)
+
+    def start(self):
+        if self._watchdog is not None:
+            return
+        self._last_beat = time.monotonic()
+        self._stop_event.clear()
+        self._heartbeat_timer.start()
+        self._watchdog = threading.Thread(target=self._watch, name="IotaStallWatchdog", daemon=True)
+        self._watchdog.start()
+        stall_logger.info(f"Stall detector started (threshold {self.threshold * 1000:.0f} ms)")
+
+    def stop(self):
+        self._heartbeat_timer.stop()
+        self._stop_event.set()
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    def _beat(self):
+        """Runs on the main thread whenever the event loop is responsive."""
+        now = time.monotonic()
+        if self._stall_reported:
+            # The loop is back; report how long it was blocked in total.
+            stall_ms = (now - self._last_beat - self.heartbeat_interval) * 1000.0
+            self._stall_reported = False
+            if stall_ms < self.threshold * 1000.0:
+                # The watchdog raced with a heartbeat that was already on its way
+                self._last_beat = now
+                return
+            stall_logger.warning(f"GUI event loop stall ended after {stall_ms:.0f} ms")
+            perfMetrics.increment("gui.stalls")
+            perfMetrics.set_gauge("gui.stall_last_ms", round(stall_ms))
+            metrics = perfMetrics.PerfMetrics.get_instance()
+            if metrics.enabled:
+                metrics.record_span("gui.stall", stall_ms, {"stack": self._stall_stack})
+        self._last_beat = now
+
+    def _watch(self):
+        """Runs on the watchdog thread and samples the main stack once per stall."""
+        poll = min(self.heartbeat_interval, self.threshold / 2)
+        while not self._stop_event.wait(poll):
+            lag = time.monotonic() - self._last_beat - self.heartbeat_interval
+            if lag < self.threshold or self._stall_reported:
+                continue
+            self._stall_stack = self._capture_main_stack()
+            self._stall_reported = True
+            stall_logger.warning(
+                f"GUI event loop blocked for {lag * 1000:.0f} ms. Main thread stack:\n{self._stall_stack}"
+            )
+
+    def _capture_main_stack(self):
+        frame = sys._current_frames().get(self._main_thread_id)
+        if frame is None:
+            return "<main thread stack unavailable>"
+        return "".join(traceback.format_stack(frame))
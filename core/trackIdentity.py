@@ -0,0 +1,543 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/trackIdentity.py
+# =============
+# Content identity for audio files, used to spot the same track stored
+# under different paths.
+#
+# The content hash covers only the encoded audio payload: ID3/APE tags,
+# FLAC metadata blocks, Ogg codec header packets and everything outside an MP4
+# 'mdat' or WAV 'data' chunk are skipped, so retagging a file or changing
+# its cover art does not change its identity. Large payloads are hashed
+# from three fixed-size samples plus their length, so hashing costs the
+# same for every file. Content hashes are cached in the library index.
+#
+# An optional acoustic fingerprint (band-energy sign bits over decoded PCM,
+# requires ffmpeg) also matches re-encodes of the same recording.
+# Fingerprints are cached in the blob store. They cover only the first two
+# minutes, so fingerprint matching compares only tracks whose real length
+# (read from the file's headers and cached with the hash) is about the same.
+# =============
+import os
+import struct
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from core.audioDecode import decode_pcm
+from core.libraryIndex import LibraryIndex, file_signature
+from core.blobStore import BlobStore
+
+# Payloads up to this size are hashed completely
+FULL_HASH_LIMIT = 1024 * 1024
+# Otherwise this much is hashed from the start, middle and end of the payload
+SAMPLE_SIZE = 256 * 1024
+
+# Acoustic fingerprint parameters
+FINGERPRINT_RATE = 5512
+FINGERPRINT_FRAME = 2048
+FINGERPRINT_HOP = 512
+FINGERPRINT_SECONDS = 120
+FINGERPRINT_BANDS = 33
+# Fraction of matching bits above which two fingerprints are the same recording
+FINGERPRINT_MATCH = 0.65
+# Frame offsets tried when aligning two fingerprints
+FINGERPRINT_MAX_SHIFT = 40
+# Tracks whose lengths differ by more than this many seconds are never compared
+DURATION_TOLERANCE = 1.0
+# First pass over every n-th frame; unrelated tracks score about 0.5, so pairs
+# more than the margin below FINGERPRINT_MATCH skip the full comparison
+_COARSE_STEP = 8
+_COARSE_MARGIN = 0.1
+
+UNSORTED_SOURCE = "Unsorted Music"
+FINGERPRINT_KIND = "fingerprint"
+
+# (content hash, fingerprint, length in seconds) of a file, see track_identities()
+Identity = Tuple[str, Optional[np.ndarray], Optional[float]]
+
+
+def normalize_path(path: str) -> str:
+    return path.replace("\\", "/")
+
+
+# ----------------------------------------------------------------------
+# Payload location
+# ----------------------------------------------------------------------
+def _id3v2_length(head: bytes) -> int:
+    """Length of a leading ID3v2 tag (header, body and footer), or 0."""
+    if len(head) < 10 or head[:3] != b"ID3":
+        return 0
+    size = (head[6] & 0x7F) << 21 | (head[7] & 0x7F) << 14 | (head[8] & 0x7F) << 7 | (head[9] & 0x7F)
+    footer = 10 if head[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _trailing_tags_length(f, start: int, end: int) -> int:
+    """Length of ID3v1 and APEv2 tags at the end of an MPEG stream."""
+    trimmed = 0
+    if end - start >= 128:
+        f.seek(end - 128)
+        if f.read(3) == b"TAG":
+            trimmed += 128
+    if end - trimmed - start >= 32:
+        f.seek(end - trimmed - 32)
+        footer = f.read(32)
+        if footer[:8] == b"APETAGEX":
+            tag_size, _, flags = struct.unpack("<III", footer[12:24])
+            trimmed += tag_size + (32 if flags & 0x80000000 else 0)
+    return trimmed
+
+
+def _flac_ranges(f, offset: int, end: int) -> List[Tuple[int, int]]:
+    f.seek(offset + 4)  # "fLaC"
+    position = offset + 4
+    while position < end:
+        header = f.read(4)
+        if len(header) < 4:
+            break
+        length = int.from_bytes(header[1:4], "big")
+        position += 4 + length
+        if header[0] & 0x80:  # Last metadata block
+            break
+        f.seek(position)
+    return [(position, end - position)]
+
+
+def _ogg_ranges(f, offset: int, end: int) -> List[Tuple[int, int]]:
+    """Page bodies after the codec header packets (Vorbis has three, Opus two)."""
+    ranges = []
+    position = offset
+    header_packets = None
+    while position + 27 <= end:
+        f.seek(position)
+        header = f.read(27)
+        if header[:4] != b"OggS":
+            break
+        lacing = f.read(header[26])
+        body_start = position + 27 + header[26]
+        if header_packets is None:
+            first_packet = f.read(8)
+            header_packets = 3 if first_packet[1:7] == b"vorbis" else 2 if first_packet == b"OpusHead" else 1
+        skip = 0
+        if header_packets:
+            # A lacing value below 255 ends a packet
+            for value in lacing:
+                skip += value
+                if value < 255:
+                    header_packets -= 1
+                    if not header_packets:
+                        break
+        body = sum(lacing)
+        if not header_packets and body > skip:
+            ranges.append((body_start + skip, body - skip))
+        position = body_start + body
+    return ranges
+
+
+def _mp4_ranges(f, offset: int, end: int) -> List[Tuple[int, int]]:
+    ranges = []
+    position = offset
+    while position + 8 <= end:
+        f.seek(position)
+        header = f.read(16)
+        size, kind = struct.unpack(">I4s", header[:8])
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", header[8:16])[0]
+            header_size = 16
+        elif size == 0:
+            size = end - position
+        if size < header_size:
+            break
+        if kind == b"mdat":
+            ranges.append((position + header_size, min(size, end - position) - header_size))
+        position += size
+    return ranges
+
+
+def _wav_ranges(f, offset: int, end: int) -> List[Tuple[int, int]]:
+    position = offset + 12  # "RIFF" <size> "WAVE"
+    while position + 8 <= end:
+        f.seek(position)
+        kind, size = struct.unpack("<4sI", f.read(8))
+        if kind == b"data":
+            return [(position + 8, min(size, end - position - 8))]
+        position += 8 + size + (size & 1)
+    return []
+
+
+def payload_ranges(path: str) -> List[Tuple[int, int]]:
+    """
+    Locate the encoded audio inside a file.
+
+    Args:
+        path: Audio file
+
+    Returns:
+        List[Tuple[int, int]]: (offset, length) byte ranges that together form
+        the audio payload; the whole file if the container is not recognised
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.read(16)
+        start = _id3v2_length(head)
+        if start:
+            f.seek(start)
+            head = f.read(16)
+        try:
+            if head[:4] == b"fLaC":
+                ranges = _flac_ranges(f, start, size)
+            elif head[:4] == b"OggS":
+                ranges = _ogg_ranges(f, start, size)
+            elif head[4:8] == b"ftyp":
+                ranges = _mp4_ranges(f, start, size)
+            elif head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+                ranges = _wav_ranges(f, start, size)
+            else:
+                ranges = [(start, size - start - _trailing_tags_length(f, start, size))]
+        except struct.error:
+            ranges = []
+    ranges = [(offset, length) for offset, length in ranges if length > 0]
+    return ranges or [(0, size)]
+
+
+def _read_payload(f, ranges, start: int, length: int) -> bytes:
+    """Read `length` bytes starting at `start` within the concatenated ranges."""
+    chunks = []
+    for offset, range_length in ranges:
+        if length <= 0:
+            break
+        if start >= range_length:
+            start -= range_length
+            continue
+        take = min(range_length - start, length)
+        f.seek(offset + start)
+        chunks.append(f.read(take))
+        length -= take
+        start = 0
+    return b"".join(chunks)
+
+
+def payload_hash(path: str) -> str:
+    """
+    Hash the audio payload of a file, ignoring its tags.
+
+    Args:
+        path: Audio file
+
+    Returns:
+        str: Hex digest; equal for files with identical audio data
+    """
+    ranges = payload_ranges(path)
+    total = sum(length for _, length in ranges)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        if total <= FULL_HASH_LIMIT:
+            digest.update(_read_payload(f, ranges, 0, total))
+        else:
+            digest.update(total.to_bytes(8, "little"))
+            for start in (0, (total - SAMPLE_SIZE) // 2, total - SAMPLE_SIZE):
+                digest.update(_read_payload(f, ranges, start, SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+# ----------------------------------------------------------------------
+# Acoustic fingerprint
+# ----------------------------------------------------------------------
+def acoustic_fingerprint(path: str) -> Optional[np.ndarray]:
+    """
+    Compute an acoustic fingerprint from the first two minutes of a track.
+
+    Each frame yields 32 bits: the sign of the change, from one frame to the
+    next, of the energy difference between adjacent log-spaced bands
+    between 300 and 2000 Hz.
+
+    Args:
+        path: Audio file
+
+    Returns:
+        np.ndarray | None: One little-endian uint32 per frame; None if the file
+        could not be decoded (for example because ffmpeg is not installed)
+    """
+    samples = decode_pcm(path, FINGERPRINT_RATE, 1, FINGERPRINT_SECONDS)
+    if samples is None or len(samples) < FINGERPRINT_FRAME * 2:
+        return None
+    frame_count = 1 + (len(samples) - FINGERPRINT_FRAME) // FINGERPRINT_HOP
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FINGERPRINT_FRAME)[::FINGERPRINT_HOP][:frame_count]
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(FINGERPRINT_FRAME), axis=1)) ** 2
+
+    edges = np.geomspace(300, 2000, FINGERPRINT_BANDS + 1)
+    bins = np.round(edges * FINGERPRINT_FRAME / FINGERPRINT_RATE).astype(int)
+    energy = np.add.reduceat(spectrum, bins[:-1], axis=1)[:, :FINGERPRINT_BANDS]
+
+    band_delta = energy[:, :-1] - energy[:, 1:]
+    bits = (band_delta[1:] - band_delta[:-1]) > 0
+    weights = (1 << np.arange(FINGERPRINT_BANDS - 1, dtype=np.uint64))
+    return (bits.astype(np.uint64) * weights).sum(axis=1).astype("<u4")
+
+
+def fingerprint_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Compare two fingerprints.
+
+    Args:
+        a, b: Fingerprints from acoustic_fingerprint()
+
+    Returns:
+        float: Best fraction of matching bits over small alignment offsets, 0..1
+    """
+    x = np.asarray(a, dtype="<u4")
+    y = np.asarray(b, dtype="<u4")
+    best = 0.0
+    for shift in range(-FINGERPRINT_MAX_SHIFT, FINGERPRINT_MAX_SHIFT + 1):
+        left = x[max(0, shift):]
+        right = y[max(0, -shift):]
+        length = min(len(left), len(right))
+        if length < 16:
+            continue
+        differing = int(np.bitwise_count(left[:length] ^ right[:length]).sum())
+        best = max(best, 1.0 - differing / (32.0 * length))
+    return best
+
+
+def track_duration(path: str) -> Optional[float]:
+    """Length of a track in seconds, read from its headers; None if mutagen cannot tell."""
+    from mutagen import File as MutagenFile
+    try:
+        audio = MutagenFile(path)
+    except Exception:
+        return None
+    length = getattr(getattr(audio, "info", None), "length", None)
+    return float(length) if length else None
+
+
+def _may_match(a: np.ndarray, b: np.ndarray) -> bool:
+    """Cheap first pass of fingerprint_similarity() over every _COARSE_STEP-th frame, at every shift."""
+    shift = FINGERPRINT_MAX_SHIFT
+    length = min(len(a), len(b)) - 2 * shift
+    if length < 16 * _COARSE_STEP:
+        return True
+    frames = np.asarray(a, dtype="<u4")[shift:shift + length:_COARSE_STEP]
+    windows = np.lib.stride_tricks.sliding_window_view(np.asarray(b, dtype="<u4")[:length + 2 * shift], length)
+    differing = np.bitwise_count(windows[:, ::_COARSE_STEP] ^ frames).sum(axis=1).min()
+    return 1.0 - differing / (32.0 * len(frames)) >= FINGERPRINT_MATCH - _COARSE_MARGIN
+
+
+# ----------------------------------------------------------------------
+# Cached identities
+# ----------------------------------------------------------------------
+def track_identities(paths: Iterable[str], with_fingerprint: bool = False,
+                     library_index: Optional[LibraryIndex] = None, workers: int = 4,
+                     blob_store: Optional[BlobStore] = None) -> Dict[str, Identity]:
+    """
+    Return the content identity of many files, computing only what the index lacks.
+
+    Args:
+        paths: Audio files; missing files are left out of the result
+        with_fingerprint: Also compute acoustic fingerprints and track lengths
+        library_index: Index to cache identities in; the singleton by default
+        workers: Threads used to hash files that are not cached
+        blob_store: Store to cache fingerprints in; the singleton by default
+
+    Returns:
+        Dict[str, Tuple[str, np.ndarray | None, float | None]]: normalized path ->
+        (content hash, fingerprint, length in seconds; 0 if unknown)
+    """
+    paths = list(dict.fromkeys(normalize_path(p) for p in paths if p))
+    index = library_index or LibraryIndex.get_instance()
+    try:
+        cached = index.cached_identities(paths)
+    except Exception as e:
+        logging.error(f"Library index unavailable, hashing all files: {e}")
+        index, cached = None, {}
+
+    store = None
+    if with_fingerprint:
+        try:
+            store = blob_store or BlobStore.get_instance()
+        except OSError as e:
+            logging.error(f"Fingerprint cache unavailable: {e}")
+
+    result, stale = {}, []
+    for path in paths:
+        try:
+            mtime, size = file_signature(path)
+        except OSError:
+            continue
+        entry = cached.get(path)
+        current = entry is not None and entry[0] == mtime and entry[1] == size
+        content_hash, duration = (entry[2], entry[3]) if current else (None, None)
+        fingerprint = store.get(FINGERPRINT_KIND, path, (mtime, size)) if store is not None else None
+        if content_hash and (not with_fingerprint or (fingerprint is not None and duration is not None)):
+            result[path] = (content_hash, fingerprint, duration)
+        else:
+            stale.append((path, mtime, size, content_hash, fingerprint, duration))
+
+    def compute(item):
+        path, mtime, size, content_hash, fingerprint, duration = item
+        try:
+            fresh_fingerprint = acoustic_fingerprint(path) if with_fingerprint and fingerprint is None else None
+            if with_fingerprint and duration is None:
+                duration = track_duration(path) or 0.0
+            return path, mtime, size, content_hash or payload_hash(path), fingerprint, fresh_fingerprint, duration
+        except OSError as e:
+            logging.warning(f"Cannot identify {path}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        fresh = [entry for entry in pool.map(compute, stale) if entry is not None]
+    for path, _, _, content_hash, fingerprint, fresh_fingerprint, duration in fresh:
+        result[path] = (content_hash, fingerprint if fresh_fingerprint is None else fresh_fingerprint, duration)
+    if index is not None and fresh:
+        try:
+            index.store_identities((path, mtime, size, content_hash, duration)
+                                   for path, mtime, size, content_hash, _, _, duration in fresh)
+        except Exception as e:
+            logging.error(f"Failed to cache track identities: {e}")
+    if store is not None:
+        try:
+            store.put_many(FINGERPRINT_KIND, ((path, (mtime, size), fresh_fingerprint)
+                                              for path, mtime, size, _, _, fresh_fingerprint, _ in fresh
+                                              if fresh_fingerprint is not None))
+        except OSError as e:
+            logging.error(f"Failed to cache fingerprints: {e}")
+    return result
+
+
+def identity_key(path: str, identities: Dict[str, Identity]) -> str:
+    """Dedupe key for a path: its content hash, or its resolved path if it could not be hashed."""
+    path = normalize_path(path)
+    entry = identities.get(path)
+    if entry is not None:
+        return entry[0]
+    return os.path.normcase(os.path.realpath(path))
+
+
+# ----------------------------------------------------------------------
+# Duplicate report
+# ----------------------------------------------------------------------
+def _library_sources(playlist_dir: str, unsorted_folder: str, extensions) -> Dict[str, List[str]]:
+    """Map every referenced audio file to the playlists (and Unsorted Music) it appears in."""
+    from core.playlistStore import read_playlist
+    from core.folderScanner import iter_audio_files
+
+    sources: Dict[str, List[str]] = {}
+    if playlist_dir and os.path.isdir(playlist_dir):
+        for filename in sorted(os.listdir(playlist_dir)):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                data = read_playlist(os.path.join(playlist_dir, filename))
+            except (OSError, ValueError) as e:
+                logging.warning(f"Skipping playlist {filename}: {e}")
+                continue
+            name = data.get("playlist_name", os.path.splitext(filename)[0])
+            for song in data.get("songs", []):
+                path = normalize_path(song.get("path", "").strip())
+                if path and name not in sources.setdefault(path, []):
+                    sources[path].append(name)
+    if unsorted_folder and os.path.isdir(unsorted_folder):
+        for path in iter_audio_files(unsorted_folder, extensions):
+            sources.setdefault(normalize_path(path), []).append(UNSORTED_SOURCE)
+    return sources
+
+
+def find_duplicates(playlist_dir: str, unsorted_folder: str = "", use_fingerprint: bool = False,
+                    extensions=(".mp3", ".wav", ".flac", ".ogg", ".m4a"),
+                    library_index: Optional[LibraryIndex] = None,
+                    blob_store: Optional[BlobStore] = None) -> List[Dict]:
+    """
+    Find audio files stored more than once across all playlists and the unsorted folder.
+
+    Args:
+        playlist_dir: Folder with the playlist JSON files
+        unsorted_folder: Unsorted music folder, if any
+        use_fingerprint: Also group different files of the same recording by acoustic fingerprint
+        extensions: Audio file extensions to pick up from the unsorted folder
+        library_index: Index to cache identities in; the singleton by default
+        blob_store: Store to cache fingerprints in; the singleton by default
+
+    Returns:
+        List[Dict]: One entry per group of two or more distinct files:
+        {"content_hash": str, "match": "content" | "acoustic", "paths": {path: [sources]}}
+    """
+    sources = _library_sources(playlist_dir, unsorted_folder, extensions)
+    identities = track_identities(sources, use_fingerprint, library_index, blob_store=blob_store)
+
+    by_hash: Dict[str, List[str]] = {}
+    for path, (content_hash, _, _) in identities.items():
+        by_hash.setdefault(content_hash, []).append(path)
+
+    groups = []
+    singles = []
+    for content_hash, paths in by_hash.items():
+        if len(paths) > 1:
+            groups.append({
+                "content_hash": content_hash,
+                "match": "content",
+                "paths": {path: sources[path] for path in sorted(paths)},
+            })
+        else:
+            singles.append(paths[0])
+
+    if use_fingerprint:
+        groups.extend(_acoustic_groups(singles, identities, sources))
+    groups.sort(key=lambda group: next(iter(group["paths"])))
+    return groups
+
+
+def _acoustic_groups(paths, identities, sources) -> List[Dict]:
+    """Group files whose fingerprints match, comparing only tracks of about the same length."""
+    timed = []
+    for path in paths:
+        _, fingerprint, duration = identities[path]
+        if fingerprint is not None and len(fingerprint):
+            # Without a length from the headers, the fingerprint's is exact for tracks under two minutes
+            timed.append((duration or len(fingerprint) * FINGERPRINT_HOP / FINGERPRINT_RATE, path))
+    timed.sort()
+
+    parent = {path: path for _, path in timed}
+
+    def root(path):
+        while parent[path] != path:
+            parent[path] = parent[parent[path]]
+            path = parent[path]
+        return path
+
+    for i, (duration, a) in enumerate(timed):
+        for other_duration, b in timed[i + 1:]:
+            if other_duration - duration > DURATION_TOLERANCE:
+                break
+            if root(a) != root(b) and _may_match(identities[a][1], identities[b][1]) and \
+                    fingerprint_similarity(identities[a][1], identities[b][1]) >= FINGERPRINT_MATCH:
+                parent[root(b)] = root(a)
+
+    grouped: Dict[str, List[str]] = {}
+    for path in parent:
+        grouped.setdefault(root(path), []).append(path)
+    return [
+        {
+            "content_hash": identities[members[0]][0],
+            "match": "acoustic",
+            "paths": {path: sources[path] for path in sorted(members)},
+        }
+        for members in grouped.values() if len(members) > 1
+    ]
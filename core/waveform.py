@@ -0,0 +1,155 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/waveform.py
+# =============
+# Waveform thumbnails for the seek bar.
+#
+# Each track is decoded once (mono, 8 kHz, streamed from ffmpeg) and
+# reduced to WAVEFORM_BUCKETS min/max pairs quantized to uint8, about 2 KB
+# per track. The peaks are stored in the blob store, so the seek bar can
+# draw a track's waveform as soon as it starts playing.
+# =============
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from core.audioDecode import iter_pcm
+from core.blobStore import BlobStore
+from core.libraryIndex import file_signature
+from core.workQueue import PathQueue
+from core import perfMetrics
+
+WAVEFORM_RATE = 8000
+WAVEFORM_BUCKETS = 1024
+WAVEFORM_KIND = "waveform"
+# Samples reduced to one min/max pair while streaming (8 ms)
+_WINDOW = 64
+
+
+def compute_peaks(path: str, buckets: int = WAVEFORM_BUCKETS) -> Optional[bytes]:
+    """
+    Decode a track and reduce it to min/max peaks.
+
+    Args:
+        path: Audio file
+        buckets: Number of min/max pairs to produce
+
+    Returns:
+        bytes | None: `buckets` interleaved (min, max) uint8 pairs, where 0 is -1.0
+        and 255 is +1.0; None if the file could not be decoded
+    """
+    blocks = iter_pcm(path, WAVEFORM_RATE, 1)
+    if blocks is None:
+        return None
+    mins, maxs = [], []
+    for block in blocks:
+        samples = block[:, 0]
+        whole = len(samples) // _WINDOW * _WINDOW
+        if whole:
+            windows = samples[:whole].reshape(-1, _WINDOW)
+            mins.append(windows.min(axis=1))
+            maxs.append(windows.max(axis=1))
+        if whole < len(samples):
+            mins.append(samples[whole:].min(keepdims=True))
+            maxs.append(samples[whole:].max(keepdims=True))
+    if not mins:
+        return None
+    mins = np.concatenate(mins)
+    maxs = np.concatenate(maxs)
+
+    count = len(mins)
+    if count >= buckets:
+        starts = np.linspace(0, count, buckets + 1).astype(int)[:-1]
+        mins = np.minimum.reduceat(mins, starts)
+        maxs = np.maximum.reduceat(maxs, starts)
+    else:
+        # Very short track: stretch rather than leave the bar partly empty
+        picks = np.arange(buckets) * count // buckets
+        mins, maxs = mins[picks], maxs[picks]
+
+    pairs = np.stack([mins, maxs], axis=1)
+    return np.clip(np.round((pairs + 1.0) * 127.5), 0, 255).astype(np.uint8).tobytes()
+
+
+def decode_peaks(peaks) -> Tuple[np.ndarray, np.ndarray]:
+    """Unpack peaks (bytes or a uint8 array) into (mins, maxs) float arrays in [-1, 1]."""
+    pairs = np.frombuffer(peaks, dtype=np.uint8).reshape(-1, 2).astype(np.float32) / 127.5 - 1.0
+    return pairs[:, 0], pairs[:, 1]
+
+
+def cached_peaks(path: str, blob_store: Optional[BlobStore] = None) -> Optional[np.ndarray]:
+    """
+    Return stored peaks for a file as a read-only uint8 view of the blob store,
+    or None if they are missing or the file has changed since.
+    """
+    path = path.replace("\\", "/")
+    try:
+        store = blob_store or BlobStore.get_instance()
+        return store.get(WAVEFORM_KIND, path, file_signature(path))
+    except OSError:
+        return None
+
+
+class WaveformGenerator(QThread):
+    """
+    Computes waveform peaks in the background, one track at a time.
+
+    Signals:
+        ready(path, peaks): after each track's peaks are computed and stored
+    """
+    ready = pyqtSignal(str, bytes)
+
+    def __init__(self, blob_store: Optional[BlobStore] = None, parent=None):
+        super().__init__(parent)
+        self.blob_store = blob_store
+        self.queue = PathQueue()
+
+    def enqueue(self, paths) -> None:
+        self.queue.enqueue(paths)
+
+    def prioritize(self, path: str) -> None:
+        self.queue.prioritize(path)
+
+    def stop(self) -> None:
+        self.queue.close()
+        self.wait()
+
+    def run(self):
+        store = self.blob_store or BlobStore.get_instance()
+        while True:
+            batch = self.queue.take(1)
+            if not batch:
+                break
+            path = batch[0]
+            if cached_peaks(path, store) is not None:
+                continue
+            try:
+                mtime, size = file_signature(path)
+                with perfMetrics.span("waveform.compute"):
+                    peaks = compute_peaks(path)
+            except OSError as e:
+                logging.warning(f"Waveform generation failed for {path}: {e}")
+                continue
+            if peaks is None:
+                continue
+            try:
+                store.put(WAVEFORM_KIND, path, (mtime, size), peaks)
+            except OSError as e:
+                logging.error(f"Failed to store waveform: {e}")
+            self.ready.emit(path, peaks)
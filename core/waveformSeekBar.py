@@ -0,0 +1,115 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/waveformSeekBar.py
+# =============
+# Seek bar that draws the current track's waveform (see core/waveform.py).
+# It is a QSlider, so value(), setValue() and sliderReleased work as
+# before; without peaks it paints as a plain slider.
+# =============
+import numpy as np
+from PyQt6.QtCore import Qt, QLineF
+from PyQt6.QtGui import QPainter, QPen, QPalette
+from PyQt6.QtWidgets import QSlider, QStyle
+
+from core.waveform import decode_peaks
+
+
+class WaveformSeekBar(QSlider):
+    """Horizontal slider with a min/max waveform behind the play position."""
+
+    WAVEFORM_HEIGHT = 40
+
+    def __init__(self, parent=None):
+        super().__init__(Qt.Orientation.Horizontal, parent)
+        self._mins = None
+        self._maxs = None
+        self._columns = None  # ((width, height), lines) for the last painted size
+
+    def set_peaks(self, peaks):
+        """Show a waveform from stored peaks (bytes or a uint8 array), or a plain slider for None."""
+        if peaks is not None and len(peaks):
+            self._mins, self._maxs = decode_peaks(peaks)
+            self.setMinimumHeight(self.WAVEFORM_HEIGHT)
+        else:
+            self._mins = self._maxs = None
+            self.setMinimumHeight(0)
+        self._columns = None
+        self.update()
+
+    def has_waveform(self):
+        return self._mins is not None
+
+    def mousePressEvent(self, event):
+        # Jump straight to the clicked position instead of paging towards it
+        if self.has_waveform() and event.button() == Qt.MouseButton.LeftButton:
+            self.setValue(QStyle.sliderValueFromPosition(
+                self.minimum(), self.maximum(), int(event.position().x()), max(1, self.width())
+            ))
+            self.setSliderDown(True)
+            event.accept()
+            return
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if self.has_waveform() and self.isSliderDown():
+            self.setValue(QStyle.sliderValueFromPosition(
+                self.minimum(), self.maximum(), int(event.position().x()), max(1, self.width())
+            ))
+            event.accept()
+            return
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        if self.has_waveform() and self.isSliderDown():
+            self.setSliderDown(False)  # Emits sliderReleased
+            event.accept()
+            return
+        super().mouseReleaseEvent(event)
+
+    def _lines(self, width, height):
+        """Per-pixel-column waveform lines, rebuilt only when the size changes."""
+        if self._columns is None or self._columns[0] != (width, height):
+            starts = np.linspace(0, len(self._mins), width + 1).astype(int)[:-1]
+            starts = np.minimum(starts, len(self._mins) - 1)
+            mins = np.minimum.reduceat(self._mins, starts) if width <= len(self._mins) else self._mins[starts]
+            maxs = np.maximum.reduceat(self._maxs, starts) if width <= len(self._maxs) else self._maxs[starts]
+            middle = height / 2.0
+            tops = middle - maxs * (middle - 1)
+            bottoms = middle - mins * (middle - 1)
+            lines = [QLineF(x + 0.5, top, x + 0.5, max(bottom, top + 1))
+                     for x, (top, bottom) in enumerate(zip(tops.tolist(), bottoms.tolist()))]
+            self._columns = ((width, height), lines)
+        return self._columns[1]
+
+    def paintEvent(self, event):
+        if not self.has_waveform():
+            super().paintEvent(event)
+            return
+        width, height = self.width(), self.height()
+        lines = self._lines(width, height)
+        span = self.maximum() - self.minimum()
+        played = int(width * (self.value() - self.minimum()) / span) if span else 0
+
+        painter = QPainter(self)
+        palette = self.palette()
+        painter.setPen(QPen(palette.color(QPalette.ColorRole.Highlight), 1))
+        painter.drawLines(lines[:played])
+        painter.setPen(QPen(palette.color(QPalette.ColorRole.Mid), 1))
+        painter.drawLines(lines[played:])
+        painter.setPen(QPen(palette.color(QPalette.ColorRole.WindowText), 2))
+        painter.drawLine(played, 0, played, height)
+        painter.end()
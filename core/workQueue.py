@@ -0,0 +1,92 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/workQueue.py
+# =============
+# Thread-safe queue of file paths for background analysis workers
+# (loudness, waveforms). Each path is processed once per session; the
+# track about to play can be moved to the front.
+# =============
+import threading
+from collections import deque
+from typing import Iterable, List
+
+
+class PathQueue:
+    """
+    FIFO of unique, normalized paths with a priority lane.
+
+    Usage:
+        queue.enqueue(paths)          # from the GUI thread
+        batch = queue.take(8)         # from the worker; blocks, [] once closed
+        queue.close()
+    """
+
+    def __init__(self):
+        self._items = deque()
+        self._queued = set()
+        self._seen = set()
+        self._condition = threading.Condition()
+        self._closed = False
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def enqueue(self, paths: Iterable[str]) -> None:
+        """Append paths that have not been queued or taken before."""
+        with self._condition:
+            for path in paths:
+                path = path.replace("\\", "/")
+                if path and path not in self._queued and path not in self._seen:
+                    self._items.append(path)
+                    self._queued.add(path)
+            self._condition.notify()
+
+    def prioritize(self, path: str) -> None:
+        """Move a path to the front, adding it if needed. Paths already taken are ignored."""
+        path = path.replace("\\", "/")
+        with self._condition:
+            if path in self._seen:
+                return
+            if path in self._queued:
+                self._items.remove(path)
+            self._items.appendleft(path)
+            self._queued.add(path)
+            self._condition.notify()
+
+    def take(self, count: int) -> List[str]:
+        """
+        Remove up to `count` paths, waiting until at least one is available.
+
+        Returns:
+            List[str]: The paths, or an empty list once the queue is closed
+        """
+        with self._condition:
+            while not self._items and not self._closed:
+                self._condition.wait()
+            if self._closed:
+                return []
+            batch = [self._items.popleft() for _ in range(min(count, len(self._items)))]
+            self._queued.difference_update(batch)
+            self._seen.update(batch)
+            return batch
+
+    def close(self) -> None:
+        """Wake the worker and make every further take() return []."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
@@ -0,0 +1,353 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/youtubeSync.py
+# =============
+# Incremental sync of a local playlist to the YouTube playlist it was
+# uploaded to.
+#
+# youtube_sync.json in the config directory maps local playlist names to
+# remote playlist ids. A sync lists the remote items (paged), matches them
+# to the local youtube_id list (the n-th remote copy of a video to its n-th
+# local copy) and applies only the difference: deletes for remote items
+# without a local match, moves for matched items outside the longest run
+# already in local order, and inserts at their final positions. Quota use
+# (50 units per write, 1 per listed page) therefore follows what changed,
+# not the playlist length.
+#
+# publish_playlist() decides between a sync and a (resumable) upload for
+# the player's upload thread and builds its result message.
+# =============
+import os
+import json
+import logging
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from googleapiclient.errors import HttpError
+
+from core.configManager import ConfigManager
+from core.playlistStore import atomic_write_json
+from core.google import create_youtube_playlist
+from core.youtubeUpload import (
+    HttpPool, PlaylistUploader, UploadJournal, execute_with_backoff, fetch_playlist_items, journal_path_for, plan_moves,
+)
+
+Progress = Callable[[str], None]
+
+
+class SyncPlan:
+    """
+    Changes that turn a remote playlist into the local order, applied in this order.
+
+    Attributes:
+        deletes: Playlist item ids to delete
+        moves: (item id, video id, position) for matched items, positions counted after the deletes
+        inserts: (video id, position) in ascending position, counted after the moves
+    """
+
+    def __init__(self, deletes: List[str], moves: List[Tuple[str, str, int]], inserts: List[Tuple[str, int]]):
+        self.deletes = deletes
+        self.moves = moves
+        self.inserts = inserts
+
+    @property
+    def writes(self) -> int:
+        return len(self.deletes) + len(self.moves) + len(self.inserts)
+
+
+def plan_sync(remote: List[Tuple[str, str]], local: List[str]) -> SyncPlan:
+    """
+    Compute the minimal set of writes that turns `remote` into `local`.
+
+    Args:
+        remote: (playlist item id, video id) pairs in remote order
+        local: Video ids in local order; a video may appear more than once
+
+    Returns:
+        SyncPlan: Deletes, moves and inserts
+    """
+    # Pair the n-th remote copy of each video with its n-th local copy
+    local_positions = defaultdict(list)
+    for position, video_id in enumerate(local):
+        local_positions[video_id].append(position)
+    used = defaultdict(int)
+    deletes = []
+    matched: Dict[int, str] = {}  # local position -> remote item id
+    kept: List[str] = []  # matched item ids in remote order
+    videos: Dict[str, str] = {}
+    for item_id, video_id in remote:
+        copies = local_positions.get(video_id, ())
+        if used[video_id] < len(copies):
+            matched[copies[used[video_id]]] = item_id
+            used[video_id] += 1
+            kept.append(item_id)
+            videos[item_id] = video_id
+        else:
+            deletes.append(item_id)
+    target = [matched[position] for position in sorted(matched)]
+    moves = [(item_id, videos[item_id], position) for item_id, position in plan_moves(kept, target)]
+    # Every local item before an insert exists by the time it is made
+    inserts = [(video_id, position) for position, video_id in enumerate(local) if position not in matched]
+    return SyncPlan(deletes, moves, inserts)
+
+
+class SyncRegistry:
+    """
+    Remote playlist ids of local playlists, kept in youtube_sync.json.
+
+    Usage:
+        registry = SyncRegistry.get_instance()
+        registry.remote_playlist("Road Trip")        # None if never uploaded
+        registry.remember("Road Trip", "PLxxxx")
+    """
+
+    _instance: Optional['SyncRegistry'] = None
+    _lock = threading.Lock()
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize SyncRegistry. Use get_instance() instead of direct instantiation.
+
+        Args:
+            path: Registry file instead of youtube_sync.json in the config directory
+        """
+        if path is None and SyncRegistry._instance is not None:
+            raise RuntimeError("Use SyncRegistry.get_instance() to get the singleton instance")
+        if path is None:
+            path = os.path.join(ConfigManager.get_instance().get_config_dir(), "youtube_sync.json")
+        self.path = path
+        self._registry_lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self._playlists: Dict[str, str] = json.load(f)
+        except FileNotFoundError:
+            self._playlists = {}
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable YouTube sync registry: {e}")
+            self._playlists = {}
+
+    @classmethod
+    def get_instance(cls) -> 'SyncRegistry':
+        """
+        Get the singleton instance of SyncRegistry.
+
+        Returns:
+            SyncRegistry: The singleton instance
+        """
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def remote_playlist(self, playlist_name: str) -> Optional[str]:
+        with self._registry_lock:
+            return self._playlists.get(playlist_name)
+
+    def remember(self, playlist_name: str, playlist_id: str) -> None:
+        self._update(playlist_name, playlist_id)
+
+    def forget(self, playlist_name: str) -> None:
+        self._update(playlist_name, None)
+
+    def _update(self, playlist_name: str, playlist_id: Optional[str]) -> None:
+        with self._registry_lock:
+            if playlist_id is None:
+                self._playlists.pop(playlist_name, None)
+            else:
+                self._playlists[playlist_name] = playlist_id
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            atomic_write_json(self.path, self._playlists)
+
+
+class PlaylistNotFound(Exception):
+    """The remote playlist no longer exists."""
+
+
+def sync_playlist(service, playlist_id: str, video_ids: List[str],
+                  progress: Optional[Progress] = None) -> Tuple[SyncPlan, List[str]]:
+    """
+    Bring a remote playlist in line with a local list of video ids.
+
+    Args:
+        service: YouTube Data API service object
+        playlist_id: Remote playlist
+        video_ids: Local youtube_id list, in order
+        progress: Called with a status message before each step
+
+    Returns:
+        Tuple[SyncPlan, List[str]]: The applied plan and error messages of writes that failed
+
+    Raises:
+        PlaylistNotFound: The remote playlist was deleted
+    """
+    report = progress or (lambda message: None)
+    report("Fetching the YouTube playlist...")
+    try:
+        remote = fetch_playlist_items(service, playlist_id)
+    except HttpError as e:
+        if e.resp.status == 404:
+            raise PlaylistNotFound(playlist_id) from e
+        raise
+    plan = plan_sync(remote, video_ids)
+    logging.info(f"YouTube sync of {playlist_id}: {len(plan.deletes)} deletes, "
+                 f"{len(plan.moves)} moves, {len(plan.inserts)} inserts")
+    errors = []
+
+    if plan.deletes:
+        report(f"Removing {len(plan.deletes)} videos...")
+    for item_id in plan.deletes:
+        try:
+            execute_with_backoff(service.playlistItems().delete(id=item_id))
+        except Exception as e:
+            errors.append(f"Remove {item_id}: {e}")
+
+    if plan.moves:
+        report(f"Reordering {len(plan.moves)} videos...")
+    for item_id, video_id, position in plan.moves:
+        try:
+            execute_with_backoff(service.playlistItems().update(part="snippet", body={
+                "id": item_id,
+                "snippet": {
+                    "playlistId": playlist_id,
+                    "resourceId": {"kind": "youtube#video", "videoId": video_id},
+                    "position": position,
+                },
+            }))
+        except Exception as e:
+            errors.append(f"Move {video_id}: {e}")
+
+    if plan.inserts:
+        report(f"Adding {len(plan.inserts)} videos...")
+    # In ascending order, so each position exists when it is used; a failed insert shifts the rest up
+    failed = 0
+    for video_id, position in plan.inserts:
+        try:
+            execute_with_backoff(service.playlistItems().insert(part="snippet", body={
+                "snippet": {
+                    "playlistId": playlist_id,
+                    "resourceId": {"kind": "youtube#video", "videoId": video_id},
+                    "position": position - failed,
+                },
+            }))
+        except Exception as e:
+            failed += 1
+            errors.append(f"{video_id}: {e}")
+    return plan, errors
+
+
+class UploadFailed(Exception):
+    """The YouTube playlist to upload to could not be created."""
+
+
+def sync_message(playlist_title: str, playlist_id: str, plan: SyncPlan, errors: List[str]) -> str:
+    """Result message of a sync, for the player's dialog."""
+    if not plan.writes:
+        return f"YouTube playlist '{playlist_title}' is already up to date."
+    result_message = (
+        f"Updated YouTube playlist '{playlist_title}' (ID: {playlist_id}).\n"
+        f"Added {len(plan.inserts)}, removed {len(plan.deletes)} and moved {len(plan.moves)} videos."
+    )
+    if errors:
+        result_message += f"\n\n{len(errors)} changes failed:\n" + "\n".join(errors[:5])
+        if len(errors) > 5:
+            result_message += "\n..."
+    return result_message
+
+
+def publish_playlist(service, playlist_title: str, video_ids: List[str], playlist_name: Optional[str] = None,
+                     sync: bool = False, progress: Optional[Progress] = None,
+                     registry: Optional[SyncRegistry] = None, journal_path: Optional[str] = None,
+                     http_pool: Optional[HttpPool] = None) -> str:
+    """
+    Upload a local playlist to YouTube, or sync the YouTube playlist it was uploaded to.
+
+    A sync is only tried when `sync` is set and the registry knows the remote playlist;
+    if that playlist was deleted it is forgotten and a new one is uploaded instead.
+
+    Args:
+        service: YouTube Data API service object
+        playlist_title: Title of the YouTube playlist
+        video_ids: Local youtube_id list, in order
+        playlist_name: Local playlist, to remember its YouTube playlist
+        sync: Update the YouTube playlist it was uploaded to instead of creating one
+        progress: Called with a status message before each step
+        registry: Registry of remote playlists; by default the shared one
+        journal_path: Upload journal; by default the one for `playlist_title`
+        http_pool: Connections for the upload's batches (see PlaylistUploader)
+
+    Returns:
+        str: Result message
+
+    Raises:
+        UploadFailed: The YouTube playlist could not be created
+    """
+    report = progress or (lambda message: None)
+    registry = registry or SyncRegistry.get_instance()
+    remote_id = registry.remote_playlist(playlist_name) if playlist_name else None
+    if sync and remote_id:
+        try:
+            plan, errors = sync_playlist(service, remote_id, video_ids, progress=report)
+            return sync_message(playlist_title, remote_id, plan, errors)
+        except PlaylistNotFound:
+            registry.forget(playlist_name)
+            report("The YouTube playlist no longer exists, creating a new one...")
+
+    journal = UploadJournal(journal_path or journal_path_for(playlist_title), video_ids)
+    if journal.resumed:
+        report(f"Resuming upload to '{playlist_title}' ({len(journal.items)} videos already added)...")
+    else:
+        report(f"Creating YouTube playlist '{playlist_title}'...")
+        new_playlist_id = create_youtube_playlist(
+            service, playlist_title, privacy_status="private"
+        )  # Or 'public'/'unlisted'
+        if not new_playlist_id:
+            raise UploadFailed("Failed to create YouTube playlist.")
+        journal.start(new_playlist_id)
+    if playlist_name:
+        registry.remember(playlist_name, journal.playlist_id)
+
+    report(f"Adding {len(journal.pending())} videos to playlist...")
+    uploader = PlaylistUploader(
+        service,
+        journal,
+        progress=lambda done, total: report(f"Added {done}/{total} videos"),
+        http_pool=http_pool,
+    )
+    _, errors, resumable = uploader.upload()
+    if journal.items and not resumable:
+        report("Putting the playlist in order...")
+        try:
+            uploader.restore_order()
+        except Exception as e:
+            errors.append(f"Could not reorder the playlist: {e}")
+
+    result_message = f"Uploaded playlist '{playlist_title}' (ID: {journal.playlist_id}).\n"
+    result_message += f"Added {len(journal.items)} out of {len(video_ids)} videos."
+    if errors:
+        result_message += (
+            f"\n\nErrors occurred for {len(errors)} videos:\n"
+            + "\n".join(errors[:5])
+        )  # Show first 5 errors
+        if len(errors) > 5:
+            result_message += "\n..."
+    if resumable:
+        result_message += "\n\nUpload the playlist again with the same name to add the rest."
+    else:
+        journal.finish()
+    return result_message
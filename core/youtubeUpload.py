@@ -0,0 +1,433 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# core/youtubeUpload.py
+# =============
+# Upload engine for adding videos to a YouTube playlist.
+#
+# Inserts go out as batch HTTP requests (up to BATCH_SIZE calls per round
+# trip) with a few batches in flight at once, each on its own connection.
+# Calls that fail with a rate limit, a conflict or a server error are retried
+# with exponential backoff; a spent daily quota stops the upload.
+#
+# Every added item is written to a progress journal in the config directory
+# as soon as its batch returns, so an interrupted upload resumes into the same
+# playlist and skips what is already there. Batched calls complete in any
+# order, so at the end the playlist is put back in order by moving only the
+# items outside the longest run that is already in order.
+# =============
+import os
+import json
+import time
+import bisect
+import random
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httplib2
+import google_auth_httplib2
+from googleapiclient.errors import HttpError
+
+from core.configManager import ConfigManager
+from core.playlistStore import atomic_write_json
+
+JOURNAL_VERSION = 1
+# Calls per batch request (the API allows up to 1000, YouTube recommends far fewer)
+BATCH_SIZE = 25
+# Batch requests in flight at once
+CONCURRENCY = 4
+# Retry rounds for calls that failed with a retryable error
+MAX_RETRIES = 6
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 64.0
+# Playlist items per list page (API maximum)
+PAGE_SIZE = 50
+
+# Error reasons worth retrying after a pause; quotaExceeded (daily quota) is not among them
+RETRYABLE_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "backendError", "SERVICE_UNAVAILABLE"}
+RETRYABLE_STATUSES = {409, 429, 500, 502, 503, 504}
+
+Progress = Callable[[int, int], None]
+
+
+def error_reason(error: Exception) -> str:
+    """The API's reason code of an HttpError ("quotaExceeded", ...), or "" if there is none."""
+    if not isinstance(error, HttpError):
+        return ""
+    try:
+        content = error.content.decode("utf-8") if isinstance(error.content, bytes) else error.content
+        return json.loads(content)["error"]["errors"][0]["reason"]
+    except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+        return ""
+
+
+def is_quota_exhausted(error: Exception) -> bool:
+    return error_reason(error) in ("quotaExceeded", "dailyLimitExceeded")
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, conflicts, server errors and network failures; not a spent quota or a bad request."""
+    if isinstance(error, HttpError):
+        if is_quota_exhausted(error):
+            return False
+        return error.resp.status in RETRYABLE_STATUSES or error_reason(error) in RETRYABLE_REASONS
+    return isinstance(error, (OSError, httplib2.HttpLib2Error))
+
+
+def backoff_delay(attempt: int) -> float:
+    """Seconds to wait before retry round `attempt` (1-based), with jitter."""
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempt - 1), BACKOFF_MAX_SECONDS)
+    return delay + random.uniform(0, delay / 2)
+
+
+def execute_with_backoff(request, http=None):
+    """
+    Execute a single API request, retrying retryable errors with exponential backoff.
+
+    Raises:
+        The last error once it is not retryable or the retries are used up
+    """
+    attempt = 0
+    while True:
+        try:
+            return request.execute(http=http)
+        except Exception as e:
+            attempt += 1
+            if attempt > MAX_RETRIES or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt)
+            logging.warning(f"YouTube request failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def fetch_playlist_items(service, playlist_id: str) -> List[Tuple[str, str]]:
+    """
+    All items of a playlist in order.
+
+    Returns:
+        List[Tuple[str, str]]: (playlist item id, video id) pairs
+    """
+    items = []
+    request = service.playlistItems().list(
+        part="snippet", playlistId=playlist_id, maxResults=PAGE_SIZE, fields="nextPageToken,items(id,snippet/resourceId/videoId)"
+    )
+    while request is not None:
+        response = execute_with_backoff(request)
+        for item in response.get("items", []):
+            items.append((item["id"], item["snippet"]["resourceId"]["videoId"]))
+        request = service.playlistItems().list_next(request, response)
+    return items
+
+
+def plan_moves(current: List[str], target: List[str]) -> List[Tuple[str, int]]:
+    """
+    Position updates that turn the order `current` into `target` (same items).
+
+    Items on a longest increasing run (by target position) stay put; every other
+    item is moved, in target order, to just after the item that precedes it in target.
+
+    Returns:
+        List[Tuple[str, int]]: (item, position) to apply in order
+    """
+    rank = {item: position for position, item in enumerate(target)}
+    ranks = [rank[item] for item in current if item in rank]
+    # Longest increasing subsequence of the ranks, O(n log n)
+    tails, tail_index, parent = [], [], [-1] * len(ranks)
+    for i, value in enumerate(ranks):
+        slot = bisect.bisect_left(tails, value)
+        if slot == len(tails):
+            tails.append(value)
+            tail_index.append(i)
+        else:
+            tails[slot] = value
+            tail_index[slot] = i
+        parent[i] = tail_index[slot - 1] if slot else -1
+    keep = set()
+    i = tail_index[-1] if tail_index else -1
+    while i >= 0:
+        keep.add(ranks[i])
+        i = parent[i]
+    # Replay the moves: each moved item goes right after its predecessor in target order
+    order = [item for item in current if item in rank]
+    moves = []
+    for position, item in enumerate(target):
+        if position in keep:
+            continue
+        order.remove(item)
+        index = order.index(target[position - 1]) + 1 if position else 0
+        order.insert(index, item)
+        moves.append((item, index))
+    return moves
+
+
+def journal_path_for(playlist_title: str) -> str:
+    """Progress journal of the upload of a playlist title, in the config directory."""
+    directory = os.path.join(ConfigManager.get_instance().get_config_dir(), "youtube_uploads")
+    name = hashlib.sha1(playlist_title.encode("utf-8")).hexdigest()
+    return os.path.join(directory, name + ".json")
+
+
+class UploadJournal:
+    """
+    Progress of one playlist upload: the remote playlist and the items added so far.
+
+    Usage:
+        journal = UploadJournal(journal_path_for(title), video_ids)
+        if journal.playlist_id is None:
+            journal.start(create_youtube_playlist(service, title))
+        ...
+        journal.finish()
+    """
+
+    def __init__(self, path: Optional[str], video_ids: List[str]):
+        """
+        Args:
+            path: Journal file (see journal_path_for), or None to keep the progress in memory only
+            video_ids: Videos of the upload, in playlist order
+        """
+        self.path = path
+        self.video_ids = list(video_ids)
+        self.playlist_id: Optional[str] = None
+        # Position in video_ids -> playlist item id
+        self.items: Dict[int, str] = {}
+        self._load()
+
+    def _load(self) -> None:
+        if self.path is None:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable upload journal {self.path}: {e}")
+            return
+        # Only resume an upload of the same videos
+        if data.get("version") != JOURNAL_VERSION or data.get("video_ids") != self.video_ids:
+            return
+        self.playlist_id = data.get("playlist_id")
+        self.items = {int(index): item for index, item in data.get("items", {}).items()}
+
+    @property
+    def resumed(self) -> bool:
+        return self.playlist_id is not None
+
+    def start(self, playlist_id: str) -> None:
+        self.playlist_id = playlist_id
+        self.items = {}
+        self.save()
+
+    def pending(self) -> List[int]:
+        """Positions in video_ids that have not been added yet."""
+        return [index for index in range(len(self.video_ids)) if index not in self.items]
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        atomic_write_json(self.path, {
+            "version": JOURNAL_VERSION,
+            "playlist_id": self.playlist_id,
+            "video_ids": self.video_ids,
+            "items": {str(index): item for index, item in self.items.items()},
+        }, indent=None)
+
+    def finish(self) -> None:
+        """The upload is complete; forget it."""
+        if self.path is None:
+            return
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class HttpPool:
+    """
+    Authorized HTTP connections for concurrent requests, kept open between uploads.
+
+    httplib2 connections are not thread-safe, so every request in flight takes its
+    own connection from the pool and gives it back when done.
+
+    Usage:
+        http = pool.acquire()
+        try:
+            request.execute(http=http)
+        finally:
+            pool.release(http)
+    """
+
+    def __init__(self, credentials, timeout: Optional[float] = None):
+        self.credentials = credentials
+        self.timeout = timeout
+        self._idle: List[google_auth_httplib2.AuthorizedHttp] = []
+        self._pool_lock = threading.Lock()
+
+    def acquire(self) -> google_auth_httplib2.AuthorizedHttp:
+        with self._pool_lock:
+            if self._idle:
+                return self._idle.pop()
+        return google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=self.timeout))
+
+    def release(self, http: google_auth_httplib2.AuthorizedHttp) -> None:
+        with self._pool_lock:
+            self._idle.append(http)
+
+    def close(self) -> None:
+        with self._pool_lock:
+            idle, self._idle = self._idle, []
+        for http in idle:
+            http.close()
+
+
+class PlaylistUploader:
+    """
+    Adds the pending videos of a journal to its playlist.
+
+    Args:
+        service: YouTube Data API service object
+        journal: UploadJournal with a playlist id
+        concurrency: Batch requests in flight at once
+        batch_size: Calls per batch request
+        progress: Called with (videos added, total) after every batch
+        http_pool: Connections for the batches in flight; by default a pool for this upload only
+    """
+
+    def __init__(self, service, journal: UploadJournal, concurrency: int = CONCURRENCY,
+                 batch_size: int = BATCH_SIZE, progress: Optional[Progress] = None,
+                 http_pool: Optional[HttpPool] = None):
+        self.service = service
+        self.journal = journal
+        self.batch_size = batch_size
+        self.progress = progress
+        if http_pool is None:
+            # Batches in flight need a connection each, made from the service's credentials
+            credentials = getattr(getattr(service, "_http", None), "credentials", None)
+            http_pool = HttpPool(credentials) if credentials is not None else None
+        self.http_pool = http_pool
+        self.concurrency = concurrency if http_pool is not None else 1
+
+    def _insert_request(self, video_id: str):
+        return self.service.playlistItems().insert(
+            part="snippet",
+            body={
+                "snippet": {
+                    "playlistId": self.journal.playlist_id,
+                    "resourceId": {"kind": "youtube#video", "videoId": video_id},
+                }
+            },
+        )
+
+    def _run_batch(self, indices: List[int]) -> List[Tuple[int, Optional[str], Optional[Exception]]]:
+        """Send one batch request; returns (position, item id or None, error or None) per call."""
+        outcomes = {}
+
+        def on_response(request_id, response, exception):
+            outcomes[int(request_id)] = (response["id"] if exception is None else None, exception)
+
+        batch = self.service.new_batch_http_request(callback=on_response)
+        for index in indices:
+            batch.add(self._insert_request(self.journal.video_ids[index]), request_id=str(index))
+        # Without a pool the single worker uses the service's own connection
+        http = self.http_pool.acquire() if self.http_pool is not None else None
+        try:
+            batch.execute(http=http)
+        except Exception as e:
+            # The whole round trip failed; calls without a response share its error
+            for index in indices:
+                outcomes.setdefault(index, (None, e))
+        finally:
+            if http is not None:
+                self.http_pool.release(http)
+        return [(index, *outcomes.get(index, (None, RuntimeError("No response")))) for index in indices]
+
+    def upload(self) -> Tuple[int, List[str], bool]:
+        """
+        Add every pending video, retrying retryable failures.
+
+        Returns:
+            Tuple[int, List[str], bool]: (videos added by this call, error messages,
+            whether the upload can be resumed later for the videos still missing)
+        """
+        total = len(self.journal.video_ids)
+        pending = self.journal.pending()
+        added, errors = 0, []
+        attempt = 0
+        while pending:
+            if attempt:
+                delay = backoff_delay(attempt)
+                logging.info(f"YouTube upload: retrying {len(pending)} videos in {delay:.1f}s")
+                time.sleep(delay)
+            batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+            retry, quota_exhausted = [], False
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                for outcomes in pool.map(self._run_batch, batches):
+                    for index, item_id, error in outcomes:
+                        if item_id is not None:
+                            self.journal.items[index] = item_id
+                            added += 1
+                        elif is_quota_exhausted(error):
+                            quota_exhausted = True
+                            retry.append(index)
+                        elif is_retryable(error):
+                            retry.append(index)
+                        else:
+                            errors.append(f"{self.journal.video_ids[index]}: {error}")
+                    self.journal.save()
+                    if self.progress:
+                        self.progress(len(self.journal.items), total)
+            if quota_exhausted:
+                errors.append(f"YouTube quota exhausted with {len(retry)} videos left; upload again later to resume.")
+                return added, errors, True
+            attempt += 1
+            if retry and attempt > MAX_RETRIES:
+                errors.append(f"{len(retry)} videos still failing after {MAX_RETRIES} retries; upload again to resume.")
+                return added, errors, True
+            pending = sorted(retry)
+        return added, errors, False
+
+    def restore_order(self) -> int:
+        """
+        Put the uploaded items in the order of the journal's videos.
+
+        Returns:
+            int: Number of items moved
+        """
+        remote = fetch_playlist_items(self.service, self.journal.playlist_id)
+        videos = dict(remote)
+        ordered = [self.journal.items[index] for index in sorted(self.journal.items)
+                   if self.journal.items[index] in videos]
+        # Items the journal does not know (added by hand meanwhile) end up after ours
+        known = set(ordered)
+        target = ordered + [item for item, _ in remote if item not in known]
+        moves = plan_moves([item for item, _ in remote], target)
+        for item_id, position in moves:
+            execute_with_backoff(self.service.playlistItems().update(
+                part="snippet",
+                body={
+                    "id": item_id,
+                    "snippet": {
+                        "playlistId": self.journal.playlist_id,
+                        "resourceId": {"kind": "youtube#video", "videoId": videos[item_id]},
+                        "position": position,
+                    },
+                },
+            ))
+        return len(moves)
@@ -0,0 +1,154 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# ./daemon.py
+# =============
+# Headless entry point for machines without a display.
+#
+# Runs the playback engine (core/playbackEngine.py) under a QCoreApplication:
+# no widgets, no platform plugin, no global keyboard hook. It takes the same
+# instance lock and serves the same control socket as the player window, so
+# iota.py (or any client of core/controlProtocol.py) controls it, MPRIS
+# clients see it on Linux, and it resumes the window's last session.
+#
+# Usage:
+#   python daemon.py [--playlist NAME] [FILE...]
+#   iota status | next | quit | ...
+# =============
+import os
+import sys
+import signal
+import socket
+import logging
+import platform
+import argparse
+import threading
+import multiprocessing
+from core.logger import setup_logging
+
+# Before config.py logs at import time, which would install a bare default handler
+setup_logging()
+
+from PyQt6.QtCore import QCoreApplication, QSocketNotifier, QTimer  # noqa: E402
+from core.configManager import ConfigManager  # noqa: E402
+from core.perfMetrics import PerfMetrics  # noqa: E402
+from core.playbackEngine import PlaybackEngine  # noqa: E402
+from core.controlProtocol import SERVER_NAME  # noqa: E402
+from core.controlServer import ControlServer, player_commands  # noqa: E402
+from core.instanceLock import acquire_instance_lock, release_instance_lock  # noqa: E402
+from config import default_settings  # noqa: E402
+
+
+def load_config():
+    """Load configuration using ConfigManager with fallback to defaults."""
+    try:
+        return ConfigManager.get_instance().load_config()
+    except (FileNotFoundError, ValueError) as e:
+        logging.error(f"Error loading config: {e}")
+        return dict(default_settings)
+
+
+def install_signal_handlers(app):
+    """
+    Quit on SIGINT and SIGTERM.
+
+    Python only runs signal handlers between bytecodes, which never happens
+    while Qt's event loop waits; the signal's wakeup byte on a socket pair
+    gives the loop something to call into. The socket pair and notifier are
+    kept on the application so they live as long as its event loop.
+    """
+    receiver, sender = socket.socketpair()
+    receiver.setblocking(False)
+    sender.setblocking(False)
+    signal.set_wakeup_fd(sender.fileno())
+    notifier = QSocketNotifier(receiver.fileno(), QSocketNotifier.Type.Read, app)
+
+    def drain():
+        try:
+            receiver.recv(64)
+        except OSError:
+            pass
+
+    notifier.activated.connect(drain)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: app.quit())
+    app._signal_wakeup = (receiver, sender, notifier)
+
+
+def start_mpris_service(engine, config):
+    """Publish the engine on D-Bus, if dbus-next is available."""
+    try:
+        from core.mprisThread import start_mpris
+        from core.imageCache import CoverArtCache
+    except ImportError as e:
+        logging.info(f"MPRIS disabled: {e}")
+        return
+    engine.cover_cache = CoverArtCache()
+    max_bytes = int(config.get("cover_cache_max_mb", 256)) * 1024 * 1024
+    # Trim the cover cache once startup has settled, as the window does
+    QTimer.singleShot(10000, lambda: threading.Thread(
+        target=engine.cover_cache.evict, args=(max_bytes,), daemon=True).start())
+    start_mpris(engine)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run IotaPlayer without a window.")
+    parser.add_argument("--playlist", help="Playlist to load instead of resuming the last session")
+    parser.add_argument("files", nargs="*", help="Audio files to play next")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    startup_paths = [os.path.abspath(path) for path in args.files if os.path.isfile(path)]
+
+    app = QCoreApplication(sys.argv[:1])
+    app.setApplicationName("IotaPlayer")
+
+    lock_file, lock_fd = acquire_instance_lock()
+    if lock_file is None:
+        logging.info("Another instance is already running. Exiting.")
+        return 0
+
+    config = load_config()
+    metrics = PerfMetrics.get_instance()
+    metrics.configure(config.get("performance_metrics", False) or os.environ.get("IOTA_PERF") == "1")
+
+    engine = PlaybackEngine(config)
+    # Quit after the reply to "quit" has been sent
+    commands = player_commands(engine, focus=lambda: None, quit=lambda: QTimer.singleShot(0, app.quit))
+    server = ControlServer(commands, SERVER_NAME)
+    if not server.listen():
+        engine.close()
+        release_instance_lock(lock_file, lock_fd)
+        return 1
+
+    engine.start(args.playlist)
+    if startup_paths:
+        engine.enqueue_paths(startup_paths)
+    if platform.system() == "Linux":
+        start_mpris_service(engine, config)
+    install_signal_handlers(app)
+    logging.info("IotaPlayer daemon running.")
+
+    exit_code = app.exec()
+
+    server.close()
+    engine.close()
+    metrics.flush_counters()
+    release_instance_lock(lock_file, lock_fd)
+    return exit_code
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Loudness analysis workers in frozen builds
+    sys.exit(main())
@@ -0,0 +1,206 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# ./iota.py
+# =============
+# Lightweight command-line entry point.
+#
+# Talks to the running instance over the control protocol
+# (core/controlProtocol.py) using only the standard library, so a command
+# or a list of files reaches the player in milliseconds. PyQt6 and the rest
+# of the GUI stack (main.py) are imported only when no instance is running
+# and one has to be started.
+#
+#   iota                      focus the running player, or start it
+#   iota FILE...              play files next (starting the player if needed)
+#   iota --daemon [FILE...]   same, but start the headless daemon (daemon.py)
+#   iota next | status | ...  control the running player (iota --help)
+# =============
+import os
+import sys
+import json
+import time
+
+from core.controlProtocol import ControlClient
+
+# Commands that need a running instance, and the usage shown for them
+COMMANDS = {
+    "play": "play [INDEX]    Play, resume, or play the song at INDEX of the playlist",
+    "pause": "pause           Pause playback",
+    "toggle": "toggle          Play or pause",
+    "stop": "stop            Stop playback",
+    "next": "next            Next song",
+    "previous": "previous        Previous song",
+    "status": "status          Show what is playing",
+    "search": "search QUERY    Search the loaded playlist",
+    "focus": "focus           Bring the player window to the front",
+    "quit": "quit            Close the player (or stop the daemon)",
+}
+# How long to wait for an instance that holds the lock but is not listening yet
+STARTUP_WAIT_SECONDS = 5.0
+
+
+def usage():
+    lines = ["Usage: iota [--json] [--daemon] [FILE... | COMMAND [ARGS]]", "", "Commands:"]
+    lines += [f"  {text}" for text in COMMANDS.values()]
+    lines += ["", "Without arguments the running player is focused, or started if none is running.",
+              "With --daemon, a player that has to be started runs headless (daemon.py)."]
+    return "\n".join(lines)
+
+
+def instance_starting():
+    """Whether the instance lock names a live process (main.py writes its PID there)."""
+    from core.configManager import ConfigManager  # Only needed when no instance answered
+    lock_file = os.path.join(ConfigManager.get_instance().get_config_dir(), ".iota.lock")
+    try:
+        with open(lock_file, "r") as f:
+            pid = int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return False
+    if pid <= 0 or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        pass
+    return True
+
+
+def connect():
+    """Connect to the running instance, waiting for one that is still starting; None if there is none."""
+    client = ControlClient.connect()
+    if client is not None or not instance_starting():
+        return client
+    deadline = time.monotonic() + STARTUP_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        client = ControlClient.connect()
+        if client is not None:
+            return client
+    return None
+
+
+def format_time(ms):
+    seconds = int(ms // 1000)
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+def format_status(status):
+    if not status.get("song"):
+        text = "Stopped"
+    else:
+        song = status["song"]
+        name = f"{song['artist']} - {song['title']}" if song.get("artist") else song.get("title", "")
+        state = "Playing" if status["state"] == "playing" else "Paused"
+        text = f"{state}: {name} [{format_time(status['position_ms'])}/{format_time(status['duration_ms'])}]"
+    extras = [f"volume {status['volume']}%", f"loop {status['loop']}", f"shuffle {'on' if status['shuffle'] else 'off'}"]
+    if status.get("queued"):
+        extras.append(f"{status['queued']} queued")
+    return f"{text}\n{', '.join(extras)}"
+
+
+def print_result(command, result, as_json):
+    if as_json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    elif command == "search":
+        for song in result:
+            name = f"{song['artist']} - {song['title']}" if song.get("artist") else song["title"]
+            print(f"{song['index']}\t{name}")
+    elif isinstance(result, dict) and "state" in result:
+        print(format_status(result))
+    elif isinstance(result, dict) and "queued" in result:
+        print(f"Queued {result['queued']} files")
+
+
+def build_request(args):
+    """(command, args) for the command line, or raise ValueError with the reason."""
+    if not args:
+        return "focus", {}
+    command = args[0]
+    if command in COMMANDS:
+        if command == "search":
+            if len(args) < 2:
+                raise ValueError("search needs a query")
+            return "search", {"query": " ".join(args[1:])}
+        if command == "play" and len(args) > 1:
+            return "play", {"index": int(args[1])}
+        if len(args) > 1:
+            raise ValueError(f"{command} takes no arguments")
+        return command, {}
+    missing = [path for path in args if not os.path.isfile(path)]
+    if missing:
+        raise ValueError(f"Unknown command or file: {missing[0]}")
+    return "enqueue", {"paths": [os.path.abspath(path) for path in args]}
+
+
+def launch_gui(paths):
+    """Start the full player in this process; files are queued once it is up."""
+    sys.argv = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")] + paths
+    import multiprocessing
+    import main as gui
+    multiprocessing.freeze_support()
+    gui.main()
+
+
+def launch_daemon(paths):
+    """Run the headless daemon in this process until it is stopped."""
+    import multiprocessing
+    import daemon
+    multiprocessing.freeze_support()
+    return daemon.main(paths)
+
+
+def main(argv=None):
+    args = list(sys.argv[1:] if argv is None else argv)
+    if args and args[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+    as_json = "--json" in args
+    headless = "--daemon" in args
+    args = [arg for arg in args if arg not in ("--json", "--daemon")]
+    try:
+        command, command_args = build_request(args)
+    except ValueError as e:
+        print(f"iota: {e}\n\n{usage()}", file=sys.stderr)
+        return 2
+
+    client = connect()
+    if client is None:
+        if command in ("focus", "enqueue", "play") and not (command == "play" and command_args):
+            if headless:
+                return launch_daemon(command_args.get("paths", []))
+            launch_gui(command_args.get("paths", []))
+            return 0
+        print("iota: IotaPlayer is not running", file=sys.stderr)
+        return 1
+    try:
+        ok, result = client.call(command, command_args)
+    except (OSError, ConnectionError) as e:
+        print(f"iota: {e}", file=sys.stderr)
+        return 1
+    finally:
+        client.close()
+    if not ok:
+        print(f"iota: {result}", file=sys.stderr)
+        return 1
+    print_result(command, result, as_json)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
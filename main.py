@@ -22,6 +22,7 @@
 # =============
 import sys
 import json
+import multiprocessing
 import platform
 import logging
 import darkdetect
@@ -30,11 +31,15 @@ import utils
 import qdarktheme # noqa: F401
 from PyQt6.QtWidgets import QApplication, QMessageBox
 from PyQt6.QtGui import QFont
-from PyQt6.QtCore import QObject, pyqtSlot, QT_VERSION_STR
-from PyQt6.QtNetwork import QLocalServer, QLocalSocket
+from PyQt6.QtCore import QObject, QTimer, QT_VERSION_STR
 from core.musicPlayer import MusicPlayer
+from core.controlProtocol import SERVER_NAME
+from core.controlServer import ControlServer, player_commands
+from core.instanceLock import acquire_instance_lock, release_instance_lock
 from core.logger import setup_logging
 from core.configManager import ConfigManager
+from core.perfMetrics import PerfMetrics
+from core.stallDetector import StallDetector
 from config import ICON_PATH, default_settings, get_system_qt_version, is_version_higher
 from core.mprisThread import start_mpris
 
@@ -54,6 +59,7 @@ class Application:
         self.iota_server = None
         self.lock_file = None
         self.lock_fd = None
+        self.stall_detector = None
 
 
 class Iota(QObject):
@@ -63,21 +69,14 @@ class Iota(QObject):
         self.player = player_instance  # Store player reference instead of using global
 
     def setup_server(self):
-        self.server = QLocalServer(self)
-        if self.server.listen("IotaPlayerInstance"):
-            logging.info("Server started, listening for incoming connections.")
-        else:
-            logging.error(f"Server failed to start: {self.server.errorString()}")
-        self.server.newConnection.connect(self.handle_new_connection)
+        """Start the control server (core/controlServer.py) that scripts and launchers talk to."""
+        commands = player_commands(self.player.engine, self.bring_to_foreground, self.close_player)
+        self.server = ControlServer(commands, SERVER_NAME, self)
+        self.server.listen()
 
-    @pyqtSlot()  # Explicitly mark as a slot
-    def handle_new_connection(self):
-        socket = self.server.nextPendingConnection()
-        if socket:
-            socket.waitForReadyRead(1000)
-            message = socket.readAll().data().decode()
-            if message == "focus":
-                self.bring_to_foreground()
+    def close_player(self):
+        # Once the reply to "quit" has been sent
+        QTimer.singleShot(0, self.player.close)
 
     def bring_to_foreground(self):
         logging.info(f"Attempting to bring window to foreground on {platform.system()}.")
@@ -132,58 +131,9 @@ def load_config():
         logging.error(f"Error loading config: {e}")
         return default_settings
 
-def is_instance_running(server_name="IotaPlayerInstance"):
-    """Send focus message to running instance if it exists."""
-    socket = QLocalSocket()
-    socket.connectToServer(server_name)
-    is_running = socket.waitForConnected(1000)
-    if is_running:
-        logging.info("Sending focus message to the running instance")
-        socket.write(b"focus")
-        socket.flush()
-        socket.waitForBytesWritten(1000)
-        socket.disconnectFromServer()
-    return is_running
-
-def acquire_instance_lock():
-    """Acquire file-based lock to ensure single instance.
-    
-    Returns:
-        tuple: (lock_file_path, lock_fd) if lock acquired, (None, None) if another instance running
-    """
-    import fcntl
-    
-    lock_file = os.path.join(config_manager.get_config_dir(), ".iota.lock")
-    os.makedirs(os.path.dirname(lock_file), exist_ok=True)
-    
-    try:
-        lock_fd = open(lock_file, 'w')
-        fcntl.flock(lock_fd.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
-        # Write PID to lock file for debugging
-        lock_fd.write(str(os.getpid()))
-        lock_fd.flush()
-        logging.info(f"Acquired instance lock: {lock_file}")
-        return lock_file, lock_fd
-    except (IOError, OSError) as e:
-        logging.info(f"Could not acquire lock (another instance running): {e}")
-        # Another instance is running, try to send focus message
-        is_instance_running()
-        return None, None
-
-def release_instance_lock(lock_file, lock_fd):
-    """Release the instance lock."""
-    if lock_fd:
-        import fcntl
-        try:
-            fcntl.flock(lock_fd.fileno(), fcntl.LOCK_UN)
-            lock_fd.close()
-            if lock_file and os.path.exists(lock_file):
-                os.remove(lock_file)
-            logging.info("Released instance lock")
-        except Exception as e:
-            logging.error(f"Error releasing lock: {e}")
-        
 def main():
+    # Files passed on the command line (iota.py FILE...) play next once the player is up
+    startup_paths = [os.path.abspath(arg) for arg in sys.argv[1:] if os.path.isfile(arg)]
     app = QApplication(sys.argv)
     application = Application()
     
@@ -197,6 +147,17 @@ def main():
     application.lock_fd = lock_fd
     
     config = load_config()
+
+    # Performance metrics can also be forced on for a single run with IOTA_PERF=1
+    metrics = PerfMetrics.get_instance()
+    metrics.configure(config.get("performance_metrics", False) or os.environ.get("IOTA_PERF") == "1")
+
+    # Watch the GUI thread for freezes (0 disables the detector). Started before the
+    # window is built, so the first playlist load and window setup are watched too.
+    stall_threshold_ms = config.get("stall_threshold_ms", 250)
+    if stall_threshold_ms:
+        application.stall_detector = StallDetector(threshold_ms=stall_threshold_ms)
+        application.stall_detector.start()
     
     needs_restart = check_qt_compatibility(config)
     if needs_restart:
@@ -205,6 +166,8 @@ def main():
             "Restart Required",
             "Please restart IotaPlayer for the theme changes to take effect."
         )
+        if application.stall_detector:
+            application.stall_detector.stop()
         release_instance_lock(lock_file, lock_fd)
         sys.exit(0)
     
@@ -250,15 +213,21 @@ def main():
     
     application.player.show()
     application.player.adjust_volume(application.player.get_volume)
+    if startup_paths:
+        QTimer.singleShot(0, lambda: application.player.engine.enqueue_paths(startup_paths))
 
     # Start MPRIS integration (Linux only)
     if platform.system() == "Linux":
-        start_mpris(application.player)
+        start_mpris(application.player.engine)
 
     if config.get("use_qdarktheme", False):
         qdarktheme.setup_theme("dark" if config.get("dark_mode", False) else "light")
 
     exit_code = app.exec()
+
+    if application.stall_detector:
+        application.stall_detector.stop()
+    metrics.flush_counters()
     
     # Cleanup: release lock on exit
     release_instance_lock(lock_file, lock_fd)
@@ -266,4 +235,5 @@ def main():
     sys.exit(exit_code)
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Loudness analysis workers in frozen builds
     main()
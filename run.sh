@@ -1,4 +1,4 @@
 #! /bin/bash
 # Run IotaPlayer from source (Linux/macOS)
 
-uv run main.py
+uv run iota.py "$@"
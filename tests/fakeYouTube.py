@@ -0,0 +1,192 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# tests/fakeYouTube.py
+# =============
+# In-memory fake of the YouTube Data API calls IotaPlayer makes.
+#
+# Covers playlists().insert, playlistItems().list/list_next/insert/update/
+# delete and batch requests, with the same request objects (built first,
+# sent with execute()) and the same HttpError the client library raises:
+# 404 for a missing playlist or item, and 404 videoNotFound for videos
+# listed in `rejected_videos`. Every write is recorded in `writes`.
+# =============
+import json
+from typing import Dict, List, Optional, Tuple
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+
+def http_error(status: int, reason: str) -> HttpError:
+    """An HttpError as the client library raises it, with the API's reason code."""
+    content = json.dumps({"error": {"code": status, "errors": [{"reason": reason}]}}).encode("utf-8")
+    return HttpError(httplib2.Response({"status": status}), content)
+
+
+class FakeRequest:
+    """A built API request; nothing happens until execute()."""
+
+    def __init__(self, call, **params):
+        self.call = call
+        self.params = params
+
+    def execute(self, http=None):
+        return self.call()
+
+
+class FakeBatch:
+    """Batch request that answers its calls in order through the callback."""
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.requests: List[Tuple[str, FakeRequest]] = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self, http=None):
+        for request_id, request in self.requests:
+            try:
+                response, error = request.execute(), None
+            except HttpError as e:
+                response, error = None, e
+            self.callback(request_id, response, error)
+
+
+class FakePlaylistItems:
+    def __init__(self, service: 'FakeYouTube'):
+        self.service = service
+
+    def list(self, part, playlistId, maxResults=5, fields=None, pageToken=None):
+        def call():
+            items = self.service.items_of(playlistId)
+            start = int(pageToken or 0)
+            page = items[start:start + maxResults]
+            self.service.pages_listed += 1
+            response = {"items": [{"id": item_id, "snippet": {"resourceId": {"videoId": video_id}}}
+                                  for item_id, video_id in page]}
+            if start + maxResults < len(items):
+                response["nextPageToken"] = str(start + maxResults)
+            return response
+        return FakeRequest(call, playlistId=playlistId, maxResults=maxResults, fields=fields)
+
+    def list_next(self, previous_request, previous_response):
+        token = previous_response.get("nextPageToken")
+        if token is None:
+            return None
+        params = dict(previous_request.params)
+        return self.list(part="snippet", pageToken=token, **params)
+
+    def insert(self, part, body):
+        snippet = body["snippet"]
+
+        def call():
+            items = self.service.items_of(snippet["playlistId"])
+            video_id = snippet["resourceId"]["videoId"]
+            if video_id in self.service.rejected_videos:
+                raise http_error(404, "videoNotFound")
+            position = snippet.get("position", len(items))
+            item_id = self.service.new_id("IT")
+            items.insert(position, (item_id, video_id))
+            self.service.writes.append(("insert", video_id, position))
+            return {"id": item_id, "snippet": snippet}
+        return FakeRequest(call)
+
+    def update(self, part, body):
+        snippet = body["snippet"]
+
+        def call():
+            items = self.service.items_of(snippet["playlistId"])
+            index = self.service.index_of(items, body["id"])
+            items.insert(snippet["position"], items.pop(index))
+            self.service.writes.append(("update", body["id"], snippet["position"]))
+            return {"id": body["id"], "snippet": snippet}
+        return FakeRequest(call)
+
+    def delete(self, id):
+        def call():
+            for items in self.service.playlists_by_id.values():
+                for index, (item_id, _) in enumerate(items):
+                    if item_id == id:
+                        del items[index]
+                        self.service.writes.append(("delete", id, index))
+                        return ""
+            raise http_error(404, "playlistItemNotFound")
+        return FakeRequest(call)
+
+
+class FakePlaylists:
+    def __init__(self, service: 'FakeYouTube'):
+        self.service = service
+
+    def insert(self, part, body):
+        def call():
+            playlist_id = self.service.create_playlist()
+            return {"id": playlist_id, "snippet": body["snippet"], "status": body.get("status", {})}
+        return FakeRequest(call)
+
+
+class FakeYouTube:
+    """
+    The service object returned by googleapiclient.discovery.build, in memory.
+
+    Usage:
+        youtube = FakeYouTube()
+        playlist_id = youtube.create_playlist(["a", "b"])
+        sync_playlist(youtube, playlist_id, ["b", "a", "c"])
+        youtube.videos(playlist_id)   # ["b", "a", "c"]
+    """
+
+    def __init__(self, rejected_videos=()):
+        self.playlists_by_id: Dict[str, List[Tuple[str, str]]] = {}
+        self.rejected_videos = set(rejected_videos)
+        self.writes: List[Tuple[str, str, int]] = []
+        self.pages_listed = 0
+        self._next_id = 0
+
+    def new_id(self, prefix: str) -> str:
+        self._next_id += 1
+        return f"{prefix}{self._next_id}"
+
+    def create_playlist(self, video_ids: Optional[List[str]] = None) -> str:
+        playlist_id = self.new_id("PL")
+        self.playlists_by_id[playlist_id] = [(self.new_id("IT"), video_id) for video_id in video_ids or []]
+        return playlist_id
+
+    def items_of(self, playlist_id: str) -> List[Tuple[str, str]]:
+        if playlist_id not in self.playlists_by_id:
+            raise http_error(404, "playlistNotFound")
+        return self.playlists_by_id[playlist_id]
+
+    @staticmethod
+    def index_of(items: List[Tuple[str, str]], item_id: str) -> int:
+        for index, (candidate, _) in enumerate(items):
+            if candidate == item_id:
+                return index
+        raise http_error(404, "playlistItemNotFound")
+
+    def videos(self, playlist_id: str) -> List[str]:
+        return [video_id for _, video_id in self.items_of(playlist_id)]
+
+    def playlistItems(self) -> FakePlaylistItems:
+        return FakePlaylistItems(self)
+
+    def playlists(self) -> FakePlaylists:
+        return FakePlaylists(self)
+
+    def new_batch_http_request(self, callback) -> FakeBatch:
+        return FakeBatch(callback)
@@ -0,0 +1,67 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# tests/test_playlistStore.py
+# =============
+# Playlist snapshots and journals (core/playlistStore.py).
+# =============
+import os
+
+import pytest
+
+from core.playlistStore import PlaylistStore, is_smart_playlist, journal_path_for, read_playlist
+
+
+def song(title):
+    return {"artist": "Artist", "title": title, "path": f"/music/{title}.mp3"}
+
+
+def test_journal_ops_replay_onto_snapshot(tmp_path):
+    path = str(tmp_path / "Road Trip.json")
+    store = PlaylistStore.get_instance()
+    store.save(path, {"playlist_name": "Road Trip", "songs": [song("a"), song("b")]})
+
+    store.append_ops(path, [{"op": "insert", "row": 1, "songs": [song("c")]},
+                            {"op": "update", "rows": [0], "fields": {"album": "X"}}])
+
+    data = read_playlist(path)
+    assert [s["title"] for s in data["songs"]] == ["a", "c", "b"]
+    assert data["songs"][0]["album"] == "X"
+    assert data["song_count"] == 3
+
+
+def test_smart_playlist_refuses_journal_ops(tmp_path):
+    path = str(tmp_path / "Recent.json")
+    store = PlaylistStore.get_instance()
+    store.save(path, {"playlist_name": "Recent", "smart": {"match": "all", "rules": []}, "songs": []})
+
+    with pytest.raises(ValueError):
+        store.append_ops(path, [{"op": "update", "rows": [1], "fields": {"album": "X"}}])
+
+    assert not os.path.exists(journal_path_for(path))
+    assert read_playlist(path)["smart"] == {"match": "all", "rules": []}
+
+
+def test_is_smart_playlist(tmp_path):
+    store = PlaylistStore.get_instance()
+    smart, static = str(tmp_path / "smart.json"), str(tmp_path / "static.json")
+    store.save(smart, {"playlist_name": "smart", "smart": {"match": "all", "rules": []}, "songs": []})
+    # A song named "smart" must not make a static playlist smart
+    store.save(static, {"playlist_name": "smart", "songs": [song("smart")] * 200})
+
+    assert is_smart_playlist(smart)
+    assert not is_smart_playlist(static)
+    assert not is_smart_playlist(str(tmp_path / "missing.json"))
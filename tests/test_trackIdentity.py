@@ -0,0 +1,96 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# tests/test_trackIdentity.py
+# =============
+# Duplicate detection (core/trackIdentity.py) over cached fingerprints, so
+# ffmpeg is not needed.
+# =============
+import json
+
+import numpy as np
+import pytest
+
+from core.blobStore import BlobStore
+from core.libraryIndex import LibraryIndex, file_signature
+from core.trackIdentity import FINGERPRINT_KIND, fingerprint_similarity, find_duplicates, track_identities
+
+FRAMES = 1287  # A full two-minute fingerprint
+
+
+def random_fingerprint(rng):
+    return rng.integers(0, 1 << 32, FRAMES, dtype=np.uint64).astype("<u4")
+
+
+def reencode(fingerprint, rng, flip_rate=0.15, shift=3):
+    """The fingerprint of another encoding: a few frames later, with some bits flipped."""
+    flips = ((rng.random((FRAMES, 32)) < flip_rate) * (1 << np.arange(32, dtype=np.uint64))).sum(axis=1)
+    return np.roll(fingerprint, shift) ^ flips.astype("<u4")
+
+
+@pytest.fixture
+def library(tmp_path):
+    """Writes tracks with distinct content and caches the given fingerprint and length for each."""
+    index = LibraryIndex(db_path=str(tmp_path / "library_index.db"))
+    blobs = BlobStore(path=str(tmp_path / "analysis_cache.blob"))
+    playlist_dir = tmp_path / "playlists"
+    playlist_dir.mkdir()
+
+    def make(tracks):
+        songs = []
+        for number, name in enumerate(tracks):
+            path = tmp_path / f"{name}.mp3"
+            path.write_bytes(bytes([number]) * 4096)
+            songs.append({"artist": "Artist", "title": name, "path": str(path)})
+        (playlist_dir / "All.json").write_text(json.dumps({"playlist_name": "All", "songs": songs}))
+        paths = [song["path"] for song in songs]
+        identities = track_identities(paths, library_index=index)
+        index.store_identities((path, *file_signature(path), identities[path][0], tracks[name][1])
+                               for path, name in zip(paths, tracks))
+        blobs.put_many(FINGERPRINT_KIND, ((path, file_signature(path), tracks[name][0])
+                                          for path, name in zip(paths, tracks)))
+        groups = find_duplicates(str(playlist_dir), use_fingerprint=True, library_index=index, blob_store=blobs)
+        return [sorted(p.rsplit("/", 1)[-1] for p in group["paths"]) for group in groups]
+
+    yield make
+    blobs.close()
+    index.close()
+
+
+def test_reencode_of_the_same_length_is_grouped(library):
+    rng = np.random.default_rng(34)
+    original = random_fingerprint(rng)
+    groups = library({
+        "original": (original, 241.0),
+        "reencode": (reencode(original, rng), 241.3),
+        "other": (random_fingerprint(rng), 241.2),
+    })
+    assert groups == [["original.mp3", "reencode.mp3"]]
+
+
+def test_tracks_of_different_length_are_not_compared(library):
+    rng = np.random.default_rng(35)
+    intro = random_fingerprint(rng)
+    # Same first two minutes (an extended mix, say), but a minute longer
+    groups = library({"radio edit": (intro, 200.0), "extended": (intro.copy(), 260.0)})
+    assert groups == []
+
+
+def test_similarity_finds_shifted_copy():
+    rng = np.random.default_rng(36)
+    original = random_fingerprint(rng)
+    assert fingerprint_similarity(original, reencode(original, rng, flip_rate=0.1, shift=-20)) > 0.85
+    assert fingerprint_similarity(original, random_fingerprint(rng)) < 0.55
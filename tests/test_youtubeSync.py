@@ -0,0 +1,179 @@
+# IotaPlayer - A feature-rich music player application
+# Copyright (C) 2025 Charlie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# tests/test_youtubeSync.py
+# =============
+# Incremental YouTube playlist sync (core/youtubeSync.py) against the
+# in-memory Data API in tests/fakeYouTube.py.
+# =============
+import random
+
+import pytest
+
+from core.youtubeSync import PlaylistNotFound, SyncRegistry, plan_sync, publish_playlist, sync_playlist
+from core.youtubeUpload import PAGE_SIZE, fetch_playlist_items
+from fakeYouTube import FakeYouTube
+
+
+def remote_items(youtube, playlist_id):
+    return list(youtube.playlists_by_id[playlist_id])
+
+
+def test_plan_sync_matches_duplicate_videos_copy_by_copy():
+    remote = [("i1", "a"), ("i2", "b"), ("i3", "a"), ("i4", "a")]
+    plan = plan_sync(remote, ["a", "b", "a", "c"])
+    # The third remote "a" has no local copy left; "c" is new
+    assert plan.deletes == ["i4"]
+    assert plan.moves == []
+    assert plan.inserts == [("c", 3)]
+
+
+def test_plan_sync_pure_reorder_moves_only_items_out_of_order():
+    local = ["a", "b", "c", "d", "e"]
+    remote = [("i1", "a"), ("i3", "c"), ("i2", "b"), ("i4", "d"), ("i5", "e")]
+    plan = plan_sync(remote, local)
+    assert plan.deletes == []
+    assert plan.inserts == []
+    assert len(plan.moves) == 1
+
+
+def test_plan_sync_up_to_date_playlist_needs_no_writes():
+    remote = [("i1", "a"), ("i2", "b"), ("i3", "a")]
+    assert plan_sync(remote, ["a", "b", "a"]).writes == 0
+
+
+def test_sync_applies_deletes_and_inserts():
+    youtube = FakeYouTube()
+    playlist_id = youtube.create_playlist(["a", "b", "c", "d"])
+    kept = {item_id for item_id, video in remote_items(youtube, playlist_id) if video in ("a", "c")}
+    local = ["x", "a", "c", "y", "z"]
+
+    plan, errors = sync_playlist(youtube, playlist_id, local)
+
+    assert errors == []
+    assert len(plan.deletes) == 2
+    assert plan.moves == []
+    assert plan.inserts == [("x", 0), ("y", 3), ("z", 4)]
+    assert youtube.videos(playlist_id) == local
+    # Matched items are kept, not deleted and re-added
+    assert kept <= {item_id for item_id, _ in remote_items(youtube, playlist_id)}
+
+
+def test_sync_reaches_local_order_for_random_playlists():
+    rng = random.Random(46)
+    for _ in range(300):
+        youtube = FakeYouTube()
+        videos = [f"v{n}" for n in range(8)]
+        remote = [rng.choice(videos) for _ in range(rng.randint(0, 12))]
+        local = [rng.choice(videos) for _ in range(rng.randint(0, 12))]
+        playlist_id = youtube.create_playlist(remote)
+
+        plan, errors = sync_playlist(youtube, playlist_id, local)
+
+        assert errors == []
+        assert youtube.videos(playlist_id) == local
+        assert len(youtube.writes) == plan.writes
+
+
+def test_fetch_playlist_items_follows_pages():
+    youtube = FakeYouTube()
+    videos = [f"v{n}" for n in range(PAGE_SIZE * 2 + 20)]
+    playlist_id = youtube.create_playlist(videos)
+
+    items = fetch_playlist_items(youtube, playlist_id)
+
+    assert items == remote_items(youtube, playlist_id)
+    assert youtube.pages_listed == 3
+
+
+def test_sync_of_deleted_playlist_raises_playlist_not_found():
+    with pytest.raises(PlaylistNotFound):
+        sync_playlist(FakeYouTube(), "PLmissing", ["a"])
+
+
+def test_failed_insert_shifts_later_insert_positions():
+    youtube = FakeYouTube(rejected_videos={"gone"})
+    playlist_id = youtube.create_playlist(["m"])
+
+    plan, errors = sync_playlist(youtube, playlist_id, ["a", "gone", "m", "b", "c"])
+
+    assert plan.inserts == [("a", 0), ("gone", 1), ("b", 3), ("c", 4)]
+    assert len(errors) == 1 and errors[0].startswith("gone:")
+    # Inserts after the failed one are placed one position earlier
+    assert [write for write in youtube.writes if write[0] == "insert"] == [
+        ("insert", "a", 0), ("insert", "b", 2), ("insert", "c", 3)
+    ]
+    assert youtube.videos(playlist_id) == ["a", "m", "b", "c"]
+
+
+def test_registry_round_trip(tmp_path):
+    path = tmp_path / "youtube_sync.json"
+    registry = SyncRegistry(str(path))
+    registry.remember("Road Trip", "PL1")
+    assert SyncRegistry(str(path)).remote_playlist("Road Trip") == "PL1"
+    registry.forget("Road Trip")
+    assert SyncRegistry(str(path)).remote_playlist("Road Trip") is None
+
+
+@pytest.fixture
+def publish(tmp_path):
+    """publish_playlist() against a fake Data API, with its registry and journal in tmp_path."""
+    youtube = FakeYouTube()
+    registry = SyncRegistry(str(tmp_path / "youtube_sync.json"))
+
+    def run(video_ids, sync=True):
+        return publish_playlist(youtube, "Road Trip", video_ids, playlist_name="Road Trip", sync=sync,
+                                registry=registry, journal_path=str(tmp_path / "Road Trip.journal.json"))
+
+    return youtube, registry, run
+
+
+def test_publish_syncs_remembered_playlist(publish):
+    youtube, registry, run = publish
+    playlist_id = youtube.create_playlist(["a", "b"])
+    registry.remember("Road Trip", playlist_id)
+
+    message = run(["b", "a", "c"])
+
+    assert "Updated YouTube playlist" in message
+    assert list(youtube.playlists_by_id) == [playlist_id]
+    assert youtube.videos(playlist_id) == ["b", "a", "c"]
+
+
+def test_publish_without_sync_uploads_a_new_playlist(publish):
+    youtube, registry, run = publish
+    playlist_id = youtube.create_playlist(["a", "b"])
+    registry.remember("Road Trip", playlist_id)
+
+    message = run(["a", "b"], sync=False)
+
+    new_id = registry.remote_playlist("Road Trip")
+    assert "Uploaded playlist" in message
+    assert new_id != playlist_id
+    assert youtube.videos(playlist_id) == ["a", "b"]
+    assert youtube.videos(new_id) == ["a", "b"]
+
+
+def test_publish_recreates_deleted_playlist(publish):
+    youtube, registry, run = publish
+    registry.remember("Road Trip", "PLdeleted")
+
+    message = run(["a", "b", "c"])
+
+    new_id = registry.remote_playlist("Road Trip")
+    assert new_id not in (None, "PLdeleted")
+    assert "Uploaded playlist" in message
+    assert youtube.videos(new_id) == ["a", "b", "c"]